@@ -1,9 +1,22 @@
 import json
 import boto3
 import os
+from botocore.config import Config
+from concurrent.futures import ThreadPoolExecutor
+from execution_wait import get_wait_time, wait_for_execution
+from execution_cache import describe_execution
 
+aws_region_name = os.environ['AWS_REGION']
 frontend_url = os.environ['FRONTEND_URL']
-client = boto3.client('stepfunctions') # SFN in boto3 documentation
+# Optional cache of finished executions, shared by the Lambda containers (see layers/common/execution_cache.py)
+execution_cache_table_name = os.environ.get('EXECUTION_CACHE_TABLE')
+# Only used by batch_status_handler (POST /orders/status)
+MAX_STATUS_EXECUTIONS = 100
+# Number of threads that describe executions concurrently (one round trip for MAX_STATUS_EXECUTIONS)
+STATUS_MAX_WORKERS = int(os.environ.get('STATUS_MAX_WORKERS', str(MAX_STATUS_EXECUTIONS)))
+# boto3 clients are thread-safe: the threads share this client, which keeps one HTTP connection per thread
+client = boto3.client('stepfunctions', region_name=aws_region_name, config=Config(max_pool_connections=STATUS_MAX_WORKERS)) # SFN in boto3 documentation
+dynamodb = boto3.resource('dynamodb', region_name=aws_region_name)
 
 def check_submission_status(arn, valerror):
     """
@@ -23,10 +36,8 @@ def check_submission_status(arn, valerror):
     ret = ''
 
     try:
-        response = client.describe_execution(
-            executionArn = arn,
-            includedData='ALL_DATA'
-            )
+        # Finished executions are cached: repeated polls do not call DescribeExecution
+        response = describe_execution(client, arn, dynamodb, execution_cache_table_name)
             
         status = response['status']
 
@@ -69,13 +80,23 @@ def lambda_handler(event, context):
     ret = httpret
 
     try:
+        # An invalid wait parameter is reported to the client as 400
+        try:
+            wait_in_seconds = get_wait_time(event)
+        except ValueError as error:
+            httpret['statusCode'] = 400
+            raise
+
+        # With ?wait=N, the status is checked again until the execution ends or N seconds
+        # have passed, so the client gets the final status in one request (long polling)
         valerror = {'error':''}
-        response = check_submission_status(execution_arn, valerror)
+        response = wait_for_execution(lambda: check_submission_status(execution_arn, valerror), wait_in_seconds, context)
         httpret['body'] = json.dumps({'status':response})
 
     except Exception as error:
         print(f'Exception error: {error}')
-        httpret['statusCode'] = 500
+        if httpret['statusCode'] != 400:
+            httpret['statusCode'] = 500
         httpret['body'] = json.dumps({'error': str(error)})
         ret = httpret
     else:
@@ -87,4 +108,129 @@ def lambda_handler(event, context):
         # Execute the following code whether or not an exception has been raised:
         print(f'finally block: do nothing for now')
 
-    return ret    
+    return ret
+
+def get_status_arns(event):
+    """
+    This function reads the execution ARNs of POST /orders/status, with body {"executionArns": [arn, arn, ...]}
+
+    Parameters:
+
+    event: API Gateway event
+
+    Returns:
+
+    List of execution ARNs. Raises ValueError for an invalid body.
+
+    """
+    try:
+        body = json.loads(event.get('body') or '{}')
+    except ValueError:
+        raise ValueError('Request body must be JSON')
+
+    arns = body.get('executionArns') if isinstance(body, dict) else None
+    if not isinstance(arns, list) or len(arns) == 0:
+        raise ValueError('Request body must have a non-empty "executionArns" list')
+    if len(arns) > MAX_STATUS_EXECUTIONS:
+        raise ValueError(f'At most {MAX_STATUS_EXECUTIONS} execution ARNs are allowed')
+    if not all(isinstance(arn, str) and arn for arn in arns):
+        raise ValueError('Execution ARNs must be non-empty strings')
+
+    return arns
+
+def check_status_of_execution(arn):
+    """
+    This function returns the status of one execution of POST /orders/status,
+    or its error (an error does not fail the other executions)
+
+    Parameters:
+
+    arn: Execution ARN of a state machine
+
+    Returns:
+
+    Dict with 'executionArn', and 'status' or 'error'
+
+    """
+    valerror = {'error':''}
+    status = check_submission_status(arn, valerror)
+    if valerror['error']:
+        return {'executionArn': arn, 'error': str(valerror['error'])}
+
+    return {'executionArn': arn, 'status': status}
+
+def check_statuses(arns):
+    """
+    This function returns the status of several executions, which are described
+    concurrently by a pool of at most STATUS_MAX_WORKERS threads
+
+    Parameters:
+
+    arns: List of execution ARNs. Duplicates are described once.
+
+    Returns:
+
+    List of dicts (see check_status_of_execution), in the order of arns
+
+    """
+    unique_arns = list(dict.fromkeys(arns))
+    with ThreadPoolExecutor(max_workers=max(1, min(STATUS_MAX_WORKERS, len(unique_arns)))) as executor:
+        results = dict(zip(unique_arns, executor.map(check_status_of_execution, unique_arns)))
+
+    return [results[arn] for arn in arns]
+
+def batch_status_handler(event, context):
+    """
+    Status of several executions: POST /orders/status (see CheckOrderSubmissionBatchLambda in template.yaml),
+    for dashboards that follow many orders. Each execution is checked like
+    GET /orders/status/{executionArn}, and the executions are checked concurrently.
+
+    The response lists one result per ARN, in the order of the request:
+    'status', or 'error' if the execution could not be described.
+
+    """
+
+    print(f'event (status of several executions): {event}')
+
+    body = json.dumps({'statuses': []})
+
+    httpret = {
+        'statusCode': 200,
+        'headers': {
+            'Access-Control-Allow-Headers': 'Content-Type,X-Amz-Date,Authorization,X-Api-Key,X-Amz-Security-Token',
+            'Access-Control-Allow-Origin': frontend_url,
+            'Access-Control-Allow-Methods': 'OPTIONS,POST,GET',
+            'Access-Control-Allow-Credentials': True,
+            'Content-Type': 'application/json'
+        },
+        'body': body
+    }
+
+    ret = httpret
+
+    try:
+        # An invalid body is reported to the client as 400
+        try:
+            arns = get_status_arns(event)
+        except ValueError as error:
+            httpret['statusCode'] = 400
+            raise
+
+        httpret['body'] = json.dumps({'statuses': check_statuses(arns)})
+
+    except Exception as error:
+        print(f'Exception error: {error}')
+        if httpret['statusCode'] != 400:
+            httpret['statusCode'] = 500
+        httpret['body'] = json.dumps({'error': str(error)})
+        ret = httpret
+    else:
+        # If no errors are detected, continue to execute the following:
+        print(f'else block: do nothing for now')
+
+        ret = httpret
+    finally:
+        # Execute the following code whether or not an exception has been raised:
+        print(f'finally block: do nothing for now')
+
+    return ret
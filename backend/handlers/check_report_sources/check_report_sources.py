@@ -0,0 +1,183 @@
+import os
+import time
+import boto3
+from collections import Counter
+from table_registry import run_table_operation
+
+aws_region_name = os.environ['AWS_REGION']
+# Version counters of the report sources, and the versions of the last report
+ddb_report_sources_table_name = os.environ['REPORT_SOURCES_TABLE']
+ddb_orders_table_name = os.environ['ORDERS_TABLE']
+dynamodb = boto3.resource('dynamodb', region_name=aws_region_name)
+
+# The last report is reused only while the links of its index page are valid (see
+# REPORT_LINK_EXPIRATION_IN_SECONDS in prepare_orders_report_html.py, 3600 seconds)
+REPORT_REUSE_MAX_AGE_IN_SECONDS = int(os.environ.get('REPORT_REUSE_MAX_AGE_IN_SECONDS', '1800'))
+# Sources of the reports: Orders table, and Products and InventoryShards tables
+REPORT_SOURCES = ('orders', 'products')
+LAST_REPORT_KEY = 'last_report'
+
+def get_source_name(event_source_arn):
+    """
+    This function returns the report source of a DynamoDB stream record
+
+    Parameters:
+
+    event_source_arn: ARN of the stream (for example arn:aws:dynamodb:us-east-1:123456789012:table/Orders/stream/2025-04-02T12:00:00.000)
+
+    Returns:
+
+    'orders' for the Orders table. 'products' for the Products and InventoryShards tables.
+
+    """
+    table_name = event_source_arn.split('/')[1]
+    return 'orders' if table_name == ddb_orders_table_name else 'products'
+
+def read_report_sources(table_name, valerror):
+    """
+    This function reads the versions of the report sources, and of the last report,
+    with one BatchGetItem (strongly consistent)
+
+    Parameters:
+
+    table_name: Name of the DynamoDB report sources Table
+    valerror: returned exception error
+
+    Returns:
+
+    Tuple (versions, last_report). versions is a dict with a version (int) per source
+    (0 if the source was never written). last_report is the item of the last report, or None.
+    Otherwise, None.
+
+    """
+    ret = None
+    try:
+
+        keys = [{'source': source} for source in REPORT_SOURCES + (LAST_REPORT_KEY,)]
+        response = dynamodb.batch_get_item(RequestItems={table_name: {'Keys': keys, 'ConsistentRead': True}})
+        if response.get('UnprocessedKeys'):
+            raise ValueError('Could not read all report sources')
+
+        items = {item['source']: item for item in response['Responses'][table_name]}
+        versions = {source: int(items.get(source, {}).get('version', 0)) for source in REPORT_SOURCES}
+
+    except (Exception, ValueError) as error:
+        print(f'Exception error: read_report_sources : {error}')
+        valerror['error'] = error
+
+    else:
+        # If no errors are detected, continue to execute the following:
+        print(f'else block: read_report_sources :')
+
+        ret = (versions, items.get(LAST_REPORT_KEY))
+
+    finally:
+        # Execute the following code whether or not an exception has been raised:
+        print(f'finally block: read_report_sources :')
+
+    return ret
+
+def lambda_handler(event, context):
+    """
+    First state of StateMachineGenerateReport (see template.yaml).
+
+    The reports are generated again only if an order or a product was written
+    since the last report (see count_writes_handler), or if the links of the last
+    report are about to expire. Otherwise, the state machine only presigns the
+    existing reports again.
+
+    """
+    print(f'event: {event}')
+
+    # If the sources cannot be checked, the reports are generated
+    ret = {'unchanged': False, 'versions': None}
+
+    try:
+
+        valerror = {'error':''}
+        result = read_report_sources(ddb_report_sources_table_name, valerror)
+        if result is None:
+            raise ValueError(f'Could not read report sources: {valerror["error"]}')
+
+        versions, last_report = result
+        ret['versions'] = versions
+
+        if last_report is None:
+            print(f'no report yet')
+        elif int(last_report['generated_at']) + REPORT_REUSE_MAX_AGE_IN_SECONDS < int(time.time()):
+            print(f'last report is too old')
+        else:
+            ret['unchanged'] = all(int(last_report[source]) == versions[source] for source in REPORT_SOURCES)
+
+    except (Exception, ValueError) as error:
+        print(f'Exception error: {error}')
+
+    else:
+        # If no errors are detected, continue to execute the following:
+        print(f'else block: report sources: {ret}')
+
+    finally:
+        # Execute the following code whether or not an exception has been raised:
+        print(f'finally block: do nothing for now')
+
+    return ret
+
+def save_report_sources_handler(event, context):
+    """
+    Saves the versions of the sources of the reports that were just generated
+    (see SaveReportSources in template.yaml).
+
+    The versions were read before the reports were generated (see lambda_handler):
+    a write during the generation makes the next report run again.
+
+    """
+    print(f'event: {event}')
+    ret = False
+
+    try:
+
+        if not event.get('versions'):
+            raise ValueError('No versions to save')
+
+        item = {source: event['versions'][source] for source in REPORT_SOURCES}
+        item.update({'source': LAST_REPORT_KEY, 'generated_at': int(time.time())})
+        run_table_operation(dynamodb, ddb_report_sources_table_name, lambda ddb_table: ddb_table.put_item(Item=item))
+
+        ret = True
+
+    except (Exception, ValueError) as error:
+        print(f'Exception error: {error}')
+
+    else:
+        # If no errors are detected, continue to execute the following:
+        print(f'else block: do nothing for now')
+
+    finally:
+        # Execute the following code whether or not an exception has been raised:
+        print(f'finally block: do nothing for now')
+
+    return ret
+
+def count_writes_handler(event, context):
+    """
+    Consumer of the DynamoDB streams of the Orders, Products and InventoryShards tables
+    (see CountReportSourceWritesLambda in template.yaml).
+
+    Each batch of stream records adds its number of writes to the version of each
+    source, with one UpdateItem per source. The counters are updated outside of
+    the order requests, and also count writes made outside of the application.
+    An error is raised so that the batch is delivered again: counting a write
+    twice only makes the next report run.
+
+    """
+    writes = Counter(get_source_name(record['eventSourceARN']) for record in event['Records'])
+    print(f'writes: {dict(writes)}')
+
+    for source, count in writes.items():
+        run_table_operation(dynamodb, ddb_report_sources_table_name, lambda ddb_table: ddb_table.update_item(
+            Key={'source': source},
+            UpdateExpression='ADD version :count',
+            ExpressionAttributeValues={':count': count}
+        ))
+
+    return {'writes': dict(writes)}
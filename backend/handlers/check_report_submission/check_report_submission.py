@@ -1,9 +1,15 @@
 import json
 import boto3
 import os
+from execution_wait import get_wait_time, wait_for_execution
+from execution_cache import describe_execution
 
+aws_region_name = os.environ['AWS_REGION']
 frontend_url = os.environ['FRONTEND_URL']
-client = boto3.client('stepfunctions') # SFN in boto3 documentation
+# Optional cache of finished executions, shared by the Lambda containers (see layers/common/execution_cache.py)
+execution_cache_table_name = os.environ.get('EXECUTION_CACHE_TABLE')
+client = boto3.client('stepfunctions', region_name=aws_region_name) # SFN in boto3 documentation
+dynamodb = boto3.resource('dynamodb', region_name=aws_region_name)
 
 def check_submission_status(arn, valerror):
     """
@@ -23,10 +29,8 @@ def check_submission_status(arn, valerror):
     ret = ''
 
     try:
-        response = client.describe_execution(
-            executionArn = arn,
-            includedData='ALL_DATA'
-            )
+        # Finished executions are cached: repeated polls do not call DescribeExecution
+        response = describe_execution(client, arn, dynamodb, execution_cache_table_name)
             
         status = response['status']
 
@@ -69,13 +73,23 @@ def lambda_handler(event, context):
     ret = httpret
 
     try:
+        # An invalid wait parameter is reported to the client as 400
+        try:
+            wait_in_seconds = get_wait_time(event)
+        except ValueError as error:
+            httpret['statusCode'] = 400
+            raise
+
+        # With ?wait=N, the status is checked again until the execution ends or N seconds
+        # have passed, so the client gets the final status in one request (long polling)
         valerror = {'error':''}
-        response = check_submission_status(execution_arn, valerror)
+        response = wait_for_execution(lambda: check_submission_status(execution_arn, valerror), wait_in_seconds, context)
         httpret['body'] = json.dumps({'status':response})
 
     except Exception as error:
         print(f'Exception error: {error}')
-        httpret['statusCode'] = 500
+        if httpret['statusCode'] != 400:
+            httpret['statusCode'] = 500
         httpret['body'] = json.dumps({'error': str(error)})
         ret = httpret
     else:
@@ -1,12 +1,31 @@
 import json
 import boto3
 import os
+import uuid
+from botocore.config import Config
+from http_request import get_request_header
+from order_ids import generate_order_id
+from idempotency import get_request_hash, claim_idempotency_key, save_idempotent_response, release_idempotency_key
 
+aws_region_name = os.environ['AWS_REGION']
 frontend_url = os.environ['FRONTEND_URL']
 state_machine_arn = os.environ['STATE_MACHINE_ARN']
-client = boto3.client('stepfunctions') # SFN in boto3 documentation
+# Synchronous mode (POST /orders?wait=true): Express state machine, and the Standard
+# state machine that is started instead if the Express execution does not finish in time
+sync_state_machine_arn = os.environ.get('SYNC_STATE_MACHINE_ARN')
+sync_fallback_state_machine_arn = os.environ.get('SYNC_FALLBACK_STATE_MACHINE_ARN', state_machine_arn)
+SYNC_WAIT_TIMEOUT_IN_SECONDS = int(os.environ.get('SYNC_WAIT_TIMEOUT_IN_SECONDS', '20'))
+# Optional Idempotency-Key support (see layers/common/idempotency.py)
+idempotency_table_name = os.environ.get('IDEMPOTENCY_TABLE')
+# Optional queued intake: orders are sent to Amazon SQS instead of starting an execution (see queue_order_handler in new_order.py)
+order_queue_url = os.environ.get('ORDER_QUEUE_URL')
+dynamodb = boto3.resource('dynamodb', region_name=aws_region_name)
+sqs = boto3.client('sqs', region_name=aws_region_name)
+client = boto3.client('stepfunctions', region_name=aws_region_name) # SFN in boto3 documentation
+# StartSyncExecution waits for the end of the execution: wait at most SYNC_WAIT_TIMEOUT_IN_SECONDS, and do not retry
+sync_client = boto3.client('stepfunctions', region_name=aws_region_name, config=Config(read_timeout=SYNC_WAIT_TIMEOUT_IN_SECONDS, retries={'total_max_attempts': 1}))
 
-def run_state_machine(input_data, valerror):
+def run_state_machine(input_data, valerror, machine_arn=None):
     """
     This functions starts the execution of a state machine, and immediately
     returns with the ARN of the state machine's execution.
@@ -15,6 +34,7 @@ def run_state_machine(input_data, valerror):
 
     input_data: Order data which includes customer info and order info
     valerror: returned exception error
+    machine_arn: Optional ARN of the state machine. Default is STATE_MACHINE_ARN
 
     Returns:
 
@@ -29,7 +49,7 @@ def run_state_machine(input_data, valerror):
         # The response is a dictionary that contains the ARN that identifies the execution,
         #  and the date the execution is started.
         response = client.start_execution(
-            stateMachineArn=state_machine_arn,
+            stateMachineArn=machine_arn or state_machine_arn,
             input=json.dumps(input_data)  # Convert the dictionary to JSON string
         )
 
@@ -53,12 +73,170 @@ def run_state_machine(input_data, valerror):
 
     return ret
 
+def run_state_machine_sync(input_data, valerror):
+    """
+    This functions runs an Express state machine with StartSyncExecution, and
+    returns when the execution ends, or after SYNC_WAIT_TIMEOUT_IN_SECONDS.
+
+    Parameters:
+
+    input_data: Order data which includes customer info and order info
+    valerror: returned exception error
+
+    Returns:
+
+    StartSyncExecution response (with 'status', and 'output' or 'error' and 'cause').
+    None if the execution did not end in time or could not be started.
+
+    """
+
+    ret = None
+
+    try:
+        response = sync_client.start_sync_execution(
+            stateMachineArn=sync_state_machine_arn,
+            input=json.dumps(input_data)  # Convert the dictionary to JSON string
+        )
+
+        print(f'response: status {response["status"]}')
+
+        # The Express state machine has the same timeout as this function (TimeoutSeconds)
+        if response['status'] == 'TIMED_OUT':
+            raise TimeoutError('Express execution timed out')
+
+        ret = response
+
+    except (Exception, ValueError) as error:
+        print(f'Exception error: run_state_machine_sync : {error}')
+        valerror['error'] = error
+
+    else:
+        # If no errors are detected, continue to execute the following:
+        print(f'else block: run_state_machine_sync :')
+
+    finally:
+        # Execute the following code whether or not an exception has been raised:
+        print(f'finally block: run_state_machine_sync :')
+
+    return ret
+
+def get_sync_result(response):
+    """
+    This function builds the POST /orders?wait=true response body from a StartSyncExecution response
+
+    Parameters:
+
+    response: StartSyncExecution response
+
+    Returns:
+
+    Dict with 'status' and 'executionArn', and 'output' (SUCCEEDED) or 'error' and 'cause' (FAILED)
+
+    """
+    result = {
+        'status': response['status'],
+        'executionArn': response['executionArn']
+    }
+
+    if 'output' in response:
+        result['output'] = json.loads(response['output'])
+    if response['status'] != 'SUCCEEDED':
+        result['error'] = response.get('error', '')
+        result['cause'] = response.get('cause', '')
+
+    return result
+
+def is_wait_requested(event):
+    """
+    This function checks whether the client asked for the synchronous mode (POST /orders?wait=true)
+
+    Parameters:
+
+    event: API Gateway event
+
+    Returns:
+
+    True or False
+
+    """
+    query_parameters = event.get('queryStringParameters') or {}
+    return str(query_parameters.get('wait', '')).lower() == 'true'
+
+def send_to_queue(input_data, valerror):
+    """
+    This function sends an order to the order queue (Amazon SQS), instead of starting
+    a state machine execution. Traffic spikes wait in the queue, and the orders are
+    placed in batches by the queue consumer.
+
+    Parameters:
+
+    input_data: Order data which includes customer info and order info (same as the state machine input)
+    valerror: returned exception error
+
+    Returns:
+
+    Ticket of the order: the id of the order once it is placed (GET /orders/{id}). Otherwise, ''.
+
+    """
+    ret = ''
+    try:
+
+        response = sqs.send_message(
+            QueueUrl=order_queue_url,
+            MessageBody=json.dumps(input_data)
+        )
+        print(f'response: {response}')
+
+    except (Exception, ValueError) as error:
+        print(f'Exception error: send_to_queue : {error}')
+        valerror['error'] = error
+
+    else:
+        # If no errors are detected, continue to execute the following:
+        print(f'else block: send_to_queue :')
+
+        ret = input_data['order_id']
+
+    finally:
+        # Execute the following code whether or not an exception has been raised:
+        print(f'finally block: send_to_queue :')
+
+    return ret
+
+def set_replayed_response(httpret, record, request_hash):
+    """
+    This function sets the response of a request whose Idempotency-Key was already used
+
+    Parameters:
+
+    httpret: HTTP response to update
+    record: Stored record of the Idempotency-Key (see claim_idempotency_key)
+    request_hash: Fingerprint of this request's body (see get_request_hash)
+
+    """
+    if record['request_hash'] != request_hash:
+        httpret['statusCode'] = 422
+        httpret['body'] = json.dumps({'error': 'Idempotency-Key was already used with a different request'})
+    elif 'response_body' in record:
+        # Same response as the first request. No new state machine execution.
+        httpret['statusCode'] = int(record['status_code'])
+        httpret['body'] = record['response_body']
+        httpret['headers']['Idempotent-Replayed'] = 'true'
+    else:
+        httpret['statusCode'] = 409
+        httpret['body'] = json.dumps({'error': 'A request with this Idempotency-Key is in progress'})
+
 def lambda_handler(event, context):
 
     print(f'event (before starting state machine): {event}')
     
     input_data = {
-        'body': event['body']  # event['body'] is already a JSON string
+        'body': event['body'],  # event['body'] is already a JSON string
+        # Identifies this submission, and the id of its order. Executions with the same
+        # submission_id place the same order once (see new_order.py), so an Express execution
+        # that did not end in time can be followed by a Standard execution without placing the order twice.
+        'submission_id': uuid.uuid4().hex,
+        'order_id': generate_order_id()
     }
 
     body = json.dumps({'message': 'Order accepted successfully'})
@@ -66,7 +244,8 @@ def lambda_handler(event, context):
     httpret = {
         'statusCode': 202,
         'headers': {
-            'Access-Control-Allow-Headers': 'Content-Type,X-Amz-Date,Authorization,X-Api-Key,X-Amz-Security-Token',
+            'Access-Control-Allow-Headers': 'Content-Type,X-Amz-Date,Authorization,X-Api-Key,X-Amz-Security-Token,Idempotency-Key',
+            'Access-Control-Expose-Headers': 'Idempotent-Replayed',
             'Access-Control-Allow-Origin': frontend_url,
             'Access-Control-Allow-Methods': 'OPTIONS,POST,GET',
             'Access-Control-Allow-Credentials': True,
@@ -77,16 +256,79 @@ def lambda_handler(event, context):
 
     ret = httpret
 
+    # Idempotency-Key of this request, if this request processes it (not a replay)
+    idempotency_key = None
+
     try:
         valerror = {'error':''}
-        response = run_state_machine(input_data, valerror)
-        httpret['body'] = json.dumps({'executionArn':response})
+
+        # Optional Idempotency-Key header: a retried POST returns the response of the
+        # first POST with the same key, without starting another execution
+        record = None
+        if idempotency_table_name:
+            idempotency_key = get_request_header(event, 'Idempotency-Key')
+        if idempotency_key is not None:
+            request_hash = get_request_hash(event['body'])
+            try:
+                record = claim_idempotency_key(dynamodb, idempotency_table_name, idempotency_key, request_hash,
+                                               {'submission_id': input_data['submission_id']})
+            except ValueError as error:
+                idempotency_key = None
+                httpret['statusCode'] = 400
+                raise
+            if record is not None:
+                # Another request owns this key
+                idempotency_key = None
+
+        # Synchronous mode: the final status and order are returned by this request
+        sync_response = None
+        if record is None and is_wait_requested(event) and sync_state_machine_arn:
+            sync_response = run_state_machine_sync(input_data, valerror)
+
+        if record is not None:
+            print(f'Idempotency-Key was already used')
+            set_replayed_response(httpret, record, request_hash)
+        elif sync_response is not None:
+            httpret['statusCode'] = 200
+            httpret['body'] = json.dumps(get_sync_result(sync_response))
+        elif order_queue_url and not is_wait_requested(event):
+            # Queued intake: the order is placed later by the queue consumer
+            ticket = send_to_queue(input_data, valerror)
+            if ticket == '':
+                raise ValueError(f'Could not queue order: {valerror["error"]}')
+            httpret['body'] = json.dumps({'ticket': ticket})
+        else:
+            if is_wait_requested(event) and sync_state_machine_arn:
+                # Not finished in time: same contract as without ?wait=true (202 and executionArn)
+                print(f'Falling back to asynchronous mode: {valerror["error"]}')
+                response = run_state_machine(input_data, valerror, sync_fallback_state_machine_arn)
+            else:
+                response = run_state_machine(input_data, valerror)
+
+            if response == '':
+                raise ValueError(f'Could not start state machine: {valerror["error"]}')
+            httpret['body'] = json.dumps({'executionArn':response})
+
+        if idempotency_key is not None:
+            # The execution has started: the response is returned even if it cannot be stored
+            try:
+                save_idempotent_response(dynamodb, idempotency_table_name, idempotency_key, httpret['statusCode'], httpret['body'])
+            except Exception as save_error:
+                print(f'Exception error: save_idempotent_response : {save_error}')
 
     except Exception as error:
         print(f'Exception error: {error}')
-        httpret['statusCode'] = 500
+        if httpret['statusCode'] != 400:
+            httpret['statusCode'] = 500
         httpret['body'] = json.dumps({'error': str(error)})
         ret = httpret
+
+        if idempotency_key is not None:
+            # The client can retry with the same key
+            try:
+                release_idempotency_key(dynamodb, idempotency_table_name, idempotency_key)
+            except Exception as release_error:
+                print(f'Exception error: release_idempotency_key : {release_error}')
     else:
         # If no errors are detected, continue to execute the following:
         print(f'else block: do nothing for now')
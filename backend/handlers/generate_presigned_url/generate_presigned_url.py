@@ -3,6 +3,8 @@ import os
 
 EXPIRATION_IN_SECOND = 3600
 s3_bucket_name = os.environ['REPORTS_BUCKET']
+# orderreport.html (incremental report) or orderreport-full.html (fused report), see FusedReportTasks
+orders_report_key = os.environ.get('ORDERS_REPORT_KEY', 'orderreport.html')
 s3 = boto3.client('s3')
 
 def generate_presigned_url(bucket_name, object_name, expiration_in_seconds, key_name, valerror):
@@ -60,7 +62,7 @@ def lambda_handler(event, context):
     ret = None
 
     try:
-        object_name = "orderreport.html"
+        object_name = orders_report_key
         expiration_in_seconds = EXPIRATION_IN_SECOND
 
         valerror = {'error':''}
@@ -1,13 +1,18 @@
 import os
 import boto3
 import json
+from table_registry import run_table_operation
+from projection import ORDER_FIELDS, get_requested_fields, build_projection
+from order_rejections import get_rejection
 
 frontend_url = os.environ['FRONTEND_URL']
 aws_region_name = os.environ['AWS_REGION']
 ddb_table_name = os.environ['ORDERS_TABLE']
+# Optional: queued orders that were not placed (see queue_order_handler in new_order.py)
+rejected_orders_table_name = os.environ.get('REJECTED_ORDERS_TABLE')
 dynamodb = boto3.resource('dynamodb', region_name=aws_region_name)
 
-def get_order_from_ddb(table_name, order_id, valerror):
+def get_order_from_ddb(table_name, order_id, valerror, fields=None):
     """
     This function gets an order from DynamoDB table
 
@@ -16,6 +21,7 @@ def get_order_from_ddb(table_name, order_id, valerror):
     table_name: Name of the DynamoDB Table that has orders
     order_id: Table key, which is also used to identify an order
     valerror: returned exception error
+    fields: Optional list of attributes to read (see layers/common/projection.py). Default is all attributes
 
     Returns:
 
@@ -25,22 +31,11 @@ def get_order_from_ddb(table_name, order_id, valerror):
 
     ret = None
     try:
-        
-        # From Boto3 documentation:
-        # Instantiate a table resource object without actually creating a DynamoDB table.
-        ddb_table = dynamodb.Table(table_name)        
-        if 'not found' in ddb_table.table_status:
-            # Boto3 documenation: the attributes (such as table_status) are lazy-loaded,
-            # which means that these are not fetched immediately when the object is created.
-            # So, once I call ddb_table.table_status, its value will be fetched.
-            # If its value has an error exception, then the exception automatically occurs
-            # before even executing the following line of code:
-            raise ValueError(f'Table: {table_name} not found')
-        print(f'ddb_table: {ddb_table}')
-
-        response = ddb_table.get_item(
-            Key={'id': order_id}
-        )
+
+        response = run_table_operation(dynamodb, table_name, lambda ddb_table: ddb_table.get_item(
+            Key={'id': order_id},
+            **build_projection(fields)
+        ))
 
         if 'Item' in response:
             print(f'response: {response}')
@@ -82,19 +77,41 @@ def lambda_handler(event, context):
     }
 
     ret = httpret
+    order = None
 
     try:
         # API Gateway sends a message to Lambda function that includes
         # 'pathParameters'. In this key, there is the requested item 'id'.
         id = event['pathParameters']['id']
+
+        # Optional sparse fields: ?fields=id,order_time,total_amount
+        # Attributes that are not allowed are reported to the client as 400
+        try:
+            fields = get_requested_fields(event.get('queryStringParameters'), ORDER_FIELDS)
+        except ValueError as error:
+            httpret['statusCode'] = 400
+            raise
         
         valerror = {'error':''}
-        order = get_order_from_ddb(ddb_table_name, id, valerror)
+        order = get_order_from_ddb(ddb_table_name, id, valerror, fields)
 
         if order is not None and 'message' in order and 'not found' in order['message']:
-            raise ValueError(order['message'])
-        else:
-            body = json.dumps(order)
+            # A ticket of the queued intake (POST /orders) is the id of the order:
+            # a rejected order is answered with its reason, instead of "not found" forever
+            reason = None
+            if rejected_orders_table_name:
+                try:
+                    reason = get_rejection(dynamodb, rejected_orders_table_name, id)
+                except Exception as error:
+                    # Answer as before: the order is not found (yet)
+                    print(f'Could not read the rejected orders table: {error}')
+            if reason is not None:
+                httpret['statusCode'] = 422
+                order = {'status': 'REJECTED', 'error': reason}
+            else:
+                raise ValueError(order['message'])
+
+        body = json.dumps(order)
 
         httpret['body'] = body
 
@@ -102,7 +119,7 @@ def lambda_handler(event, context):
         print(f'Exception error: {error}')        
         if order is not None and 'message' in order and str(error) == order['message']:
             httpret['statusCode'] = 404
-        else:
+        elif httpret['statusCode'] != 400:
             httpret['statusCode'] = 500
         httpret['body'] = json.dumps({'error': str(error)})
         ret = httpret
@@ -1,64 +1,312 @@
 import os
 import boto3
 import json
+from datetime import datetime
+from boto3.dynamodb.conditions import Key
+from table_registry import run_table_operation
+from pagination import encode_cursor, decode_cursor
+from projection import ORDER_FIELDS, get_requested_fields, build_projection
+from order_keys import normalize_email
+from order_days import query_order_days
+
+# Global secondary index of Orders table: partition key 'order_day' (YYYY-MM-DD), sort key 'order_time'
+ORDER_TIME_INDEX_NAME = 'OrderTimeIndex'
+# Global secondary index of Orders table: partition key 'email_key' (lower case email), sort key 'order_time'
+CUSTOMER_EMAIL_INDEX_NAME = 'CustomerEmailIndex'
+DEFAULT_PAGE_LIMIT = 50
+MAX_PAGE_LIMIT = 100
 
 frontend_url = os.environ['FRONTEND_URL']
 aws_region_name = os.environ['AWS_REGION']
 ddb_table_name = os.environ['ORDERS_TABLE']
+# Days that have orders (see layers/common/order_days.py), so that empty days are never queried
+ddb_order_days_table_name = os.environ['ORDER_DAYS_TABLE']
 dynamodb = boto3.resource('dynamodb', region_name=aws_region_name)
 
-def get_orders_from_ddb(table_name, valerror):
+def parse_time_bound(value, upper):
+    """
+    This function validates a 'from' or 'to' query string parameter
+
+    Parameters:
+
+    value: ISO 8601 date (2025-03-12) or date and time (2025-03-12T13:11:51.761Z), or None
+    upper: True for 'to' (inclusive upper bound). False for 'from'
+
+    Returns:
+
+    String to compare with 'order_time'. None if value is None. Raises ValueError for an invalid value.
+
+    """
+    if value is None:
+        return None
+
+    try:
+        datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        raise ValueError(f'Invalid date: {value}')
+
+    if upper and len(value) == 10:
+        # A date only 'to' includes the whole day. '~' sorts after every character of an order_time.
+        value += 'T~'
+
+    return value
+
+def check_cursor(position, by_email):
+    """
+    This function checks the content of a decoded cursor (see query_orders_by_time and query_orders_by_email)
+
+    Parameters:
+
+    position: Decoded cursor (see decode_cursor), or None
+    by_email: True for the orders of one customer
+
+    Returns:
+
+    Nothing. Raises ValueError for an invalid cursor.
+
+    """
+    if position is None:
+        return
+
+    start_key = position.get('key')
+    if start_key is not None and not isinstance(start_key, dict):
+        raise ValueError('Invalid cursor')
+
+    if by_email:
+        if not start_key:
+            raise ValueError('Invalid cursor')
+        return
+
+    day = position.get('day')
+    try:
+        if not isinstance(day, str) or len(day) != 10:
+            raise ValueError
+        datetime.fromisoformat(day)
+    except ValueError:
+        raise ValueError('Invalid cursor')
+
+def get_query_parameters(query_parameters):
+    """
+    This function reads the query string parameters of the time-ordered listing:
+
+    email: only the orders of this customer (case insensitive)
+    from, to: ISO 8601 dates or date and time (inclusive)
+    order: 'desc' (most recent first, default) or 'asc'
+    limit: page size (default DEFAULT_PAGE_LIMIT)
+    cursor: 'next_cursor' returned by a previous request
+
+    Parameters:
+
+    query_parameters: API Gateway 'queryStringParameters' (can be None)
+
+    Returns:
+
+    Dict of parameters. Without parameters, the DEFAULT_PAGE_LIMIT most recent orders
+    are listed (never a Scan of the whole table). Raises ValueError for invalid values.
+
+    """
+    query_parameters = query_parameters or {}
+
+    order = query_parameters.get('order', 'desc').lower()
+    if order not in ('asc', 'desc'):
+        raise ValueError('order must be asc or desc')
+
+    try:
+        limit = int(query_parameters.get('limit', DEFAULT_PAGE_LIMIT))
+    except ValueError:
+        raise ValueError('limit must be an integer')
+    if limit <= 0:
+        raise ValueError('limit must be greater than 0')
+
+    parameters = {
+        'email': normalize_email(query_parameters['email']) if 'email' in query_parameters else None,
+        'time_from': parse_time_bound(query_parameters.get('from'), upper=False),
+        'time_to': parse_time_bound(query_parameters.get('to'), upper=True),
+        'descending': order == 'desc',
+        'limit': min(limit, MAX_PAGE_LIMIT),
+        'cursor': query_parameters.get('cursor')
+    }
+
+    if parameters['time_from'] and parameters['time_to'] and parameters['time_from'] > parameters['time_to']:
+        raise ValueError('from must be before to')
+
+    # Check the cursor now, so that an invalid cursor is reported as 400
+    check_cursor(decode_cursor(parameters['cursor']), by_email=parameters['email'] is not None)
+
+    return parameters
+
+def query_orders_by_time(table_name, valerror, time_from=None, time_to=None, descending=True,
+                         limit=DEFAULT_PAGE_LIMIT, cursor=None, fields=None, page=None):
+    """
+    This function gets one page of orders, ordered by 'order_time', with Query
+    requests on the OrderTimeIndex (one day partition at a time), instead of a Scan.
+
+    Parameters:
+
+    table_name: Name of the DynamoDB Table that has orders
+    valerror: returned exception error
+    time_from: Lower bound of order_time (see parse_time_bound), or None
+    time_to: Upper bound of order_time (see parse_time_bound), or None
+    descending: True to get the most recent orders first
+    limit: Maximum number of orders
+    cursor: Opaque cursor returned by a previous call
+    fields: Optional list of attributes to read (see layers/common/projection.py). Default is all attributes
+    page: Optional dict that receives 'next_cursor' (None if there are no more orders)
+
+    Returns:
+
+    Orders list. Otherwise, None.
+
     """
-    This function gets all orders from DynamoDB table
+
+    ret = None
+    try:
+
+        # Days to query, in the requested order. Only the days that have orders are
+        # listed (see layers/common/order_days.py): empty days cost nothing, and
+        # orders of any age can be reached without 'from'.
+        first_day = time_from[:10] if time_from else None
+        last_day = time_to[:10] if time_to else None
+
+        # Continue from the position saved in the cursor (checked by get_query_parameters)
+        position = decode_cursor(cursor)
+        start_key = None
+        if position is not None:
+            if descending:
+                last_day = position['day']
+            else:
+                first_day = position['day']
+            start_key = position.get('key')
+
+        if time_from and time_to:
+            time_condition = Key('order_time').between(time_from, time_to)
+        elif time_from:
+            time_condition = Key('order_time').gte(time_from)
+        elif time_to:
+            time_condition = Key('order_time').lte(time_to)
+        else:
+            time_condition = None
+
+        days = query_order_days(dynamodb, ddb_order_days_table_name, first_day, last_day, descending)
+        day = next(days, None)
+        orders = []
+
+        while day is not None and len(orders) < limit:
+            key_condition = Key('order_day').eq(day)
+            if time_condition is not None:
+                key_condition = key_condition & time_condition
+
+            query_kwargs = {
+                'IndexName': ORDER_TIME_INDEX_NAME,
+                'KeyConditionExpression': key_condition,
+                'ScanIndexForward': not descending,
+                'Limit': limit - len(orders),
+                **build_projection(fields)
+            }
+            if start_key is not None:
+                query_kwargs['ExclusiveStartKey'] = start_key
+
+            response = run_table_operation(dynamodb, table_name, lambda ddb_table: ddb_table.query(**query_kwargs))
+            orders.extend(response['Items'])
+
+            start_key = response.get('LastEvaluatedKey')
+            if start_key is None:
+                # This day has no more orders. Continue with the next day that has orders.
+                day = next(days, None)
+
+        print(f'orders: {len(orders)} items')
+
+        if page is not None:
+            page['next_cursor'] = encode_cursor({'day': day, 'key': start_key}) if day is not None else None
+
+    except (Exception, ValueError) as error:
+        print(f'Exception error: query_orders_by_time : {error}')
+        valerror['error'] = error
+
+    else:
+        # If no errors are detected, continue to execute the following:
+        print(f'else block: query_orders_by_time :')
+
+        ret = orders
+
+    finally:
+        # Execute the following code whether or not an exception has been raised:
+        print(f'finally block: query_orders_by_time :')
+
+    return ret
+
+def query_orders_by_email(table_name, email, valerror, time_from=None, time_to=None, descending=True,
+                          limit=DEFAULT_PAGE_LIMIT, cursor=None, fields=None, page=None):
+    """
+    This function gets one page of the orders of one customer, ordered by 'order_time',
+    with a single Query on the CustomerEmailIndex, instead of a Scan.
 
     Parameters:
 
     table_name: Name of the DynamoDB Table that has orders
+    email: Normalized email of the customer (see layers/common/order_keys.py)
     valerror: returned exception error
+    time_from: Lower bound of order_time (see parse_time_bound), or None
+    time_to: Upper bound of order_time (see parse_time_bound), or None
+    descending: True to get the most recent orders first
+    limit: Maximum number of orders
+    cursor: Opaque cursor returned by a previous call
+    fields: Optional list of attributes to read (see layers/common/projection.py). Default is all attributes
+    page: Optional dict that receives 'next_cursor' (None if there are no more orders)
 
     Returns:
 
     Orders list. Otherwise, None.
-    
+
     """
 
     ret = None
     try:
-        
-        # From Boto3 documentation:
-        # Instantiate a table resource object without actually creating a DynamoDB table.
-        ddb_table = dynamodb.Table(table_name)              
-        if 'not found' in ddb_table.table_status:
-            # Boto3 documenation: the attributes (such as table_status) are lazy-loaded,
-            # which means that these are not fetched immediately when the object is created.
-            # So, once I call ddb_table.table_status, its value will be fetched.
-            # If its value has an error exception, then the exception automatically occurs
-            # before even executing the following line of code:
-            raise ValueError(f'Table: {table_name} not found')
-        print(f'ddb_table: {ddb_table}')
-
-        response = ddb_table.scan()
-        print(f'response: {response}')
+
+        key_condition = Key('email_key').eq(email)
+        if time_from and time_to:
+            key_condition = key_condition & Key('order_time').between(time_from, time_to)
+        elif time_from:
+            key_condition = key_condition & Key('order_time').gte(time_from)
+        elif time_to:
+            key_condition = key_condition & Key('order_time').lte(time_to)
+
+        query_kwargs = {
+            'IndexName': CUSTOMER_EMAIL_INDEX_NAME,
+            'KeyConditionExpression': key_condition,
+            'ScanIndexForward': not descending,
+            'Limit': limit,
+            **build_projection(fields)
+        }
+
+        position = decode_cursor(cursor)
+        if position is not None:
+            query_kwargs['ExclusiveStartKey'] = position['key']
+
+        response = run_table_operation(dynamodb, table_name, lambda ddb_table: ddb_table.query(**query_kwargs))
         orders = response['Items']
-        print(f'orders: {orders}')
+        print(f'orders: {len(orders)} items')
+
+        if page is not None:
+            start_key = response.get('LastEvaluatedKey')
+            page['next_cursor'] = encode_cursor({'key': start_key}) if start_key else None
 
     except (Exception, ValueError) as error:
-        print(f'Exception error: get_orders_from_ddb : {error}')
+        print(f'Exception error: query_orders_by_email : {error}')
         valerror['error'] = error
 
     else:
         # If no errors are detected, continue to execute the following:
-        print(f'else block: get_orders_from_ddb :')
+        print(f'else block: query_orders_by_email :')
 
         ret = orders
 
     finally:
         # Execute the following code whether or not an exception has been raised:
-        print(f'finally block: get_orders_from_ddb :')
+        print(f'finally block: query_orders_by_email :')
 
     return ret
 
-
 def lambda_handler(event, context):
     body = json.dumps({
         'orders': []
@@ -77,19 +325,41 @@ def lambda_handler(event, context):
 
     ret = httpret
 
-    try:        
+    try:
+        # Optional sparse fields: ?fields=id,order_time,total_amount
+        # Optional time-ordered listing: ?from=2025-03-01&to=2025-03-31&order=desc&limit=50&cursor=...
+        # Optional orders of one customer: ?email=jane.doe@example.com (with the same parameters)
+        # Invalid parameters are reported to the client as 400
+        try:
+            fields = get_requested_fields(event.get('queryStringParameters'), ORDER_FIELDS)
+            query_parameters = get_query_parameters(event.get('queryStringParameters'))
+        except ValueError as error:
+            httpret['statusCode'] = 400
+            raise
+
         valerror = {'error':''}
-        orders = get_orders_from_ddb(ddb_table_name, valerror)
+
+        # Without parameters, the most recent orders are listed, one page at a time
+        page = {'next_cursor': None}
+        email = query_parameters.pop('email')
+        if email is not None:
+            orders = query_orders_by_email(ddb_table_name, email, valerror, fields=fields, page=page, **query_parameters)
+        else:
+            orders = query_orders_by_time(ddb_table_name, valerror, fields=fields, page=page, **query_parameters)
+        if orders is None:
+            raise ValueError(f'Could not get orders: {valerror["error"]}')
 
         body = json.dumps({
-        'orders': orders
+        'orders': orders,
+        'next_cursor': page['next_cursor']
         })
 
         httpret['body'] = body
 
     except Exception as error:
         print(f'Exception error: {error}')
-        httpret['statusCode'] = 500
+        if httpret['statusCode'] != 400:
+            httpret['statusCode'] = 500
         httpret['body'] = json.dumps({'error': str(error)})
         ret = httpret
     else:
@@ -1,9 +1,14 @@
 import json
 import boto3
 import os
+from execution_cache import describe_execution
 
+aws_region_name = os.environ['AWS_REGION']
 frontend_url = os.environ['FRONTEND_URL']
-client = boto3.client('stepfunctions') # SFN in boto3 documentation
+# Optional cache of finished executions, shared by the Lambda containers (see layers/common/execution_cache.py)
+execution_cache_table_name = os.environ.get('EXECUTION_CACHE_TABLE')
+client = boto3.client('stepfunctions', region_name=aws_region_name) # SFN in boto3 documentation
+dynamodb = boto3.resource('dynamodb', region_name=aws_region_name)
 
 def get_presigned_urls_from_statemachine(arn, valerror):
     """
@@ -23,11 +28,11 @@ def get_presigned_urls_from_statemachine(arn, valerror):
     ret = ''
 
     try:
-        response = client.describe_execution(
-            executionArn = arn,
-            includedData='ALL_DATA'
-            )
-            
+        # Finished executions are cached: repeated requests do not call DescribeExecution
+        response = describe_execution(client, arn, dynamodb, execution_cache_table_name)
+        if 'output' not in response:
+            raise ValueError(f'Execution has no output (status {response["status"]})')
+
         output = response['output']
         print(f'response: {response}')
         print(f'output: {output}')
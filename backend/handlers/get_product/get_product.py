@@ -1,13 +1,19 @@
 import os
 import boto3
 import json
+from table_registry import run_table_operation
+from projection import PRODUCT_FIELDS, get_requested_fields, build_projection
+from json_encoding import dumps
+from inventory_shards import with_shard_field, aggregate_inventory, remove_shard_field
 
 frontend_url = os.environ['FRONTEND_URL']
 aws_region_name = os.environ['AWS_REGION']
 ddb_table_name = os.environ['PRODUCTS_TABLE']
+# Optional sharded inventory of hot products (see layers/common/inventory_shards.py)
+shards_table_name = os.environ.get('INVENTORY_SHARDS_TABLE')
 dynamodb = boto3.resource('dynamodb', region_name=aws_region_name)
 
-def get_product_from_ddb(table_name, product_id, valerror):
+def get_product_from_ddb(table_name, product_id, valerror, fields=None):
     """
     This function gets a product from DynamoDB table
 
@@ -16,6 +22,7 @@ def get_product_from_ddb(table_name, product_id, valerror):
     table_name: Name of the DynamoDB Table that has products
     product_id: Table key, which is also used to identify a product
     valerror: returned exception error
+    fields: Optional list of attributes to read (see layers/common/projection.py). Default is all attributes
 
     Returns:
 
@@ -25,26 +32,18 @@ def get_product_from_ddb(table_name, product_id, valerror):
 
     ret = None
     try:
-        
-        # From Boto3 documentation:
-        # Instantiate a table resource object without actually creating a DynamoDB table.
-        ddb_table = dynamodb.Table(table_name)        
-        if 'not found' in ddb_table.table_status:
-            # Boto3 documenation: the attributes (such as table_status) are lazy-loaded,
-            # which means that these are not fetched immediately when the object is created.
-            # So, once I call ddb_table.table_status, its value will be fetched.
-            # If its value has an error exception, then the exception automatically occurs
-            # before even executing the following line of code:
-            raise ValueError(f'Table: {table_name} not found')
-        print(f'ddb_table: {ddb_table}')
-
-        response = ddb_table.get_item(
-            Key={'id': product_id}
-        )
+
+        response = run_table_operation(dynamodb, table_name, lambda ddb_table: ddb_table.get_item(
+            Key={'id': product_id},
+            **build_projection(with_shard_field(fields))
+        ))
 
         if 'Item' in response:
             print(f'response: {response}')
             product = response['Item']
+            # The stock of a sharded product is the total of its shards
+            aggregate_inventory(dynamodb, shards_table_name, [product])
+            remove_shard_field([product], fields)
             print(f'product: {product}')
         else:
             product = {'message': f'Product {product_id} not found'}
@@ -82,19 +81,28 @@ def lambda_handler(event, context):
     }
 
     ret = httpret
+    product = None
 
     try:
         # API Gateway sends a message to Lambda function that includes
         # 'pathParameters'. In this key, there is the requested item 'id'.
         id = event['pathParameters']['id']
+
+        # Optional sparse fields: ?fields=id,price
+        # Attributes that are not allowed are reported to the client as 400
+        try:
+            fields = get_requested_fields(event.get('queryStringParameters'), PRODUCT_FIELDS)
+        except ValueError as error:
+            httpret['statusCode'] = 400
+            raise
         
         valerror = {'error':''}
-        product = get_product_from_ddb(ddb_table_name, id, valerror)
+        product = get_product_from_ddb(ddb_table_name, id, valerror, fields)
 
         if product is not None and 'message' in product and 'not found' in product['message']:
             raise ValueError(product['message'])
         else:
-            body = json.dumps(product)
+            body = dumps(product)
 
         httpret['body'] = body
 
@@ -102,7 +110,7 @@ def lambda_handler(event, context):
         print(f'Exception error: {error}')        
         if product is not None and 'message' in product and str(error) == product['message']:
             httpret['statusCode'] = 404
-        else:
+        elif httpret['statusCode'] != 400:
             httpret['statusCode'] = 500
         httpret['body'] = json.dumps({'error': str(error)})
         ret = httpret
@@ -1,20 +1,49 @@
 import os
 import boto3
 import json
+import time
+import hashlib
+from table_registry import get_table, run_table_operation
+from pagination import encode_cursor, decode_cursor
+from projection import PRODUCT_FIELDS, get_requested_fields, build_projection
+from json_encoding import dumps
+from inventory_shards import with_shard_field, aggregate_inventory, remove_shard_field
+from batch_get import batch_get_items
+from http_request import get_request_header
 
+MAX_PAGE_LIMIT = 100
+MAX_DRAIN_ITEMS = 1000
+MAX_BATCH_IDS = 500
+CATALOG_CACHE_TTL_IN_SECONDS = int(os.environ.get('CATALOG_CACHE_TTL_IN_SECONDS', '30'))
 frontend_url = os.environ['FRONTEND_URL']
 aws_region_name = os.environ['AWS_REGION']
 ddb_table_name = os.environ['PRODUCTS_TABLE']
+# Optional sharded inventory of hot products (see layers/common/inventory_shards.py)
+shards_table_name = os.environ.get('INVENTORY_SHARDS_TABLE')
 dynamodb = boto3.resource('dynamodb', region_name=aws_region_name)
 
-def get_products_from_ddb(table_name, valerror):
+# Snapshot of the whole catalog (GET /products without parameters), kept while
+# the Lambda container is warm. It is refreshed from DynamoDB after CATALOG_CACHE_TTL_IN_SECONDS.
+catalog_cache = {'body': None, 'etag': None, 'expires_at': 0}
+
+def get_products_from_ddb(table_name, valerror, limit=None, cursor=None, drain=True, max_items=MAX_DRAIN_ITEMS, page=None, fields=None):
     """
-    This function gets all products from DynamoDB table
+    This function gets products from DynamoDB table.
+
+    A single scan returns at most 1 MB (or 'limit' items), so the function
+    either returns one page, or keeps following LastEvaluatedKey ("drain")
+    until the table ends or 'max_items' products are read.
 
     Parameters:
 
     table_name: Name of the DynamoDB Table that has the products
     valerror: returned exception error
+    limit: Maximum number of products to read per scan page
+    cursor: Opaque cursor returned by a previous call (see encode_cursor)
+    drain: If True, follow all pages up to max_items. Otherwise, return one page
+    max_items: Upper bound of products returned in drain mode
+    page: Optional dict that receives 'next_cursor' (None if the table end is reached)
+    fields: Optional list of attributes to read (see layers/common/projection.py). Default is all attributes
 
     Returns:
 
@@ -24,24 +53,37 @@ def get_products_from_ddb(table_name, valerror):
 
     ret = None
     try:
-        
-        # From Boto3 documentation:
-        # Instantiate a table resource object without actually creating a DynamoDB table.
-        ddb_table = dynamodb.Table(table_name)        
-        if 'not found' in ddb_table.table_status:
-            # Boto3 documenation: the attributes (such as table_status) are lazy-loaded,
-            # which means that these are not fetched immediately when the object is created.
-            # So, once I call ddb_table.table_status, its value will be fetched.
-            # If its value has an error exception, then the exception automatically occurs
-            # before even executing the following line of code:
-            raise ValueError(f'Table: {table_name} not found')
-        print(f'ddb_table: {ddb_table}')
 
-        response = ddb_table.scan()
-        print(f'response: {response}')
-        products = response['Items']
+        start_key = decode_cursor(cursor)
+        products = []
+
+        while True:
+            scan_kwargs = build_projection(with_shard_field(fields))
+            if limit is not None:
+                scan_kwargs['Limit'] = limit
+            if drain:
+                # Never read more than what is still allowed by max_items
+                remaining = max_items - len(products)
+                scan_kwargs['Limit'] = min(scan_kwargs.get('Limit', remaining), remaining)
+            if start_key is not None:
+                scan_kwargs['ExclusiveStartKey'] = start_key
+
+            response = run_table_operation(dynamodb, table_name, lambda ddb_table: ddb_table.scan(**scan_kwargs))
+            print(f'response: {response}')
+            products.extend(response['Items'])
+            start_key = response.get('LastEvaluatedKey')
+
+            if not drain or start_key is None or len(products) >= max_items:
+                break
+
+        # The stock of sharded products is the total of their shards
+        aggregate_inventory(dynamodb, shards_table_name, products)
+        remove_shard_field(products, fields)
         print(f'products: {products}')
 
+        if page is not None:
+            page['next_cursor'] = encode_cursor(start_key)
+
     except (Exception, ValueError) as error:
         print(f'Exception error: get_products_from_ddb : {error}')
         valerror['error'] = error
@@ -58,6 +100,214 @@ def get_products_from_ddb(table_name, valerror):
 
     return ret
 
+def get_products_by_ids_from_ddb(table_name, product_ids, valerror, missing_ids=None, fields=None):
+    """
+    This function gets several products from DynamoDB table with BatchGetItem,
+    instead of one GetItem per product.
+
+    Keys are sent in chunks, and UnprocessedKeys are retried (see layers/common/batch_get.py).
+
+    Parameters:
+
+    table_name: Name of the DynamoDB Table that has the products
+    product_ids: List of product ids
+    valerror: returned exception error
+    missing_ids: Optional list that receives the ids that are not in the table
+    fields: Optional list of attributes to read (see layers/common/projection.py). Default is all attributes
+
+    Returns:
+
+    Products list, in the same order as product_ids. Otherwise, None.
+
+    """
+
+    ret = None
+    try:
+
+        ddb_table = get_table(dynamodb, table_name)
+        print(f'ddb_table: {ddb_table}')
+
+        unique_ids = list(dict.fromkeys(str(product_id) for product_id in product_ids))
+        found = batch_get_items(dynamodb, table_name, unique_ids, build_projection(with_shard_field(fields)))
+
+        products = [found[product_id] for product_id in unique_ids if product_id in found]
+
+        # The stock of sharded products is the total of their shards
+        aggregate_inventory(dynamodb, shards_table_name, products)
+        remove_shard_field(products, fields)
+        print(f'products: {products}')
+
+        if missing_ids is not None:
+            missing_ids.extend(product_id for product_id in unique_ids if product_id not in found)
+
+    except (Exception, ValueError) as error:
+        print(f'Exception error: get_products_by_ids_from_ddb : {error}')
+        valerror['error'] = error
+
+    else:
+        # If no errors are detected, continue to execute the following:
+        print(f'else block: get_products_by_ids_from_ddb :')
+
+        ret = products
+
+    finally:
+        # Execute the following code whether or not an exception has been raised:
+        print(f'finally block: get_products_by_ids_from_ddb :')
+
+    return ret
+
+def compute_etag(body):
+    """
+    This function computes a strong ETag of a response body
+
+    Parameters:
+
+    body: Serialized (JSON string) response body
+
+    Returns:
+
+    ETag string, including the double quotes
+
+    """
+    return '"' + hashlib.sha256(body.encode()).hexdigest() + '"'
+
+def is_etag_matched(if_none_match, etag):
+    """
+    This function checks an If-None-Match request header against an ETag
+
+    Parameters:
+
+    if_none_match: Value of the If-None-Match header, or None
+    etag: Current ETag of the response
+
+    Returns:
+
+    True if the client already has this response (304). Otherwise, False
+
+    """
+    if not if_none_match:
+        return False
+
+    for candidate in if_none_match.split(','):
+        candidate = candidate.strip()
+        # Weak validators (W/"...") are compared by their opaque tag
+        if candidate == '*' or candidate.removeprefix('W/') == etag:
+            return True
+
+    return False
+
+def get_catalog_snapshot(valerror):
+    """
+    This function returns the serialized catalog (all products) and its ETag.
+    It reads DynamoDB only when the cached snapshot of this container has expired.
+
+    Parameters:
+
+    valerror: returned exception error
+
+    Returns:
+
+    Dict with 'body' and 'etag'. Otherwise, None.
+
+    """
+    now = time.monotonic()
+    if catalog_cache['body'] is not None and now < catalog_cache['expires_at']:
+        print(f'catalog cache hit')
+        return {'body': catalog_cache['body'], 'etag': catalog_cache['etag']}
+
+    page = {'next_cursor': None}
+    products = get_products_from_ddb(ddb_table_name, valerror, page=page)
+    if products is None:
+        return None
+
+    body = dumps({
+    'products': products,
+    'next_cursor': page['next_cursor']
+    })
+
+    catalog_cache['body'] = body
+    catalog_cache['etag'] = compute_etag(body)
+    catalog_cache['expires_at'] = now + CATALOG_CACHE_TTL_IN_SECONDS
+
+    return {'body': body, 'etag': catalog_cache['etag']}
+
+def get_requested_ids(event):
+    """
+    This function reads the list of product ids of a batch request:
+
+    GET /products?ids=1,2,3
+    POST /products/batch with body {"ids": ["1", "2", "3"]}
+
+    Parameters:
+
+    event: API Gateway event
+
+    Returns:
+
+    List of ids. None if this is not a batch request. Raises ValueError for invalid values.
+
+    """
+    if event.get('httpMethod') == 'POST':
+        try:
+            body = json.loads(event.get('body') or '{}')
+        except ValueError:
+            raise ValueError('Request body must be JSON')
+        ids = body.get('ids') if isinstance(body, dict) else None
+        if not isinstance(ids, list):
+            raise ValueError('Request body must have an "ids" list')
+    else:
+        query_parameters = event.get('queryStringParameters') or {}
+        if 'ids' not in query_parameters:
+            return None
+        ids = query_parameters['ids'].split(',')
+
+    ids = [str(product_id).strip() for product_id in ids if str(product_id).strip() != '']
+    if len(ids) == 0:
+        raise ValueError('ids must not be empty')
+    if len(ids) > MAX_BATCH_IDS:
+        raise ValueError(f'At most {MAX_BATCH_IDS} ids are allowed')
+
+    return ids
+
+def get_paging_parameters(query_parameters):
+    """
+    This function reads the paging query string parameters of GET /products:
+
+    limit: page size. The client gets exactly one page and a 'next_cursor'
+    cursor: 'next_cursor' returned by a previous request
+    all: 'true' to drain all pages (bounded by MAX_DRAIN_ITEMS) even if limit is set
+
+    Without 'limit', all pages are drained (bounded by MAX_DRAIN_ITEMS).
+
+    Parameters:
+
+    query_parameters: API Gateway 'queryStringParameters' (can be None)
+
+    Returns:
+
+    Dict with 'limit', 'cursor' and 'drain'. Raises ValueError for invalid values.
+
+    """
+    query_parameters = query_parameters or {}
+
+    paging = {
+        'limit': None,
+        'cursor': query_parameters.get('cursor'),
+        'drain': True
+    }
+
+    if 'limit' in query_parameters:
+        try:
+            limit = int(query_parameters['limit'])
+        except ValueError:
+            raise ValueError('limit must be an integer')
+        if limit <= 0:
+            raise ValueError('limit must be greater than 0')
+
+        paging['limit'] = min(limit, MAX_PAGE_LIMIT)
+        paging['drain'] = str(query_parameters.get('all', '')).lower() == 'true'
+
+    return paging
 
 def lambda_handler(event, context):
     body = json.dumps({
@@ -67,10 +317,13 @@ def lambda_handler(event, context):
     httpret = {
         'statusCode': 200,
         'headers': {
-            'Access-Control-Allow-Headers': 'Content-Type,X-Amz-Date,Authorization,X-Api-Key,X-Amz-Security-Token',
-            'Access-Control-Allow-Methods': 'GET,HEAD,OPTIONS',
+            'Access-Control-Allow-Headers': 'Content-Type,X-Amz-Date,Authorization,X-Api-Key,X-Amz-Security-Token,If-None-Match',
+            'Access-Control-Allow-Methods': 'GET,HEAD,OPTIONS,POST',
             'Access-Control-Allow-Origin': frontend_url,
-            'Access-Control-Allow-Credentials': True
+            'Access-Control-Allow-Credentials': True,
+            'Access-Control-Expose-Headers': 'ETag',
+            # The browser may keep the response, but must revalidate it (If-None-Match) before using it
+            'Cache-Control': 'no-cache'
         },
         'body': body
     }
@@ -78,19 +331,72 @@ def lambda_handler(event, context):
     ret = httpret
 
     try:
-        
+        # Paging parameters are optional: GET /products?limit=20&cursor=...
+        # Batch parameters: GET /products?ids=1,2,3 or POST /products/batch
+        # Sparse fields: ?fields=id,price
+        # An invalid limit, cursor, ids or fields is reported to the client as 400
+        try:
+            ids = get_requested_ids(event)
+            paging = get_paging_parameters(event.get('queryStringParameters'))
+            decode_cursor(paging['cursor'])
+            fields = get_requested_fields(event.get('queryStringParameters'), PRODUCT_FIELDS)
+        except ValueError as error:
+            httpret['statusCode'] = 400
+            raise
+
         valerror = {'error':''}
-        products = get_products_from_ddb(ddb_table_name, valerror)
+        etag = None
+
+        if ids is not None:
+            # Batch lookup: one BatchGetItem round trip for many products
+            missing_ids = []
+            products = get_products_by_ids_from_ddb(ddb_table_name, ids, valerror, missing_ids, fields)
+            if products is None:
+                raise ValueError(f'Could not get products: {valerror["error"]}')
+
+            body = dumps({
+            'products': products,
+            'missing_ids': missing_ids
+            })
+        elif paging['limit'] is None and paging['cursor'] is None and fields is None:
+            # Whole catalog: served from the warm container's snapshot when possible
+            snapshot = get_catalog_snapshot(valerror)
+            if snapshot is None:
+                raise ValueError(f'Could not get products: {valerror["error"]}')
+
+            body = snapshot['body']
+            etag = snapshot['etag']
+        else:
+            page = {'next_cursor': None}
+            products = get_products_from_ddb(ddb_table_name,
+                                             valerror,
+                                             limit=paging['limit'],
+                                             cursor=paging['cursor'],
+                                             drain=paging['drain'],
+                                             page=page,
+                                             fields=fields)
+            if products is None:
+                raise ValueError(f'Could not get products: {valerror["error"]}')
+
+            body = dumps({
+            'products': products,
+            'next_cursor': page['next_cursor']
+            })
 
-        body = json.dumps({
-        'products': products
-        })
+        # If the client already has this exact response, answer 304 without a body
+        if etag is None:
+            etag = compute_etag(body)
+        httpret['headers']['ETag'] = etag
+        if is_etag_matched(get_request_header(event, 'If-None-Match'), etag):
+            httpret['statusCode'] = 304
+            body = ''
 
         httpret['body'] = body
 
     except Exception as error:
         print(f'Exception error: {error}')
-        httpret['statusCode'] = 500
+        if httpret['statusCode'] != 400:
+            httpret['statusCode'] = 500
         httpret['body'] = json.dumps({'error': str(error)})
         ret = httpret
     else:
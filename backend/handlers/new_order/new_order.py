@@ -2,21 +2,54 @@ import os
 import boto3
 import json
 import uuid
+import time
+import random
+import hashlib
 from datetime import datetime
+from table_registry import get_table, invalidate_table, is_resource_not_found
+from botocore.exceptions import ClientError
+from order_keys import get_order_day, normalize_email
+from order_ids import generate_order_id
+from order_days import record_order_days
+from order_rejections import record_rejections
+from inventory import MAX_TRANSACTION_ITEMS, get_quantities, describe_failed_products
+from catalog_prices import get_catalog_prices, get_product_ids, price_order
+from batch_get import batch_get_items
+from inventory_shards import get_shard_counts, plan_shards, build_shard_decrement, build_shard_increment, transact_with_shards
 
 ID_LENGTH = 8
 MAX_LENGTH = 10
+# Number of order ids tried before giving up, if an id is already used by another order
+MAX_ORDER_ID_ATTEMPTS = 3
 aws_region_name = os.environ['AWS_REGION']
 ddb_table_name = os.environ['ORDERS_TABLE']
+# Catalog prices of orders (all handlers), and inventory of place_order_handler,
+# batch_order_handler and queue_order_handler
+products_table_name = os.environ.get('PRODUCTS_TABLE')
+# Optional sharded inventory of hot products (see layers/common/inventory_shards.py)
+shards_table_name = os.environ.get('INVENTORY_SHARDS_TABLE')
+# Days that have orders, for GET /orders (see layers/common/order_days.py)
+order_days_table_name = os.environ.get('ORDER_DAYS_TABLE')
+# Queued orders that were not placed, so that their ticket resolves (see queue_order_handler)
+rejected_orders_table_name = os.environ.get('REJECTED_ORDERS_TABLE')
+# Only used by batch_order_handler (POST /orders/batch)
+frontend_url = os.environ.get('FRONTEND_URL')
+BATCH_WRITE_MAX_ITEMS = 25 # DynamoDB BatchWriteItem accepts up to 25 items per request
+MAX_BATCH_ORDERS = 500
+MAX_BATCH_RETRIES = 5
+BATCH_RETRY_BASE_DELAY_IN_SECONDS = 0.05
+# Number of times the stock of a batch is reserved again, after products without enough stock are known
+MAX_RESERVATION_ATTEMPTS = 3
 dynamodb = boto3.resource('dynamodb', region_name=aws_region_name)
 
-def generate_short_id(length):
+def generate_short_id(length, seed=None):
     """
     This function generates a UUID and returns a numeric value of size 'length'
 
     Parameters:
 
     length: Desirec length of the generated ID
+    seed: Optional UUID hex string to use instead of a new UUID (the same seed gives the same ID)
 
     Returns:
 
@@ -29,7 +62,7 @@ def generate_short_id(length):
         length = ID_LENGTH
 
     # Generate a UUID and take the first `length` characters of its hex representation
-    unique_id = uuid.uuid4().hex[:length]
+    unique_id = (seed or uuid.uuid4().hex)[:length]
 
     # Convert the hex characters to numeric values
     numeric_id = ''.join(str(int(c, 16)) for c in unique_id)
@@ -37,7 +70,51 @@ def generate_short_id(length):
     # Limit to length (in case conversion exceeds length characters)
     return numeric_id[:length]
 
-def create_order(received_order, valerror):
+def get_display_code(order_id):
+    """
+    This function returns the short code of an order, for people (for example,
+    a customer on the phone with support staff). Unlike the order id, it is not unique.
+
+    Parameters:
+
+    order_id: Order id (see layers/common/order_ids.py)
+
+    Returns:
+
+    Numeric string of ID_LENGTH digits. The same order id always gives the same code.
+
+    """
+    return generate_short_id(ID_LENGTH, hashlib.sha256(order_id.encode()).hexdigest())
+
+def set_order_id(order, order_id):
+    """
+    This function sets the id of an order, and its display code
+
+    Parameters:
+
+    order: New order (see create_order)
+    order_id: Order id (see layers/common/order_ids.py)
+
+    """
+    order['id'] = order_id
+    order['display_code'] = get_display_code(order_id)
+
+def is_order_id_taken(error):
+    """
+    This function checks whether an order write failed because another order has the same id
+
+    Parameters:
+
+    error: Exception raised by put_item (attribute_not_exists(id) condition)
+
+    Returns:
+
+    True or False
+
+    """
+    return isinstance(error, ClientError) and error.response['Error']['Code'] == 'ConditionalCheckFailedException'
+
+def create_order(received_order, valerror, submission_id=None, order_id=None, prices=None):
     """
     This function creates a new order.
 
@@ -45,6 +122,11 @@ def create_order(received_order, valerror):
 
     received_order: This is the order that the customer requested
     valerror: returned exception error
+    submission_id: Optional UUID hex string of the POST /orders request (see create_order.py)
+    order_id: Optional order id chosen by create_order.py, so that executions of
+              the same submission create the same order. Default is a new id.
+    prices: Optional catalog prices of the products (see get_catalog_prices), when
+            they are read once for several orders. Default is to read them.
 
     Returns:
 
@@ -56,34 +138,27 @@ def create_order(received_order, valerror):
 
         print(f'Received order is: {received_order}')
 
-        # Generate a unique ID for this order
-        unique_id = generate_short_id(ID_LENGTH)
-
+        # Time-sortable, collision-safe ID (ULID), and a short code for people
         new_order = {}
-        new_order['id'] = unique_id
+        set_order_id(new_order, order_id or generate_order_id())
+        if submission_id:
+            new_order['submission_id'] = submission_id
         new_order['customer_name'] = received_order['personalInfo']['customer_name']
         new_order['email'] = received_order['personalInfo']['email']
+        # Partition key of the CustomerEmailIndex (see template.yaml), to find a customer's orders with Query
+        new_order['email_key'] = normalize_email(new_order['email'])
         new_order['phone'] = received_order['personalInfo']['phone']
         new_order['ordered_items'] = []
 
-        # Compute the total amount of ordered products
-        total_amount = 0.0
-        for product in received_order['customerproduct']['productsToSubmit']:
-            # Compute from 'quantity' and 'price'
-            product_amount = product['quantity'] * float(product['price'])
-            total_amount += product_amount
-
-            new_order['ordered_items'].append(
-                {
-                    "product_id": str(product['id']),
-                    "product_name": product['name'],
-                    "quantity": str(product['quantity']),
-                    "amount": f"{product_amount:.2f}"
-                }
-            )
-        
-        new_order['total_amount'] = f"{total_amount:.2f}"
+        # Reprice the order with the catalog: the client's prices are only used to
+        # detect a total that has changed since the customer loaded the products
+        if prices is None:
+            prices = get_catalog_prices(dynamodb, products_table_name, get_product_ids(received_order))
+        new_order['ordered_items'], total_amount = price_order(received_order, prices)
+        new_order['total_amount'] = str(total_amount)
         new_order['order_time'] = datetime.now().isoformat() + "Z"
+        # Partition key of the OrderTimeIndex (see template.yaml), to list orders by time with Query
+        new_order['order_day'] = get_order_day(new_order['order_time'])
 
     except (Exception, ValueError) as error:
         print(f'Exception error: create_order : {error}')
@@ -120,7 +195,24 @@ def put_item_in_dynamodb(dynamodb_table, order, ddb_response, valerror):
     ret = False
     try:
 
-        ddb_response['ddb_response'] = dynamodb_table.put_item(Item=order)
+        record_order_days(dynamodb, order_days_table_name, [order.get('order_day')])
+
+        try:
+            ddb_response['ddb_response'] = dynamodb_table.put_item(
+                Item=order,
+                # Never overwrite another order that has the same id
+                ConditionExpression='attribute_not_exists(id)',
+                ReturnValuesOnConditionCheckFailure='ALL_OLD'
+            )
+        except ClientError as error:
+            # The existing item is returned (ReturnValuesOnConditionCheckFailure). It is not deserialized by boto3.
+            existing_item = error.response.get('Item') or {}
+            if not is_order_id_taken(error) or 'submission_id' not in order or existing_item.get('submission_id', {}).get('S') != order['submission_id']:
+                raise
+            # Another execution of the same submission already wrote this order
+            print(f'Order {order["id"]} is already placed')
+            ddb_response['ddb_response'] = {'ResponseMetadata': {'HTTPStatusCode': 200}}
+
         print(f'ddb response: {ddb_response['ddb_response']}')
         if ddb_response['ddb_response']['ResponseMetadata']['HTTPStatusCode'] != 200:
             raise ValueError('Could not put DynamoDB Table item')
@@ -141,6 +233,454 @@ def put_item_in_dynamodb(dynamodb_table, order, ddb_response, valerror):
 
     return ret
 
+def give_back_inventory(committed_quantities, plan=None):
+    """
+    This function gives back the stock that was reserved by committed transactions
+    of an order, when a later transaction of the same order is cancelled.
+
+    Parameters:
+
+    committed_quantities: Dict. Key: product id. Value: quantity that was decremented
+    plan: Shards of the sharded products (see layers/common/inventory_shards.py plan_shards)
+
+    """
+    plan = plan or {}
+    product_ids = list(committed_quantities.keys())
+    for start in range(0, len(product_ids), MAX_TRANSACTION_ITEMS):
+        dynamodb.meta.client.transact_write_items(TransactItems=[
+            build_shard_increment(products_table_name, shards_table_name, product_id, committed_quantities[product_id], plan)
+            for product_id in product_ids[start:start + MAX_TRANSACTION_ITEMS]
+        ])
+
+def is_order_already_placed(error, order):
+    """
+    This function checks whether a transaction was cancelled because the same order
+    (same id and submission_id) was already written
+
+    Parameters:
+
+    error: TransactionCanceledException raised by TransactWriteItems (the order Put is the last item)
+    order: New order (see create_order)
+
+    Returns:
+
+    True if the order was already placed. Otherwise, False
+
+    """
+    reasons = error.response.get('CancellationReasons', [])
+    if not reasons or 'submission_id' not in order:
+        return False
+
+    reason = reasons[-1]
+    # The current item is returned (ReturnValuesOnConditionCheckFailure). It is not deserialized by boto3.
+    item = reason.get('Item') or {}
+    return reason.get('Code') == 'ConditionalCheckFailed' and item.get('submission_id', {}).get('S') == order['submission_id']
+
+def place_order_in_dynamodb(order, received_order, valerror):
+    """
+    This function writes an order and reserves the stock of its products together,
+    with TransactWriteItems: the order is written only if every product has enough stock.
+
+    The order write is conditional (attribute_not_exists(id)), so running the same
+    submission twice places the order once.
+
+    An order with up to MAX_TRANSACTION_ITEMS - 1 products is placed with a single
+    transaction. Larger orders are split into several transactions; the order is
+    written by the last one, and if a transaction is cancelled, the stock reserved
+    by the previous ones is given back.
+
+    Parameters:
+
+    order: New order (see create_order)
+    received_order: This is the order that the customer requested
+    valerror: returned exception error. On cancellation, valerror['failed_products']
+              lists the products that cancelled the transaction (see layers/common/inventory.py)
+
+    Returns:
+
+    True if operations are successful, or if the order was already placed by
+    another execution with the same submission_id. Otherwise, False
+
+    """
+    ret = False
+    committed_quantities = {}
+    plan = {}
+    try:
+
+        get_table(dynamodb, ddb_table_name)
+        get_table(dynamodb, products_table_name)
+
+        quantities = get_quantities(received_order)
+        print(f'quantities: {quantities}')
+
+        # The day of the order is recorded before the order is written (see layers/common/order_days.py)
+        record_order_days(dynamodb, order_days_table_name, [order.get('order_day')])
+
+        # Sharded products are decremented in one of their shards (see layers/common/inventory_shards.py)
+        plan = plan_shards(get_shard_counts(dynamodb, products_table_name, list(quantities.keys()), shards_table_name))
+
+        # Inventory decrements first, and the order last, so that the order is
+        # written by the last transaction. None: not an inventory decrement.
+        order_put = {
+            'Put': {
+                'TableName': ddb_table_name,
+                'Item': order,
+                'ConditionExpression': 'attribute_not_exists(id)',
+                'ReturnValuesOnConditionCheckFailure': 'ALL_OLD'
+            }
+        }
+        product_ids = list(quantities.keys()) + [None]
+
+        for start in range(0, len(product_ids), MAX_TRANSACTION_ITEMS):
+            chunk_product_ids = product_ids[start:start + MAX_TRANSACTION_ITEMS]
+            build_items = lambda: [order_put if product_id is None else build_shard_decrement(products_table_name, shards_table_name, product_id, quantities[product_id], plan)
+                                   for product_id in chunk_product_ids]
+            try:
+                transact_with_shards(dynamodb, build_items, chunk_product_ids, plan)
+            except ClientError as error:
+                if error.response['Error']['Code'] != 'TransactionCanceledException':
+                    raise
+                if chunk_product_ids[-1] is None and is_order_already_placed(error, order):
+                    # Another execution of the same submission (see create_order.py) placed
+                    # this order. Its inventory was decremented by that execution.
+                    print(f'Order {order["id"]} is already placed')
+                    valerror['already_placed'] = True
+                    give_back_inventory(committed_quantities, plan)
+                    committed_quantities = {}
+                    break
+                valerror['failed_products'] = error.failed_products
+                if not valerror['failed_products']:
+                    # Only the order write was cancelled: another order has the same id
+                    valerror['order_id_taken'] = True
+                    raise ValueError(f'Could not place order: order {order["id"]} already exists')
+                raise ValueError('Could not place order: ' + describe_failed_products(valerror['failed_products']))
+
+            for product_id in chunk_product_ids:
+                if product_id is not None:
+                    committed_quantities[product_id] = quantities[product_id]
+
+    except (Exception, ValueError) as error:
+        print(f'Exception error: place_order_in_dynamodb : {error}')
+        valerror['error'] = error
+
+        if committed_quantities:
+            print(f'Giving back the stock of {len(committed_quantities)} products')
+            try:
+                give_back_inventory(committed_quantities, plan)
+            except Exception as rollback_error:
+                print(f'Exception error: give_back_inventory : {rollback_error}')
+
+    else:
+        # If no errors are detected, continue to execute the following:
+        print(f'else block: place_order_in_dynamodb :')
+
+        ret = True
+
+    finally:
+        # Execute the following code whether or not an exception has been raised:
+        print(f'finally block: place_order_in_dynamodb :')
+
+    return ret
+
+def allocate_orders(order_quantities, known_stock):
+    """
+    This function chooses the orders of a batch that can be placed, in the order of the batch.
+
+    Only the products in known_stock are limited: they cancelled a previous
+    reservation (see reserve_inventory), so their stock is known. The stock of
+    other products was enough for the previous reservation, which had more orders.
+
+    Parameters:
+
+    order_quantities: List of (index, quantities) of the orders (see layers/common/inventory.py get_quantities)
+    known_stock: Dict. Key: product id. Value: failed product (see layers/common/inventory.py get_failed_products).
+                 The inventory_count of a sharded product is the stock of all its shards
+                 (see layers/common/inventory_shards.py collapse_failed_products).
+
+    Returns:
+
+    Tuple (accepted, rejected). accepted: list of (index, quantities).
+    rejected: dict. Key: index. Value: list of failed products of the order.
+
+    """
+    remaining = {product_id: failed_product.get('inventory_count', 0) for product_id, failed_product in known_stock.items()}
+    accepted = []
+    rejected = {}
+
+    for index, quantities in order_quantities:
+        failed_products = [known_stock[product_id] for product_id, quantity in quantities.items()
+                           if product_id in remaining and remaining[product_id] < quantity]
+        if failed_products:
+            rejected[index] = failed_products
+            continue
+
+        for product_id, quantity in quantities.items():
+            if product_id in remaining:
+                remaining[product_id] -= quantity
+        accepted.append((index, quantities))
+
+    return accepted, rejected
+
+def add_quantities(order_quantities):
+    """
+    This function adds up the quantities of several orders, per product, so that
+    the stock of each product is decremented once for the whole batch
+
+    Parameters:
+
+    order_quantities: List of (index, quantities) of the orders
+
+    Returns:
+
+    Dict. Key: product id (string). Value: total quantity (int)
+
+    """
+    totals = {}
+    for index, quantities in order_quantities:
+        for product_id, quantity in quantities.items():
+            totals[product_id] = totals.get(product_id, 0) + quantity
+
+    return totals
+
+def reserve_inventory(totals, valerror, plan=None):
+    """
+    This function decrements the stock of several products, with conditional
+    TransactWriteItems in chunks of MAX_TRANSACTION_ITEMS. If a transaction is
+    cancelled, the stock reserved by the previous ones is given back.
+
+    Parameters:
+
+    totals: Dict. Key: product id. Value: quantity to decrement (see add_quantities)
+    plan: Shards of the sharded products (see layers/common/inventory_shards.py plan_shards)
+    valerror: returned exception error. On cancellation, valerror['failed_products']
+              lists the products that cancelled the transaction (see layers/common/inventory.py)
+
+    Returns:
+
+    True if the stock of all products is reserved. Otherwise, False
+
+    """
+    ret = False
+    committed_quantities = {}
+    plan = plan or {}
+    try:
+
+        product_ids = list(totals.keys())
+        for start in range(0, len(product_ids), MAX_TRANSACTION_ITEMS):
+            chunk_product_ids = product_ids[start:start + MAX_TRANSACTION_ITEMS]
+            build_items = lambda: [build_shard_decrement(products_table_name, shards_table_name, product_id, totals[product_id], plan)
+                                   for product_id in chunk_product_ids]
+            try:
+                transact_with_shards(dynamodb, build_items, chunk_product_ids, plan)
+            except ClientError as error:
+                if error.response['Error']['Code'] != 'TransactionCanceledException':
+                    raise
+                valerror['failed_products'] = error.failed_products
+                raise ValueError('Could not reserve stock: ' + describe_failed_products(valerror['failed_products']))
+
+            for product_id in chunk_product_ids:
+                committed_quantities[product_id] = totals[product_id]
+
+    except (Exception, ValueError) as error:
+        print(f'Exception error: reserve_inventory : {error}')
+        valerror['error'] = error
+
+        if committed_quantities:
+            print(f'Giving back the stock of {len(committed_quantities)} products')
+            try:
+                give_back_inventory(committed_quantities, plan)
+            except Exception as rollback_error:
+                print(f'Exception error: give_back_inventory : {rollback_error}')
+
+    else:
+        # If no errors are detected, continue to execute the following:
+        print(f'else block: reserve_inventory :')
+
+        ret = True
+
+    finally:
+        # Execute the following code whether or not an exception has been raised:
+        print(f'finally block: reserve_inventory :')
+
+    return ret
+
+def write_orders_in_batches(orders, valerror):
+    """
+    This function writes orders to DynamoDB with BatchWriteItem, in chunks of BATCH_WRITE_MAX_ITEMS.
+
+    UnprocessedItems (returned by DynamoDB when it is throttled) are retried with
+    exponential backoff and full jitter, so that concurrent imports do not retry together.
+
+    BatchWriteItem has no condition expressions: an order id (ULID, see
+    layers/common/order_ids.py) is not expected to be used by another order.
+
+    Parameters:
+
+    orders: List of new orders (see create_order)
+    valerror: returned exception error
+
+    Returns:
+
+    List of the ids of the orders that could not be written. Empty list if all orders are written.
+
+    """
+    unwritten_ids = []
+    try:
+        # The days of the orders are recorded before the orders are written (see layers/common/order_days.py)
+        record_order_days(dynamodb, order_days_table_name, [order.get('order_day') for order in orders])
+    except (ClientError, ValueError) as error:
+        print(f'Exception error: write_orders_in_batches : {error}')
+        valerror['error'] = error
+        return [order['id'] for order in orders]
+
+    for start in range(0, len(orders), BATCH_WRITE_MAX_ITEMS):
+        chunk = orders[start:start + BATCH_WRITE_MAX_ITEMS]
+        try:
+
+            request_items = {ddb_table_name: [{'PutRequest': {'Item': order}} for order in chunk]}
+            retries = 0
+            while request_items:
+                response = dynamodb.batch_write_item(RequestItems=request_items)
+                request_items = response.get('UnprocessedItems')
+                if request_items:
+                    if retries >= MAX_BATCH_RETRIES:
+                        unwritten_ids.extend(put_request['PutRequest']['Item']['id'] for put_request in request_items[ddb_table_name])
+                        raise ValueError(f'Could not write {len(request_items[ddb_table_name])} orders: too many unprocessed items')
+                    time.sleep(random.uniform(0, BATCH_RETRY_BASE_DELAY_IN_SECONDS * (2 ** retries)))
+                    retries += 1
+
+        except ClientError as error:
+            # The chunk was not written
+            print(f'Exception error: write_orders_in_batches : {error}')
+            valerror['error'] = error
+            unwritten_ids.extend(order['id'] for order in chunk)
+
+        except ValueError as error:
+            print(f'Exception error: write_orders_in_batches : {error}')
+            valerror['error'] = error
+
+    return unwritten_ids
+
+def place_orders_in_bulk(orders, order_quantities, valerror):
+    """
+    This function places many orders together (POST /orders/batch and the order queue).
+
+    The stock of the orders is added up per product and reserved with one decrement
+    per product (see reserve_inventory). When products do not have enough stock,
+    their stock is known (ALL_OLD), so the orders that still fit are chosen (see
+    allocate_orders) and reserved again. Then the orders are written with
+    BatchWriteItem (see write_orders_in_batches), and the stock of the orders that
+    could not be written is given back.
+
+    Parameters:
+
+    orders: Dict. Key: index of the order (for example its position in the request). Value: new order (see create_order)
+    order_quantities: List of (index, quantities) of the orders (see layers/common/inventory.py get_quantities)
+    valerror: returned exception error
+
+    Returns:
+
+    Dict with 'created' (list of indexes), 'rejected' (dict. Key: index. Value: failed products)
+    and 'failed' (list of indexes of orders that could not be written). Otherwise, None.
+
+    """
+    ret = None
+    try:
+
+        known_stock = {}
+        accepted = []
+        rejected = {}
+        plan = {}
+        for attempt in range(MAX_RESERVATION_ATTEMPTS):
+            accepted, rejected = allocate_orders(order_quantities, known_stock)
+            if not accepted:
+                break
+
+            # Sharded products are decremented in one of their shards (see layers/common/inventory_shards.py)
+            totals = add_quantities(accepted)
+            plan = plan_shards(get_shard_counts(dynamodb, products_table_name, list(totals.keys()), shards_table_name))
+
+            reservation_error = {'error':''}
+            if reserve_inventory(totals, reservation_error, plan):
+                break
+            if not reservation_error.get('failed_products'):
+                raise ValueError(f'Could not reserve stock: {reservation_error["error"]}')
+
+            print(f'Stock reservation cancelled. Attempt {attempt + 1} of {MAX_RESERVATION_ATTEMPTS}')
+            for failed_product in reservation_error['failed_products']:
+                known_stock[failed_product['product_id']] = failed_product
+        else:
+            # The stock changed (concurrent orders) between every attempt
+            raise ValueError('Could not reserve stock: too many attempts')
+
+        # Write the accepted orders. The stock of orders that could not be written is given back.
+        unwritten_ids = set(write_orders_in_batches([orders[index] for index, quantities in accepted], valerror))
+        unwritten = [(index, quantities) for index, quantities in accepted if orders[index]['id'] in unwritten_ids]
+        if unwritten:
+            print(f'Giving back the stock of {len(unwritten)} orders that could not be written')
+            try:
+                give_back_inventory(add_quantities(unwritten), plan)
+            except Exception as rollback_error:
+                print(f'Exception error: give_back_inventory : {rollback_error}')
+
+    except (Exception, ValueError) as error:
+        print(f'Exception error: place_orders_in_bulk : {error}')
+        valerror['error'] = error
+
+    else:
+        # If no errors are detected, continue to execute the following:
+        print(f'else block: place_orders_in_bulk :')
+
+        ret = {
+            'created': [index for index, quantities in accepted if orders[index]['id'] not in unwritten_ids],
+            'rejected': rejected,
+            'failed': [index for index, quantities in unwritten]
+        }
+
+    finally:
+        # Execute the following code whether or not an exception has been raised:
+        print(f'finally block: place_orders_in_bulk :')
+
+    return ret
+
+def get_placed_order_ids(order_ids, valerror):
+    """
+    This function finds which orders are already in DynamoDB, with BatchGetItem.
+
+    Amazon SQS delivers a message at least once, so an order of the queue can be
+    received again after it was placed.
+
+    Parameters:
+
+    order_ids: List of order ids
+    valerror: returned exception error
+
+    Returns:
+
+    Set of the order ids that are in the orders table. Otherwise, None.
+
+    """
+    ret = None
+    try:
+
+        placed_ids = set(batch_get_items(dynamodb, ddb_table_name, order_ids, 'id'))
+
+    except (Exception, ValueError) as error:
+        print(f'Exception error: get_placed_order_ids : {error}')
+        valerror['error'] = error
+
+    else:
+        # If no errors are detected, continue to execute the following:
+        print(f'else block: get_placed_order_ids :')
+
+        ret = placed_ids
+
+    finally:
+        # Execute the following code whether or not an exception has been raised:
+        print(f'finally block: get_placed_order_ids :')
+
+    return ret
+
 def lambda_handler(event, context):
 
     print(f'event (starting state machine): {event}')
@@ -154,25 +694,28 @@ def lambda_handler(event, context):
         body = json.loads(event['body'])
 
         valerror = {'error':''}        
-        order = create_order(body, valerror)
+        order = create_order(body, valerror, event.get('submission_id'), event.get('order_id'))
         if order is None:
             raise ValueError('Order creation failed!')
         print(f'new order: {order}')
         
-        ddb_table = dynamodb.Table(ddb_table_name)
-        if 'not found' in ddb_table.table_status:
-            # Boto3 documenation: the attributes (such as table_status) are lazy-loaded,
-            # which means that these are not fetched immediately when the object is created.
-            # So, once I call ddb_table.table_status, its value will be fetched.
-            # If its value has an error exception, then the exception automatically occurs
-            # before even executing the following line of code:
-            raise ValueError(f'Table: {ddb_table_name} not found')
+        ddb_table = get_table(dynamodb, ddb_table_name)
         print(f'ddb_table: {ddb_table}')
 
-        # Add the new order to DynamoDB table
+        # Add the new order to DynamoDB table. If another order has the same id
+        # (the write is conditional), try again with a new id.
         ddb_response = {'ddb_response':''}
-        outcome = put_item_in_dynamodb(ddb_table, order, ddb_response, valerror)
+        for attempt in range(MAX_ORDER_ID_ATTEMPTS):
+            outcome = put_item_in_dynamodb(ddb_table, order, ddb_response, valerror)
+            if outcome == True or not is_order_id_taken(valerror['error']):
+                break
+            print(f'Order id {order["id"]} is already used. Attempt {attempt + 1} of {MAX_ORDER_ID_ATTEMPTS}')
+            set_order_id(order, generate_order_id())
+
         if outcome == False:
+            if is_resource_not_found(valerror['error']):
+                # The cached table handle is not valid anymore. Validate it again on the next request.
+                invalidate_table(ddb_table_name)
             raise ValueError('Error in put_item_in_dynamodb')
                 
     except (Exception, ValueError) as error:
@@ -188,3 +731,322 @@ def lambda_handler(event, context):
         print(f'finally block: do nothing for now')
 
     return ret
+
+def place_order_handler(event, context):
+    """
+    Fused order placement (see StateMachinePlaceOrder in template.yaml).
+
+    This AWS Lambda function replaces the two tasks new_order and update_inventory:
+    it builds the order with create_order, and writes it together with the
+    inventory decrements (see place_order_in_dynamodb).
+
+    """
+
+    print(f'event (placing order via state machine): {event}')
+
+    # Output of the state machine execution. On failure, it reports which products
+    # cancelled the order, and why (for example, not enough stock).
+    ret = {
+        'order': None,
+        'inventory_updated': False,
+        'failed_products': []
+    }
+
+    try:
+        # For POST request, get its body
+        body = json.loads(event['body'])
+
+        valerror = {'error':''}
+        order = create_order(body, valerror, event.get('submission_id'), event.get('order_id'))
+        if order is None:
+            raise ValueError('Order creation failed!')
+        print(f'new order: {order}')
+
+        # If another order has the same id (the write is conditional), try again with a new id
+        for attempt in range(MAX_ORDER_ID_ATTEMPTS):
+            valerror = {'error':''}
+            outcome = place_order_in_dynamodb(order, body, valerror)
+            if outcome == True or not valerror.get('order_id_taken'):
+                break
+            print(f'Order id {order["id"]} is already used. Attempt {attempt + 1} of {MAX_ORDER_ID_ATTEMPTS}')
+            set_order_id(order, generate_order_id())
+
+        if outcome == False:
+            ret['failed_products'] = valerror.get('failed_products', [])
+            if is_resource_not_found(valerror['error']):
+                # The cached table handles are not valid anymore. Validate them again on the next request.
+                invalidate_table(ddb_table_name)
+                invalidate_table(products_table_name)
+            raise ValueError(f'Error in place_order_in_dynamodb: {valerror["error"]}')
+
+    except (Exception, ValueError) as error:
+        print(f'Exception error: {error}')
+        ret['error'] = str(error)
+
+    else:
+        # If no errors are detected, continue to execute the following:
+        print(f'else block: do nothing for now')
+
+        ret['order'] = body
+        ret['inventory_updated'] = True
+
+    finally:
+        # Execute the following code whether or not an exception has been raised:
+        print(f'finally block: do nothing for now')
+
+    return ret
+
+def get_batch_orders(event):
+    """
+    This function reads the orders of POST /orders/batch, with body {"orders": [order, order, ...]}.
+    Each order has the same format as the body of POST /orders.
+
+    Parameters:
+
+    event: API Gateway event
+
+    Returns:
+
+    List of orders. Raises ValueError for an invalid body.
+
+    """
+    try:
+        body = json.loads(event.get('body') or '{}')
+    except ValueError:
+        raise ValueError('Request body must be JSON')
+
+    orders = body.get('orders') if isinstance(body, dict) else None
+    if not isinstance(orders, list) or len(orders) == 0:
+        raise ValueError('Request body must have a non-empty "orders" list')
+    if len(orders) > MAX_BATCH_ORDERS:
+        raise ValueError(f'At most {MAX_BATCH_ORDERS} orders are allowed')
+
+    return orders
+
+def batch_order_handler(event, context):
+    """
+    Bulk order ingestion: POST /orders/batch (see BatchOrderLambda in template.yaml).
+
+    Orders are validated with create_order, without a state machine execution per order.
+    The stock of the accepted orders is added up per product and reserved with
+    conditional TransactWriteItems (see reserve_inventory). Orders that cannot get
+    their stock are rejected, and the others are written with BatchWriteItem
+    (see write_orders_in_batches).
+
+    The response lists one result per order, in the order of the request:
+    'created' (with 'order_id' and 'display_code'), 'invalid', 'rejected'
+    (with 'failed_products') or 'failed'.
+
+    """
+
+    print(f'event (batch of orders): {event}')
+
+    body = json.dumps({'results': []})
+
+    httpret = {
+        'statusCode': 200,
+        'headers': {
+            'Access-Control-Allow-Headers': 'Content-Type,X-Amz-Date,Authorization,X-Api-Key,X-Amz-Security-Token',
+            'Access-Control-Allow-Origin': frontend_url,
+            'Access-Control-Allow-Methods': 'OPTIONS,POST',
+            'Access-Control-Allow-Credentials': True,
+            'Content-Type': 'application/json'
+        },
+        'body': body
+    }
+
+    ret = httpret
+
+    try:
+        # An invalid body is reported to the client as 400
+        try:
+            received_orders = get_batch_orders(event)
+        except ValueError as error:
+            httpret['statusCode'] = 400
+            raise
+
+        get_table(dynamodb, ddb_table_name)
+        get_table(dynamodb, products_table_name)
+
+        # The prices of all products of the batch are read together (one BatchGetItem)
+        prices = get_catalog_prices(dynamodb, products_table_name,
+                                    [product_id for received_order in received_orders for product_id in get_product_ids(received_order)])
+
+        # Validate each order with the same code as POST /orders
+        results = [None] * len(received_orders)
+        orders = {}
+        order_quantities = []
+        for index, received_order in enumerate(received_orders):
+            valerror = {'error':''}
+            order = create_order(received_order, valerror, prices=prices)
+            try:
+                if order is None:
+                    raise ValueError(f'Invalid order: {valerror["error"]}')
+                quantities = get_quantities(received_order)
+            except (Exception, ValueError) as error:
+                results[index] = {'index': index, 'status': 'invalid', 'error': str(error)}
+                continue
+            orders[index] = order
+            order_quantities.append((index, quantities))
+
+        valerror = {'error':''}
+        outcome = place_orders_in_bulk(orders, order_quantities, valerror)
+        if outcome is None:
+            raise ValueError(f'Could not place orders: {valerror["error"]}')
+
+        for index, failed_products in outcome['rejected'].items():
+            results[index] = {
+                'index': index,
+                'status': 'rejected',
+                'error': 'Could not place order: ' + describe_failed_products(failed_products),
+                'failed_products': failed_products
+            }
+        for index in outcome['failed']:
+            results[index] = {'index': index, 'status': 'failed', 'error': f'Could not write order: {valerror["error"]}'}
+        for index in outcome['created']:
+            order = orders[index]
+            results[index] = {'index': index, 'status': 'created', 'order_id': order['id'], 'display_code': order['display_code']}
+
+        httpret['body'] = json.dumps({
+            'results': results,
+            'created': sum(1 for result in results if result['status'] == 'created')
+        })
+
+    except Exception as error:
+        print(f'Exception error: {error}')
+        if is_resource_not_found(error):
+            # The cached table handles are not valid anymore. Validate them again on the next request.
+            invalidate_table(ddb_table_name)
+            invalidate_table(products_table_name)
+        if httpret['statusCode'] != 400:
+            httpret['statusCode'] = 500
+        httpret['body'] = json.dumps({'error': str(error)})
+        ret = httpret
+    else:
+        # If no errors are detected, continue to execute the following:
+        print(f'else block: do nothing for now')
+
+        ret = httpret
+    finally:
+        # Execute the following code whether or not an exception has been raised:
+        print(f'finally block: do nothing for now')
+
+    return ret
+
+def queue_order_handler(event, context):
+    """
+    Consumer of the order queue (see QueueOrderLambda and OrderQueue in template.yaml).
+
+    create_order.py sends orders to Amazon SQS instead of starting a state machine
+    execution when the queued intake is enabled. This AWS Lambda function receives
+    up to 10 messages at a time, and places their orders together (see place_orders_in_bulk):
+    one inventory decrement per product for the whole batch, and one BatchWriteItem.
+
+    Invalid orders (including orders whose prices have changed), and orders without
+    enough stock, are not retried: they are recorded in the rejected orders table, so
+    that GET /orders/{id} answers their ticket with the reason. If the rejections cannot
+    be recorded, their messages are delivered again.
+    Orders that could not be written are reported as batch item failures, so that
+    Amazon SQS delivers only their messages again (ReportBatchItemFailures).
+
+    """
+
+    print(f'event (messages of the order queue): {event}')
+
+    records = event.get('Records', [])
+    ret = {'batchItemFailures': []}
+
+    try:
+        get_table(dynamodb, ddb_table_name)
+        get_table(dynamodb, products_table_name)
+
+        # Orders that are not placed. Key: index of the message. Value: (order id, reason)
+        rejections = {}
+
+        # Same input as the state machine executions (see create_order.py)
+        messages = {}
+        for index, record in enumerate(records):
+            message = None
+            try:
+                message = json.loads(record['body'])
+                messages[index] = (message, json.loads(message['body']))
+            except (Exception, ValueError) as error:
+                # Delivering the message again does not make it valid
+                print(f'Dropping message {record["messageId"]}: {error}')
+                if isinstance(message, dict) and message.get('order_id'):
+                    rejections[index] = (message['order_id'], f'Invalid order: {error}')
+
+        # The prices of all products of the batch are read together (one BatchGetItem)
+        prices = get_catalog_prices(dynamodb, products_table_name,
+                                    [product_id for message, received_order in messages.values() for product_id in get_product_ids(received_order)])
+
+        orders = {}
+        order_quantities = []
+        for index, (message, received_order) in messages.items():
+            record = records[index]
+            try:
+                valerror = {'error':''}
+                order = create_order(received_order, valerror, message.get('submission_id'), message.get('order_id'), prices)
+                if order is None:
+                    raise ValueError(f'Invalid order: {valerror["error"]}')
+                quantities = get_quantities(received_order)
+            except (Exception, ValueError) as error:
+                # Delivering the message again does not make the order valid
+                print(f'Dropping message {record["messageId"]}: {error}')
+                if message.get('order_id'):
+                    rejections[index] = (message['order_id'], str(error))
+                continue
+
+            if any(other_order['id'] == order['id'] for other_order in orders.values()):
+                # The same message was delivered twice in this batch
+                print(f'Dropping message {record["messageId"]}: order {order["id"]} is already in this batch')
+                continue
+
+            orders[index] = order
+            order_quantities.append((index, quantities))
+
+        # Orders that were placed before this message was delivered again are skipped
+        valerror = {'error':''}
+        placed_ids = get_placed_order_ids([order['id'] for order in orders.values()], valerror)
+        if placed_ids is None:
+            raise ValueError(f'Could not read orders: {valerror["error"]}')
+        order_quantities = [(index, quantities) for index, quantities in order_quantities if orders[index]['id'] not in placed_ids]
+
+        outcome = place_orders_in_bulk(orders, order_quantities, valerror)
+        if outcome is None:
+            raise ValueError(f'Could not place orders: {valerror["error"]}')
+
+        for index, failed_products in outcome['rejected'].items():
+            print(f'Order {orders[index]["id"]} is not placed: ' + describe_failed_products(failed_products))
+            rejections[index] = (orders[index]['id'], 'Could not place order: ' + describe_failed_products(failed_products))
+
+        failed_indexes = list(outcome['failed'])
+        try:
+            record_rejections(dynamodb, rejected_orders_table_name,
+                              {order_id: reason for order_id, reason in rejections.values()})
+        except (Exception, ValueError) as error:
+            # The tickets would stay pending: deliver these messages again
+            print(f'Exception error: record_rejections : {error}')
+            failed_indexes.extend(rejections.keys())
+
+        ret['batchItemFailures'] = [{'itemIdentifier': records[index]['messageId']} for index in failed_indexes]
+
+    except (Exception, ValueError) as error:
+        print(f'Exception error: {error}')
+        if is_resource_not_found(error):
+            # The cached table handles are not valid anymore. Validate them again on the next request.
+            invalidate_table(ddb_table_name)
+            invalidate_table(products_table_name)
+
+        # No order of this batch is placed: all messages are delivered again
+        ret['batchItemFailures'] = [{'itemIdentifier': record['messageId']} for record in records]
+
+    else:
+        # If no errors are detected, continue to execute the following:
+        print(f'else block: do nothing for now')
+
+    finally:
+        # Execute the following code whether or not an exception has been raised:
+        print(f'finally block: do nothing for now')
+
+    return ret
@@ -1,13 +1,31 @@
 import boto3
 import os
+from parallel_scan import parallel_scan
+from report_data import get_dataset_key, write_dataset
+from incremental_report import read_manifest, get_settle_time, is_after, query_orders_after
 
 aws_region_name = os.environ['AWS_REGION']
 ddb_orders_table_name = os.environ['ORDERS_TABLE']
+# Days that have orders (see layers/common/order_days.py)
+ddb_order_days_table_name = os.environ['ORDER_DAYS_TABLE']
+# The orders are passed to the HTML task through this bucket (see layers/common/report_data.py)
+s3_bucket_name = os.environ['REPORTS_BUCKET']
 dynamodb = boto3.resource('dynamodb', region_name=aws_region_name)
+s3 = boto3.client('s3')
 
-def get_data_from_ddb(table_name, valerror):
+def write_data_from_ddb(table_name, valerror):
     """
-    This function gets data from DynamoDB table
+    This function copies the orders that are not in the orders report yet to datasets in S3.
+
+    The orders report is incremental (see layers/common/incremental_report.py): the
+    manifest in the reports bucket has the watermark (last reported order). Only the
+    orders after the watermark are read, with Query requests on the OrderTimeIndex
+    (only the days that have orders).
+    The first report (no manifest) scans the whole table.
+
+    Orders older than the settle time go to the 'dataset' (the next fragment of the report).
+    More recent orders go to the 'recent' dataset: they are only shown in the index page,
+    and are read again by the next report.
 
     Parameters:
 
@@ -16,57 +34,79 @@ def get_data_from_ddb(table_name, valerror):
 
     Returns:
 
-    List. Otherwise, None.
+    Dict with 'dataset' and 'recent' (pointers, see write_dataset), 'watermark' (last order
+    of the dataset), 'period' ('from' and 'to' order_time of the dataset, or None) and
+    'manifest_etag' (version of the manifest that was read). Otherwise, None.
     
     """
 
     ret = None
     try:
-        
-        # From Boto3 documentation:
-        # Instantiate a table resource object without actually creating a DynamoDB table.
-        ddb_table = dynamodb.Table(table_name)       
-        if 'not found' in ddb_table.table_status:
-            # Boto3 documenation: the attributes (such as table_status) are lazy-loaded,
-            # which means that these are not fetched immediately when the object is created.
-            # So, once I call ddb_table.table_status, its value will be fetched.
-            # If its value has an error exception, then the exception automatically occurs
-            # before even executing the following line of code:
-            raise ValueError(f'Table: {table_name} not found')
-        print(f'ddb_table: {ddb_table}')
-
-        response = ddb_table.scan()
-        print(f'response: {response}')
-        data = response['Items']
-        print(f'data: {data}')
+
+        manifest, etag = read_manifest(s3, s3_bucket_name)
+        if manifest is None:
+            # A single scan() returns at most 1 MB. parallel_scan() scans all pages of
+            # all table segments in parallel. See layers/common/parallel_scan.py
+            watermark = None
+            orders = parallel_scan(dynamodb, table_name)
+        else:
+            watermark = manifest['watermark']
+            orders = query_orders_after(dynamodb, table_name, ddb_order_days_table_name, watermark)
+
+        settle_time = get_settle_time()
+        recent_orders = []
+        period = {'watermark': watermark, 'from': None, 'to': None}
+
+        def settled_orders():
+            for order in orders:
+                if order['order_time'] > settle_time:
+                    recent_orders.append(order)
+                    continue
+                if is_after(order, period['watermark']):
+                    period['watermark'] = {'order_time': order['order_time'], 'id': order['id']}
+                if period['from'] is None or order['order_time'] < period['from']:
+                    period['from'] = order['order_time']
+                yield order
+
+        # Items are written to S3 as they are read: the new orders are not held in memory.
+        pointer = write_dataset(s3, s3_bucket_name, get_dataset_key('orders'), settled_orders())
+        recent_pointer = write_dataset(s3, s3_bucket_name, get_dataset_key('recent-orders'), recent_orders)
+        print(f'data: {pointer["count"]} new orders in {pointer["key"]}, {recent_pointer["count"]} recent orders')
 
     except (Exception, ValueError) as error:
-        print(f'Exception error: get_data_from_ddb : {error}')
+        print(f'Exception error: write_data_from_ddb : {error}')
         valerror['error'] = error
 
     else:
         # If no errors are detected, continue to execute the following:
-        print(f'else block: get_data_from_ddb :')
+        print(f'else block: write_data_from_ddb :')
 
-        ret = data
+        ret = {
+            'dataset': pointer,
+            'recent': recent_pointer,
+            'watermark': period['watermark'],
+            'period': {'from': period['from'], 'to': period['watermark']['order_time']} if pointer['count'] else None,
+            'manifest_etag': etag
+        }
 
     finally:
         # Execute the following code whether or not an exception has been raised:
-        print(f'finally block: get_data_from_ddb :')
+        print(f'finally block: write_data_from_ddb :')
 
     return ret
 
 def lambda_handler(event, context):
             
-    ret = None
+    ret = False
 
     try:        
         valerror = {'error':''}
-        orders = get_data_from_ddb(ddb_orders_table_name, valerror)
-        if orders is None:
+        result = write_data_from_ddb(ddb_orders_table_name, valerror)
+        if result is None:
             raise ValueError(f'Could not get data from orders table')
         
-        ret = {'orders':orders}
+        # AWS Step Functions payloads are limited to 256 KB: pass pointers to the orders, not the orders
+        ret = result
 
     except Exception as error:
         print(f'Exception error: {error}')
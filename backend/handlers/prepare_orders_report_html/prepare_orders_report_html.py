@@ -2,115 +2,186 @@ import os
 import boto3
 import json
 from datetime import datetime
-import html
+from report_stream import escape, render_header, render_footer, upload_stream
+from report_data import read_dataset
+from parallel_scan import scan_pages
+from incremental_report import read_manifest, write_manifest, get_fragment_key
 
 s3_bucket_name = os.environ['REPORTS_BUCKET']
+# Index page of the incremental report
+ORDERS_REPORT_KEY = 'orderreport.html'
+# Full report of fused_report_handler: another key, so that it never overwrites the index page
+FULL_ORDERS_REPORT_KEY = 'orderreport-full.html'
+# The index page links to the fragments with presigned URLs (same expiration as generate_presigned_url)
+REPORT_LINK_EXPIRATION_IN_SECONDS = int(os.environ.get('REPORT_LINK_EXPIRATION_IN_SECONDS', '3600'))
+# Only used by fused_report_handler (scan-to-HTML report)
+ddb_orders_table_name = os.environ.get('ORDERS_TABLE')
 s3 = boto3.client('s3')
+dynamodb = boto3.resource('dynamodb')
 
-def write_report(html_str):
-    params = {
-        'Bucket': s3_bucket_name,
-        'Key': 'orderreport.html',
-        'Body': html_str.encode(),
-        'CacheControl': 'max-age=0',
-        'ContentType': 'text/html'
-    }
+def write_report(html_chunks, key=ORDERS_REPORT_KEY):
+    """
+    This function uploads the orders report to S3, part by part (see upload_stream)
+
+    Parameters:
+
+    html_chunks: Generator of HTML strings (see create_html_orders)
+    key: S3 key of the report
 
-    s3.put_object(**params)
+    """
+    upload_stream(s3, s3_bucket_name, key, html_chunks)
 
-def create_html_orders(orders, valerror):
+def create_html_order(order):
     """
-    This function create an html string that contains information
-    about orders.
+    This function creates the table row of an order
 
     Parameters:
 
-    orders: List of orders
-    valerror: returned exception error
+    order: Order (dict)
 
     Returns:
 
-    HTML string. Otherwise, None.
+    HTML string
     
     """
+    products = ''.join(
+        '<div>'
+        f'<p><strong>Product {escape(product["product_id"])}:</strong></p>'
+        '<ul>'
+        f'<li><strong>Product Name:</strong> {escape(product["product_name"])}</li>'
+        f'<li><strong>Quantity Ordered:</strong> {escape(product["quantity"])}</li>'
+        f'<li><strong>Amount:</strong> {escape(product["amount"])}</li>'
+        '</ul>'
+        '</div>'
+        for product in order['ordered_items']
+    )
+
+    return (
+        '<tr>'
+        f'<td>{escape(order["id"])}</td>'
+        f'<td>{escape(order["order_time"])}</td>'
+        f'<td>{escape(order["total_amount"])}</td>'
+        f'<td>{products}</td>'
+        '</tr>'
+    )
+
+def create_html_orders(orders):
+    """
+    This function creates the HTML page that contains information
+    about orders, one chunk at a time.
 
-    ret = None
+    Each order is rendered when the upload needs it, so the page is never
+    held in memory as a whole, and the time is linear in the number of orders.
+    All values are HTML-escaped.
 
-    try:
-        html_str = """
-        <!DOCTYPE html>
-        <html>
-        <head>
-            <title>Orders Report</title>
-                <style>
-                    table {
-                        border-collapse: collapse;
-                        width: 100%;
-                    }
-                    th, td {
-                        text-align: left;
-                        padding: 8px;
-                        border-bottom: 1px solid #ddd;
-                    }
-                    th {
-                        background-color: #f2f2f2;
-                    }
-                </style>
-        </head>
-        <body>
-            <h1>List of Orders</h1>
-                <table>
-                    <tr>
-                        <th>Order ID</th>                        
-                        <th>Order Time</th>
-                        <th>Total Amount</th>
-                        <th>Products</th>
-                    </tr>
-        """
-
-        for order in orders:
-            order_id = order['id']            
-            order_time = order['order_time']
-            total_amount = order['total_amount']
-            ordered_items = order['ordered_items']
-            
-            html_str += f"""
-            <tr>
-                <td>{order_id}</td>                
-                <td>{order_time}</td>
-                <td>{total_amount}</td>
-                <td>
-            """
-
-            for product in ordered_items:
-                id = product['product_id']
-                product_name = product['product_name']
-                quantity = product['quantity']
-                amount = product['amount']
-
-                html_str += f"""
-                <div>
-                    <p><strong>Product {id}:</string></p>
-					    <ul>
-						    <li><strong>Product Name:</strong> {product_name}</li>
-						    <li><strong>Quantity Ordered:</strong> {quantity}</li>
-						    <li><strong>Amount:</strong> {amount}</li>
-					    </ul>
-                </div>				
-                """
-            html_str += """
-            </td>
-            </tr>
-            """
-        html_str += """
-            </table>
-        </body>
-        </html>
-        """
-
-        html_str = html_str.replace("\n", "")
-
-        ret = html_str
+    Parameters:
+
+    orders: Iterable of orders
+
+    Returns:
+
+    Generator of HTML strings
+    
+    """
+    yield render_header('Orders Report', 'List of Orders', ['Order ID', 'Order Time', 'Total Amount', 'Products'])
+
+    for order in orders:
+        yield create_html_order(order)
+
+    yield render_footer()
+
+def create_html_index(fragments, recent_orders):
+    """
+    This function creates the index page of the incremental orders report, one chunk at a time.
+
+    The index lists the fragments of the report (most recent first), with a
+    presigned link to each, then the recent orders that are not in a fragment yet.
+    Its size depends on the number of fragments, not on the number of orders.
+
+    Parameters:
+
+    fragments: List of fragments of the manifest (dicts with 'key', 'from', 'to' and 'count')
+    recent_orders: Iterable of orders that are not in a fragment yet
+
+    Returns:
+
+    Generator of HTML strings
+    
+    """
+    yield render_header('Orders Report', 'List of Orders', ['From', 'To', 'Orders', 'Report'])
+
+    for fragment in reversed(fragments):
+        url = s3.generate_presigned_url('get_object', Params={'Bucket': s3_bucket_name, 'Key': fragment['key']},
+                                        ExpiresIn=REPORT_LINK_EXPIRATION_IN_SECONDS)
+        yield (
+            '<tr>'
+            f'<td>{escape(fragment["from"])}</td>'
+            f'<td>{escape(fragment["to"])}</td>'
+            f'<td>{escape(fragment["count"])}</td>'
+            f'<td><a href="{escape(url)}">View orders</a></td>'
+            '</tr>'
+        )
+
+    yield (
+        '</table>'
+        '<h2>Recent Orders</h2>'
+        '<table>'
+        '<tr><th>Order ID</th><th>Order Time</th><th>Total Amount</th><th>Products</th></tr>'
+    )
+
+    for order in recent_orders:
+        yield create_html_order(order)
+
+    yield render_footer()
+
+def write_incremental_report(result):
+    """
+    This function adds the new orders to the incremental orders report (see layers/common/incremental_report.py)
+
+    The new orders are rendered as one fragment: an HTML page that is never changed
+    once written. The fragment is added to the manifest, with the new watermark,
+    then the index page (orderreport.html) is written again. The manifest is only
+    updated if no other execution has changed it since prepare_orders_report_data read it.
+
+    Parameters:
+
+    result: Output of prepare_orders_report_data
+
+    """
+    manifest, etag = read_manifest(s3, s3_bucket_name)
+    if etag != result['manifest_etag']:
+        raise ValueError('The orders report was updated by another execution. Please try again.')
+    if manifest is None:
+        manifest = {'watermark': None, 'fragments': []}
+
+    if result['dataset']['count'] > 0:
+        fragment_key = get_fragment_key(result['watermark'])
+        upload_stream(s3, s3_bucket_name, fragment_key, create_html_orders(read_dataset(s3, result['dataset'])),
+                      cache_control='max-age=31536000, immutable')
+
+        manifest['fragments'].append({
+            'key': fragment_key,
+            'from': result['period']['from'],
+            'to': result['period']['to'],
+            'count': result['dataset']['count']
+        })
+        manifest['watermark'] = result['watermark']
+        write_manifest(s3, s3_bucket_name, manifest, etag)
+        print(f'fragment: {result["dataset"]["count"]} orders in {fragment_key}')
+
+    write_report(create_html_index(manifest['fragments'], read_dataset(s3, result['recent'])))
+
+def lambda_handler(event, context):
+    print(f'event: {event}')
+    ret = False
+
+    try:        
+        # see template yaml: ResultPath: '$.ordersReportResult'
+        # The new orders are read from S3 (see prepare_orders_report_data), and the
+        # pages are rendered while they are uploaded
+        write_incremental_report(event['ordersReportResult'])
+
+        ret = True
 
     except Exception as error:
         print(f'Exception error: {error}')
@@ -125,18 +196,41 @@ def create_html_orders(orders, valerror):
 
     return ret
 
-def lambda_handler(event, context):
+def scan_orders(table_name):
+    """
+    This function returns the orders of a DynamoDB table, one scan page at a time
+
+    Parameters:
+
+    table_name: Name of the DynamoDB Table that has orders
+
+    Returns:
+
+    Generator of orders. The next page is scanned when the current one has been rendered.
+
+    """
+    for page in scan_pages(dynamodb, table_name):
+        yield from page
+
+def fused_report_handler(event, context):
+    """
+    Fused orders report (see StateMachineGenerateReportFused in template.yaml).
+
+    This AWS Lambda function replaces the two tasks prepare_orders_report_data and
+    prepare_orders_report_html: each page of the orders scan is rendered straight
+    into the report that is uploading to S3, so at most one page is held in memory,
+    whatever the size of the table.
+
+    The fused report is a full report of the table. It is written to FULL_ORDERS_REPORT_KEY,
+    not to the index page of the incremental report (GeneratePresignedURL links to the
+    report of the mode the stack is deployed with, see FusedReportTasks in template.yaml).
+
+    """
     print(f'event: {event}')
-    ret = None
+    ret = False
 
-    try:        
-        valerror = {'error':''}
-        # see template yaml: ResultPath: '$.ordersReportResult'
-        html_orders = create_html_orders(event['ordersReportResult']['orders'], valerror)
-        if html_orders is None:
-            raise ValueError(f'Could not create html for orders')
-        
-        write_report(html_orders)
+    try:
+        write_report(create_html_orders(scan_orders(ddb_orders_table_name)), FULL_ORDERS_REPORT_KEY)
 
         ret = True
 
@@ -152,4 +246,3 @@ def lambda_handler(event, context):
         print(f'finally block: do nothing for now')
 
     return ret
-
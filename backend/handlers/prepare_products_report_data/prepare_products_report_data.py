@@ -1,9 +1,17 @@
 import boto3
 import os
+from parallel_scan import parallel_scan
+from inventory_shards import aggregate_inventory
+from report_data import get_dataset_key, write_dataset
 
 aws_region_name = os.environ['AWS_REGION']
 ddb_products_table_name = os.environ['PRODUCTS_TABLE']
+# Optional sharded inventory of hot products (see layers/common/inventory_shards.py)
+shards_table_name = os.environ.get('INVENTORY_SHARDS_TABLE')
+# The products are passed to the HTML task through this bucket (see layers/common/report_data.py)
+s3_bucket_name = os.environ['REPORTS_BUCKET']
 dynamodb = boto3.resource('dynamodb', region_name=aws_region_name)
+s3 = boto3.client('s3')
 
 def get_data_from_ddb(table_name, valerror):
     """
@@ -23,22 +31,13 @@ def get_data_from_ddb(table_name, valerror):
     ret = None
     try:
         
-        # From Boto3 documentation:
-        # Instantiate a table resource object without actually creating a DynamoDB table.
-        ddb_table = dynamodb.Table(table_name)       
-        if 'not found' in ddb_table.table_status:
-            # Boto3 documenation: the attributes (such as table_status) are lazy-loaded,
-            # which means that these are not fetched immediately when the object is created.
-            # So, once I call ddb_table.table_status, its value will be fetched.
-            # If its value has an error exception, then the exception automatically occurs
-            # before even executing the following line of code:
-            raise ValueError(f'Table: {table_name} not found')
-        print(f'ddb_table: {ddb_table}')
-
-        response = ddb_table.scan()
-        print(f'response: {response}')
-        data = response['Items']
-        print(f'data: {data}')
+        # A single scan() returns at most 1 MB. parallel_scan() scans all pages of
+        # all table segments in parallel. See layers/common/parallel_scan.py
+        data = list(parallel_scan(dynamodb, table_name))
+        print(f'data: {len(data)} items')
+
+        # The stock of sharded products is the total of their shards
+        aggregate_inventory(dynamodb, shards_table_name, data)
 
     except (Exception, ValueError) as error:
         print(f'Exception error: get_data_from_ddb : {error}')
@@ -58,7 +57,7 @@ def get_data_from_ddb(table_name, valerror):
 
 def lambda_handler(event, context):
             
-    ret = None
+    ret = False
 
     try:        
         
@@ -67,7 +66,9 @@ def lambda_handler(event, context):
         if products is None:
             raise ValueError(f'Could not get data from products table')
 
-        ret = {'products':products}
+        # AWS Step Functions payloads are limited to 256 KB: pass a pointer to the products, not the products.
+        # Decimal numbers (such as inventory_count) are written as JSON numbers (see layers/common/json_encoding.py)
+        ret = {'dataset':write_dataset(s3, s3_bucket_name, get_dataset_key('products'), products)}
 
     except Exception as error:
         print(f'Exception error: {error}')
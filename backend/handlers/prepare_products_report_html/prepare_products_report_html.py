@@ -2,95 +2,74 @@ import os
 import boto3
 import json
 from datetime import datetime
-import html
+from report_stream import escape, render_header, render_footer, upload_stream
+from report_data import read_dataset
+from parallel_scan import scan_pages
+from inventory_shards import aggregate_inventory
 
 s3_bucket_name = os.environ['REPORTS_BUCKET']
+# Only used by fused_report_handler (scan-to-HTML report)
+ddb_products_table_name = os.environ.get('PRODUCTS_TABLE')
+# Optional sharded inventory of hot products (see layers/common/inventory_shards.py)
+shards_table_name = os.environ.get('INVENTORY_SHARDS_TABLE')
 s3 = boto3.client('s3')
+dynamodb = boto3.resource('dynamodb')
 
-def write_report(html_str):    
-    params = {
-        'Bucket': s3_bucket_name,
-        'Key': 'productreport.html',
-        'Body': html_str.encode(),
-        'CacheControl': 'max-age=0',
-        'ContentType': 'text/html'
-    }
+def write_report(html_chunks):
+    """
+    This function uploads the products report to S3, part by part (see upload_stream)
+
+    Parameters:
 
-    s3.put_object(**params)
+    html_chunks: Generator of HTML strings (see create_html_products)
+
+    """
+    upload_stream(s3, s3_bucket_name, 'productreport.html', html_chunks)
 
-def create_html_products(products, valerror):
+def create_html_products(products):
     """
-    This function create an html string that contains information
-    about products.
+    This function creates the HTML page that contains information
+    about products, one chunk at a time.
+
+    Each product is rendered when the upload needs it, so the page is never
+    held in memory as a whole, and the time is linear in the number of products.
+    All values are HTML-escaped.
 
     Parameters:
 
-    products: List of products
-    valerror: returned exception error
+    products: Iterable of products
 
     Returns:
 
-    HTML string. Otherwise, None.
+    Generator of HTML strings
     
     """
+    yield render_header('Products Report', 'List of Products', ['Product ID', 'Product Name', 'Price', 'Available'])
 
-    ret = None
+    for product in products:
+        yield (
+            '<tr>'
+            f'<td>{escape(product["id"])}</td>'
+            f'<td>{escape(product["product_name"])}</td>'
+            f'<td>{escape(product["price"])}</td>'
+            f'<td>{escape(product["inventory_count"])}</td>'
+            '</tr>'
+        )
 
-    try:
-        html_str = """
-        <!DOCTYPE html>
-        <html>
-        <head>
-            <title>Products Report</title>
-                <style>
-                    table {
-                        border-collapse: collapse;
-                        width: 100%;
-                    }
-                    th, td {
-                        text-align: left;
-                        padding: 8px;
-                        border-bottom: 1px solid #ddd;
-                    }
-                    th {
-                        background-color: #f2f2f2;
-                    }
-                </style>
-        </head>
-        <body>
-            <h1>List of Products</h1>
-                <table>
-                    <tr>
-                        <th>Product ID</th>                        
-                        <th>Product Name</th>
-                        <th>Price</th>
-                        <th>Available</th>
-                    </tr>
-        """
-
-        for product in products:
-            id = product['id']            
-            product_name = product['product_name']
-            price = product['price']
-            inventory_count = product['inventory_count']
-            
-            html_str += f"""
-            <tr>
-                <td>{id}</td>                
-                <td>{product_name}</td>
-                <td>{price}</td>
-                <td>{inventory_count}</td>
-            </tr>
-            """
-        html_str += """
-            </table>
-        </body>
-        </html>
-        """
-
-        html_str = html_str.replace("\n", "")
-
-        ret = html_str
+    yield render_footer()
+
+def lambda_handler(event, context):
+
+    print(f'event: {event}')
+    ret = False
+
+    try:        
+        # see template yaml: ResultPath: '$.productsDataResult'
+        # The products are read from S3 (see prepare_products_report_data), and the page is
+        # rendered while it is uploaded
+        write_report(create_html_products(read_dataset(s3, event['productsDataResult']['dataset'])))
+
+        ret = True
 
     except Exception as error:
         print(f'Exception error: {error}')
@@ -105,19 +84,39 @@ def create_html_products(products, valerror):
 
     return ret
 
-def lambda_handler(event, context):
+def scan_products(table_name):
+    """
+    This function returns the products of a DynamoDB table, one scan page at a time
+
+    Parameters:
+
+    table_name: Name of the DynamoDB Table that has products
+
+    Returns:
+
+    Generator of products. The next page is scanned when the current one has been rendered.
+
+    """
+    for page in scan_pages(dynamodb, table_name):
+        # The stock of sharded products is the total of their shards
+        aggregate_inventory(dynamodb, shards_table_name, page)
+        yield from page
 
+def fused_report_handler(event, context):
+    """
+    Fused products report (see StateMachineGenerateReportFused in template.yaml).
+
+    This AWS Lambda function replaces the two tasks prepare_products_report_data and
+    prepare_products_report_html: each page of the products scan is rendered straight
+    into the report that is uploading to S3, so at most one page is held in memory,
+    whatever the size of the table.
+
+    """
     print(f'event: {event}')
     ret = False
 
-    try:        
-        valerror = {'error':''}
-        # see template yaml: ResultPath: '$.productsDataResult'
-        html_products = create_html_products(event['productsDataResult']['products'], valerror)
-        if html_products is None:
-            raise ValueError(f'Could not create html for products')
-        
-        write_report(html_products)
+    try:
+        write_report(create_html_products(scan_products(ddb_products_table_name)))
 
         ret = True
 
@@ -133,4 +132,3 @@ def lambda_handler(event, context):
         print(f'finally block: do nothing for now')
 
     return ret
-
@@ -0,0 +1,109 @@
+import os
+import boto3
+from boto3.dynamodb.conditions import Attr
+from table_registry import get_table, run_table_operation
+from inventory_shards import rebalance_shards
+
+aws_region_name = os.environ['AWS_REGION']
+ddb_table_name = os.environ['PRODUCTS_TABLE']
+shards_table_name = os.environ['INVENTORY_SHARDS_TABLE']
+dynamodb = boto3.resource('dynamodb', region_name=aws_region_name)
+
+def get_sharded_products(table_name, valerror):
+    """
+    This function gets the products whose inventory is sharded (see scripts/shard_inventory.py)
+
+    Parameters:
+
+    table_name: Name of the DynamoDB Table that has products
+    valerror: returned exception error
+
+    Returns:
+
+    List of dicts with 'id' and 'inventory_shards'. Otherwise, None.
+
+    """
+    ret = None
+    try:
+
+        get_table(dynamodb, table_name)
+
+        products = []
+        scan_kwargs = {
+            'ProjectionExpression': 'id, inventory_shards',
+            'FilterExpression': Attr('inventory_shards').gt(1)
+        }
+
+        # Follow all pages of the scan
+        while True:
+            response = run_table_operation(dynamodb, table_name, lambda ddb_table: ddb_table.scan(**scan_kwargs))
+            products.extend(response['Items'])
+
+            if 'LastEvaluatedKey' not in response:
+                break
+            scan_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+        print(f'sharded products: {products}')
+
+    except (Exception, ValueError) as error:
+        print(f'Exception error: get_sharded_products : {error}')
+        valerror['error'] = error
+
+    else:
+        # If no errors are detected, continue to execute the following:
+        print(f'else block: get_sharded_products :')
+
+        ret = products
+
+    finally:
+        # Execute the following code whether or not an exception has been raised:
+        print(f'finally block: get_sharded_products :')
+
+    return ret
+
+def lambda_handler(event, context):
+    """
+    Rebalancer of the sharded inventory (see RebalanceInventoryLambda in template.yaml).
+
+    Orders decrement a random shard of a hot product, so some shards run out of
+    stock before others. This scheduled AWS Lambda function moves stock between the
+    shards of each sharded product, so that every shard has about the same stock.
+
+    """
+
+    print(f'event (rebalancing inventory shards): {event}')
+
+    ret = {
+        'rebalanced': [],
+        'failed': []
+    }
+
+    try:
+
+        valerror = {'error':''}
+        products = get_sharded_products(ddb_table_name, valerror)
+        if products is None:
+            raise ValueError(f'Could not get sharded products: {valerror["error"]}')
+
+        for product in products:
+            # One product that cannot be rebalanced does not stop the others
+            try:
+                if rebalance_shards(dynamodb, shards_table_name, product['id'], int(product['inventory_shards'])):
+                    ret['rebalanced'].append(product['id'])
+            except Exception as error:
+                print(f'Exception error: rebalance_shards : product {product["id"]} : {error}')
+                ret['failed'].append(product['id'])
+
+    except (Exception, ValueError) as error:
+        print(f'Exception error: {error}')
+        ret['error'] = str(error)
+
+    else:
+        # If no errors are detected, continue to execute the following:
+        print(f'else block: do nothing for now')
+
+    finally:
+        # Execute the following code whether or not an exception has been raised:
+        print(f'finally block: do nothing for now')
+
+    return ret
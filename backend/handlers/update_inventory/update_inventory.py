@@ -1,19 +1,35 @@
 import os
 import boto3
 import json
+from botocore.exceptions import ClientError
+from table_registry import get_table
+from inventory import MAX_TRANSACTION_ITEMS, get_quantities, describe_failed_products
+from inventory_shards import get_shard_counts, plan_shards, build_shard_decrement, transact_with_shards
 
 aws_region_name = os.environ['AWS_REGION']
 ddb_table_name = os.environ['PRODUCTS_TABLE']
+# Optional sharded inventory of hot products (see layers/common/inventory_shards.py)
+shards_table_name = os.environ.get('INVENTORY_SHARDS_TABLE')
 dynamodb = boto3.resource('dynamodb', region_name=aws_region_name)
 
 def update_inventory(received_order, valerror):
     """
     This function updates the inventory count for each ordered product.
 
+    All products are decremented with a single TransactWriteItems request.
+    Each decrement is conditional (inventory_count >= quantity), so either the
+    stock of every product is sufficient and all products are updated, or
+    nothing is updated. Concurrent orders cannot oversell.
+
+    The stock of a sharded product is decremented in one of its shards, chosen at
+    random. If that shard does not have enough stock, the transaction is tried again
+    with another shard.
+
     Parameters:
 
     received_order: This is the order that the customer requested
-    valerror: returned exception error
+    valerror: returned exception error. On cancellation, valerror['failed_products']
+              lists the products that cancelled the transaction (see layers/common/inventory.py)
 
     Returns:
 
@@ -24,58 +40,25 @@ def update_inventory(received_order, valerror):
 
     try:
                 
-        ddb_table = dynamodb.Table(ddb_table_name)
-        if 'not found' in ddb_table.table_status:
-            # Boto3 documenation: the attributes (such as table_status) are lazy-loaded,
-            # which means that these are not fetched immediately when the object is created.
-            # So, once I call ddb_table.table_status, its value will be fetched.
-            # If its value has an error exception, then the exception automatically occurs
-            # before even executing the following line of code:
-            raise ValueError(f'Table: {ddb_table_name} not found')
-        print(f'ddb_table: {ddb_table}')
-
-        for product in received_order['customerproduct']['productsToSubmit']:
-            product_quantity = int(product['quantity']) # This is a string. Convert to int
-            product_id = product['id'] # This is a string
-
-            print(f'product_quantity: {product_quantity}')
-            print(f'product_id: {product_id}')
-
-            # Get the product from DynamoDB
-            response = ddb_table.get_item(Key={'id':product_id})
-
-            if 'Item' not in response:
-                raise ValueError(f'Product not found')
-            
-            item = response['Item']
-            inventory_count = int(item['inventory_count'])
-
-            if inventory_count < product_quantity:
-                raise ValueError(f'Not enough stock available')
-            
-            print(f'inventory_count: {inventory_count}')
-
-            new_val = str(inventory_count - product_quantity)
-
-            response_update = ddb_table.update_item(
-                Key={'id': product_id},
-                UpdateExpression='SET inventory_count = :new_val',
-                ExpressionAttributeValues={':new_val': new_val},
-                ReturnValues='ALL_NEW'  # Return the updated item
-            )
-
-            # Until I find a way to store inventory_count as a Number without causing JSON serialization exception in Lambda
-            # response_update = ddb_table.update_item(
-            #     Key={'id': product_id},
-            #     UpdateExpression='SET inventory_count = inventory_count - :product_quantity',
-            #     ConditionExpression='inventory_count >= :product_quantity',  # Ensure stock is sufficient
-            #     ExpressionAttributeValues={':product_quantity': product_quantity},
-            #     ReturnValues='ALL_NEW'  # Return the updated item
-            # )
-
-            if 'Attributes' not in response_update:
-                raise ValueError(f'Could not update inventory')
-            
+        quantities = get_quantities(received_order)
+        print(f'quantities: {quantities}')
+
+        if len(quantities) > MAX_TRANSACTION_ITEMS:
+            raise ValueError(f'Too many products in one order: {len(quantities)}. Maximum is {MAX_TRANSACTION_ITEMS}')
+
+        product_ids = list(quantities.keys())
+        plan = plan_shards(get_shard_counts(dynamodb, ddb_table_name, product_ids, shards_table_name))
+        build_items = lambda: [build_shard_decrement(ddb_table_name, shards_table_name, product_id, quantities[product_id], plan) for product_id in product_ids]
+
+        get_table(dynamodb, ddb_table_name)
+        try:
+            transact_with_shards(dynamodb, build_items, product_ids, plan)
+        except ClientError as error:
+            if error.response['Error']['Code'] != 'TransactionCanceledException':
+                raise
+            valerror['failed_products'] = error.failed_products
+            raise ValueError('Could not update inventory: ' + describe_failed_products(valerror['failed_products']))
+
     except (Exception, ValueError) as error:
         print(f'Exception error: update_inventory : {error}')
         valerror['error'] = error
@@ -96,7 +79,12 @@ def lambda_handler(event, context):
 
     print(f'event (updating inventory via state machine): {event}')
 
-    ret = False
+    # Output of the state machine execution. On failure, it reports which products
+    # cancelled the inventory update, and why (for example, not enough stock).
+    ret = {
+        'inventory_updated': False,
+        'failed_products': []
+    }
 
     try:
 
@@ -105,12 +93,14 @@ def lambda_handler(event, context):
         data = event['order']
         outcome = update_inventory(data, valerror)
         if outcome == False:
-            raise ValueError('Error in update_inventory')
+            ret['failed_products'] = valerror.get('failed_products', [])
+            raise ValueError(f'Error in update_inventory: {valerror["error"]}')
         
-        ret = True
+        ret['inventory_updated'] = True
 
     except (Exception, ValueError) as error:
         print(f'Exception error: {error}')
+        ret['error'] = str(error)
 
     else:
         # If no errors are detected, continue to execute the following:
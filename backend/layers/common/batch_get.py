@@ -0,0 +1,53 @@
+import time
+import random
+
+BATCH_GET_MAX_KEYS = 100 # DynamoDB BatchGetItem accepts up to 100 keys per request
+MAX_BATCH_RETRIES = 5
+BATCH_RETRY_BASE_DELAY_IN_SECONDS = 0.05
+
+def batch_get_items(dynamodb, table_name, keys, projection=None):
+    """
+    This function reads items with BatchGetItem, in chunks of BATCH_GET_MAX_KEYS.
+    UnprocessedKeys (returned by DynamoDB when it is throttled) are retried with
+    exponential backoff and full jitter.
+
+    Parameters:
+
+    dynamodb: boto3 DynamoDB service resource
+    table_name: Name of the DynamoDB Table (partition key 'id')
+    keys: List of ids. Duplicates are read once (BatchGetItem rejects duplicate keys).
+    projection: ProjectionExpression (for example 'id, inventory_count'), or the parameters
+                of build_projection (see layers/common/projection.py). None: all attributes
+
+    Returns:
+
+    Dict. Key: id. Value: item. Ids that are not in the table are missing.
+
+    """
+    if isinstance(projection, str):
+        projection = {'ProjectionExpression': projection}
+
+    items = {}
+    unique_keys = list(dict.fromkeys(keys))
+    for start in range(0, len(unique_keys), BATCH_GET_MAX_KEYS):
+        request_items = {
+            table_name: {
+                'Keys': [{'id': key} for key in unique_keys[start:start + BATCH_GET_MAX_KEYS]],
+                **(projection or {})
+            }
+        }
+
+        retries = 0
+        while request_items:
+            response = dynamodb.batch_get_item(RequestItems=request_items)
+            for item in response['Responses'].get(table_name, []):
+                items[item['id']] = item
+
+            request_items = response.get('UnprocessedKeys')
+            if request_items:
+                if retries >= MAX_BATCH_RETRIES:
+                    raise ValueError(f'Could not read {table_name}: too many unprocessed keys')
+                time.sleep(random.uniform(0, BATCH_RETRY_BASE_DELAY_IN_SECONDS * (2 ** retries)))
+                retries += 1
+
+    return items
@@ -0,0 +1,188 @@
+import os
+import time
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+from batch_get import batch_get_items
+
+# How long (in seconds) the price of a product is trusted before it is read again
+PRICE_CACHE_TTL_IN_SECONDS = int(os.environ.get('PRICE_CACHE_TTL_IN_SECONDS', '30'))
+CENT = Decimal('0.01')
+
+# Prices of this Lambda container (execution environment).
+# Key: product id. Value: {'price': Decimal, 'product_name': string, 'fetched_at': time}
+_prices = {}
+
+def to_amount(value):
+    """
+    This function converts a price or an amount to Decimal, rounded to the cent
+
+    Parameters:
+
+    value: String, int, float or Decimal (for example '10.5')
+
+    Returns:
+
+    Decimal with two decimal places (for example Decimal('10.50')).
+    Raises ValueError if value is not a number.
+
+    """
+    try:
+        # str() first: Decimal(0.1) is not Decimal('0.1')
+        amount = Decimal(str(value))
+    except (InvalidOperation, TypeError):
+        raise ValueError(f'Invalid amount: {value}')
+
+    if not amount.is_finite():
+        raise ValueError(f'Invalid amount: {value}')
+
+    return amount.quantize(CENT, rounding=ROUND_HALF_UP)
+
+def get_product_ids(received_order):
+    """
+    This function lists the product ids of an order, to read their prices together
+
+    Parameters:
+
+    received_order: This is the order that the customer requested
+
+    Returns:
+
+    List of product ids (string). Empty if the order is malformed (create_order reports it).
+
+    """
+    try:
+        return [str(product['id']) for product in received_order['customerproduct']['productsToSubmit']]
+    except (KeyError, TypeError):
+        return []
+
+def get_catalog_prices(dynamodb, table_name, product_ids):
+    """
+    This function returns the authoritative price and name of products.
+
+    Prices that were read less than PRICE_CACHE_TTL_IN_SECONDS ago are taken from
+    this container. The other products are read together, with one BatchGetItem
+    for up to 100 products (see batch_get_items), instead of one GetItem per line item.
+
+    Parameters:
+
+    dynamodb: boto3 DynamoDB service resource
+    table_name: Name of the DynamoDB Table that has products
+    product_ids: List of product ids (string). Duplicates are read once.
+
+    Returns:
+
+    Dict. Key: product id. Value: {'price': Decimal, 'product_name': string}.
+    Products that are not in the table are missing.
+
+    """
+    now = time.time()
+    prices = {}
+    missing_ids = []
+    for product_id in dict.fromkeys(product_ids):
+        cached = _prices.get(product_id)
+        if cached is not None and now - cached['fetched_at'] < PRICE_CACHE_TTL_IN_SECONDS:
+            prices[product_id] = cached
+        else:
+            missing_ids.append(product_id)
+
+    if missing_ids:
+        items = batch_get_items(dynamodb, table_name, missing_ids, 'id, price, product_name')
+        for product_id, item in items.items():
+            if 'price' not in item:
+                # Not cached: the product cannot be ordered until it has a price
+                continue
+            prices[product_id] = _prices[product_id] = {
+                'price': to_amount(item['price']),
+                'product_name': item.get('product_name', ''),
+                'fetched_at': now
+            }
+
+    return {product_id: {'price': price['price'], 'product_name': price['product_name']} for product_id, price in prices.items()}
+
+def invalidate_prices(product_ids=None):
+    """
+    This function forgets the cached prices of products (for example, after a price change)
+
+    Parameters:
+
+    product_ids: List of product ids. Default is all products.
+
+    """
+    if product_ids is None:
+        _prices.clear()
+    else:
+        for product_id in product_ids:
+            _prices.pop(product_id, None)
+
+def get_client_total(received_order):
+    """
+    This function returns the total that the customer saw before ordering.
+
+    It is 'total_amount' of the order if the client sends it. Otherwise, it is computed
+    from the 'price' of each product, as displayed by the frontend.
+
+    Parameters:
+
+    received_order: This is the order that the customer requested
+
+    Returns:
+
+    Decimal, or None if the client sent no prices
+
+    """
+    if received_order.get('total_amount') is not None:
+        return to_amount(received_order['total_amount'])
+
+    products = received_order['customerproduct']['productsToSubmit']
+    if any(product.get('price') is None for product in products):
+        return None
+
+    return sum((to_amount(product['price']) * int(product['quantity']) for product in products), Decimal('0.00'))
+
+def price_order(received_order, prices):
+    """
+    This function computes the ordered items and the total amount of an order
+    with catalog prices, not with the prices sent by the client.
+
+    Amounts are computed with Decimal and rounded to the cent, so that the
+    total is exactly the sum of the amounts.
+
+    Parameters:
+
+    received_order: This is the order that the customer requested
+    prices: Dict returned by get_catalog_prices
+
+    Returns:
+
+    Tuple (ordered_items, total_amount). total_amount is a Decimal.
+    Raises ValueError for an unknown product, or if the total that the
+    client saw is not the total computed with catalog prices.
+
+    """
+    ordered_items = []
+    total_amount = Decimal('0.00')
+    for product in received_order['customerproduct']['productsToSubmit']:
+        product_id = str(product['id'])
+        quantity = int(product['quantity'])
+        if quantity <= 0:
+            raise ValueError(f'Invalid quantity for product {product_id}')
+        if product_id not in prices:
+            raise ValueError(f'Product not found (product {product_id})')
+
+        product_amount = prices[product_id]['price'] * quantity
+        total_amount += product_amount
+
+        ordered_items.append(
+            {
+                "product_id": product_id,
+                "product_name": prices[product_id]['product_name'] or product.get('name', ''),
+                "quantity": str(quantity),
+                "amount": str(product_amount)
+            }
+        )
+
+    client_total = get_client_total(received_order)
+    if client_total is not None and client_total != total_amount:
+        # The prices changed after the customer loaded the products, or the client sent wrong prices
+        raise ValueError(f'Prices have changed: the total is {total_amount}, not {client_total}. Please review your order.')
+
+    return ordered_items, total_amount
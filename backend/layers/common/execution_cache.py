@@ -0,0 +1,169 @@
+import os
+import time
+import threading
+from collections import OrderedDict
+from table_registry import run_table_operation
+
+# Statuses of a finished AWS Step Functions execution
+TERMINAL_STATUSES = ('SUCCEEDED', 'FAILED', 'TIMED_OUT', 'ABORTED')
+# Statuses that can no longer change. A FAILED, TIMED_OUT or ABORTED execution can be
+# redriven (RedriveExecution), and run again: it is described at every request.
+CACHED_STATUSES = ('SUCCEEDED',)
+# Number of finished executions kept by this Lambda container (execution environment)
+EXECUTION_CACHE_SIZE = int(os.environ.get('EXECUTION_CACHE_SIZE', '1024'))
+# How long (in seconds) a finished execution is kept in the optional table. DynamoDB TTL deletes expired items.
+EXECUTION_CACHE_TTL_IN_SECONDS = int(os.environ.get('EXECUTION_CACHE_TTL_IN_SECONDS', '86400'))
+# Attributes of DescribeExecution that are kept for finished executions
+EXECUTION_FIELDS = ('status', 'output', 'error', 'cause')
+
+# Finished executions of this container, least recently used first.
+# Key: execution ARN. Value: dict with EXECUTION_FIELDS
+_executions = OrderedDict()
+_lock = threading.Lock()
+
+def get_cached_execution(execution_arn):
+    """
+    This function returns a finished execution kept by this container
+
+    Parameters:
+
+    execution_arn: Execution ARN of a state machine
+
+    Returns:
+
+    Dict with 'status' and, if any, 'output', 'error' and 'cause'. None if not cached.
+
+    """
+    with _lock:
+        execution = _executions.get(execution_arn)
+        if execution is not None:
+            _executions.move_to_end(execution_arn)
+        return execution
+
+def cache_execution(execution_arn, execution):
+    """
+    This function keeps a finished execution in this container. When more than
+    EXECUTION_CACHE_SIZE executions are kept, the least recently used is forgotten.
+
+    Parameters:
+
+    execution_arn: Execution ARN of a state machine
+    execution: Dict with 'status' and, if any, 'output', 'error' and 'cause'
+
+    """
+    with _lock:
+        _executions[execution_arn] = execution
+        _executions.move_to_end(execution_arn)
+        while len(_executions) > EXECUTION_CACHE_SIZE:
+            _executions.popitem(last=False)
+
+def invalidate_executions():
+    """
+    This function forgets the executions kept by this container
+    """
+    with _lock:
+        _executions.clear()
+
+def read_stored_execution(dynamodb, table_name, execution_arn):
+    """
+    This function reads a finished execution from the optional execution cache table
+
+    Parameters:
+
+    dynamodb: boto3 DynamoDB service resource
+    table_name: Name of the DynamoDB execution cache Table
+    execution_arn: Execution ARN of a state machine
+
+    Returns:
+
+    Dict with 'status' and, if any, 'output', 'error' and 'cause'. None if not stored (or expired).
+
+    """
+    response = run_table_operation(dynamodb, table_name, lambda ddb_table: ddb_table.get_item(
+        Key={'execution_arn': execution_arn}
+    ))
+    item = response.get('Item')
+    # DynamoDB TTL deletes expired items within a few days, not immediately
+    if item is None or item.get('expires_at', 0) < int(time.time()):
+        return None
+    if item.get('status') not in CACHED_STATUSES:
+        return None
+
+    return {field: item[field] for field in EXECUTION_FIELDS if field in item}
+
+def store_execution(dynamodb, table_name, execution_arn, execution):
+    """
+    This function writes a finished execution to the optional execution cache table,
+    so that the other Lambda containers do not describe it again
+
+    Parameters:
+
+    dynamodb: boto3 DynamoDB service resource
+    table_name: Name of the DynamoDB execution cache Table
+    execution_arn: Execution ARN of a state machine
+    execution: Dict with 'status' and, if any, 'output', 'error' and 'cause'
+
+    """
+    item = dict(execution)
+    item.update({
+        'execution_arn': execution_arn,
+        'expires_at': int(time.time()) + EXECUTION_CACHE_TTL_IN_SECONDS
+    })
+    run_table_operation(dynamodb, table_name, lambda ddb_table: ddb_table.put_item(Item=item))
+
+def describe_execution(client, execution_arn, dynamodb=None, table_name=None):
+    """
+    This function returns the status (and, once finished, the output) of an execution.
+
+    A succeeded execution cannot change, so it is described once and then kept by
+    this container (LRU) and, if table_name is set, in the execution cache table
+    for the other containers (see CACHED_STATUSES). A running execution is described without its input
+    and output (includedData='METADATA_ONLY'); the output is read once, when the
+    execution has finished.
+
+    Parameters:
+
+    client: boto3 AWS Step Functions client
+    execution_arn: Execution ARN of a state machine
+    dynamodb: Optional boto3 DynamoDB service resource (with table_name)
+    table_name: Optional name of the DynamoDB execution cache Table
+
+    Returns:
+
+    Dict with 'status' and, for a finished execution, 'output' (if it succeeded),
+    or 'error' and 'cause' (if any)
+
+    """
+    execution = get_cached_execution(execution_arn)
+    if execution is not None:
+        return execution
+
+    if table_name:
+        try:
+            execution = read_stored_execution(dynamodb, table_name, execution_arn)
+        except Exception as error:
+            # The cache is an optimization: describe the execution instead
+            print(f'Could not read the execution cache table: {error}')
+        if execution is not None:
+            cache_execution(execution_arn, execution)
+            return execution
+
+    response = client.describe_execution(executionArn=execution_arn, includedData='METADATA_ONLY')
+    if response['status'] not in TERMINAL_STATUSES:
+        return {'status': response['status']}
+
+    # Finished: read the output once, and keep it
+    response = client.describe_execution(executionArn=execution_arn, includedData='ALL_DATA')
+    execution = {field: response[field] for field in EXECUTION_FIELDS if field in response}
+    if execution['status'] not in CACHED_STATUSES:
+        return execution
+
+    cache_execution(execution_arn, execution)
+
+    if table_name:
+        try:
+            store_execution(dynamodb, table_name, execution_arn, execution)
+        except Exception as error:
+            print(f'Could not write the execution cache table: {error}')
+
+    return execution
@@ -0,0 +1,81 @@
+import os
+import time
+
+# Statuses of an AWS Step Functions execution that can still change
+NON_TERMINAL_STATUSES = ('RUNNING', 'PENDING_REDRIVE')
+# API Gateway ends REST API requests after 29 seconds
+MAX_WAIT_IN_SECONDS = int(os.environ.get('MAX_WAIT_IN_SECONDS', '20'))
+# Delays between two status checks: 0.25, 0.5, 1, 2, 2, ... seconds
+FIRST_POLL_DELAY_IN_SECONDS = 0.25
+MAX_POLL_DELAY_IN_SECONDS = 2.0
+# Time kept to return the response before the AWS Lambda function times out
+RESPONSE_MARGIN_IN_SECONDS = 1.0
+
+def get_wait_time(event):
+    """
+    This function reads the optional 'wait' query string parameter of a status
+    route (for example GET /orders/status/{executionArn}?wait=20)
+
+    Parameters:
+
+    event: API Gateway event
+
+    Returns:
+
+    Number of seconds to wait for the end of the execution, at most MAX_WAIT_IN_SECONDS.
+    0 if there is no 'wait' parameter. Raises ValueError for an invalid value.
+
+    """
+    query_parameters = event.get('queryStringParameters') or {}
+    wait = query_parameters.get('wait')
+    if wait is None or wait == '':
+        return 0
+
+    try:
+        wait_in_seconds = float(wait)
+    except ValueError:
+        raise ValueError(f'wait must be a number of seconds, not {wait}')
+
+    if not 0 <= wait_in_seconds < float('inf'):
+        raise ValueError(f'wait must be a number of seconds, not {wait}')
+
+    return min(wait_in_seconds, MAX_WAIT_IN_SECONDS)
+
+def wait_for_execution(get_status, wait_in_seconds, context=None):
+    """
+    This function checks the status of an execution until it ends (long polling).
+
+    The status is checked at once, then again after delays that double from
+    FIRST_POLL_DELAY_IN_SECONDS to MAX_POLL_DELAY_IN_SECONDS, until the status
+    is terminal or wait_in_seconds have passed. The wait never goes beyond the
+    remaining time of the AWS Lambda function, minus RESPONSE_MARGIN_IN_SECONDS.
+
+    Parameters:
+
+    get_status: Function without parameters that returns the current status
+                (for example check_submission_status). Any status that is not
+                in NON_TERMINAL_STATUSES (including '' for an error) ends the wait.
+    wait_in_seconds: Maximum number of seconds to wait (see get_wait_time). 0 checks once.
+    context: Optional AWS Lambda context (get_remaining_time_in_millis)
+
+    Returns:
+
+    Last status
+
+    """
+    deadline = time.monotonic() + wait_in_seconds
+    if context is not None:
+        deadline = min(deadline, time.monotonic() + context.get_remaining_time_in_millis() / 1000 - RESPONSE_MARGIN_IN_SECONDS)
+
+    delay = FIRST_POLL_DELAY_IN_SECONDS
+    status = get_status()
+    while status in NON_TERMINAL_STATUSES:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+
+        time.sleep(min(delay, remaining))
+        delay = min(delay * 2, MAX_POLL_DELAY_IN_SECONDS)
+        status = get_status()
+
+    return status
@@ -0,0 +1,19 @@
+def get_request_header(event, header_name):
+    """
+    This function returns a request header. HTTP header names are case-insensitive.
+
+    Parameters:
+
+    event: API Gateway event
+    header_name: Header name
+
+    Returns:
+
+    Header value. None if the header is not in the request.
+
+    """
+    for name, value in (event.get('headers') or {}).items():
+        if name.lower() == header_name.lower():
+            return value
+
+    return None
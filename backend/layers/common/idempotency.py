@@ -0,0 +1,114 @@
+import os
+import time
+import hashlib
+from botocore.exceptions import ClientError
+from table_registry import run_table_operation
+
+# How long (in seconds) a response is kept for replays. DynamoDB TTL deletes expired items.
+IDEMPOTENCY_TTL_IN_SECONDS = int(os.environ.get('IDEMPOTENCY_TTL_IN_SECONDS', '86400'))
+MAX_IDEMPOTENCY_KEY_LENGTH = 255
+
+def get_request_hash(body):
+    """
+    This function computes a fingerprint of a request body, to detect an
+    Idempotency-Key that is reused with a different request
+
+    Parameters:
+
+    body: Request body (string), or None
+
+    Returns:
+
+    SHA-256 hex digest
+
+    """
+    return hashlib.sha256((body or '').encode()).hexdigest()
+
+def claim_idempotency_key(dynamodb, table_name, idempotency_key, request_hash, attributes=None):
+    """
+    This function records a new request for an Idempotency-Key, with a conditional put.
+
+    Only the first request with a key succeeds. Later requests with the same key
+    (for example retries of the browser) get the record of the first request.
+
+    Parameters:
+
+    dynamodb: boto3 DynamoDB service resource
+    table_name: Name of the DynamoDB idempotency Table
+    idempotency_key: Value of the Idempotency-Key header
+    request_hash: See get_request_hash
+    attributes: Optional dict of other attributes to store (for example submission_id)
+
+    Returns:
+
+    None if the key is new (the caller processes the request). Otherwise, the
+    stored record: 'request_hash', and 'status_code' and 'response_body' once
+    the first request has finished. Raises ValueError for an invalid key.
+
+    """
+    if not idempotency_key or len(idempotency_key) > MAX_IDEMPOTENCY_KEY_LENGTH:
+        raise ValueError(f'Idempotency-Key must have 1 to {MAX_IDEMPOTENCY_KEY_LENGTH} characters')
+
+    now = int(time.time())
+    item = dict(attributes or {})
+    item.update({
+        'idempotency_key': idempotency_key,
+        'request_hash': request_hash,
+        'expires_at': now + IDEMPOTENCY_TTL_IN_SECONDS
+    })
+
+    try:
+        run_table_operation(dynamodb, table_name, lambda ddb_table: ddb_table.put_item(
+            Item=item,
+            # DynamoDB TTL deletes expired items within a few days, not immediately
+            ConditionExpression='attribute_not_exists(idempotency_key) OR expires_at < :now',
+            ExpressionAttributeValues={':now': now}
+        ))
+        return None
+    except ClientError as error:
+        if error.response['Error']['Code'] != 'ConditionalCheckFailedException':
+            raise
+
+    response = run_table_operation(dynamodb, table_name, lambda ddb_table: ddb_table.get_item(
+        Key={'idempotency_key': idempotency_key},
+        ConsistentRead=True
+    ))
+
+    # The record can be deleted between the put and the get (see release_idempotency_key)
+    return response.get('Item', {'idempotency_key': idempotency_key, 'request_hash': request_hash})
+
+def save_idempotent_response(dynamodb, table_name, idempotency_key, status_code, response_body):
+    """
+    This function stores the response of the first request with an Idempotency-Key,
+    so that it is returned to later requests with the same key
+
+    Parameters:
+
+    dynamodb: boto3 DynamoDB service resource
+    table_name: Name of the DynamoDB idempotency Table
+    idempotency_key: Value of the Idempotency-Key header
+    status_code: HTTP status code of the response
+    response_body: Response body (string)
+
+    """
+    run_table_operation(dynamodb, table_name, lambda ddb_table: ddb_table.update_item(
+        Key={'idempotency_key': idempotency_key},
+        UpdateExpression='SET status_code = :status_code, response_body = :response_body',
+        ExpressionAttributeValues={':status_code': status_code, ':response_body': response_body}
+    ))
+
+def release_idempotency_key(dynamodb, table_name, idempotency_key):
+    """
+    This function deletes the record of an Idempotency-Key whose request failed,
+    so that the client can retry it with the same key
+
+    Parameters:
+
+    dynamodb: boto3 DynamoDB service resource
+    table_name: Name of the DynamoDB idempotency Table
+    idempotency_key: Value of the Idempotency-Key header
+
+    """
+    run_table_operation(dynamodb, table_name, lambda ddb_table: ddb_table.delete_item(
+        Key={'idempotency_key': idempotency_key}
+    ))
@@ -0,0 +1,159 @@
+import os
+import json
+import uuid
+from datetime import datetime, timedelta
+from boto3.dynamodb.conditions import Key
+from botocore.exceptions import ClientError
+from table_registry import run_table_operation
+from order_days import query_order_days
+
+# State of the incremental orders report: the watermark (last order in a fragment)
+# and the list of fragments. Fragments are never changed once written.
+MANIFEST_KEY = 'orders-report/manifest.json'
+FRAGMENT_PREFIX = 'orders-report/fragments/'
+# Global secondary index of Orders table: partition key 'order_day' (YYYY-MM-DD), sort key 'order_time'
+ORDER_TIME_INDEX_NAME = 'OrderTimeIndex'
+# Orders younger than this are not put in a fragment yet: an order can become visible
+# in the OrderTimeIndex (eventually consistent) after a younger one. They are shown
+# in the index page until they are settled.
+REPORT_SETTLE_TIME_IN_SECONDS = int(os.environ.get('REPORT_SETTLE_TIME_IN_SECONDS', '60'))
+
+def read_manifest(s3, bucket):
+    """
+    This function reads the state of the incremental orders report
+
+    Parameters:
+
+    s3: boto3 S3 client
+    bucket: Name of the reports bucket
+
+    Returns:
+
+    Tuple (manifest, etag). The manifest is a dict with 'watermark' and 'fragments'.
+    (None, None) if no report was generated yet.
+
+    """
+    try:
+        response = s3.get_object(Bucket=bucket, Key=MANIFEST_KEY)
+    except ClientError as error:
+        if error.response['Error']['Code'] in ('NoSuchKey', '404'):
+            return None, None
+        raise
+
+    return json.loads(response['Body'].read()), response['ETag']
+
+def write_manifest(s3, bucket, manifest, etag):
+    """
+    This function writes the state of the incremental orders report, with a conditional put.
+
+    The write succeeds only if the manifest was not changed since it was read
+    (etag), so that two report executions cannot both add a fragment from the
+    same watermark, or lose the fragment of each other.
+
+    Parameters:
+
+    s3: boto3 S3 client
+    bucket: Name of the reports bucket
+    manifest: Dict with 'watermark' and 'fragments'
+    etag: ETag returned by read_manifest. None if there was no manifest.
+
+    """
+    condition = {'IfMatch': etag} if etag else {'IfNoneMatch': '*'}
+    try:
+        s3.put_object(Bucket=bucket, Key=MANIFEST_KEY, Body=json.dumps(manifest).encode(),
+                      ContentType='application/json', CacheControl='no-store', **condition)
+    except ClientError as error:
+        if error.response['Error']['Code'] in ('PreconditionFailed', 'ConditionalRequestConflict'):
+            raise ValueError('The orders report was updated by another execution. Please try again.')
+        raise
+
+def get_settle_time(now=None):
+    """
+    This function returns the order_time before which orders are settled (see REPORT_SETTLE_TIME_IN_SECONDS)
+
+    Parameters:
+
+    now: Optional current time (datetime). Default is datetime.now(), like create_order in new_order.py
+
+    Returns:
+
+    ISO 8601 string, comparable with order_time (for example 2025-04-02T11:59:00.000000Z)
+
+    """
+    settle_time = (now or datetime.now()) - timedelta(seconds=REPORT_SETTLE_TIME_IN_SECONDS)
+    return settle_time.isoformat(timespec='microseconds') + 'Z'
+
+def is_after(order, watermark):
+    """
+    This function checks whether an order comes after the watermark.
+    Orders are sorted by order_time, then by id (two orders can have the same order_time).
+
+    Parameters:
+
+    order: Order (dict with 'order_time' and 'id')
+    watermark: Dict with 'order_time' and 'id', or None (no order was reported yet)
+
+    Returns:
+
+    True or False
+
+    """
+    if watermark is None:
+        return True
+    return (order['order_time'], order['id']) > (watermark['order_time'], watermark['id'])
+
+def get_fragment_key(watermark):
+    """
+    This function returns the S3 key of a new fragment. Keys sort by the time of their last order.
+
+    Parameters:
+
+    watermark: Dict with 'order_time' and 'id' of the last order of the fragment
+
+    Returns:
+
+    S3 key. For example orders-report/fragments/2025-04-02T120000.000000Z-0f8fad5b.html
+
+    """
+    # Without ':', so that the key is the same in a presigned URL
+    return f"{FRAGMENT_PREFIX}{watermark['order_time'].replace(':', '')}-{uuid.uuid4().hex[:8]}.html"
+
+def query_orders_after(dynamodb, table_name, order_days_table_name, watermark):
+    """
+    This function returns the orders that come after the watermark, with Query
+    requests on the OrderTimeIndex (one day partition at a time), instead of a Scan.
+
+    Only the days that have orders from the day of the watermark on are read (see
+    layers/common/order_days.py), so the cost depends on the number of new orders,
+    not on the size of the table or on the time since the last order.
+
+    Parameters:
+
+    dynamodb: boto3 DynamoDB service resource
+    table_name: Name of the DynamoDB Table that has orders
+    order_days_table_name: Name of the DynamoDB OrderDays Table
+    watermark: Dict with 'order_time' and 'id' of the last reported order
+
+    Returns:
+
+    Generator of orders, by order_time. The next page is read when the current one has been consumed.
+
+    """
+    for day in query_order_days(dynamodb, order_days_table_name, first_day=watermark['order_time'][:10], descending=False):
+        # order_time >= watermark: orders with the same order_time as the watermark are compared by id
+        key_condition = Key('order_day').eq(day) & Key('order_time').gte(watermark['order_time'])
+        start_key = None
+
+        while True:
+            query_kwargs = {'IndexName': ORDER_TIME_INDEX_NAME, 'KeyConditionExpression': key_condition}
+            if start_key is not None:
+                query_kwargs['ExclusiveStartKey'] = start_key
+
+            response = run_table_operation(dynamodb, table_name, lambda ddb_table: ddb_table.query(**query_kwargs))
+            for order in response['Items']:
+                if is_after(order, watermark):
+                    yield order
+
+            start_key = response.get('LastEvaluatedKey')
+            if start_key is None:
+                break
@@ -0,0 +1,142 @@
+from boto3.dynamodb.types import TypeDeserializer
+
+# Maximum number of items in one TransactWriteItems request
+MAX_TRANSACTION_ITEMS = 100
+
+# Cancellation reasons are not deserialized by boto3
+deserializer = TypeDeserializer()
+
+def get_quantities(received_order):
+    """
+    This function adds up the ordered quantity of each product.
+
+    A transaction cannot update the same item twice, so a product that is
+    listed several times in an order is decremented once, by the total quantity.
+
+    Parameters:
+
+    received_order: This is the order that the customer requested
+
+    Returns:
+
+    Dict. Key: product id (string). Value: quantity (int)
+
+    """
+    quantities = {}
+    for product in received_order['customerproduct']['productsToSubmit']:
+        product_quantity = int(product['quantity']) # This is a string. Convert to int
+        product_id = str(product['id'])
+
+        if product_quantity <= 0:
+            raise ValueError(f'Invalid quantity for product {product_id}')
+
+        quantities[product_id] = quantities.get(product_id, 0) + product_quantity
+
+    return quantities
+
+def build_decrement(table_name, product_id, quantity):
+    """
+    This function builds a TransactWriteItems item that decrements the stock of a product.
+
+    The decrement is conditional: the product must exist and have enough stock.
+
+    Parameters:
+
+    table_name: Name of the DynamoDB Table that has products
+    product_id: Product id (string)
+    quantity: Ordered quantity (int)
+
+    Returns:
+
+    TransactWriteItems 'Update' item
+
+    """
+    return {
+        'Update': {
+            'TableName': table_name,
+            'Key': {'id': product_id},
+            'UpdateExpression': 'SET inventory_count = inventory_count - :quantity',
+            # Ensure the product exists and stock is sufficient
+            'ConditionExpression': 'attribute_exists(id) AND inventory_count >= :quantity',
+            'ExpressionAttributeValues': {':quantity': quantity},
+            'ReturnValuesOnConditionCheckFailure': 'ALL_OLD'
+        }
+    }
+
+def build_increment(table_name, product_id, quantity):
+    """
+    This function builds a TransactWriteItems item that gives back the stock of a product
+    (for example, when a later transaction of the same order is cancelled).
+
+    Parameters:
+
+    table_name: Name of the DynamoDB Table that has products
+    product_id: Product id (string)
+    quantity: Quantity to give back (int)
+
+    Returns:
+
+    TransactWriteItems 'Update' item
+
+    """
+    return {
+        'Update': {
+            'TableName': table_name,
+            'Key': {'id': product_id},
+            'UpdateExpression': 'SET inventory_count = inventory_count + :quantity',
+            'ConditionExpression': 'attribute_exists(id)',
+            'ExpressionAttributeValues': {':quantity': quantity}
+        }
+    }
+
+def get_failed_products(error, product_ids):
+    """
+    This function reads which products cancelled a transaction
+
+    Parameters:
+
+    error: TransactionCanceledException raised by TransactWriteItems
+    product_ids: Product ids, in the order of the transaction items.
+                 None for items that are not inventory decrements (they are skipped).
+
+    Returns:
+
+    List of dicts with 'product_id', 'reason' and, if the product exists, 'inventory_count'
+
+    """
+    failed_products = []
+    for product_id, reason in zip(product_ids, error.response.get('CancellationReasons', [])):
+        if product_id is None or reason.get('Code') in (None, 'None'):
+            continue
+
+        failed_product = {'product_id': product_id}
+        if reason['Code'] == 'ConditionalCheckFailed':
+            # The current item is returned (ReturnValuesOnConditionCheckFailure) only if the product exists.
+            item = reason.get('Item')
+            if item is None:
+                failed_product['reason'] = 'Product not found'
+            else:
+                failed_product['reason'] = 'Not enough stock available'
+                if 'inventory_count' in item:
+                    failed_product['inventory_count'] = int(deserializer.deserialize(item['inventory_count']))
+        else:
+            failed_product['reason'] = reason.get('Message', reason['Code'])
+
+        failed_products.append(failed_product)
+
+    return failed_products
+
+def describe_failed_products(failed_products):
+    """
+    This function describes the products that cancelled a transaction, for error messages
+
+    Parameters:
+
+    failed_products: List returned by get_failed_products
+
+    Returns:
+
+    String. For example: Not enough stock available (product 2)
+
+    """
+    return ', '.join(f"{failed_product['reason']} (product {failed_product['product_id']})" for failed_product in failed_products)
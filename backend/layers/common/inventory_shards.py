@@ -0,0 +1,502 @@
+import os
+import time
+import random
+from botocore.exceptions import ClientError
+from inventory import MAX_TRANSACTION_ITEMS, build_decrement, build_increment, get_failed_products
+from batch_get import batch_get_items
+
+# How long (in seconds) the shard count of a product is trusted before it is read again
+SHARD_LAYOUT_TTL_IN_SECONDS = int(os.environ.get('SHARD_LAYOUT_TTL_IN_SECONDS', '60'))
+
+# Shard counts of this Lambda container (execution environment).
+# Key: product id. Value: {'shards': number of shards (0: not sharded), 'fetched_at': time}
+_layouts = {}
+
+def get_shard_key(product_id, shard):
+    """
+    This function returns the key of a shard item in the inventory shards table.
+
+    Each shard has its own partition key, so that the shards of a hot product
+    are spread across DynamoDB partitions.
+
+    Parameters:
+
+    product_id: Product id (string)
+    shard: Shard number, from 0 to the number of shards - 1
+
+    Returns:
+
+    Shard id. For example 2#0
+
+    """
+    return f'{product_id}#{shard}'
+
+def get_shard_counts(dynamodb, products_table_name, product_ids, shards_table_name):
+    """
+    This function returns the number of inventory shards of products.
+
+    A product is sharded when its item in the products table has inventory_shards
+    (see scripts/shard_inventory.py). Shard counts are kept for SHARD_LAYOUT_TTL_IN_SECONDS
+    in this container, so hot products are not read on every order.
+
+    Parameters:
+
+    dynamodb: boto3 DynamoDB service resource
+    products_table_name: Name of the DynamoDB Table that has products
+    product_ids: List of product ids
+    shards_table_name: Name of the DynamoDB Table that has inventory shards. None: sharding is disabled
+
+    Returns:
+
+    Dict. Key: product id of a sharded product. Value: number of shards.
+    Products that are not sharded are not in the dict.
+
+    """
+    if not shards_table_name:
+        return {}
+
+    now = time.monotonic()
+    expired_ids = [product_id for product_id in product_ids
+                   if product_id not in _layouts or now - _layouts[product_id]['fetched_at'] >= SHARD_LAYOUT_TTL_IN_SECONDS]
+    if expired_ids:
+        items = batch_get_items(dynamodb, products_table_name, expired_ids, 'id, inventory_shards')
+        for product_id in expired_ids:
+            _layouts[product_id] = {
+                'shards': int(items.get(product_id, {}).get('inventory_shards', 0)),
+                'fetched_at': now
+            }
+
+    return {product_id: _layouts[product_id]['shards'] for product_id in product_ids if _layouts[product_id]['shards'] > 1}
+
+def invalidate_shard_counts(product_ids=None):
+    """
+    This function removes kept shard counts, so that they are read again
+
+    Parameters:
+
+    product_ids: Product ids. Default is all products
+
+    """
+    if product_ids is None:
+        _layouts.clear()
+    for product_id in product_ids or []:
+        _layouts.pop(product_id, None)
+
+def plan_shards(shard_counts):
+    """
+    This function chooses the shards that the decrements of a request try, in order.
+
+    Each sharded product starts with a random shard, so that concurrent orders are
+    spread across shards. If that shard does not have enough stock, the other shards
+    are tried, and then the quantity is split across shards (see try_next_shards).
+
+    Parameters:
+
+    shard_counts: See get_shard_counts
+
+    Returns:
+
+    Dict. Key: product id. Value: {'shards': shards in the order to try, 'position': index of the current shard}.
+    try_next_shards adds 'seen' (stock of the shards that cancelled a transaction) and
+    'split' (list of (shard, quantity), when no single shard has enough stock).
+
+    """
+    return {product_id: {'shards': random.sample(range(shards), shards), 'position': 0}
+            for product_id, shards in shard_counts.items()}
+
+def build_shard_decrement(products_table_name, shards_table_name, product_id, quantity, plan):
+    """
+    This function builds a TransactWriteItems item that decrements the stock of a product:
+    its current shard if it is sharded (see plan_shards), otherwise its item in the products table.
+
+    Parameters:
+
+    products_table_name: Name of the DynamoDB Table that has products
+    shards_table_name: Name of the DynamoDB Table that has inventory shards
+    product_id: Product id (string)
+    quantity: Ordered quantity (int)
+    plan: See plan_shards
+
+    Returns:
+
+    TransactWriteItems 'Update' item (see layers/common/inventory.py build_decrement)
+
+    """
+    if product_id not in plan:
+        return build_decrement(products_table_name, product_id, quantity)
+
+    product_plan = plan[product_id]
+    shard = product_plan['shards'][product_plan['position']]
+    return build_decrement(shards_table_name, get_shard_key(product_id, shard), quantity)
+
+def build_shard_increment(products_table_name, shards_table_name, product_id, quantity, plan):
+    """
+    This function builds a TransactWriteItems item that gives back the stock of a product.
+    Stock can be given back to any shard: it goes to a random shard.
+
+    Parameters:
+
+    products_table_name: Name of the DynamoDB Table that has products
+    shards_table_name: Name of the DynamoDB Table that has inventory shards
+    product_id: Product id (string)
+    quantity: Quantity to give back (int)
+    plan: See plan_shards
+
+    Returns:
+
+    TransactWriteItems 'Update' item (see layers/common/inventory.py build_increment)
+
+    """
+    if product_id not in plan:
+        return build_increment(products_table_name, product_id, quantity)
+
+    shard = random.choice(plan[product_id]['shards'])
+    return build_increment(shards_table_name, get_shard_key(product_id, shard), quantity)
+
+def split_quantity(seen, quantity):
+    """
+    This function splits a quantity across shards, the shards with the most stock first
+
+    Parameters:
+
+    seen: Dict. Key: shard. Value: stock of the shard (as returned by a cancelled transaction)
+    quantity: Quantity to decrement (int)
+
+    Returns:
+
+    List of (shard, quantity). None if the shards do not have enough stock together.
+
+    """
+    if sum(seen.values()) < quantity:
+        return None
+
+    split = []
+    remaining = quantity
+    for shard, count in sorted(seen.items(), key=lambda shard_count: (-shard_count[1], shard_count[0])):
+        if remaining <= 0:
+            break
+        if count > 0:
+            split.append((shard, min(count, remaining)))
+            remaining -= min(count, remaining)
+
+    return split
+
+def try_next_shards(plan, failed_products, quantities=None):
+    """
+    This function moves the sharded products that cancelled a transaction to their next shard.
+
+    When every shard of a product was tried, its quantity is split across its shards,
+    with the stock that each shard had when it cancelled the transaction (see split_quantity).
+    For example, 10 units of a product with 3 shards of 4 units are decremented as 4, 4 and 2.
+    A split is tried once: if a shard has less stock by then, the product is out of stock.
+
+    Parameters:
+
+    plan: See plan_shards
+    failed_products: Products that cancelled the transaction (see layers/common/inventory.py get_failed_products)
+    quantities: Optional dict. Key: product id. Value: quantity to decrement. None: quantities are not split.
+
+    Returns:
+
+    True if the transaction can be tried again: every failed product is sharded, ran out
+    of stock in its current shard, and has a shard that was not tried, or enough stock
+    across its shards. Otherwise, False
+
+    """
+    if not failed_products:
+        return False
+
+    splits = {}
+    for failed_product in failed_products:
+        product_id = failed_product['product_id']
+        product_plan = plan.get(product_id)
+        if product_plan is None or failed_product['reason'] != 'Not enough stock available':
+            return False
+        if product_plan.get('split') is not None:
+            return False
+
+        shard = product_plan['shards'][product_plan['position']]
+        product_plan.setdefault('seen', {})[shard] = failed_product.get('inventory_count', 0)
+
+        if product_plan['position'] + 1 >= len(product_plan['shards']):
+            split = split_quantity(product_plan['seen'], quantities[product_id]) if quantities else None
+            if split is None:
+                return False
+            splits[product_id] = split
+
+    for failed_product in failed_products:
+        product_id = failed_product['product_id']
+        if product_id in splits:
+            plan[product_id]['split'] = splits[product_id]
+        else:
+            plan[product_id]['position'] += 1
+
+    return True
+
+def split_decrements(items, product_ids, plan):
+    """
+    This function replaces the decrement of each split product (see try_next_shards)
+    with one decrement per shard
+
+    Parameters:
+
+    items: TransactWriteItems items (see build_shard_decrement)
+    product_ids: Product ids, in the order of the items. None for other items.
+    plan: See plan_shards
+
+    Returns:
+
+    Tuple (items, product ids), in the same order
+
+    """
+    split_items, split_product_ids = [], []
+    for item, product_id in zip(items, product_ids):
+        split = plan[product_id].get('split') if product_id in plan else None
+        if split is None:
+            split_items.append(item)
+            split_product_ids.append(product_id)
+            continue
+
+        shards_table_name = item['Update']['TableName']
+        for shard, quantity in split:
+            split_items.append(build_decrement(shards_table_name, get_shard_key(product_id, shard), quantity))
+            split_product_ids.append(product_id)
+
+    return split_items, split_product_ids
+
+class InventoryTransactionCanceled(ClientError):
+    """
+    TransactionCanceledException raised by transact_with_shards.
+
+    The CancellationReasons of a split transaction (see split_decrements) do not line up
+    with the products of the request, so the products that cancelled the transaction are
+    given in failed_products: one entry per product, with the stock of the whole product
+    (all its shards) in inventory_count (see collapse_failed_products).
+    """
+    def __init__(self, error, failed_products):
+        super().__init__(error.response, error.operation_name)
+        self.failed_products = failed_products
+
+def collapse_failed_products(dynamodb, shards_table_name, plan, failed_products):
+    """
+    This function merges the failed products of a transaction to one entry per product.
+    Sharded products that ran out of stock get the total stock of their shards, instead
+    of the stock of the shard that was tried.
+
+    Parameters:
+
+    dynamodb: boto3 DynamoDB service resource
+    shards_table_name: Name of the DynamoDB Table that has inventory shards
+    plan: See plan_shards
+    failed_products: Products that cancelled the transaction, one entry per item (see layers/common/inventory.py get_failed_products)
+
+    Returns:
+
+    List of failed products, one per product
+
+    """
+    collapsed = {}
+    for failed_product in failed_products:
+        collapsed.setdefault(failed_product['product_id'], dict(failed_product))
+
+    shard_counts = {product_id: len(plan[product_id]['shards']) for product_id, failed_product in collapsed.items()
+                    if product_id in plan and failed_product['reason'] == 'Not enough stock available'}
+    if shard_counts:
+        try:
+            for product_id, inventory_count in get_sharded_inventory_counts(dynamodb, shards_table_name, shard_counts).items():
+                collapsed[product_id]['inventory_count'] = inventory_count
+        except (ClientError, ValueError) as error:
+            # The stock of the shard that was tried is a lower bound of the stock of the product
+            print(f'Exception error: collapse_failed_products : {error}')
+
+    return list(collapsed.values())
+
+def transact_with_shards(dynamodb, build_items, product_ids, plan):
+    """
+    This function runs a TransactWriteItems of inventory decrements. If the transaction is
+    cancelled because sharded products ran out of stock in their current shard, it is
+    tried again with their next shards, or with their quantity split across shards (see try_next_shards).
+
+    Parameters:
+
+    dynamodb: boto3 DynamoDB service resource
+    build_items: Function that returns the TransactWriteItems items (see build_shard_decrement), for the current plan
+    product_ids: Product ids, in the order of the transaction items. None for other items.
+    plan: See plan_shards
+
+    Returns:
+
+    TransactWriteItems response. Raises InventoryTransactionCanceled (with the products that
+    cancelled the last attempt) if the transaction is cancelled, or the ClientError of other errors.
+
+    """
+    last_error = None
+    last_failed_products = []
+    while True:
+        items = build_items()
+        quantities = {product_id: item['Update']['ExpressionAttributeValues'][':quantity']
+                      for item, product_id in zip(items, product_ids) if product_id in plan}
+        shards_table_name = next((item['Update']['TableName'] for item, product_id in zip(items, product_ids) if product_id in plan), None)
+        items, item_product_ids = split_decrements(items, product_ids, plan)
+        if len(items) > MAX_TRANSACTION_ITEMS:
+            # The split decrements do not fit in one transaction
+            raise InventoryTransactionCanceled(last_error, collapse_failed_products(dynamodb, shards_table_name, plan, last_failed_products))
+
+        try:
+            # The resource's client converts Python types to DynamoDB attribute values.
+            return dynamodb.meta.client.transact_write_items(TransactItems=items)
+        except ClientError as error:
+            if error.response['Error']['Code'] != 'TransactionCanceledException':
+                raise
+            failed_products = get_failed_products(error, item_product_ids)
+            if not try_next_shards(plan, failed_products, quantities):
+                raise InventoryTransactionCanceled(error, collapse_failed_products(dynamodb, shards_table_name, plan, failed_products))
+            last_error = error
+            last_failed_products = failed_products
+            print(f'Not enough stock in a shard. Trying the next shards.')
+
+def with_shard_field(fields):
+    """
+    This function adds inventory_shards to the attributes to read, when inventory_count
+    is read, so that the stock of sharded products can be added up (see aggregate_inventory)
+
+    Parameters:
+
+    fields: List of attribute names (see layers/common/projection.py), or None for all attributes
+
+    Returns:
+
+    List of attribute names, or None
+
+    """
+    if fields and 'inventory_count' in fields and 'inventory_shards' not in fields:
+        return fields + ['inventory_shards']
+    return fields
+
+def remove_shard_field(products, fields):
+    """
+    This function removes inventory_shards from products, when it was only read
+    for aggregate_inventory (see with_shard_field), so that the response has the requested fields only
+
+    Parameters:
+
+    products: List of products
+    fields: List of requested attribute names, or None for all attributes
+
+    """
+    if fields and 'inventory_shards' not in fields:
+        for product in products:
+            product.pop('inventory_shards', None)
+
+def get_sharded_inventory_counts(dynamodb, shards_table_name, shard_counts):
+    """
+    This function adds up the stock of the shards of products
+
+    Parameters:
+
+    dynamodb: boto3 DynamoDB service resource
+    shards_table_name: Name of the DynamoDB Table that has inventory shards
+    shard_counts: Dict. Key: product id. Value: number of shards
+
+    Returns:
+
+    Dict. Key: product id. Value: total stock (int)
+
+    """
+    keys = [get_shard_key(product_id, shard) for product_id, shards in shard_counts.items() for shard in range(shards)]
+    items = batch_get_items(dynamodb, shards_table_name, keys, 'id, inventory_count')
+
+    return {
+        product_id: sum(int(items.get(get_shard_key(product_id, shard), {}).get('inventory_count', 0)) for shard in range(shards))
+        for product_id, shards in shard_counts.items()
+    }
+
+def aggregate_inventory(dynamodb, shards_table_name, products):
+    """
+    This function replaces the inventory_count of sharded products (read from the
+    products table) with the total stock of their shards
+
+    Parameters:
+
+    dynamodb: boto3 DynamoDB service resource
+    shards_table_name: Name of the DynamoDB Table that has inventory shards. None: sharding is disabled
+    products: List of products. Products without inventory_shards are not changed.
+
+    """
+    if not shards_table_name:
+        return
+
+    shard_counts = {product['id']: int(product['inventory_shards']) for product in products
+                    if int(product.get('inventory_shards', 0)) > 1}
+    if not shard_counts:
+        return
+
+    inventory_counts = get_sharded_inventory_counts(dynamodb, shards_table_name, shard_counts)
+    for product in products:
+        if product['id'] in inventory_counts:
+            product['inventory_count'] = inventory_counts[product['id']]
+
+def rebalance_shards(dynamodb, shards_table_name, product_id, shards):
+    """
+    This function moves stock between the shards of a product, so that every shard
+    has about the same stock. Orders then rarely find an empty shard.
+
+    The shards are updated with one TransactWriteItems. Each update is conditional on
+    the stock that was read, so a concurrent order cancels the rebalance instead of
+    being lost (the rebalance runs again later).
+
+    Parameters:
+
+    dynamodb: boto3 DynamoDB service resource
+    shards_table_name: Name of the DynamoDB Table that has inventory shards
+    product_id: Product id (string)
+    shards: Number of shards (at most 100, the TransactWriteItems limit)
+
+    Returns:
+
+    True if stock was moved. False if the shards were already balanced, or if
+    the stock changed during the rebalance.
+
+    """
+    keys = [get_shard_key(product_id, shard) for shard in range(shards)]
+    items = batch_get_items(dynamodb, shards_table_name, keys, 'id, inventory_count')
+    counts = [int(items.get(key, {}).get('inventory_count', 0)) for key in keys]
+
+    # The first shards get the remainder
+    total = sum(counts)
+    targets = [total // shards + (1 if shard < total % shards else 0) for shard in range(shards)]
+    if max(counts) - min(counts) <= 1:
+        return False
+
+    transact_items = []
+    for key, count, target in zip(keys, counts, targets):
+        if key in items:
+            transact_items.append({
+                'Update': {
+                    'TableName': shards_table_name,
+                    'Key': {'id': key},
+                    'UpdateExpression': 'SET inventory_count = :target',
+                    'ConditionExpression': 'inventory_count = :count',
+                    'ExpressionAttributeValues': {':target': target, ':count': count}
+                }
+            })
+        else:
+            # A missing shard is created
+            transact_items.append({
+                'Put': {
+                    'TableName': shards_table_name,
+                    'Item': {'id': key, 'inventory_count': target},
+                    'ConditionExpression': 'attribute_not_exists(id)'
+                }
+            })
+
+    try:
+        # The resource's client converts Python types to DynamoDB attribute values.
+        dynamodb.meta.client.transact_write_items(TransactItems=transact_items)
+    except ClientError as error:
+        if error.response['Error']['Code'] != 'TransactionCanceledException':
+            raise
+        print(f'Rebalance of product {product_id} cancelled: the stock changed')
+        return False
+
+    return True
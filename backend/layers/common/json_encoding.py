@@ -0,0 +1,50 @@
+import json
+from decimal import Decimal
+
+class DecimalEncoder(json.JSONEncoder):
+    """
+    JSON encoder for items read with boto3.
+
+    boto3 returns DynamoDB Numbers (for example inventory_count) as Decimal,
+    which json.dumps() cannot serialize. Whole numbers are encoded as int, and
+    other numbers as float.
+
+    """
+    def default(self, value):
+        if isinstance(value, Decimal):
+            return int(value) if value == value.to_integral_value() else float(value)
+        return super().default(value)
+
+def dumps(value, **kwargs):
+    """
+    This function is json.dumps() for values that can contain Decimal numbers
+
+    Parameters:
+
+    value: Value to serialize (for example a list of DynamoDB items)
+    kwargs: Other json.dumps() parameters (for example sort_keys)
+
+    Returns:
+
+    JSON string
+
+    """
+    return json.dumps(value, cls=DecimalEncoder, **kwargs)
+
+def to_json_compatible(value):
+    """
+    This function converts the Decimal numbers of a value to int or float.
+
+    AWS Lambda serializes the return value of a function with json, so items
+    returned to AWS Step Functions must not contain Decimal numbers.
+
+    Parameters:
+
+    value: Value to convert (for example a list of DynamoDB items)
+
+    Returns:
+
+    Same value, with int and float instead of Decimal
+
+    """
+    return json.loads(dumps(value))
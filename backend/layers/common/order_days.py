@@ -0,0 +1,83 @@
+import threading
+from boto3.dynamodb.conditions import Key
+from table_registry import run_table_operation
+
+# Partition key ('calendar') of the OrderDays table: all days are in one partition, sorted by 'order_day',
+# so that the days that have orders are listed with one Query, without reading the empty days.
+ORDER_DAYS_PARTITION = 'orders'
+
+# Days already recorded by this Lambda container: a day is written once per container, not once per order
+_recorded_days = set()
+_lock = threading.Lock()
+
+def record_order_days(dynamodb, table_name, days):
+    """
+    This function records the days that have orders, in the OrderDays table (see template.yaml).
+
+    It is called before the orders are written: a day without its order (the order
+    write failed) is only an empty day for GET /orders, while an order without its
+    day could not be listed.
+
+    Parameters:
+
+    dynamodb: boto3 DynamoDB service resource
+    table_name: Name of the DynamoDB OrderDays Table. None: days are not recorded.
+    days: Iterable of days (YYYY-MM-DD, see layers/common/order_keys.py). None is ignored:
+          an order without 'order_day' is not in the OrderTimeIndex either.
+
+    """
+    if not table_name:
+        return
+
+    with _lock:
+        new_days = {day for day in days if day} - _recorded_days
+
+    for day in sorted(new_days):
+        run_table_operation(dynamodb, table_name, lambda ddb_table: ddb_table.put_item(
+            Item={'calendar': ORDER_DAYS_PARTITION, 'order_day': day}
+        ))
+        with _lock:
+            _recorded_days.add(day)
+
+def invalidate_order_days():
+    """
+    This function forgets the days recorded by this container
+    """
+    with _lock:
+        _recorded_days.clear()
+
+def query_order_days(dynamodb, table_name, first_day=None, last_day=None, descending=True):
+    """
+    This function lists the days that have orders, between first_day and last_day (inclusive)
+
+    Parameters:
+
+    dynamodb: boto3 DynamoDB service resource
+    table_name: Name of the DynamoDB OrderDays Table
+    first_day: Optional first day (YYYY-MM-DD). Default: the first day that has orders
+    last_day: Optional last day (YYYY-MM-DD). Default: the last day that has orders
+    descending: True to list the most recent days first
+
+    Returns:
+
+    Generator of days (YYYY-MM-DD). The next page is read when the current one has been consumed.
+
+    """
+    key_condition = Key('calendar').eq(ORDER_DAYS_PARTITION)
+    if first_day and last_day:
+        key_condition = key_condition & Key('order_day').between(first_day, last_day)
+    elif first_day:
+        key_condition = key_condition & Key('order_day').gte(first_day)
+    elif last_day:
+        key_condition = key_condition & Key('order_day').lte(last_day)
+
+    query_kwargs = {'KeyConditionExpression': key_condition, 'ScanIndexForward': not descending}
+
+    while True:
+        response = run_table_operation(dynamodb, table_name, lambda ddb_table: ddb_table.query(**query_kwargs))
+        for item in response['Items']:
+            yield item['order_day']
+
+        if 'LastEvaluatedKey' not in response:
+            break
+        query_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
@@ -0,0 +1,94 @@
+import os
+import time
+import threading
+
+# Crockford's Base32 alphabet (no I, L, O, U), as used by ULID
+ENCODING = '0123456789ABCDEFGHJKMNPQRSTVWXYZ'
+TIMESTAMP_LENGTH = 10   # 48 bits of milliseconds
+RANDOM_LENGTH = 16      # 80 random bits
+RANDOM_BITS = 80
+
+# Last ULID of this Lambda container (execution environment), to keep IDs
+# monotonic when several are generated within the same millisecond
+_last = {'timestamp': -1, 'random': 0}
+_lock = threading.Lock()
+
+def encode_base32(value, length):
+    """
+    This function encodes an integer with Crockford's Base32
+
+    Parameters:
+
+    value: Non-negative integer
+    length: Number of characters (the value is left-padded with '0')
+
+    Returns:
+
+    String of 'length' characters
+
+    """
+    characters = []
+    for _ in range(length):
+        characters.append(ENCODING[value & 31])
+        value >>= 5
+
+    return ''.join(reversed(characters))
+
+def generate_order_id():
+    """
+    This function generates a ULID (Universally Unique Lexicographically Sortable Identifier).
+
+    A ULID is 26 characters: 10 for the time in milliseconds, then 16 for 80 random bits.
+    IDs sort by creation time as plain strings, and two containers generating IDs
+    in the same millisecond collide with a probability of 2^-80. Within the same
+    millisecond, this container increments the random part instead, so its IDs
+    are strictly increasing.
+
+    Returns:
+
+    ULID string (for example 01J8Z4Q3V6K2T9M5R7X1C0B2N4)
+
+    """
+    with _lock:
+        timestamp = int(time.time() * 1000)
+
+        if timestamp <= _last['timestamp']:
+            # Same millisecond (or the clock went back): keep the order of this container
+            timestamp = _last['timestamp']
+            random_part = _last['random'] + 1
+            if random_part >= 1 << RANDOM_BITS:
+                # 2^80 IDs in one millisecond: move to the next millisecond
+                timestamp += 1
+                random_part = int.from_bytes(os.urandom(10), 'big')
+        else:
+            random_part = int.from_bytes(os.urandom(10), 'big')
+
+        _last['timestamp'] = timestamp
+        _last['random'] = random_part
+
+    return encode_base32(timestamp, TIMESTAMP_LENGTH) + encode_base32(random_part, RANDOM_LENGTH)
+
+def get_order_id_time(order_id):
+    """
+    This function reads the creation time of a ULID
+
+    Parameters:
+
+    order_id: ULID string (see generate_order_id)
+
+    Returns:
+
+    Milliseconds since the epoch. Raises ValueError if order_id is not a ULID.
+
+    """
+    if not isinstance(order_id, str) or len(order_id) != TIMESTAMP_LENGTH + RANDOM_LENGTH:
+        raise ValueError(f'Invalid order id: {order_id}')
+
+    timestamp = 0
+    for character in order_id[:TIMESTAMP_LENGTH].upper():
+        position = ENCODING.find(character)
+        if position < 0:
+            raise ValueError(f'Invalid order id: {order_id}')
+        timestamp = (timestamp << 5) | position
+
+    return timestamp
@@ -0,0 +1,39 @@
+def get_order_day(order_time):
+    """
+    This function returns the partition key of the OrderTimeIndex (see template.yaml)
+
+    Parameters:
+
+    order_time: ISO 8601 date and time of the order (for example 2025-03-12T13:11:51.761Z)
+
+    Returns:
+
+    Day of the order as YYYY-MM-DD
+
+    """
+    return order_time[:10]
+
+def normalize_email(email):
+    """
+    This function returns the partition key of the CustomerEmailIndex (see template.yaml).
+
+    Email addresses are compared without case and surrounding spaces, so that
+    Jane.Doe@Example.com and jane.doe@example.com find the same orders.
+
+    Parameters:
+
+    email: Email address as entered by the customer (or by support staff)
+
+    Returns:
+
+    Normalized email address. Raises ValueError for an invalid email address.
+
+    """
+    if not isinstance(email, str):
+        raise ValueError('Invalid email')
+
+    email_key = email.strip().lower()
+    if '@' not in email_key or ' ' in email_key:
+        raise ValueError(f'Invalid email: {email}')
+
+    return email_key
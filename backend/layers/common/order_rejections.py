@@ -0,0 +1,56 @@
+import os
+import time
+from table_registry import run_table_operation
+
+# How long (in seconds) the rejection of a queued order can be read. DynamoDB TTL deletes expired items.
+REJECTION_TTL_IN_SECONDS = int(os.environ.get('REJECTION_TTL_IN_SECONDS', str(7 * 24 * 3600)))
+
+def record_rejections(dynamodb, table_name, rejections):
+    """
+    This function records the queued orders that were not placed (see queue_order_handler in new_order.py),
+    so that their ticket (the order id) resolves to a rejection instead of pending forever.
+
+    Parameters:
+
+    dynamodb: boto3 DynamoDB service resource
+    table_name: Name of the DynamoDB rejected orders Table. None: rejections are not recorded.
+    rejections: Dict. Key: order id. Value: reason (string)
+
+    """
+    if not rejections or not table_name:
+        return
+
+    expires_at = int(time.time()) + REJECTION_TTL_IN_SECONDS
+
+    def write_rejections(ddb_table):
+        # batch_writer sends BatchWriteItem requests of up to 25 items, and retries unprocessed items
+        with ddb_table.batch_writer() as batch:
+            for order_id, reason in rejections.items():
+                batch.put_item(Item={'order_id': order_id, 'reason': reason, 'expires_at': expires_at})
+
+    run_table_operation(dynamodb, table_name, write_rejections)
+
+def get_rejection(dynamodb, table_name, order_id):
+    """
+    This function reads the rejection of a queued order
+
+    Parameters:
+
+    dynamodb: boto3 DynamoDB service resource
+    table_name: Name of the DynamoDB rejected orders Table
+    order_id: Id of the order (the ticket returned by POST /orders)
+
+    Returns:
+
+    Reason (string). None if the order was not rejected (or the rejection expired).
+
+    """
+    response = run_table_operation(dynamodb, table_name, lambda ddb_table: ddb_table.get_item(
+        Key={'order_id': order_id}
+    ))
+    item = response.get('Item')
+    # DynamoDB TTL deletes expired items within a few days, not immediately
+    if item is None or item.get('expires_at', 0) < int(time.time()):
+        return None
+
+    return item['reason']
@@ -0,0 +1,46 @@
+import base64
+import json
+
+def encode_cursor(last_evaluated_key):
+    """
+    This function encodes DynamoDB's LastEvaluatedKey into an opaque cursor string
+
+    Parameters:
+
+    last_evaluated_key: LastEvaluatedKey returned by DynamoDB (or any JSON-serializable position), or None
+
+    Returns:
+
+    URL-safe cursor string. None if there are no more pages.
+
+    """
+    if not last_evaluated_key:
+        return None
+
+    return base64.urlsafe_b64encode(json.dumps(last_evaluated_key).encode()).decode()
+
+def decode_cursor(cursor):
+    """
+    This function decodes a cursor string (see encode_cursor) back into an ExclusiveStartKey
+
+    Parameters:
+
+    cursor: Cursor string that was returned to the client as 'next_cursor'
+
+    Returns:
+
+    ExclusiveStartKey dict. None if cursor is empty. Raises ValueError for an invalid cursor.
+
+    """
+    if not cursor:
+        return None
+
+    try:
+        start_key = json.loads(base64.urlsafe_b64decode(cursor.encode()).decode())
+    except Exception:
+        raise ValueError('Invalid cursor')
+
+    if not isinstance(start_key, dict) or not start_key:
+        raise ValueError('Invalid cursor')
+
+    return start_key
@@ -0,0 +1,154 @@
+import os
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from table_registry import get_table, invalidate_table, is_resource_not_found
+
+# Number of DynamoDB scan segments, and number of threads that scan them
+DEFAULT_TOTAL_SEGMENTS = int(os.environ.get('SCAN_TOTAL_SEGMENTS', '4'))
+DEFAULT_MAX_WORKERS = int(os.environ.get('SCAN_MAX_WORKERS', str(DEFAULT_TOTAL_SEGMENTS)))
+
+# Maximum number of scanned pages waiting to be consumed.
+# Segments stop scanning when the consumer is slower, so memory stays bounded.
+MAX_QUEUED_PAGES = 8
+QUEUE_TIMEOUT_IN_SECONDS = 0.1
+
+_SEGMENT_DONE = object()
+
+def parallel_scan(dynamodb, table_name, total_segments=None, max_workers=None, page_size=None, **scan_kwargs):
+    """
+    This function scans a whole DynamoDB table with parallel segmented scans.
+
+    The table is split in total_segments segments (Segment/TotalSegments), which
+    are scanned by a pool of max_workers threads. Each segment follows its
+    LastEvaluatedKey until its end. Items are yielded as soon as a page arrives,
+    so a caller can either stream them or collect them with list().
+
+    Parameters:
+
+    dynamodb: boto3 DynamoDB service resource
+    table_name: Name of the DynamoDB Table
+    total_segments: Number of segments. Default is DEFAULT_TOTAL_SEGMENTS
+    max_workers: Number of threads. Default is DEFAULT_MAX_WORKERS
+    page_size: Optional Limit of items per scan request
+    scan_kwargs: Other Scan parameters (for example ProjectionExpression)
+
+    Returns:
+
+    Generator of items (in no particular order). Raises ValueError if the table is not found.
+
+    """
+    if total_segments is None:
+        total_segments = DEFAULT_TOTAL_SEGMENTS
+    if max_workers is None:
+        max_workers = DEFAULT_MAX_WORKERS
+    total_segments = max(1, total_segments)
+    max_workers = max(1, min(max_workers, total_segments))
+
+    # Validate the table once (see table_registry.py)
+    get_table(dynamodb, table_name)
+
+    # boto3 resources are not thread safe, but clients are. The resource's client
+    # also converts DynamoDB attribute values to Python types, like Table.scan().
+    client = dynamodb.meta.client
+
+    pages = queue.Queue(maxsize=MAX_QUEUED_PAGES)
+    stop = threading.Event()
+
+    def put(value):
+        # Wait for room in the queue, unless the consumer has stopped
+        while not stop.is_set():
+            try:
+                pages.put(value, timeout=QUEUE_TIMEOUT_IN_SECONDS)
+                return
+            except queue.Full:
+                pass
+
+    def scan_segment(segment):
+        try:
+            request = dict(scan_kwargs, TableName=table_name, Segment=segment, TotalSegments=total_segments)
+            if page_size is not None:
+                request['Limit'] = page_size
+
+            while not stop.is_set():
+                response = client.scan(**request)
+                put(response['Items'])
+
+                if 'LastEvaluatedKey' not in response:
+                    break
+                request['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+            put(_SEGMENT_DONE)
+
+        except Exception as error:
+            put(error)
+
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    try:
+        for segment in range(total_segments):
+            executor.submit(scan_segment, segment)
+
+        done_segments = 0
+        while done_segments < total_segments:
+            page = pages.get()
+            if page is _SEGMENT_DONE:
+                done_segments += 1
+            elif isinstance(page, Exception):
+                if is_resource_not_found(page):
+                    # The cached table handle is not valid anymore. Validating it
+                    # again raises ValueError if the table does not exist.
+                    invalidate_table(table_name)
+                    get_table(dynamodb, table_name)
+                raise page
+            else:
+                yield from page
+
+    finally:
+        # Also executed when the caller stops consuming the generator early
+        stop.set()
+        executor.shutdown(wait=True, cancel_futures=True)
+
+def scan_pages(dynamodb, table_name, page_size=None, **scan_kwargs):
+    """
+    This function scans a whole DynamoDB table one page at a time, as a generator.
+
+    Unlike parallel_scan, the next page is only requested when the caller has
+    consumed the current one, so at most one page (1 MB, or page_size items)
+    is held in memory. It is meant for consumers that stream the items
+    (for example to an S3 upload), where memory matters more than speed.
+
+    Parameters:
+
+    dynamodb: boto3 DynamoDB service resource
+    table_name: Name of the DynamoDB Table
+    page_size: Optional Limit of items per scan request
+    scan_kwargs: Other Scan parameters (for example ProjectionExpression)
+
+    Returns:
+
+    Generator of pages (lists of items), in the order of the scan. Raises ValueError if the table is not found.
+
+    """
+    # Validate the table once (see table_registry.py)
+    ddb_table = get_table(dynamodb, table_name)
+
+    request = dict(scan_kwargs)
+    if page_size is not None:
+        request['Limit'] = page_size
+
+    while True:
+        try:
+            response = ddb_table.scan(**request)
+        except Exception as error:
+            if is_resource_not_found(error):
+                # The cached table handle is not valid anymore. Validating it
+                # again raises ValueError if the table does not exist.
+                invalidate_table(table_name)
+                get_table(dynamodb, table_name)
+            raise
+
+        yield response['Items']
+
+        if 'LastEvaluatedKey' not in response:
+            break
+        request['ExclusiveStartKey'] = response['LastEvaluatedKey']
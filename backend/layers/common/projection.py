@@ -0,0 +1,59 @@
+KEY_ATTRIBUTE = 'id'
+
+# Attributes that a client can request with ?fields=..., per route
+PRODUCT_FIELDS = ('id', 'product_name', 'price', 'inventory_count', 'inventory_shards', 'image')
+ORDER_FIELDS = ('id', 'display_code', 'customer_name', 'email', 'phone', 'total_amount', 'ordered_items', 'order_time')
+
+def get_requested_fields(query_parameters, allowed_fields):
+    """
+    This function reads the 'fields' query string parameter (for example ?fields=id,price)
+
+    Parameters:
+
+    query_parameters: API Gateway 'queryStringParameters' (can be None)
+    allowed_fields: Attribute names that this route can return
+
+    Returns:
+
+    List of attribute names, always including the table key. None if all attributes
+    are requested. Raises ValueError for attributes that are not allowed.
+
+    """
+    query_parameters = query_parameters or {}
+
+    if not query_parameters.get('fields'):
+        return None
+
+    fields = [field.strip() for field in query_parameters['fields'].split(',') if field.strip() != '']
+    not_allowed = [field for field in fields if field not in allowed_fields]
+    if not_allowed:
+        raise ValueError(f'fields not allowed: {",".join(not_allowed)}')
+
+    # The key is always returned, so that clients (and batch lookups) can identify items
+    return list(dict.fromkeys([KEY_ATTRIBUTE] + fields))
+
+def build_projection(fields):
+    """
+    This function builds the DynamoDB parameters that read only some attributes.
+
+    Every attribute name is aliased (#p0, #p1, ...), because several attribute
+    names (for example 'name') are DynamoDB reserved words.
+
+    Parameters:
+
+    fields: List of attribute names (see get_requested_fields), or None
+
+    Returns:
+
+    Dict with 'ProjectionExpression' and 'ExpressionAttributeNames'. Empty dict if fields is None.
+
+    """
+    if not fields:
+        return {}
+
+    names = {f'#p{i}': field for i, field in enumerate(fields)}
+
+    return {
+        'ProjectionExpression': ', '.join(names.keys()),
+        'ExpressionAttributeNames': names
+    }
@@ -0,0 +1,106 @@
+import json
+import uuid
+import zlib
+import hashlib
+from decimal import Decimal
+from json_encoding import dumps
+from report_stream import upload_stream
+
+# Datasets of the report tasks are written under this prefix of the reports bucket.
+# They are only needed during an execution: a lifecycle rule deletes them (see ReportsBucket in template.yaml).
+REPORT_DATA_PREFIX = 'report-data/'
+# gzip format for zlib (16 + maximum window size)
+GZIP_WBITS = 31
+
+def get_dataset_key(name):
+    """
+    This function returns a new S3 key for a dataset, so that concurrent
+    report executions do not overwrite the datasets of each other
+
+    Parameters:
+
+    name: Name of the dataset (for example 'orders')
+
+    Returns:
+
+    S3 key. For example report-data/0f8fad5bd9cb469fa16570867728950e/orders.ndjson.gz
+
+    """
+    return f'{REPORT_DATA_PREFIX}{uuid.uuid4().hex}/{name}.ndjson.gz'
+
+def write_dataset(s3, bucket, key, items):
+    """
+    This function writes items to S3 as gzip-compressed NDJSON (one JSON item per line).
+
+    Items are encoded and compressed one at a time and uploaded with upload_stream,
+    so a generator of items (for example a scan) is never held in memory.
+    The pointer that is returned is small enough for any AWS Step Functions
+    payload, whatever the number of items.
+
+    Parameters:
+
+    s3: boto3 S3 client
+    bucket: Name of the S3 bucket
+    key: Key of the S3 object (see get_dataset_key)
+    items: Iterable of items (Decimal numbers are supported, see json_encoding.py)
+
+    Returns:
+
+    Pointer: dict with 'bucket', 'key', 'count' (number of items) and 'sha256' (of the S3 object)
+
+    """
+    count = [0]
+
+    def compressed_lines():
+        compressor = zlib.compressobj(wbits=GZIP_WBITS)
+        for item in items:
+            count[0] += 1
+            chunk = compressor.compress((dumps(item) + '\n').encode())
+            if chunk:
+                yield chunk
+        yield compressor.flush()
+
+    result = upload_stream(s3, bucket, key, compressed_lines(), content_type='application/x-ndjson', cache_control='no-store')
+
+    return {'bucket': bucket, 'key': key, 'count': count[0], 'sha256': result['sha256']}
+
+def read_dataset(s3, pointer):
+    """
+    This function reads the items of a dataset written by write_dataset, as a generator.
+
+    The object is read, decompressed and parsed chunk by chunk. Its checksum and
+    number of items are verified at the end: a ValueError is then raised if they do
+    not match the pointer (for example, if the object was overwritten).
+
+    Parameters:
+
+    s3: boto3 S3 client
+    pointer: Dict returned by write_dataset
+
+    Returns:
+
+    Generator of items (numbers with a fraction are Decimal)
+
+    """
+    response = s3.get_object(Bucket=pointer['bucket'], Key=pointer['key'])
+    decompressor = zlib.decompressobj(wbits=GZIP_WBITS)
+    digest = hashlib.sha256()
+    count = 0
+    pending = b''
+
+    for chunk in response['Body'].iter_chunks():
+        digest.update(chunk)
+        lines = (pending + decompressor.decompress(chunk)).split(b'\n')
+        # The last line is not complete until the next chunk
+        pending = lines.pop()
+        for line in lines:
+            count += 1
+            yield json.loads(line, parse_float=Decimal)
+
+    pending += decompressor.flush()
+    if pending:
+        count += 1
+        yield json.loads(pending, parse_float=Decimal)
+
+    if digest.hexdigest() != pointer['sha256'] or count != pointer['count']:
+        raise ValueError(f'Dataset {pointer["key"]} does not match its pointer')
@@ -0,0 +1,133 @@
+import os
+import html
+import hashlib
+
+# Size of the parts of a multipart upload. S3 requires at least 5 MiB per part (except the last one).
+# The upload buffer holds at most one part, so memory does not grow with the size of a report.
+REPORT_PART_SIZE_IN_BYTES = int(os.environ.get('REPORT_PART_SIZE_IN_BYTES', str(8 * 1024 * 1024)))
+
+# Beginning of the HTML reports (title, style and the header row of the table)
+HTML_HEADER = (
+    '<!DOCTYPE html>'
+    '<html>'
+    '<head>'
+    '<title>{title}</title>'
+    '<style>'
+    'table {{ border-collapse: collapse; width: 100%; }}'
+    'th, td {{ text-align: left; padding: 8px; border-bottom: 1px solid #ddd; }}'
+    'th {{ background-color: #f2f2f2; }}'
+    '</style>'
+    '</head>'
+    '<body>'
+    '<h1>{heading}</h1>'
+    '<table>'
+    '<tr>{columns}</tr>'
+)
+HTML_FOOTER = '</table></body></html>'
+
+def escape(value):
+    """
+    This function escapes a value for an HTML page (for example a product name with '<' or '&')
+
+    Parameters:
+
+    value: Any value (converted with str)
+
+    Returns:
+
+    Escaped string
+
+    """
+    return html.escape(str(value))
+
+def render_header(title, heading, columns):
+    """
+    This function returns the beginning of an HTML report, up to the header row of its table
+
+    Parameters:
+
+    title: Title of the page
+    heading: Heading above the table
+    columns: List of column names
+
+    Returns:
+
+    HTML string
+
+    """
+    return HTML_HEADER.format(
+        title=escape(title),
+        heading=escape(heading),
+        columns=''.join(f'<th>{escape(column)}</th>' for column in columns)
+    )
+
+def render_footer():
+    """
+    This function returns the end of an HTML report (see render_header)
+    """
+    return HTML_FOOTER
+
+def upload_stream(s3, bucket, key, chunks, content_type='text/html', cache_control='max-age=0'):
+    """
+    This function uploads an S3 object from a generator of chunks, without
+    holding the whole object in memory.
+
+    Chunks are buffered until REPORT_PART_SIZE_IN_BYTES, then sent as one part
+    of a multipart upload. An object smaller than one part is sent with a single
+    PutObject instead. If a chunk cannot be produced or a part cannot be sent,
+    the multipart upload is aborted (S3 does not keep the parts) and the error is raised.
+
+    Parameters:
+
+    s3: boto3 S3 client
+    bucket: Name of the S3 bucket
+    key: Key of the S3 object
+    chunks: Iterable of strings (encoded as UTF-8) or bytes
+    content_type: ContentType of the object
+    cache_control: CacheControl of the object
+
+    Returns:
+
+    Dict with 'size' (number of bytes) and 'sha256' (hex digest of the object)
+
+    """
+    buffer = bytearray()
+    digest = hashlib.sha256()
+    size = 0
+    upload_id = None
+    parts = []
+
+    def upload_part():
+        response = s3.upload_part(Bucket=bucket, Key=key, UploadId=upload_id,
+                                  PartNumber=len(parts) + 1, Body=bytes(buffer))
+        parts.append({'PartNumber': len(parts) + 1, 'ETag': response['ETag']})
+        buffer.clear()
+
+    try:
+        for chunk in chunks:
+            if isinstance(chunk, str):
+                chunk = chunk.encode()
+            buffer += chunk
+            digest.update(chunk)
+            size += len(chunk)
+
+            if len(buffer) >= REPORT_PART_SIZE_IN_BYTES:
+                if upload_id is None:
+                    upload_id = s3.create_multipart_upload(Bucket=bucket, Key=key, ContentType=content_type,
+                                                           CacheControl=cache_control)['UploadId']
+                upload_part()
+
+        if upload_id is None:
+            # Smaller than one part: one request is enough
+            s3.put_object(Bucket=bucket, Key=key, Body=bytes(buffer), ContentType=content_type, CacheControl=cache_control)
+        else:
+            if buffer:
+                upload_part()
+            s3.complete_multipart_upload(Bucket=bucket, Key=key, UploadId=upload_id, MultipartUpload={'Parts': parts})
+
+    except Exception:
+        if upload_id is not None:
+            s3.abort_multipart_upload(Bucket=bucket, Key=key, UploadId=upload_id)
+        raise
+
+    return {'size': size, 'sha256': digest.hexdigest()}
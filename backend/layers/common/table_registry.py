@@ -0,0 +1,118 @@
+import os
+import time
+from botocore.exceptions import ClientError
+
+# How long (in seconds) a validated table handle is trusted before DescribeTable is called again
+TABLE_VALIDATION_TTL_IN_SECONDS = int(os.environ.get('TABLE_VALIDATION_TTL_IN_SECONDS', '300'))
+
+# Table handles of this Lambda container (execution environment).
+# Module-level variables survive between invocations of a warm container,
+# so DescribeTable is called once per container (and TTL), not once per request.
+# Key: table name. Value: {'dynamodb': resource, 'table': Table, 'validated_at': time}
+_tables = {}
+
+def is_resource_not_found(error):
+    """
+    This function checks whether an exception is DynamoDB's ResourceNotFoundException
+
+    Parameters:
+
+    error: Exception raised by boto3
+
+    Returns:
+
+    True if the table (or index) does not exist. Otherwise, False
+
+    """
+    return isinstance(error, ClientError) and error.response.get('Error', {}).get('Code') == 'ResourceNotFoundException'
+
+def invalidate_table(table_name):
+    """
+    This function removes a table handle, so that the next get_table() validates the table again
+
+    Parameters:
+
+    table_name: Name of the DynamoDB Table
+
+    """
+    _tables.pop(table_name, None)
+
+def get_table(dynamodb, table_name, ttl_in_seconds=None):
+    """
+    This function returns a validated DynamoDB Table resource.
+
+    The table is validated (DescribeTable) the first time it is requested in
+    this container, and again only after ttl_in_seconds or after invalidate_table().
+
+    Parameters:
+
+    dynamodb: boto3 DynamoDB service resource
+    table_name: Name of the DynamoDB Table
+    ttl_in_seconds: Validation TTL. Default is TABLE_VALIDATION_TTL_IN_SECONDS
+
+    Returns:
+
+    Table resource. Raises ValueError if the table is not found.
+
+    """
+    if ttl_in_seconds is None:
+        ttl_in_seconds = TABLE_VALIDATION_TTL_IN_SECONDS
+
+    entry = _tables.get(table_name)
+    now = time.monotonic()
+
+    if entry is not None and entry['dynamodb'] is dynamodb and now - entry['validated_at'] < ttl_in_seconds:
+        return entry['table']
+
+    # From Boto3 documentation:
+    # Instantiate a table resource object without actually creating a DynamoDB table.
+    ddb_table = dynamodb.Table(table_name)
+    try:
+        # Boto3 documenation: the attributes (such as table_status) are lazy-loaded,
+        # which means that these are not fetched immediately when the object is created.
+        # So, once I call ddb_table.table_status, its value will be fetched (DescribeTable).
+        table_status = ddb_table.table_status
+    except ClientError as error:
+        invalidate_table(table_name)
+        if is_resource_not_found(error):
+            raise ValueError(f'Table: {table_name} not found')
+        raise
+
+    if 'not found' in table_status:
+        invalidate_table(table_name)
+        raise ValueError(f'Table: {table_name} not found')
+
+    _tables[table_name] = {'dynamodb': dynamodb, 'table': ddb_table, 'validated_at': now}
+
+    return ddb_table
+
+def run_table_operation(dynamodb, table_name, operation):
+    """
+    This function runs a DynamoDB data-plane operation with a cached table handle.
+
+    If DynamoDB answers ResourceNotFoundException (for example, the table was
+    deleted or re-created since it was validated), the handle is validated
+    again and the operation is retried once.
+
+    Parameters:
+
+    dynamodb: boto3 DynamoDB service resource
+    table_name: Name of the DynamoDB Table
+    operation: Function that receives the Table resource and calls DynamoDB
+
+    Returns:
+
+    Whatever operation returns. Raises ValueError if the table is not found.
+
+    """
+    ddb_table = get_table(dynamodb, table_name)
+    try:
+        return operation(ddb_table)
+    except ClientError as error:
+        if not is_resource_not_found(error):
+            raise
+        print(f'Table {table_name} not found with the cached handle. Validating it again.')
+        invalidate_table(table_name)
+
+    ddb_table = get_table(dynamodb, table_name)
+    return operation(ddb_table)
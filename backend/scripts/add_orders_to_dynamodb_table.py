@@ -16,12 +16,19 @@ try:
     dynamodb = boto3.resource('dynamodb',  region_name=aws_region)
 
     table = dynamodb.Table('Orders')
+    # Days that have orders, listed by GET /orders (see layers/common/order_days.py)
+    order_days_table = dynamodb.Table('OrderDays')
 
     with open('orders.json') as json_file:
         orders_list = json.load(json_file)
     
     # Add to the table all items from the json file
     for order in orders_list:
+        # Partition key of the OrderTimeIndex (see template.yaml)
+        order.setdefault('order_day', order['order_time'][:10])
+        # Partition key of the CustomerEmailIndex (see template.yaml)
+        order.setdefault('email_key', order['email'].strip().lower())
+        order_days_table.put_item(Item={'calendar': 'orders', 'order_day': order['order_day']})
         table.put_item(Item=order)
 
 except (Exception, ValueError) as error:
@@ -22,6 +22,9 @@ try:
     
     # Add to the table all items from the json file
     for product in products_list:
+        # inventory_count is stored as a Number, so that update_inventory can decrement it
+        # with a conditional update (see backfill_inventory_count.py for existing products)
+        product['inventory_count'] = int(product['inventory_count'])
         table.put_item(Item=product)
 
 except (Exception, ValueError) as error:
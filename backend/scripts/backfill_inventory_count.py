@@ -0,0 +1,72 @@
+import boto3
+from botocore.exceptions import ClientError
+
+# Products that were added before inventory_count was stored as a Number
+# (for example by an older add_products_to_dynamodb_table.py) have a String
+# inventory_count, such as "100". The conditional decrement in update_inventory
+# (inventory_count >= :quantity) fails for these products.
+# This script converts inventory_count of these products to a Number.
+
+try:
+
+    # Create a session
+    session = boto3.session.Session()
+
+    # Get the current AWS region. AWS region was set when
+    # I ran 'aws configure' to setup my local environemnt.
+    aws_region = session.region_name
+    if aws_region is None:
+        raise ValueError('Invalid AWS region')
+    print(f'aws_region: {aws_region}')
+    
+    dynamodb = boto3.resource('dynamodb',  region_name=aws_region)
+
+    table = dynamodb.Table('Products')
+
+    updated = 0
+    skipped = 0
+    scan_kwargs = {
+        'ProjectionExpression': 'id, inventory_count'
+    }
+
+    # Follow all pages of the scan
+    while True:
+        response = table.scan(**scan_kwargs)
+
+        for product in response['Items']:
+            if not isinstance(product.get('inventory_count'), str):
+                skipped += 1
+                continue
+
+            try:
+                table.update_item(
+                    Key={'id': product['id']},
+                    UpdateExpression='SET inventory_count = :new_count',
+                    # Do not overwrite an inventory_count that changed since the scan
+                    ConditionExpression='inventory_count = :old_count',
+                    ExpressionAttributeValues={
+                        ':new_count': int(product['inventory_count']),
+                        ':old_count': product['inventory_count']
+                    }
+                )
+                updated += 1
+            except ClientError as error:
+                if error.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                    raise
+                skipped += 1
+
+        if 'LastEvaluatedKey' not in response:
+            break
+        scan_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+except (Exception, ValueError) as error:
+    print(f'Exception error: backfill_inventory_count : {error}')
+
+else:
+    # If no errors are detected, continue to execute the following:
+    print(f'else block: backfill_inventory_count :')
+    print(f'Products updated: {updated}. Products skipped: {skipped}.')
+
+finally:
+    # Execute the following code whether or not an exception has been raised:
+    print(f'finally block: backfill_inventory_count :')
@@ -0,0 +1,88 @@
+import boto3
+from botocore.exceptions import ClientError
+
+# Orders that were added before the OrderTimeIndex and CustomerEmailIndex existed
+# (for example by add_orders_to_dynamodb_table.py) do not have the 'order_day' and
+# 'email_key' attributes, so they are not listed by GET /orders?from=...&to=...
+# and GET /orders?email=...
+# This script adds the missing attributes to these orders:
+# 'order_day' (YYYY-MM-DD, from 'order_time') and 'email_key' (lower case 'email').
+# It also records the days of all orders in the OrderDays table: GET /orders only
+# queries the days that are in this table (see layers/common/order_days.py).
+
+try:
+
+    # Create a session
+    session = boto3.session.Session()
+
+    # Get the current AWS region. AWS region was set when
+    # I ran 'aws configure' to setup my local environemnt.
+    aws_region = session.region_name
+    if aws_region is None:
+        raise ValueError('Invalid AWS region')
+    print(f'aws_region: {aws_region}')
+    
+    dynamodb = boto3.resource('dynamodb',  region_name=aws_region)
+
+    table = dynamodb.Table('Orders')
+    order_days_table = dynamodb.Table('OrderDays')
+
+    order_days = set()
+    updated = 0
+    skipped = 0
+    scan_kwargs = {
+        'ProjectionExpression': 'id, order_time, order_day, email, email_key'
+    }
+
+    # Follow all pages of the scan
+    while True:
+        response = table.scan(**scan_kwargs)
+
+        for order in response['Items']:
+            if 'order_time' in order:
+                order_days.add(order['order_time'][:10])
+
+            missing = {}
+            if 'order_day' not in order and 'order_time' in order:
+                missing['order_day'] = order['order_time'][:10]
+            if 'email_key' not in order and 'email' in order:
+                missing['email_key'] = order['email'].strip().lower()
+
+            if not missing:
+                skipped += 1
+                continue
+
+            try:
+                table.update_item(
+                    Key={'id': order['id']},
+                    UpdateExpression='SET ' + ', '.join(f'{name} = :{name}' for name in missing),
+                    # Do not overwrite attributes written since the scan
+                    ConditionExpression=' AND '.join(['attribute_exists(id)'] + [f'attribute_not_exists({name})' for name in missing]),
+                    ExpressionAttributeValues={f':{name}': value for name, value in missing.items()}
+                )
+                updated += 1
+            except ClientError as error:
+                if error.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                    raise
+                skipped += 1
+
+        if 'LastEvaluatedKey' not in response:
+            break
+        scan_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+    # One item per day (writing a day again is harmless)
+    with order_days_table.batch_writer() as batch:
+        for order_day in sorted(order_days):
+            batch.put_item(Item={'calendar': 'orders', 'order_day': order_day})
+
+except (Exception, ValueError) as error:
+    print(f'Exception error: backfill_order_keys : {error}')
+
+else:
+    # If no errors are detected, continue to execute the following:
+    print(f'else block: backfill_order_keys :')
+    print(f'Orders updated: {updated}. Orders skipped: {skipped}. Days recorded: {len(order_days)}.')
+
+finally:
+    # Execute the following code whether or not an exception has been raised:
+    print(f'finally block: backfill_order_keys :')
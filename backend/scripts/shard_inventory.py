@@ -0,0 +1,81 @@
+import sys
+import boto3
+
+# During promotions, every order of a hot product updates the same item of the
+# Products table, so the write throughput of that product is limited to one partition.
+# This script moves the stock of a product to several shard items of the
+# InventoryShards table (see layers/common/inventory_shards.py). Orders then
+# decrement a random shard, and reads add up the stock of all shards.
+#
+# Usage: python shard_inventory.py <product id> <number of shards>
+#
+# AWS Lambda containers keep the number of shards of a product for
+# SHARD_LAYOUT_TTL_IN_SECONDS (default 60 seconds): during that time, orders
+# of this product can fail because its stock in the Products table is 0.
+
+MAX_SHARDS = 99 # The product and its shards are updated with one TransactWriteItems (at most 100 items)
+
+try:
+
+    if len(sys.argv) != 3:
+        raise ValueError('Usage: python shard_inventory.py <product id> <number of shards>')
+
+    product_id = sys.argv[1]
+    shards = int(sys.argv[2])
+    if shards < 2 or shards > MAX_SHARDS:
+        raise ValueError(f'The number of shards must be between 2 and {MAX_SHARDS}')
+
+    # Create a session
+    session = boto3.session.Session()
+
+    # Get the current AWS region. AWS region was set when
+    # I ran 'aws configure' to setup my local environemnt.
+    aws_region = session.region_name
+    if aws_region is None:
+        raise ValueError('Invalid AWS region')
+    print(f'aws_region: {aws_region}')
+    
+    dynamodb = boto3.resource('dynamodb',  region_name=aws_region)
+
+    product = dynamodb.Table('Products').get_item(Key={'id': product_id}, ConsistentRead=True).get('Item')
+    if product is None:
+        raise ValueError(f'Product {product_id} not found')
+    if 'inventory_shards' in product:
+        raise ValueError(f'Product {product_id} is already sharded')
+
+    # The first shards get the remainder
+    inventory_count = int(product['inventory_count'])
+    counts = [inventory_count // shards + (1 if shard < inventory_count % shards else 0) for shard in range(shards)]
+
+    transact_items = [{
+        'Update': {
+            'TableName': 'Products',
+            'Key': {'id': product_id},
+            'UpdateExpression': 'SET inventory_shards = :shards, inventory_count = :zero',
+            # Do not lose an order that was placed since the read
+            'ConditionExpression': 'inventory_count = :inventory_count AND attribute_not_exists(inventory_shards)',
+            'ExpressionAttributeValues': {':shards': shards, ':zero': 0, ':inventory_count': inventory_count}
+        }
+    }]
+    for shard, count in enumerate(counts):
+        transact_items.append({
+            'Put': {
+                'TableName': 'InventoryShards',
+                'Item': {'id': f'{product_id}#{shard}', 'inventory_count': count}
+            }
+        })
+
+    # The resource's client converts Python types to DynamoDB attribute values.
+    dynamodb.meta.client.transact_write_items(TransactItems=transact_items)
+
+except (Exception, ValueError) as error:
+    print(f'Exception error: shard_inventory : {error}')
+
+else:
+    # If no errors are detected, continue to execute the following:
+    print(f'else block: shard_inventory :')
+    print(f'Product {product_id}: {inventory_count} moved to {shards} shards: {counts}')
+
+finally:
+    # Execute the following code whether or not an exception has been raised:
+    print(f'finally block: shard_inventory :')
@@ -0,0 +1,80 @@
+import unittest
+from unittest.mock import patch, Mock
+import boto3
+from moto import mock_aws
+import os
+import sys
+
+# Append the path of the shared Lambda layer, in order to import from layers/common/
+layer_path_to_add = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'layers', 'common'))
+sys.path.append(layer_path_to_add)
+
+class TestBatchGet(unittest.TestCase):
+
+    def setUp(self):
+
+        import batch_get
+
+        self.batch_get = batch_get  # Store it in an instance variable
+
+    @mock_aws
+    def test_batch_get_items(self):
+        print(f'***************************************************')
+        print(f'Unit Test: {self.__class__.__name__} : {self._testMethodName} :')
+        print(f'***************************************************')
+
+        dynamodb = boto3.resource('dynamodb', region_name='us-east-1')
+        dynamodb.create_table(
+            TableName='test_table',
+            KeySchema=[{'AttributeName': 'id', 'KeyType': 'HASH'}],
+            AttributeDefinitions=[{'AttributeName': 'id', 'AttributeType': 'S'}],
+            ProvisionedThroughput={'ReadCapacityUnits': 1, 'WriteCapacityUnits': 1}
+        )
+        with dynamodb.Table('test_table').batch_writer() as batch:
+            for i in range(150):
+                batch.put_item(Item={'id': str(i), 'name': f'Product {i}', 'price': '10.00'})
+
+        # More than 100 ids (and duplicates) are read in several BatchGetItem requests
+        items = self.batch_get.batch_get_items(dynamodb, 'test_table', [str(i) for i in range(160)] + ['1'], 'id, price')
+        self.assertEqual(len(items), 150)
+        self.assertEqual(items['1'], {'id': '1', 'price': '10.00'})
+
+        # Parameters of build_projection (see layers/common/projection.py)
+        from projection import build_projection
+        items = self.batch_get.batch_get_items(dynamodb, 'test_table', ['1'], build_projection(['id', 'name']))
+        self.assertEqual(items, {'1': {'id': '1', 'name': 'Product 1'}})
+
+    @patch('batch_get.time.sleep')
+    def test_batch_get_items_unprocessed_keys(self, mock_sleep):
+        print(f'***************************************************')
+        print(f'Unit Test: {self.__class__.__name__} : {self._testMethodName} :')
+        print(f'***************************************************')
+
+        throttled = {'Responses': {'test_table': []}, 'UnprocessedKeys': {'test_table': {'Keys': [{'id': '1'}]}}}
+
+        with patch.object(self.batch_get.random, 'uniform', return_value=0.01) as mock_uniform:
+            dynamodb = Mock()
+            dynamodb.batch_get_item.side_effect = [throttled, {'Responses': {'test_table': [{'id': '1'}]}}]
+            self.assertEqual(self.batch_get.batch_get_items(dynamodb, 'test_table', ['1']), {'1': {'id': '1'}})
+            # Full jitter: a random delay up to the exponential backoff
+            mock_uniform.assert_called_once_with(0, self.batch_get.BATCH_RETRY_BASE_DELAY_IN_SECONDS)
+            mock_sleep.assert_called_once_with(0.01)
+
+        # Keys that are still unprocessed after MAX_BATCH_RETRIES raise an error
+        dynamodb.batch_get_item.side_effect = [throttled] * (self.batch_get.MAX_BATCH_RETRIES + 1)
+        with self.assertRaises(ValueError):
+            self.batch_get.batch_get_items(dynamodb, 'test_table', ['1'])
+
+if __name__ == '__main__':
+
+    os.environ['AWS_ACCESS_KEY_ID'] = 'testing'
+    os.environ['AWS_SECRET_ACCESS_KEY'] = 'testing'
+    os.environ['AWS_SECURITY_TOKEN'] = 'testing'
+    os.environ['AWS_SESSION_TOKEN'] = 'testing'
+    os.environ['AWS_DEFAULT_REGION'] = 'us-east-1'
+
+    unittest.main()
+
+    # Remove the same path from sys.path when finished testing
+    if layer_path_to_add in sys.path:
+        sys.path.remove(layer_path_to_add)
@@ -0,0 +1,114 @@
+import unittest
+from unittest.mock import patch
+import boto3
+from decimal import Decimal
+from moto import mock_aws
+import os
+import sys
+
+# Append the path of the shared Lambda layer, in order to import from layers/common/
+layer_path_to_add = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'layers', 'common'))
+sys.path.append(layer_path_to_add)
+
+class TestCatalogPrices(unittest.TestCase):
+
+    def setUp(self):
+
+        import catalog_prices
+
+        self.catalog_prices = catalog_prices  # Store it in an instance variable
+        catalog_prices.invalidate_prices()
+
+    def create_table(self, products):
+        dynamodb = boto3.resource('dynamodb', region_name='us-east-1')
+        dynamodb.create_table(
+            TableName='test_products_table',
+            KeySchema=[{'AttributeName': 'id', 'KeyType': 'HASH'}],
+            AttributeDefinitions=[{'AttributeName': 'id', 'AttributeType': 'S'}],
+            ProvisionedThroughput={'ReadCapacityUnits': 1, 'WriteCapacityUnits': 1}
+        )
+
+        for product_id in range(1, products + 1):
+            dynamodb.Table('test_products_table').put_item(Item={
+                'id': str(product_id),
+                'product_name': f'Product {product_id}',
+                'price': '2.5' if product_id % 2 else '3',
+                'inventory_count': 10
+            })
+
+        return dynamodb
+
+    def make_order(self, quantities, prices):
+        return {
+            'customerproduct': {
+                'productsToSubmit': [
+                    {'id': product_id, 'name': f'Product {product_id}', 'quantity': quantity, 'price': price}
+                    for (product_id, quantity), price in zip(quantities, prices)
+                ]
+            }
+        }
+
+    @mock_aws
+    def test_get_catalog_prices_one_round_trip(self):
+        print(f'***************************************************')
+        print(f'Unit Test: {self.__class__.__name__} : {self._testMethodName} :')
+        print(f'***************************************************')
+
+        dynamodb = self.create_table(50)
+        product_ids = [str(product_id) for product_id in range(1, 51)] + ['51']
+
+        # A 50-item cart is priced with one BatchGetItem
+        with patch.object(dynamodb, 'batch_get_item', wraps=dynamodb.batch_get_item) as mock_batch_get_item:
+            prices = self.catalog_prices.get_catalog_prices(dynamodb, 'test_products_table', product_ids)
+            self.assertEqual(mock_batch_get_item.call_count, 1)
+
+        self.assertEqual(len(prices), 50)  # Product 51 does not exist
+        self.assertEqual(prices['1'], {'price': Decimal('2.50'), 'product_name': 'Product 1'})
+        self.assertEqual(prices['2']['price'], Decimal('3.00'))
+
+        # Prices are kept by the container
+        with patch.object(dynamodb, 'batch_get_item') as mock_batch_get_item:
+            self.assertEqual(self.catalog_prices.get_catalog_prices(dynamodb, 'test_products_table', ['1', '2']), {key: prices[key] for key in ('1', '2')})
+            mock_batch_get_item.assert_not_called()
+
+    def test_price_order(self):
+        print(f'***************************************************')
+        print(f'Unit Test: {self.__class__.__name__} : {self._testMethodName} :')
+        print(f'***************************************************')
+
+        prices = {
+            '1': {'price': Decimal('0.10'), 'product_name': 'Product 1'},
+            '2': {'price': Decimal('0.20'), 'product_name': 'Product 2'}
+        }
+
+        # 3 * 0.10 + 0.20 is 0.50 exactly (with float, 0.1 * 3 is 0.30000000000000004)
+        ordered_items, total_amount = self.catalog_prices.price_order(self.make_order([(1, 3), (2, 1)], ['0.1', '0.2']), prices)
+        self.assertEqual(total_amount, Decimal('0.50'))
+        self.assertEqual([item['amount'] for item in ordered_items], ['0.30', '0.20'])
+
+        # The total sent by the client is checked instead of its prices
+        received_order = self.make_order([(1, 3)], ['0.01'])
+        received_order['total_amount'] = '0.30'
+        self.assertEqual(self.catalog_prices.price_order(received_order, prices)[1], Decimal('0.30'))
+
+        # Drifted total
+        with self.assertRaises(ValueError):
+            self.catalog_prices.price_order(self.make_order([(1, 3)], ['0.09']), prices)
+
+        # Without client prices, the order is priced with the catalog only
+        received_order = self.make_order([(2, 2)], [None])
+        self.assertEqual(self.catalog_prices.price_order(received_order, prices)[1], Decimal('0.40'))
+
+if __name__ == '__main__':
+
+    os.environ['AWS_ACCESS_KEY_ID'] = 'testing'
+    os.environ['AWS_SECRET_ACCESS_KEY'] = 'testing'
+    os.environ['AWS_SECURITY_TOKEN'] = 'testing'
+    os.environ['AWS_SESSION_TOKEN'] = 'testing'
+    os.environ['AWS_DEFAULT_REGION'] = 'us-east-1'
+
+    unittest.main()
+
+    # Remove the same path from sys.path when finished testing
+    if layer_path_to_add in sys.path:
+        sys.path.remove(layer_path_to_add)
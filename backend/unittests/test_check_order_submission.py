@@ -9,18 +9,29 @@ from moto import mock_aws
 path_to_add = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
 sys.path.append(path_to_add)
 
+# Append the path of the shared Lambda layer, in order to import from layers/common/
+layer_path_to_add = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'layers', 'common'))
+sys.path.append(layer_path_to_add)
+
 class TestCheckOrderSubmission(unittest.TestCase):
 
     def setUp(self):
 
+        os.environ['AWS_REGION'] = 'us-east-1'
         os.environ['FRONTEND_URL'] = 'test_frontend_url'
         
         # Import after patching env variables
         from handlers.check_order_submission.check_order_submission import check_submission_status
         from handlers.check_order_submission.check_order_submission import client
+        from execution_cache import invalidate_executions
+        from handlers.check_order_submission.check_order_submission import lambda_handler
 
         self.check_order_submission = check_submission_status  # Store it in an instance variable
+        self.lambda_handler = lambda_handler
+        from handlers.check_order_submission.check_order_submission import batch_status_handler
+        self.batch_status_handler = batch_status_handler
         self.client = client
+        invalidate_executions()
 
     def tearDown(self):
         os.environ.pop('FRONTEND_URL', None)        
@@ -111,6 +122,105 @@ class TestCheckOrderSubmission(unittest.TestCase):
         self.assertTrue('error' in valerror)
         self.assertEqual(str(valerror['error']), "Invalid input")
 
+    @patch('execution_wait.time.sleep')
+    @patch('handlers.check_order_submission.check_order_submission.client.describe_execution')
+    def test_check_order_submission_long_poll(self, mock_describe_execution, mock_sleep):
+        print(f'***************************************************')
+        print(f'Unit Test: {self.__class__.__name__} : {self._testMethodName} :')
+        print(f'***************************************************')
+
+        executionArn = 'arn:aws:states:region:123456789012:execution:stateMachineName:executionId'
+        event = {'pathParameters': {'executionArn': executionArn}, 'queryStringParameters': {'wait': '20'}}
+        context = Mock()
+        context.get_remaining_time_in_millis.return_value = 25000
+
+        # The execution ends during the third check. Its output is then read once.
+        mock_describe_execution.side_effect = [{'status': 'RUNNING'}, {'status': 'RUNNING'}, {'status': 'SUCCEEDED'},
+                                               {'status': 'SUCCEEDED', 'output': '{}'}]
+
+        response = self.lambda_handler(event, context)
+
+        self.assertEqual(response['statusCode'], 200)
+        self.assertEqual(json.loads(response['body']), {'status': 'SUCCEEDED'})
+        self.assertEqual(mock_describe_execution.call_count, 4)
+        # Exponential backoff between the checks
+        self.assertEqual([call.args[0] for call in mock_sleep.call_args_list], [0.25, 0.5])
+
+        # Without wait, the status is checked once
+        mock_describe_execution.side_effect = None
+        mock_describe_execution.return_value = {'status': 'RUNNING'}
+        mock_describe_execution.reset_mock()
+        response = self.lambda_handler({'pathParameters': {'executionArn': executionArn + '2'}}, context)
+
+        self.assertEqual(json.loads(response['body']), {'status': 'RUNNING'})
+        self.assertEqual(mock_describe_execution.call_count, 1)
+
+    @patch('handlers.check_order_submission.check_order_submission.client.describe_execution')
+    def test_check_order_submission_long_poll_deadline(self, mock_describe_execution):
+        print(f'***************************************************')
+        print(f'Unit Test: {self.__class__.__name__} : {self._testMethodName} :')
+        print(f'***************************************************')
+
+        executionArn = 'arn:aws:states:region:123456789012:execution:stateMachineName:executionId'
+        mock_describe_execution.return_value = {'status': 'RUNNING'}
+
+        # The remaining time of the function (1.3 seconds, minus 1 second to respond) ends the wait
+        context = Mock()
+        context.get_remaining_time_in_millis.return_value = 1300
+        event = {'pathParameters': {'executionArn': executionArn}, 'queryStringParameters': {'wait': '20'}}
+        response = self.lambda_handler(event, context)
+
+        self.assertEqual(json.loads(response['body']), {'status': 'RUNNING'})
+        self.assertLessEqual(mock_describe_execution.call_count, 3)
+
+        # Invalid wait
+        event['queryStringParameters']['wait'] = 'soon'
+        response = self.lambda_handler(event, context)
+        self.assertEqual(response['statusCode'], 400)
+
+    @patch('handlers.check_order_submission.check_order_submission.client.describe_execution')
+    def test_batch_status_handler(self, mock_describe_execution):
+        print(f'***************************************************')
+        print(f'Unit Test: {self.__class__.__name__} : {self._testMethodName} :')
+        print(f'***************************************************')
+
+        arn_prefix = 'arn:aws:states:region:123456789012:execution:stateMachineName:'
+        arns = [arn_prefix + str(number) for number in range(99)] + [arn_prefix + '0']
+
+        def describe_execution(executionArn, includedData):
+            # Execution 7 does not exist. Even executions are finished.
+            if executionArn.endswith(':7'):
+                raise Exception('Execution does not exist')
+            number = int(executionArn.rsplit(':', 1)[1])
+            return {'status': 'RUNNING' if number % 2 else 'SUCCEEDED'}
+
+        mock_describe_execution.side_effect = describe_execution
+
+        response = self.batch_status_handler({'body': json.dumps({'executionArns': arns})}, None)
+
+        self.assertEqual(response['statusCode'], 200)
+        statuses = json.loads(response['body'])['statuses']
+        # One result per ARN, in the order of the request
+        self.assertEqual([status['executionArn'] for status in statuses], arns)
+        self.assertEqual(statuses[0], {'executionArn': arn_prefix + '0', 'status': 'SUCCEEDED'})
+        self.assertEqual(statuses[1], {'executionArn': arn_prefix + '1', 'status': 'RUNNING'})
+        self.assertEqual(statuses[7], {'executionArn': arn_prefix + '7', 'error': 'Execution does not exist'})
+        self.assertEqual(statuses[99], statuses[0])
+
+        # The duplicate ARN is described once: 48 running, 50 finished (described twice), 1 error
+        self.assertEqual(mock_describe_execution.call_count, 48 + 50 * 2 + 1)
+
+    @patch('handlers.check_order_submission.check_order_submission.MAX_STATUS_EXECUTIONS', 2)
+    def test_batch_status_handler_invalid_body(self):
+        print(f'***************************************************')
+        print(f'Unit Test: {self.__class__.__name__} : {self._testMethodName} :')
+        print(f'***************************************************')
+
+        for body in ('not json', json.dumps({'executionArns': []}), json.dumps({'executionArns': ['a', 'b', 'c']}), json.dumps({'executionArns': [1]})):
+            response = self.batch_status_handler({'body': body}, None)
+            self.assertEqual(response['statusCode'], 400)
+            self.assertIn('error', json.loads(response['body']))
+
 if __name__ == '__main__':
     os.environ['AWS_ACCESS_KEY_ID'] = 'testing'
     os.environ['AWS_SECRET_ACCESS_KEY'] = 'testing'
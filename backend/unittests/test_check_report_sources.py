@@ -0,0 +1,123 @@
+import unittest
+from unittest.mock import patch
+import os
+import sys
+import time
+from moto import mock_aws
+
+# Append the path to sys.path, in order to import from DocumentLambdaFunction/
+path_to_add = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(path_to_add)
+
+# Append the path of the shared Lambda layer, in order to import from layers/common/
+layer_path_to_add = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'layers', 'common'))
+sys.path.append(layer_path_to_add)
+
+ORDERS_STREAM_ARN = 'arn:aws:dynamodb:us-east-1:123456789012:table/test_orders_table/stream/2025-04-02T12:00:00.000'
+PRODUCTS_STREAM_ARN = 'arn:aws:dynamodb:us-east-1:123456789012:table/test_products_table/stream/2025-04-02T12:00:00.000'
+
+class TestCheckReportSources(unittest.TestCase):
+
+    def setUp(self):
+
+        os.environ['AWS_REGION'] = 'us-east-1'
+        os.environ['REPORT_SOURCES_TABLE'] = 'test_table'
+        os.environ['ORDERS_TABLE'] = 'test_orders_table'
+
+        # Import after patching env variables
+        from handlers.check_report_sources.check_report_sources import lambda_handler, save_report_sources_handler
+        from handlers.check_report_sources.check_report_sources import count_writes_handler, dynamodb
+        from table_registry import invalidate_table
+
+        self.lambda_handler = lambda_handler  # Store it in an instance variable
+        self.save_report_sources_handler = save_report_sources_handler
+        self.count_writes_handler = count_writes_handler
+        self.dynamodb = dynamodb
+        invalidate_table('test_table')
+
+    def tearDown(self):
+        os.environ.pop('REPORT_SOURCES_TABLE', None)
+        os.environ.pop('ORDERS_TABLE', None)
+
+    def create_table(self):
+        from moto.core import patch_client, patch_resource
+        patch_resource(self.dynamodb)
+
+        self.dynamodb.create_table(
+            TableName='test_table',
+            KeySchema=[{'AttributeName': 'source', 'KeyType': 'HASH'}],
+            AttributeDefinitions=[{'AttributeName': 'source', 'AttributeType': 'S'}],
+            ProvisionedThroughput={'ReadCapacityUnits': 1, 'WriteCapacityUnits': 1}
+        )
+
+    @patch('handlers.check_report_sources.check_report_sources.ddb_report_sources_table_name', 'test_table')
+    @patch('handlers.check_report_sources.check_report_sources.ddb_orders_table_name', 'test_orders_table')
+    @mock_aws
+    def test_report_sources_unchanged(self):
+        print(f'***************************************************')
+        print(f'Unit Test: {self.__class__.__name__} : {self._testMethodName} :')
+        print(f'***************************************************')
+
+        self.create_table()
+
+        # No report yet
+        result = self.lambda_handler({}, None)
+        self.assertEqual(result, {'unchanged': False, 'versions': {'orders': 0, 'products': 0}})
+
+        # Writes to the source tables, from their streams
+        records = [{'eventSourceARN': ORDERS_STREAM_ARN}] * 2 + [{'eventSourceARN': PRODUCTS_STREAM_ARN}] * 3
+        self.assertEqual(self.count_writes_handler({'Records': records}, None), {'writes': {'orders': 2, 'products': 3}})
+
+        result = self.lambda_handler({}, None)
+        self.assertEqual(result, {'unchanged': False, 'versions': {'orders': 2, 'products': 3}})
+
+        # The reports were generated: the next execution reuses them
+        self.assertTrue(self.save_report_sources_handler(result, None))
+        self.assertEqual(self.lambda_handler({}, None), {'unchanged': True, 'versions': {'orders': 2, 'products': 3}})
+
+        # A new order: the reports are generated again
+        self.count_writes_handler({'Records': [{'eventSourceARN': ORDERS_STREAM_ARN}]}, None)
+        self.assertEqual(self.lambda_handler({}, None), {'unchanged': False, 'versions': {'orders': 3, 'products': 3}})
+
+    @patch('handlers.check_report_sources.check_report_sources.ddb_report_sources_table_name', 'test_table')
+    @mock_aws
+    def test_report_sources_expired_links(self):
+        print(f'***************************************************')
+        print(f'Unit Test: {self.__class__.__name__} : {self._testMethodName} :')
+        print(f'***************************************************')
+
+        self.create_table()
+        self.dynamodb.Table('test_table').put_item(Item={
+            'source': 'last_report', 'orders': 0, 'products': 0, 'generated_at': int(time.time()) - 3600
+        })
+
+        # The links of the index page of the last report are about to expire
+        self.assertFalse(self.lambda_handler({}, None)['unchanged'])
+
+    @patch('handlers.check_report_sources.check_report_sources.ddb_report_sources_table_name', 'test_table')
+    @mock_aws
+    def test_report_sources_error(self):
+        print(f'***************************************************')
+        print(f'Unit Test: {self.__class__.__name__} : {self._testMethodName} :')
+        print(f'***************************************************')
+
+        from moto.core import patch_client, patch_resource
+        patch_resource(self.dynamodb)
+
+        # No table: the reports are generated, and nothing is saved
+        self.assertEqual(self.lambda_handler({}, None), {'unchanged': False, 'versions': None})
+        self.assertFalse(self.save_report_sources_handler({'unchanged': False, 'versions': None}, None))
+
+if __name__ == '__main__':
+    os.environ['AWS_ACCESS_KEY_ID'] = 'testing'
+    os.environ['AWS_SECRET_ACCESS_KEY'] = 'testing'
+    os.environ['AWS_SECURITY_TOKEN'] = 'testing'
+    os.environ['AWS_SESSION_TOKEN'] = 'testing'
+    os.environ['AWS_DEFAULT_REGION'] = 'us-east-1'
+    os.environ['AWS_REGION'] = 'us-east-1'
+
+    unittest.main()
+
+    # Remove the same path from sys.path when finished testing
+    if path_to_add in sys.path:
+        sys.path.remove(path_to_add)
@@ -9,18 +9,25 @@ from moto import mock_aws
 path_to_add = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
 sys.path.append(path_to_add)
 
+# Append the path of the shared Lambda layer, in order to import from layers/common/
+layer_path_to_add = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'layers', 'common'))
+sys.path.append(layer_path_to_add)
+
 class TestCheckReportSubmission(unittest.TestCase):
 
     def setUp(self):
 
+        os.environ['AWS_REGION'] = 'us-east-1'
         os.environ['FRONTEND_URL'] = 'test_frontend_url'
         
         # Import after patching env variables
         from handlers.check_report_submission.check_report_submission import check_submission_status
         from handlers.check_report_submission.check_report_submission import client
+        from execution_cache import invalidate_executions
 
         self.check_report_submission = check_submission_status  # Store it in an instance variable
         self.client = client
+        invalidate_executions()
 
     def tearDown(self):
         os.environ.pop('FRONTEND_URL', None) 
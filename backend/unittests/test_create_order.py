@@ -9,10 +9,15 @@ from moto import mock_aws
 path_to_add = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
 sys.path.append(path_to_add)
 
+# Append the path of the shared Lambda layer, in order to import from layers/common/
+layer_path_to_add = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'layers', 'common'))
+sys.path.append(layer_path_to_add)
+
 class TestCreateOrder(unittest.TestCase):
 
     def setUp(self):
 
+        os.environ['AWS_REGION'] = 'us-east-1'
         os.environ['STATE_MACHINE_ARN'] = 'test_state_machine'
         os.environ['FRONTEND_URL'] = 'test_frontend_url'
         
@@ -111,6 +116,247 @@ class TestCreateOrder(unittest.TestCase):
         self.assertTrue('error' in valerror)
         self.assertEqual(str(valerror['error']), "Invalid input")
 
+class TestCreateOrderWait(unittest.TestCase):
+
+    def setUp(self):
+
+        os.environ['AWS_REGION'] = 'us-east-1'
+        os.environ['STATE_MACHINE_ARN'] = 'test_state_machine'
+        os.environ['FRONTEND_URL'] = 'test_frontend_url'
+        
+        # Import after patching env variables
+        from handlers.create_order.create_order import lambda_handler
+
+        self.lambda_handler = lambda_handler  # Store it in an instance variable
+        self.event = {
+            'body': json.dumps({'personalInfo': {}, 'customerproduct': {}}),
+            'queryStringParameters': {'wait': 'true'}
+        }
+
+    def tearDown(self):
+        os.environ.pop('STATE_MACHINE_ARN', None) 
+        os.environ.pop('FRONTEND_URL', None)    
+
+    @patch('handlers.create_order.create_order.sync_state_machine_arn', 'test_express_state_machine')
+    @patch('handlers.create_order.create_order.client.start_execution')
+    @patch('handlers.create_order.create_order.sync_client.start_sync_execution')
+    def test_lambda_handler_wait_succeeded(self, mock_start_sync_execution, mock_start_execution):
+        print(f'***************************************************')
+        print(f'Unit Test: {self.__class__.__name__} : {self._testMethodName} :')
+        print(f'***************************************************')
+
+        output = {'order': {'personalInfo': {}}, 'inventory_updated': True, 'failed_products': []}
+        mock_start_sync_execution.return_value = {
+            'executionArn': 'arn:aws:states:region:123456789012:express:stateMachineName:executionId',
+            'status': 'SUCCEEDED',
+            'output': json.dumps(output)
+        }
+
+        response = self.lambda_handler(self.event, None)
+
+        # The final status and order are in the POST response: no polling, no Standard execution
+        self.assertEqual(response['statusCode'], 200)
+        body = json.loads(response['body'])
+        self.assertEqual(body['status'], 'SUCCEEDED')
+        self.assertEqual(body['output'], output)
+        mock_start_execution.assert_not_called()
+
+    @patch('handlers.create_order.create_order.sync_state_machine_arn', 'test_express_state_machine')
+    @patch('handlers.create_order.create_order.sync_fallback_state_machine_arn', 'test_fallback_state_machine')
+    @patch('handlers.create_order.create_order.client.start_execution')
+    @patch('handlers.create_order.create_order.sync_client.start_sync_execution')
+    def test_lambda_handler_wait_timeout(self, mock_start_sync_execution, mock_start_execution):
+        print(f'***************************************************')
+        print(f'Unit Test: {self.__class__.__name__} : {self._testMethodName} :')
+        print(f'***************************************************')
+
+        from botocore.exceptions import ReadTimeoutError
+        mock_start_sync_execution.side_effect = ReadTimeoutError(endpoint_url='https://sync-states.us-east-1.amazonaws.com')
+        executionArn = 'arn:aws:states:region:123456789012:execution:stateMachineName:executionId'
+        mock_start_execution.return_value = {'executionArn': executionArn}
+
+        response = self.lambda_handler(self.event, None)
+
+        # Same contract as without ?wait=true
+        self.assertEqual(response['statusCode'], 202)
+        self.assertEqual(json.loads(response['body']), {'executionArn': executionArn})
+
+        # The Standard state machine gets the same submission, so the order is placed once
+        self.assertEqual(mock_start_execution.call_args.kwargs['stateMachineArn'], 'test_fallback_state_machine')
+        sync_input = json.loads(mock_start_sync_execution.call_args.kwargs['input'])
+        fallback_input = json.loads(mock_start_execution.call_args.kwargs['input'])
+        self.assertEqual(sync_input, fallback_input)
+        self.assertTrue(fallback_input['submission_id'])
+        self.assertTrue(fallback_input['order_id'])
+
+class TestCreateOrderQueue(unittest.TestCase):
+
+    def setUp(self):
+
+        os.environ['AWS_REGION'] = 'us-east-1'
+        os.environ['STATE_MACHINE_ARN'] = 'test_state_machine'
+        os.environ['FRONTEND_URL'] = 'test_frontend_url'
+        
+        # Import after patching env variables
+        from handlers.create_order.create_order import lambda_handler
+        from handlers.create_order.create_order import sqs
+
+        self.lambda_handler = lambda_handler  # Store it in an instance variable
+        self.sqs = sqs
+
+    def tearDown(self):
+        os.environ.pop('STATE_MACHINE_ARN', None) 
+        os.environ.pop('FRONTEND_URL', None)    
+
+    @patch('handlers.create_order.create_order.client.start_execution')
+    @mock_aws
+    def test_lambda_handler_queued_intake(self, mock_start_execution):
+        print(f'***************************************************')
+        print(f'Unit Test: {self.__class__.__name__} : {self._testMethodName} :')
+        print(f'***************************************************')
+
+        # https://docs.getmoto.org/en/latest/docs/getting_started.html
+        # According to moto documentation, I can use the clients and resources that I created
+        # in the AWS Lambda function, and then patch them (using patch_client() and patch_resource())
+        # to be used with moto.
+        from moto.core import patch_client, patch_resource
+        patch_client(self.sqs)
+        queue_url = self.sqs.create_queue(QueueName='test_order_queue')['QueueUrl']
+
+        body = json.dumps({'personalInfo': {'customer_name': 'John Doe'}, 'customerproduct': {}})
+        with patch('handlers.create_order.create_order.order_queue_url', queue_url):
+            response = self.lambda_handler({'body': body}, None)
+
+        # The order is queued, and no state machine execution is started
+        self.assertEqual(response['statusCode'], 202)
+        ticket = json.loads(response['body'])['ticket']
+        mock_start_execution.assert_not_called()
+
+        # The message has the same input as a state machine execution. The ticket is the order id.
+        messages = self.sqs.receive_message(QueueUrl=queue_url, MaxNumberOfMessages=10)['Messages']
+        self.assertEqual(len(messages), 1)
+        message = json.loads(messages[0]['Body'])
+        self.assertEqual(message['body'], body)
+        self.assertEqual(message['order_id'], ticket)
+        self.assertTrue(message['submission_id'])
+
+    @patch('handlers.create_order.create_order.order_queue_url', 'https://sqs.us-east-1.amazonaws.com/123456789012/test_order_queue')
+    @patch('handlers.create_order.create_order.sqs.send_message')
+    def test_lambda_handler_queued_intake_error(self, mock_send_message):
+        print(f'***************************************************')
+        print(f'Unit Test: {self.__class__.__name__} : {self._testMethodName} :')
+        print(f'***************************************************')
+
+        mock_send_message.side_effect = Exception('Queue not found')
+
+        response = self.lambda_handler({'body': json.dumps({'personalInfo': {}})}, None)
+
+        self.assertEqual(response['statusCode'], 500)
+        self.assertIn('Queue not found', json.loads(response['body'])['error'])
+
+class TestCreateOrderIdempotency(unittest.TestCase):
+
+    def setUp(self):
+
+        os.environ['AWS_REGION'] = 'us-east-1'
+        os.environ['STATE_MACHINE_ARN'] = 'test_state_machine'
+        os.environ['FRONTEND_URL'] = 'test_frontend_url'
+        
+        # Import after patching env variables
+        from handlers.create_order.create_order import lambda_handler
+        from handlers.create_order.create_order import dynamodb
+        from table_registry import invalidate_table
+
+        self.lambda_handler = lambda_handler  # Store it in an instance variable
+        self.dynamodb = dynamodb
+        invalidate_table('test_idempotency_table')
+
+    def tearDown(self):
+        os.environ.pop('STATE_MACHINE_ARN', None) 
+        os.environ.pop('FRONTEND_URL', None)    
+
+    def create_idempotency_table(self):
+        self.dynamodb.create_table(
+            TableName='test_idempotency_table',
+            KeySchema=[{'AttributeName': 'idempotency_key', 'KeyType': 'HASH'}],
+            AttributeDefinitions=[{'AttributeName': 'idempotency_key', 'AttributeType': 'S'}],
+            ProvisionedThroughput={'ReadCapacityUnits': 1, 'WriteCapacityUnits': 1}
+        )
+
+    def make_event(self, idempotency_key, body):
+        return {
+            'headers': {'idempotency-key': idempotency_key},
+            'body': json.dumps(body)
+        }
+
+    @patch('handlers.create_order.create_order.idempotency_table_name', 'test_idempotency_table')
+    @patch('handlers.create_order.create_order.client.start_execution')
+    @mock_aws
+    def test_lambda_handler_replayed_key(self, mock_start_execution):
+        print(f'***************************************************')
+        print(f'Unit Test: {self.__class__.__name__} : {self._testMethodName} :')
+        print(f'***************************************************')
+
+        # https://docs.getmoto.org/en/latest/docs/getting_started.html
+        # According to moto documentation, I can use the clients and resources that I created
+        # in the AWS Lambda function, and then patch them (using patch_client() and patch_resource())
+        # to be used with moto.
+        from moto.core import patch_client, patch_resource
+        patch_resource(self.dynamodb)
+        self.create_idempotency_table()
+
+        executionArn = 'arn:aws:states:region:123456789012:execution:stateMachineName:executionId'
+        mock_start_execution.return_value = {'executionArn': executionArn}
+
+        event = self.make_event('key-1', {'personalInfo': {'customer_name': 'John Doe'}})
+        first = self.lambda_handler(event, None)
+        second = self.lambda_handler(event, None)
+
+        # The retry gets the original response, without a second execution
+        self.assertEqual(first['statusCode'], 202)
+        self.assertEqual(second['statusCode'], 202)
+        self.assertEqual(json.loads(second['body']), {'executionArn': executionArn})
+        self.assertEqual(second['headers']['Idempotent-Replayed'], 'true')
+        self.assertEqual(mock_start_execution.call_count, 1)
+
+        # The same key with another order is rejected
+        other = self.lambda_handler(self.make_event('key-1', {'personalInfo': {'customer_name': 'Jane Doe'}}), None)
+        self.assertEqual(other['statusCode'], 422)
+        self.assertEqual(mock_start_execution.call_count, 1)
+
+        # Without the header, every POST starts an execution
+        self.lambda_handler({'body': event['body']}, None)
+        self.assertEqual(mock_start_execution.call_count, 2)
+
+    @patch('handlers.create_order.create_order.idempotency_table_name', 'test_idempotency_table')
+    @patch('handlers.create_order.create_order.client.start_execution')
+    @mock_aws
+    def test_lambda_handler_failed_request_can_be_retried(self, mock_start_execution):
+        print(f'***************************************************')
+        print(f'Unit Test: {self.__class__.__name__} : {self._testMethodName} :')
+        print(f'***************************************************')
+
+        # https://docs.getmoto.org/en/latest/docs/getting_started.html
+        # According to moto documentation, I can use the clients and resources that I created
+        # in the AWS Lambda function, and then patch them (using patch_client() and patch_resource())
+        # to be used with moto.
+        from moto.core import patch_client, patch_resource
+        patch_resource(self.dynamodb)
+        self.create_idempotency_table()
+
+        executionArn = 'arn:aws:states:region:123456789012:execution:stateMachineName:executionId'
+        mock_start_execution.side_effect = [Exception('State machine failed to start'), {'executionArn': executionArn}]
+
+        event = self.make_event('key-2', {'personalInfo': {'customer_name': 'John Doe'}})
+        first = self.lambda_handler(event, None)
+        second = self.lambda_handler(event, None)
+
+        # The failed request released the key, so the retry is processed
+        self.assertEqual(first['statusCode'], 500)
+        self.assertEqual(second['statusCode'], 202)
+        self.assertEqual(json.loads(second['body']), {'executionArn': executionArn})
+        self.assertNotIn('Idempotent-Replayed', second['headers'])
+
 if __name__ == '__main__':
     os.environ['AWS_ACCESS_KEY_ID'] = 'testing'
     os.environ['AWS_SECRET_ACCESS_KEY'] = 'testing'
@@ -120,6 +366,10 @@ if __name__ == '__main__':
     os.environ['AWS_REGION'] = 'us-east-1'
     
     unittest.main()
+
+    # Remove the same path from sys.path when finished testing
+    if layer_path_to_add in sys.path:
+        sys.path.remove(layer_path_to_add)
     
     # Remove the same path from sys.path when finished testing
     if path_to_add in sys.path:
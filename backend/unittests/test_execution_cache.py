@@ -0,0 +1,126 @@
+import unittest
+from unittest.mock import patch, Mock
+import boto3
+from moto import mock_aws
+import os
+import sys
+
+# Append the path of the shared Lambda layer, in order to import from layers/common/
+layer_path_to_add = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'layers', 'common'))
+sys.path.append(layer_path_to_add)
+
+class TestExecutionCache(unittest.TestCase):
+
+    def setUp(self):
+
+        import execution_cache
+        from table_registry import invalidate_table
+
+        self.execution_cache = execution_cache  # Store it in an instance variable
+        execution_cache.invalidate_executions()
+        invalidate_table('test_execution_cache_table')
+
+    def create_table(self):
+        dynamodb = boto3.resource('dynamodb', region_name='us-east-1')
+        dynamodb.create_table(
+            TableName='test_execution_cache_table',
+            KeySchema=[{'AttributeName': 'execution_arn', 'KeyType': 'HASH'}],
+            AttributeDefinitions=[{'AttributeName': 'execution_arn', 'AttributeType': 'S'}],
+            ProvisionedThroughput={'ReadCapacityUnits': 1, 'WriteCapacityUnits': 1}
+        )
+        return dynamodb
+
+    def test_describe_execution_terminal_status_is_cached(self):
+        print(f'***************************************************')
+        print(f'Unit Test: {self.__class__.__name__} : {self._testMethodName} :')
+        print(f'***************************************************')
+
+        client = Mock()
+        client.describe_execution.side_effect = [
+            {'status': 'RUNNING'},
+            {'status': 'SUCCEEDED'},
+            {'status': 'SUCCEEDED', 'output': '{"ok": true}', 'input': '{}'}
+        ]
+
+        # A running execution is described without its data, and not cached
+        self.assertEqual(self.execution_cache.describe_execution(client, 'arn-1'), {'status': 'RUNNING'})
+        self.assertEqual(client.describe_execution.call_args.kwargs['includedData'], 'METADATA_ONLY')
+
+        # Once finished, the output is read once
+        self.assertEqual(self.execution_cache.describe_execution(client, 'arn-1'), {'status': 'SUCCEEDED', 'output': '{"ok": true}'})
+        self.assertEqual(client.describe_execution.call_args.kwargs['includedData'], 'ALL_DATA')
+
+        # Repeated polls are cache hits
+        self.assertEqual(self.execution_cache.describe_execution(client, 'arn-1')['status'], 'SUCCEEDED')
+        self.assertEqual(client.describe_execution.call_count, 3)
+
+    def test_describe_execution_failed_status_is_not_cached(self):
+        print(f'***************************************************')
+        print(f'Unit Test: {self.__class__.__name__} : {self._testMethodName} :')
+        print(f'***************************************************')
+
+        client = Mock()
+        client.describe_execution.side_effect = [
+            {'status': 'FAILED'},
+            {'status': 'FAILED', 'error': 'States.TaskFailed', 'cause': 'Out of stock'},
+            {'status': 'RUNNING'}
+        ]
+
+        self.assertEqual(self.execution_cache.describe_execution(client, 'arn-1'),
+                         {'status': 'FAILED', 'error': 'States.TaskFailed', 'cause': 'Out of stock'})
+
+        # A failed execution can be redriven: the next poll describes it again
+        self.assertEqual(self.execution_cache.describe_execution(client, 'arn-1'), {'status': 'RUNNING'})
+        self.assertEqual(client.describe_execution.call_count, 3)
+
+    @patch('execution_cache.EXECUTION_CACHE_SIZE', 2)
+    def test_cache_execution_least_recently_used(self):
+        print(f'***************************************************')
+        print(f'Unit Test: {self.__class__.__name__} : {self._testMethodName} :')
+        print(f'***************************************************')
+
+        for execution_arn in ('arn-1', 'arn-2'):
+            self.execution_cache.cache_execution(execution_arn, {'status': 'SUCCEEDED'})
+        self.execution_cache.get_cached_execution('arn-1')
+        self.execution_cache.cache_execution('arn-3', {'status': 'FAILED'})
+
+        # arn-2 was the least recently used
+        self.assertIsNone(self.execution_cache.get_cached_execution('arn-2'))
+        self.assertEqual(self.execution_cache.get_cached_execution('arn-1'), {'status': 'SUCCEEDED'})
+        self.assertEqual(self.execution_cache.get_cached_execution('arn-3'), {'status': 'FAILED'})
+
+    @mock_aws
+    def test_describe_execution_shared_table(self):
+        print(f'***************************************************')
+        print(f'Unit Test: {self.__class__.__name__} : {self._testMethodName} :')
+        print(f'***************************************************')
+
+        dynamodb = self.create_table()
+        client = Mock()
+        client.describe_execution.side_effect = [
+            {'status': 'SUCCEEDED'},
+            {'status': 'SUCCEEDED', 'output': '{"order_id": "1"}'}
+        ]
+
+        execution = self.execution_cache.describe_execution(client, 'arn-1', dynamodb, 'test_execution_cache_table')
+        self.assertEqual(execution, {'status': 'SUCCEEDED', 'output': '{"order_id": "1"}'})
+
+        # Another container (empty LRU) reads the table instead of AWS Step Functions
+        self.execution_cache.invalidate_executions()
+        client.describe_execution.reset_mock()
+        self.assertEqual(self.execution_cache.describe_execution(client, 'arn-1', dynamodb, 'test_execution_cache_table'), execution)
+        client.describe_execution.assert_not_called()
+
+if __name__ == '__main__':
+
+    os.environ['AWS_ACCESS_KEY_ID'] = 'testing'
+    os.environ['AWS_SECRET_ACCESS_KEY'] = 'testing'
+    os.environ['AWS_SECURITY_TOKEN'] = 'testing'
+    os.environ['AWS_SESSION_TOKEN'] = 'testing'
+    os.environ['AWS_DEFAULT_REGION'] = 'us-east-1'
+
+    unittest.main()
+
+    # Remove the same path from sys.path when finished testing
+    if layer_path_to_add in sys.path:
+        sys.path.remove(layer_path_to_add)
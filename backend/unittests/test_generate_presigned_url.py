@@ -153,6 +153,24 @@ class TestGeneratePresignedURL(unittest.TestCase):
         self.assertIsNone(result)
         self.assertIn('error', valerror)
 
+    @patch('handlers.generate_presigned_url.generate_presigned_url.orders_report_key', 'orderreport-full.html')
+    @patch('handlers.generate_presigned_url.generate_presigned_url.s3.generate_presigned_url')
+    def test_lambda_handler_orders_report_key(self, mock_generate_presigned_url):
+        print(f'***************************************************')
+        print(f'Unit Test: {self.__class__.__name__} : {self._testMethodName} :')
+        print(f'***************************************************')        
+
+        from handlers.generate_presigned_url.generate_presigned_url import lambda_handler
+
+        mock_generate_presigned_url.return_value = "https://mock-presigned-url.com"
+
+        result = lambda_handler({}, None)
+
+        # The fused report tasks write the orders report to its own key (see FusedReportTasks)
+        self.assertIsNotNone(result)
+        keys = [call.kwargs['Params']['Key'] for call in mock_generate_presigned_url.call_args_list]
+        self.assertEqual(keys, ['orderreport-full.html', 'productreport.html'])
+
 if __name__ == '__main__':
 
     os.environ['AWS_ACCESS_KEY_ID'] = 'testing'
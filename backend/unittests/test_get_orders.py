@@ -1,6 +1,7 @@
 import unittest
 from unittest.mock import patch
 import boto3
+import json
 import os
 import sys
 from moto import mock_aws
@@ -10,48 +11,56 @@ from botocore.exceptions import ClientError
 path_to_add = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
 sys.path.append(path_to_add)
 
-class TestGetOrdersFromDDB(unittest.TestCase):
+# Append the path of the shared Lambda layer, in order to import from layers/common/
+layer_path_to_add = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'layers', 'common'))
+sys.path.append(layer_path_to_add)
+
+class TestQueryOrdersByTime(unittest.TestCase):
 
     @mock_aws
     def setUp(self):
 
         os.environ['ORDERS_TABLE'] = 'test_table'
+        os.environ['ORDER_DAYS_TABLE'] = 'test_order_days_table'
         os.environ['FRONTEND_URL'] = 'test_frontend_url'
         
         # Import after patching env variables
-        from handlers.get_orders.get_orders import get_orders_from_ddb
-        from handlers.get_orders.get_orders import dynamodb
+        from handlers.get_orders.get_orders import query_orders_by_time, query_orders_by_email, get_query_parameters
+        from handlers.get_orders.get_orders import lambda_handler, dynamodb
+        from table_registry import invalidate_table
 
-        self.get_orders_from_ddb = get_orders_from_ddb  # Store it in an instance variable
+        self.query_orders_by_time = query_orders_by_time  # Store it in an instance variable
+        self.query_orders_by_email = query_orders_by_email
+        self.get_query_parameters = get_query_parameters
+        self.lambda_handler = lambda_handler
         self.dynamodb = dynamodb
+        invalidate_table('test_table')
+        invalidate_table('test_order_days_table')
 
     def tearDown(self):
         os.environ.pop('ORDERS_TABLE', None)
+        os.environ.pop('ORDER_DAYS_TABLE', None)
         os.environ.pop('FRONTEND_URL', None) 
 
-    @mock_aws
-    def test_get_orders_from_ddb_success(self):
-        print(f'***************************************************')
-        print(f'Unit Test: {self.__class__.__name__} : {self._testMethodName} :')
-        print(f'***************************************************')        
-
-        # https://docs.getmoto.org/en/latest/docs/getting_started.html
-        # According to moto documentation, I can use the clients and resources that I created
-        # in the AWS Lambda function, and then patch them (using patch_client() and patch_resource())
-        # to be used with moto.
-        from moto.core import patch_client, patch_resource
-        patch_resource(self.dynamodb)
-
-        get_orders_from_ddb = self.get_orders_from_ddb
-        dynamodb = self.dynamodb
-
-        # Setup mock DynamoDB
-        table_name = os.environ['ORDERS_TABLE']
-
-        ddb_table = dynamodb.Table(table_name) 
+    def create_order_days_table(self, order_times):
+        # Days that have orders (see layers/common/order_days.py)
+        self.dynamodb.create_table(
+            TableName='test_order_days_table',
+            KeySchema=[
+                {'AttributeName': 'calendar', 'KeyType': 'HASH'},
+                {'AttributeName': 'order_day', 'KeyType': 'RANGE'}
+            ],
+            AttributeDefinitions=[
+                {'AttributeName': 'calendar', 'AttributeType': 'S'},
+                {'AttributeName': 'order_day', 'AttributeType': 'S'}
+            ],
+            ProvisionedThroughput={'ReadCapacityUnits': 1, 'WriteCapacityUnits': 1}
+        )
+        for order_day in {order_time[:10] for order_time in order_times}:
+            self.dynamodb.Table('test_order_days_table').put_item(Item={'calendar': 'orders', 'order_day': order_day})
 
-        # Create mock table
-        dynamodb.create_table(
+    def create_orders_table(self, table_name, order_times=None, emails=None):
+        self.dynamodb.create_table(
             TableName=table_name,
             KeySchema=[
                 {
@@ -63,82 +72,172 @@ class TestGetOrdersFromDDB(unittest.TestCase):
                 {
                     'AttributeName': 'id',
                     'AttributeType': 'S'
+                },
+                {
+                    'AttributeName': 'order_day',
+                    'AttributeType': 'S'
+                },
+                {
+                    'AttributeName': 'order_time',
+                    'AttributeType': 'S'
+                },
+                {
+                    'AttributeName': 'email_key',
+                    'AttributeType': 'S'
                 }
             ],
             ProvisionedThroughput={
                 'ReadCapacityUnits': 1,
                 'WriteCapacityUnits': 1
-            }
-        )
-
-        # Adding some mock orders to the table
-        ddb_table.put_item(
-            Item={
-                "id": "1",
-                "customer_name": "Customer1",
-                "email": "Customer1@email.com",
-                "phone": "123456789",
-                "total_amount": "17.00",
-                "ordered_items": [
-                    {
-                        "product_id": "2",
-                        "product_name": "Product2",
-                        "quantity": "3",
-                        "amount": "9.00"
+            },
+            GlobalSecondaryIndexes=[
+                {
+                    'IndexName': 'OrderTimeIndex',
+                    'KeySchema': [
+                        {
+                            'AttributeName': 'order_day',
+                            'KeyType': 'HASH'
+                        },
+                        {
+                            'AttributeName': 'order_time',
+                            'KeyType': 'RANGE'
+                        }
+                    ],
+                    'Projection': {
+                        'ProjectionType': 'ALL'
                     },
-                    {
-                        "product_id": "4",
-                        "product_name": "Product4",
-                        "quantity": "2",
-                        "amount": "8.00"
+                    'ProvisionedThroughput': {
+                        'ReadCapacityUnits': 1,
+                        'WriteCapacityUnits': 1
                     }
-                ],        
-                "order_time": "2025-03-12T13:11:51.761Z"
-            }
-        )
-        ddb_table.put_item(
-            Item={
-                "id": "2",
-                "customer_name": "Customer2",
-                "email": "Customer2@email.com",
-                "phone": "123456789",
-                "total_amount": "6.00",
-                "ordered_items": [
-                    {
-                        "product_id": "2",
-                        "product_name": "Product2",
-                        "quantity": "1",
-                        "amount": "2.00"
+                },
+                {
+                    'IndexName': 'CustomerEmailIndex',
+                    'KeySchema': [
+                        {
+                            'AttributeName': 'email_key',
+                            'KeyType': 'HASH'
+                        },
+                        {
+                            'AttributeName': 'order_time',
+                            'KeyType': 'RANGE'
+                        }
+                    ],
+                    'Projection': {
+                        'ProjectionType': 'ALL'
                     },
-                    {
-                        "product_id": "4",
-                        "product_name": "Product4",
-                        "quantity": "1",
-                        "amount": "4.00"
+                    'ProvisionedThroughput': {
+                        'ReadCapacityUnits': 1,
+                        'WriteCapacityUnits': 1
                     }
-                ],        
-                "order_time": "2025-01-12T13:11:51.761Z"
-            }
+                }
+            ]
         )
 
-        # Prepare a valerror dictionary to capture errors
-        valerror = {'error':''}
+        # Six orders over three days: 2025-03-10, 2025-03-12 and 2025-03-13
+        # Orders 1, 3 and 6 are from the same customer (the email is written with different cases)
+        order_times = order_times or [
+            '2025-03-10T09:00:00Z',
+            '2025-03-10T17:30:00Z',
+            '2025-03-12T08:15:00Z',
+            '2025-03-12T13:11:51.761Z',
+            '2025-03-12T22:00:00Z',
+            '2025-03-13T07:45:00Z'
+        ]
+        emails = emails or [
+            'Jane.Doe@example.com',
+            'customer2@example.com',
+            'jane.doe@example.com',
+            'customer4@example.com',
+            'customer5@example.com',
+            'JANE.DOE@EXAMPLE.COM'
+        ]
+        self.create_order_days_table(order_times)
+        ddb_table = self.dynamodb.Table(table_name)
+        for i, order_time in enumerate(order_times):
+            ddb_table.put_item(
+                Item={
+                    'id': str(i + 1),
+                    'customer_name': f'Customer{i + 1}',
+                    'email': emails[i],
+                    'email_key': emails[i].lower(),
+                    'total_amount': '1.00',
+                    'order_time': order_time,
+                    'order_day': order_time[:10]
+                }
+            )
 
-        # Call the function under test
-        result = get_orders_from_ddb(table_name, valerror)
+    @mock_aws
+    def test_query_orders_by_time_latest_first(self):
+        print(f'***************************************************')
+        print(f'Unit Test: {self.__class__.__name__} : {self._testMethodName} :')
+        print(f'***************************************************')        
+
+        # https://docs.getmoto.org/en/latest/docs/getting_started.html
+        # According to moto documentation, I can use the clients and resources that I created
+        # in the AWS Lambda function, and then patch them (using patch_client() and patch_resource())
+        # to be used with moto.
+        from moto.core import patch_client, patch_resource
+        patch_resource(self.dynamodb)
+
+        table_name = os.environ['ORDERS_TABLE']
+        self.create_orders_table(table_name)
+
+        # Read the most recent orders first, 4 at a time, by following next_cursor
+        parameters = self.get_query_parameters({'from': '2025-03-01', 'to': '2025-03-13', 'limit': '4'})
+        self.assertIsNone(parameters.pop('email'))
+        ids = []
+        pages = 0
+        while True:
+            valerror = {'error':''}
+            page = {}
+            result = self.query_orders_by_time(table_name, valerror, page=page, **parameters)
+
+            self.assertEqual(valerror, {'error':''})  # No error should be set
+            self.assertLessEqual(len(result), 4)
+            ids.extend(order['id'] for order in result)
+            pages += 1
+
+            if page['next_cursor'] is None:
+                break
+            parameters['cursor'] = page['next_cursor']
+
+        self.assertEqual(ids, ['6', '5', '4', '3', '2', '1'])
+        self.assertEqual(pages, 2)
+
+    @mock_aws
+    def test_query_orders_by_time_range_ascending(self):
+        print(f'***************************************************')
+        print(f'Unit Test: {self.__class__.__name__} : {self._testMethodName} :')
+        print(f'***************************************************')        
+
+        # https://docs.getmoto.org/en/latest/docs/getting_started.html
+        # According to moto documentation, I can use the clients and resources that I created
+        # in the AWS Lambda function, and then patch them (using patch_client() and patch_resource())
+        # to be used with moto.
+        from moto.core import patch_client, patch_resource
+        patch_resource(self.dynamodb)
+
+        table_name = os.environ['ORDERS_TABLE']
+        self.create_orders_table(table_name)
+
+        # Orders from 2025-03-10 17:00 to the end of 2025-03-12, oldest first, only some attributes
+        parameters = self.get_query_parameters({'from': '2025-03-10T17:00:00Z', 'to': '2025-03-12', 'order': 'asc'})
+        self.assertIsNone(parameters.pop('email'))
+        valerror = {'error':''}
+        page = {}
+        result = self.query_orders_by_time(table_name, valerror, page=page, fields=['id', 'order_time'], **parameters)
 
-        # Check the result
-        self.assertIsNotNone(result)
-        self.assertEqual(len(result), 2)  # We inserted two orders
-        self.assertEqual(result[0]['id'], '1')  # First order's ID should be '1'
-        self.assertEqual(result[1]['id'], '2')  # Second order's ID should be '2'
         self.assertEqual(valerror, {'error':''})  # No error should be set
+        self.assertEqual([order['id'] for order in result], ['2', '3', '4', '5'])
+        self.assertEqual(set(result[0].keys()), {'id', 'order_time'})
+        self.assertIsNone(page['next_cursor'])
 
     @mock_aws
-    def test_get_orders_from_ddb_table_not_found(self):
+    def test_query_orders_by_email(self):
         print(f'***************************************************')
         print(f'Unit Test: {self.__class__.__name__} : {self._testMethodName} :')
-        print(f'***************************************************')    
+        print(f'***************************************************')        
 
         # https://docs.getmoto.org/en/latest/docs/getting_started.html
         # According to moto documentation, I can use the clients and resources that I created
@@ -147,23 +246,134 @@ class TestGetOrdersFromDDB(unittest.TestCase):
         from moto.core import patch_client, patch_resource
         patch_resource(self.dynamodb)
 
-        get_orders_from_ddb = self.get_orders_from_ddb
-        dynamodb = self.dynamodb
+        table_name = os.environ['ORDERS_TABLE']
+        self.create_orders_table(table_name)
+
+        # Support staff can type the email with any case
+        parameters = self.get_query_parameters({'email': ' Jane.DOE@Example.com ', 'limit': '2'})
+        email = parameters.pop('email')
+        self.assertEqual(email, 'jane.doe@example.com')
+
+        ids = []
+        pages = 0
+        while True:
+            valerror = {'error':''}
+            page = {}
+            result = self.query_orders_by_email(table_name, email, valerror, page=page, fields=['id', 'email'], **parameters)
+
+            self.assertEqual(valerror, {'error':''})  # No error should be set
+            self.assertLessEqual(len(result), 2)
+            ids.extend(order['id'] for order in result)
+            pages += 1
+
+            if page['next_cursor'] is None:
+                break
+            parameters['cursor'] = page['next_cursor']
+
+        # Only this customer's orders, most recent first
+        self.assertEqual(ids, ['6', '3', '1'])
+        self.assertGreaterEqual(pages, 2)
+
+        # Orders of this customer in a time range
+        valerror = {'error':''}
+        result = self.query_orders_by_email(table_name, email, valerror, time_from='2025-03-11', time_to='2025-03-12T~')
+        self.assertEqual([order['id'] for order in result], ['3'])
+
+    def test_get_query_parameters(self):
+        print(f'***************************************************')
+        print(f'Unit Test: {self.__class__.__name__} : {self._testMethodName} :')
+        print(f'***************************************************')
+
+        # Without parameters, the most recent orders are listed, one page at a time
+        for query_parameters in (None, {'fields': 'id'}):
+            parameters = self.get_query_parameters(query_parameters)
+            self.assertTrue(parameters['descending'])
+            self.assertEqual(parameters['limit'], 50)
+            self.assertIsNone(parameters['cursor'])
 
-        # Setup mock DynamoDB
+        parameters = self.get_query_parameters({'limit': '500'})
+        self.assertEqual(parameters['limit'], 100)
+        self.assertTrue(parameters['descending'])
+
+        for invalid in ({'order': 'up'}, {'from': 'yesterday'}, {'limit': '0'},
+                        {'from': '2025-03-13', 'to': '2025-03-01'}, {'cursor': 'not-a-cursor'},
+                        {'email': 'not-an-email'}):
+            with self.assertRaises(ValueError):
+                self.get_query_parameters(invalid)
+
+        # Cursors that decode, but without a valid position, are reported as 400 too
+        from pagination import encode_cursor
+        for position in ({'key': {'id': '1'}}, {'day': 'yesterday'}, {'day': '2025-03-12', 'key': 'not-a-key'}):
+            with self.assertRaises(ValueError):
+                self.get_query_parameters({'cursor': encode_cursor(position)})
+        with self.assertRaises(ValueError):
+            self.get_query_parameters({'email': 'jane.doe@example.com', 'cursor': encode_cursor({'day': '2025-03-12'})})
+
+    @mock_aws
+    def test_query_orders_by_time_skips_empty_days(self):
+        print(f'***************************************************')
+        print(f'Unit Test: {self.__class__.__name__} : {self._testMethodName} :')
+        print(f'***************************************************')
+
+        from moto.core import patch_client, patch_resource
+        patch_resource(self.dynamodb)
+
+        # The most recent order is months old, and the others are years old
+        order_times = ['2021-06-01T10:00:00Z', '2022-02-01T10:00:00Z', '2025-01-05T10:00:00Z']
         table_name = os.environ['ORDERS_TABLE']
+        self.create_orders_table(table_name, order_times, ['a@example.com', 'b@example.com', 'c@example.com'])
 
-        # Prepare a valerror dictionary to capture errors
+        # Without 'from', all orders are found, and only the days that have orders are queried
+        queries = []
+        original_query = self.dynamodb.Table(table_name).query
+        from table_registry import get_table
+        ddb_table = get_table(self.dynamodb, table_name)
+        def query(**kwargs):
+            queries.append(kwargs)
+            return original_query(**kwargs)
+        ddb_table.query = query
+
+        parameters = self.get_query_parameters({'limit': '2'})
+        parameters.pop('email')
         valerror = {'error':''}
+        page = {}
+        result = self.query_orders_by_time(table_name, valerror, page=page, **parameters)
 
-        # Call the function under test
-        result = get_orders_from_ddb(table_name, valerror)
+        self.assertEqual([order['order_time'] for order in result], ['2025-01-05T10:00:00Z', '2022-02-01T10:00:00Z'])
+        self.assertEqual(len(queries), 2)
+        self.assertIsNotNone(page['next_cursor'])
+
+        parameters['cursor'] = page['next_cursor']
+        result = self.query_orders_by_time(table_name, valerror, page=page, **parameters)
+        self.assertEqual([order['order_time'] for order in result], ['2021-06-01T10:00:00Z'])
+        self.assertIsNone(page['next_cursor'])
+
+    @mock_aws
+    def test_lambda_handler_latest_orders(self):
+        print(f'***************************************************')
+        print(f'Unit Test: {self.__class__.__name__} : {self._testMethodName} :')
+        print(f'***************************************************')
+
+        from moto.core import patch_client, patch_resource
+        patch_resource(self.dynamodb)
+
+        table_name = os.environ['ORDERS_TABLE']
+        self.create_orders_table(table_name)
+
+        # Without parameters: the most recent orders, not a Scan of the whole table
+        with patch('handlers.get_orders.get_orders.ddb_table_name', table_name), \
+             patch('handlers.get_orders.get_orders.ddb_order_days_table_name', 'test_order_days_table'):
+            response = self.lambda_handler({'queryStringParameters': {'fields': 'id'}}, None)
+
+            self.assertEqual(response['statusCode'], 200)
+            body = json.loads(response['body'])
+            self.assertEqual([order['id'] for order in body['orders']], ['6', '5', '4', '3', '2', '1'])
+            self.assertIsNone(body['next_cursor'])
+
+            from pagination import encode_cursor
+            response = self.lambda_handler({'queryStringParameters': {'cursor': encode_cursor({'day': 3})}}, None)
+            self.assertEqual(response['statusCode'], 400)
 
-        # Check the result
-        self.assertIsNone(result)  # No orders should be returned
-        self.assertIn('error', valerror)  # There should be an error captured in valerror    
-        self.assertIn(f'Table: {table_name} not found', str(valerror['error'])) # error message is part of a long error message
-    
 if __name__ == '__main__':
 
     os.environ['AWS_ACCESS_KEY_ID'] = 'testing'
@@ -10,6 +10,10 @@ from botocore.exceptions import ClientError
 path_to_add = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
 sys.path.append(path_to_add)
 
+# Append the path of the shared Lambda layer, in order to import from layers/common/
+layer_path_to_add = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'layers', 'common'))
+sys.path.append(layer_path_to_add)
+
 class TestGetProductFromDDB(unittest.TestCase):
 
     @mock_aws
@@ -127,7 +131,106 @@ class TestGetProductFromDDB(unittest.TestCase):
         self.assertIsNone(result)  # No products should be returned
         self.assertIn('error', valerror)  # There should be an error captured in valerror    
         self.assertIn(f'Table: {table_name} not found', str(valerror['error'])) # error message is part of a long error message
-    
+
+    @mock_aws
+    def test_get_product_from_ddb_warm_container(self):
+        print(f'***************************************************')
+        print(f'Unit Test: {self.__class__.__name__} : {self._testMethodName} :')
+        print(f'***************************************************')
+
+        # https://docs.getmoto.org/en/latest/docs/getting_started.html
+        # According to moto documentation, I can use the clients and resources that I created
+        # in the AWS Lambda function, and then patch them (using patch_client() and patch_resource())
+        # to be used with moto.
+        from moto.core import patch_client, patch_resource
+        patch_resource(self.dynamodb)
+
+        get_product_from_ddb = self.get_product_from_ddb
+        dynamodb = self.dynamodb
+
+        # Setup mock DynamoDB
+        table_name = os.environ['PRODUCTS_TABLE']
+
+        dynamodb.create_table(
+            TableName=table_name,
+            KeySchema=[
+                {
+                    'AttributeName': 'id',
+                    'KeyType': 'HASH'
+                }
+            ],
+            AttributeDefinitions=[
+                {
+                    'AttributeName': 'id',
+                    'AttributeType': 'S'
+                }
+            ],
+            ProvisionedThroughput={
+                'ReadCapacityUnits': 1,
+                'WriteCapacityUnits': 1
+            }
+        )
+        dynamodb.Table(table_name).put_item(Item={'id': '1', 'name': 'Product 1'})
+
+        # Record every DynamoDB API call made by the Lambda function's resource
+        api_calls = []
+        def record_api_call(event_name, **kwargs):
+            api_calls.append(event_name.split('.')[-1])
+        dynamodb.meta.client.meta.events.register('before-call.dynamodb.*', record_api_call)
+
+        try:
+            # Cold container: the table is validated once
+            valerror = {'error':''}
+            get_product_from_ddb(table_name, '1', valerror)
+
+            # Warm container: one data-plane call (GetItem) per request, no DescribeTable
+            api_calls.clear()
+            for _ in range(3):
+                valerror = {'error':''}
+                result = get_product_from_ddb(table_name, '1', valerror)
+                self.assertEqual(result['id'], '1')
+        finally:
+            dynamodb.meta.client.meta.events.unregister('before-call.dynamodb.*', record_api_call)
+
+        self.assertEqual(api_calls, ['GetItem', 'GetItem', 'GetItem'])
+
+    @patch('handlers.get_product.get_product.shards_table_name', 'test_shards_table')
+    @mock_aws
+    def test_get_product_from_ddb_sharded_inventory(self):
+        print(f'***************************************************')
+        print(f'Unit Test: {self.__class__.__name__} : {self._testMethodName} :')
+        print(f'***************************************************')
+
+        # https://docs.getmoto.org/en/latest/docs/getting_started.html
+        # According to moto documentation, I can use the clients and resources that I created
+        # in the AWS Lambda function, and then patch them (using patch_client() and patch_resource())
+        # to be used with moto.
+        from moto.core import patch_client, patch_resource
+        patch_resource(self.dynamodb)
+
+        table_name = os.environ['PRODUCTS_TABLE']
+        for name in (table_name, 'test_shards_table'):
+            self.dynamodb.create_table(
+                TableName=name,
+                KeySchema=[{'AttributeName': 'id', 'KeyType': 'HASH'}],
+                AttributeDefinitions=[{'AttributeName': 'id', 'AttributeType': 'S'}],
+                ProvisionedThroughput={'ReadCapacityUnits': 1, 'WriteCapacityUnits': 1}
+            )
+
+        # The stock of product 1 is in 3 shards
+        self.dynamodb.Table(table_name).put_item(Item={'id': '1', 'price': '10.00', 'inventory_count': 0, 'inventory_shards': 3})
+        for shard, count in enumerate([4, 0, 5]):
+            self.dynamodb.Table('test_shards_table').put_item(Item={'id': f'1#{shard}', 'inventory_count': count})
+
+        valerror = {'error':''}
+        result = self.get_product_from_ddb(table_name, '1', valerror)
+        self.assertEqual(result['inventory_count'], 9)
+
+        # Also with ?fields=inventory_count
+        valerror = {'error':''}
+        result = self.get_product_from_ddb(table_name, '1', valerror, ['id', 'inventory_count'])
+        self.assertEqual(result, {'id': '1', 'inventory_count': 9})
+
 if __name__ == '__main__':
 
     os.environ['AWS_ACCESS_KEY_ID'] = 'testing'
@@ -1,6 +1,7 @@
 import unittest
 from unittest.mock import patch
 import boto3
+import json
 import os
 import sys
 from moto import mock_aws
@@ -10,6 +11,10 @@ from botocore.exceptions import ClientError
 path_to_add = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
 sys.path.append(path_to_add)
 
+# Append the path of the shared Lambda layer, in order to import from layers/common/
+layer_path_to_add = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'layers', 'common'))
+sys.path.append(layer_path_to_add)
+
 class TestGetProductsFromDDB(unittest.TestCase):
 
     @mock_aws
@@ -127,7 +132,318 @@ class TestGetProductsFromDDB(unittest.TestCase):
         self.assertIsNone(result)  # No products should be returned
         self.assertIn('error', valerror)  # There should be an error captured in valerror    
         self.assertIn(f'Table: {table_name} not found', str(valerror['error'])) # error message is part of a long error message
+
+    @mock_aws
+    def test_get_products_from_ddb_paginated(self):
+        print(f'***************************************************')
+        print(f'Unit Test: {self.__class__.__name__} : {self._testMethodName} :')
+        print(f'***************************************************')
+
+        # https://docs.getmoto.org/en/latest/docs/getting_started.html
+        # According to moto documentation, I can use the clients and resources that I created
+        # in the AWS Lambda function, and then patch them (using patch_client() and patch_resource())
+        # to be used with moto.
+        from moto.core import patch_client, patch_resource
+        patch_resource(self.dynamodb)
+
+        get_products_from_ddb = self.get_products_from_ddb
+        dynamodb = self.dynamodb
+
+        # Setup mock DynamoDB
+        table_name = os.environ['PRODUCTS_TABLE']
+
+        ddb_table = dynamodb.Table(table_name) 
+
+        # Create mock table
+        dynamodb.create_table(
+            TableName=table_name,
+            KeySchema=[
+                {
+                    'AttributeName': 'id',
+                    'KeyType': 'HASH'
+                }
+            ],
+            AttributeDefinitions=[
+                {
+                    'AttributeName': 'id',
+                    'AttributeType': 'S'
+                }
+            ],
+            ProvisionedThroughput={
+                'ReadCapacityUnits': 1,
+                'WriteCapacityUnits': 1
+            }
+        )
+
+        # Adding some mock products to the table
+        for i in range(5):
+            ddb_table.put_item(
+                Item={
+                    'id': str(i),
+                    'name': f'Product {i}'
+                }
+            )
+
+        # Read the table 2 products at a time by following next_cursor
+        ids = []
+        cursor = None
+        pages = 0
+        while True:
+            valerror = {'error':''}
+            page = {}
+            result = get_products_from_ddb(table_name, valerror, limit=2, cursor=cursor, drain=False, page=page)
+
+            self.assertIsNotNone(result)
+            self.assertLessEqual(len(result), 2)  # One page is at most 'limit' products
+            self.assertEqual(valerror, {'error':''})  # No error should be set
+
+            ids.extend(product['id'] for product in result)
+            pages += 1
+            cursor = page['next_cursor']
+            if cursor is None:
+                break
+
+        self.assertEqual(sorted(ids), ['0', '1', '2', '3', '4'])  # Every product is read exactly once
+        self.assertGreaterEqual(pages, 3)
+
+        # Drain mode follows all pages, but stops at max_items and returns a cursor to continue
+        valerror = {'error':''}
+        page = {}
+        result = get_products_from_ddb(table_name, valerror, limit=2, drain=True, max_items=3, page=page)
+        self.assertEqual(len(result), 3)
+        self.assertIsNotNone(page['next_cursor'])
+
+        valerror = {'error':''}
+        page = {}
+        result = get_products_from_ddb(table_name, valerror, page=page)
+        self.assertEqual(len(result), 5)
+        self.assertIsNone(page['next_cursor'])
+
+    def test_get_products_from_ddb_invalid_cursor(self):
+        print(f'***************************************************')
+        print(f'Unit Test: {self.__class__.__name__} : {self._testMethodName} :')
+        print(f'***************************************************')
+
+        from handlers.get_products.get_products import decode_cursor, encode_cursor, get_paging_parameters
+
+        # A cursor is an opaque encoding of LastEvaluatedKey
+        self.assertEqual(decode_cursor(encode_cursor({'id': '3'})), {'id': '3'})
+        self.assertIsNone(encode_cursor(None))
+
+        with self.assertRaises(ValueError):
+            decode_cursor('not-a-cursor')
+
+        with self.assertRaises(ValueError):
+            get_paging_parameters({'limit': 'abc'})
+
+        # Without 'limit', all pages are drained. With 'limit', one page is returned.
+        self.assertTrue(get_paging_parameters(None)['drain'])
+        self.assertFalse(get_paging_parameters({'limit': '10'})['drain'])
+        self.assertTrue(get_paging_parameters({'limit': '10', 'all': 'true'})['drain'])
     
+    @mock_aws
+    def test_get_products_by_ids_from_ddb(self):
+        print(f'***************************************************')
+        print(f'Unit Test: {self.__class__.__name__} : {self._testMethodName} :')
+        print(f'***************************************************')
+
+        # https://docs.getmoto.org/en/latest/docs/getting_started.html
+        # According to moto documentation, I can use the clients and resources that I created
+        # in the AWS Lambda function, and then patch them (using patch_client() and patch_resource())
+        # to be used with moto.
+        from moto.core import patch_client, patch_resource
+        patch_resource(self.dynamodb)
+
+        from handlers.get_products.get_products import get_products_by_ids_from_ddb
+        dynamodb = self.dynamodb
+
+        # Setup mock DynamoDB
+        table_name = os.environ['PRODUCTS_TABLE']
+
+        ddb_table = dynamodb.Table(table_name) 
+
+        # Create mock table
+        dynamodb.create_table(
+            TableName=table_name,
+            KeySchema=[
+                {
+                    'AttributeName': 'id',
+                    'KeyType': 'HASH'
+                }
+            ],
+            AttributeDefinitions=[
+                {
+                    'AttributeName': 'id',
+                    'AttributeType': 'S'
+                }
+            ],
+            ProvisionedThroughput={
+                'ReadCapacityUnits': 1,
+                'WriteCapacityUnits': 1
+            }
+        )
+
+        # Adding more products than one BatchGetItem request can hold
+        with ddb_table.batch_writer() as batch:
+            for i in range(150):
+                batch.put_item(
+                    Item={
+                        'id': str(i),
+                        'name': f'Product {i}'
+                    }
+                )
+
+        valerror = {'error':''}
+        missing_ids = []
+        requested_ids = ['120', '3', 'unknown', '3', '45'] + [str(i) for i in range(100, 110)]
+        result = get_products_by_ids_from_ddb(table_name, requested_ids, valerror, missing_ids)
+
+        self.assertEqual(valerror, {'error':''})  # No error should be set
+        # Products are returned once each, in the requested order
+        self.assertEqual([product['id'] for product in result], ['120', '3', '45'] + [str(i) for i in range(100, 110)])
+        self.assertEqual(missing_ids, ['unknown'])
+
+        # More than 100 ids are split in several BatchGetItem requests
+        valerror = {'error':''}
+        result = get_products_by_ids_from_ddb(table_name, [str(i) for i in range(150)], valerror)
+        self.assertEqual(len(result), 150)
+
+    @patch('batch_get.time.sleep')
+    @patch('handlers.get_products.get_products.dynamodb')
+    def test_get_products_by_ids_from_ddb_unprocessed_keys(self, mock_dynamodb, mock_sleep):
+        print(f'***************************************************')
+        print(f'Unit Test: {self.__class__.__name__} : {self._testMethodName} :')
+        print(f'***************************************************')
+
+        from handlers.get_products.get_products import get_products_by_ids_from_ddb
+
+        table_name = os.environ['PRODUCTS_TABLE']
+
+        mock_dynamodb.Table.return_value.table_status = 'ACTIVE'
+        # First response is throttled for product '2', the retry returns it
+        mock_dynamodb.batch_get_item.side_effect = [
+            {
+                'Responses': {table_name: [{'id': '1'}]},
+                'UnprocessedKeys': {table_name: {'Keys': [{'id': '2'}]}}
+            },
+            {
+                'Responses': {table_name: [{'id': '2'}]},
+                'UnprocessedKeys': {}
+            }
+        ]
+
+        valerror = {'error':''}
+        result = get_products_by_ids_from_ddb(table_name, ['2', '1'], valerror)
+
+        self.assertEqual([product['id'] for product in result], ['2', '1'])
+        self.assertEqual(mock_dynamodb.batch_get_item.call_count, 2)
+        mock_sleep.assert_called_once()  # Backoff before retrying unprocessed keys
+
+class TestGetProductsETag(unittest.TestCase):
+
+    @mock_aws
+    def setUp(self):
+
+        os.environ['PRODUCTS_TABLE'] = 'test_table'
+        os.environ['FRONTEND_URL'] = 'test_frontend_url'
+        
+        # Import after patching env variables
+        from handlers.get_products.get_products import lambda_handler, catalog_cache, is_etag_matched
+        from handlers.get_products.get_products import dynamodb
+
+        self.lambda_handler = lambda_handler  # Store it in an instance variable
+        self.catalog_cache = catalog_cache
+        self.is_etag_matched = is_etag_matched
+        self.dynamodb = dynamodb
+
+        # Every test starts with a cold catalog cache
+        self.catalog_cache['body'] = None
+
+    def tearDown(self):
+        self.catalog_cache['body'] = None
+        os.environ.pop('PRODUCTS_TABLE', None)
+        os.environ.pop('FRONTEND_URL', None)
+
+    @mock_aws
+    def test_get_products_not_modified(self):
+        print(f'***************************************************')
+        print(f'Unit Test: {self.__class__.__name__} : {self._testMethodName} :')
+        print(f'***************************************************')
+
+        # https://docs.getmoto.org/en/latest/docs/getting_started.html
+        # According to moto documentation, I can use the clients and resources that I created
+        # in the AWS Lambda function, and then patch them (using patch_client() and patch_resource())
+        # to be used with moto.
+        from moto.core import patch_client, patch_resource
+        patch_resource(self.dynamodb)
+
+        dynamodb = self.dynamodb
+
+        # Setup mock DynamoDB
+        table_name = os.environ['PRODUCTS_TABLE']
+
+        dynamodb.create_table(
+            TableName=table_name,
+            KeySchema=[
+                {
+                    'AttributeName': 'id',
+                    'KeyType': 'HASH'
+                }
+            ],
+            AttributeDefinitions=[
+                {
+                    'AttributeName': 'id',
+                    'AttributeType': 'S'
+                }
+            ],
+            ProvisionedThroughput={
+                'ReadCapacityUnits': 1,
+                'WriteCapacityUnits': 1
+            }
+        )
+        dynamodb.Table(table_name).put_item(Item={'id': '1', 'name': 'Product 1', 'inventory_count': 100})
+
+        # First page load: products are read from DynamoDB, and an ETag is returned
+        response = self.lambda_handler({'httpMethod': 'GET'}, None)
+        self.assertEqual(response['statusCode'], 200)
+        products = json.loads(response['body'])['products']
+        self.assertEqual(len(products), 1)
+        self.assertEqual(products[0]['inventory_count'], 100)  # DynamoDB Number (Decimal) serialized as JSON number
+        etag = response['headers']['ETag']
+
+        # Record every DynamoDB API call made by the Lambda function's resource
+        api_calls = []
+        def record_api_call(event_name, **kwargs):
+            api_calls.append(event_name.split('.')[-1])
+        dynamodb.meta.client.meta.events.register('before-call.dynamodb.*', record_api_call)
+
+        try:
+            # Repeat page load: 304 without a body, and no DynamoDB reads
+            response = self.lambda_handler({'httpMethod': 'GET', 'headers': {'if-none-match': etag}}, None)
+        finally:
+            dynamodb.meta.client.meta.events.unregister('before-call.dynamodb.*', record_api_call)
+
+        self.assertEqual(response['statusCode'], 304)
+        self.assertEqual(response['body'], '')
+        self.assertEqual(response['headers']['ETag'], etag)
+        self.assertEqual(api_calls, [])
+
+        # An old ETag gets the full body
+        response = self.lambda_handler({'httpMethod': 'GET', 'headers': {'If-None-Match': '"old"'}}, None)
+        self.assertEqual(response['statusCode'], 200)
+        self.assertEqual(response['headers']['ETag'], etag)
+
+    def test_is_etag_matched(self):
+        print(f'***************************************************')
+        print(f'Unit Test: {self.__class__.__name__} : {self._testMethodName} :')
+        print(f'***************************************************')
+
+        self.assertTrue(self.is_etag_matched('"abc"', '"abc"'))
+        self.assertTrue(self.is_etag_matched('"old", W/"abc"', '"abc"'))
+        self.assertTrue(self.is_etag_matched('*', '"abc"'))
+        self.assertFalse(self.is_etag_matched('"old"', '"abc"'))
+        self.assertFalse(self.is_etag_matched(None, '"abc"'))
+
 if __name__ == '__main__':
 
     os.environ['AWS_ACCESS_KEY_ID'] = 'testing'
@@ -0,0 +1,141 @@
+import unittest
+from unittest.mock import patch
+import boto3
+from moto import mock_aws
+from datetime import datetime
+import os
+import sys
+
+# Append the path of the shared Lambda layer, in order to import from layers/common/
+layer_path_to_add = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'layers', 'common'))
+sys.path.append(layer_path_to_add)
+
+class TestIncrementalReport(unittest.TestCase):
+
+    def setUp(self):
+
+        import incremental_report
+        from table_registry import invalidate_table
+
+        self.incremental_report = incremental_report  # Store it in an instance variable
+        invalidate_table('test_table')
+
+    def test_is_after(self):
+        print(f'***************************************************')
+        print(f'Unit Test: {self.__class__.__name__} : {self._testMethodName} :')
+        print(f'***************************************************')
+
+        watermark = {'order_time': '2025-04-02T12:00:00.000000Z', 'id': 'B'}
+
+        self.assertTrue(self.incremental_report.is_after({'order_time': '2025-04-02T12:00:01.000000Z', 'id': 'A'}, watermark))
+        # Same order_time: compared by id
+        self.assertTrue(self.incremental_report.is_after({'order_time': '2025-04-02T12:00:00.000000Z', 'id': 'C'}, watermark))
+        self.assertFalse(self.incremental_report.is_after({'order_time': '2025-04-02T12:00:00.000000Z', 'id': 'B'}, watermark))
+        self.assertFalse(self.incremental_report.is_after({'order_time': '2025-04-02T11:59:59.000000Z', 'id': 'Z'}, watermark))
+        self.assertTrue(self.incremental_report.is_after({'order_time': '2025-04-02T11:59:59.000000Z', 'id': 'Z'}, None))
+
+    @patch('incremental_report.REPORT_SETTLE_TIME_IN_SECONDS', 60)
+    def test_get_settle_time(self):
+        print(f'***************************************************')
+        print(f'Unit Test: {self.__class__.__name__} : {self._testMethodName} :')
+        print(f'***************************************************')
+
+        settle_time = self.incremental_report.get_settle_time(datetime(2025, 4, 2, 12, 0, 0))
+        self.assertEqual(settle_time, '2025-04-02T11:59:00.000000Z')
+
+    @mock_aws
+    def test_write_manifest_conditional(self):
+        print(f'***************************************************')
+        print(f'Unit Test: {self.__class__.__name__} : {self._testMethodName} :')
+        print(f'***************************************************')
+
+        s3 = boto3.client('s3', region_name='us-east-1')
+        s3.create_bucket(Bucket='test-bucket')
+
+        self.assertEqual(self.incremental_report.read_manifest(s3, 'test-bucket'), (None, None))
+
+        manifest = {'watermark': {'order_time': '2025-04-02T12:00:00Z', 'id': 'A'}, 'fragments': []}
+        self.incremental_report.write_manifest(s3, 'test-bucket', manifest, None)
+        stored_manifest, etag = self.incremental_report.read_manifest(s3, 'test-bucket')
+        self.assertEqual(stored_manifest, manifest)
+
+        # A second first report cannot overwrite the manifest
+        with self.assertRaises(ValueError):
+            self.incremental_report.write_manifest(s3, 'test-bucket', manifest, None)
+
+        # Only one of two executions that read the same version can update it
+        manifest['fragments'].append({'key': 'orders-report/fragments/1.html', 'from': None, 'to': None, 'count': 1})
+        self.incremental_report.write_manifest(s3, 'test-bucket', manifest, etag)
+        with self.assertRaises(ValueError):
+            self.incremental_report.write_manifest(s3, 'test-bucket', manifest, etag)
+
+    @mock_aws
+    def test_query_orders_after(self):
+        print(f'***************************************************')
+        print(f'Unit Test: {self.__class__.__name__} : {self._testMethodName} :')
+        print(f'***************************************************')
+
+        dynamodb = boto3.resource('dynamodb', region_name='us-east-1')
+        dynamodb.create_table(
+            TableName='test_table',
+            KeySchema=[{'AttributeName': 'id', 'KeyType': 'HASH'}],
+            AttributeDefinitions=[
+                {'AttributeName': 'id', 'AttributeType': 'S'},
+                {'AttributeName': 'order_day', 'AttributeType': 'S'},
+                {'AttributeName': 'order_time', 'AttributeType': 'S'}
+            ],
+            GlobalSecondaryIndexes=[{
+                'IndexName': 'OrderTimeIndex',
+                'KeySchema': [
+                    {'AttributeName': 'order_day', 'KeyType': 'HASH'},
+                    {'AttributeName': 'order_time', 'KeyType': 'RANGE'}
+                ],
+                'Projection': {'ProjectionType': 'ALL'},
+                'ProvisionedThroughput': {'ReadCapacityUnits': 1, 'WriteCapacityUnits': 1}
+            }],
+            ProvisionedThroughput={'ReadCapacityUnits': 1, 'WriteCapacityUnits': 1}
+        )
+        dynamodb.create_table(
+            TableName='test_order_days_table',
+            KeySchema=[
+                {'AttributeName': 'calendar', 'KeyType': 'HASH'},
+                {'AttributeName': 'order_day', 'KeyType': 'RANGE'}
+            ],
+            AttributeDefinitions=[
+                {'AttributeName': 'calendar', 'AttributeType': 'S'},
+                {'AttributeName': 'order_day', 'AttributeType': 'S'}
+            ],
+            ProvisionedThroughput={'ReadCapacityUnits': 1, 'WriteCapacityUnits': 1}
+        )
+        ddb_table = dynamodb.Table('test_table')
+        for order_id, order_time in [
+            ('A', '2025-04-01T10:00:00.000000Z'),
+            ('B', '2025-04-02T12:00:00.000000Z'),
+            ('C', '2025-04-02T12:00:00.000000Z'),
+            ('D', '2025-04-03T08:00:00.000000Z'),
+            ('E', '2026-10-05T08:00:00.000000Z')
+        ]:
+            ddb_table.put_item(Item={'id': order_id, 'order_time': order_time, 'order_day': order_time[:10]})
+            dynamodb.Table('test_order_days_table').put_item(Item={'calendar': 'orders', 'order_day': order_time[:10]})
+
+        watermark = {'order_time': '2025-04-02T12:00:00.000000Z', 'id': 'B'}
+        with patch('incremental_report.run_table_operation', wraps=self.incremental_report.run_table_operation) as mock_run_table_operation:
+            orders = list(self.incremental_report.query_orders_after(dynamodb, 'test_table', 'test_order_days_table', watermark))
+
+        self.assertEqual([order['id'] for order in orders], ['C', 'D', 'E'])
+        # Only the days that have orders are queried, however long ago the watermark is
+        self.assertEqual(mock_run_table_operation.call_count, 3)
+
+if __name__ == '__main__':
+
+    os.environ['AWS_ACCESS_KEY_ID'] = 'testing'
+    os.environ['AWS_SECRET_ACCESS_KEY'] = 'testing'
+    os.environ['AWS_SECURITY_TOKEN'] = 'testing'
+    os.environ['AWS_SESSION_TOKEN'] = 'testing'
+    os.environ['AWS_DEFAULT_REGION'] = 'us-east-1'
+
+    unittest.main()
+
+    # Remove the same path from sys.path when finished testing
+    if layer_path_to_add in sys.path:
+        sys.path.remove(layer_path_to_add)
@@ -0,0 +1,210 @@
+import unittest
+from unittest.mock import patch
+import boto3
+from moto import mock_aws
+import os
+import sys
+
+# Append the path of the shared Lambda layer, in order to import from layers/common/
+layer_path_to_add = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'layers', 'common'))
+sys.path.append(layer_path_to_add)
+
+class TestInventoryShards(unittest.TestCase):
+
+    def setUp(self):
+
+        import inventory_shards
+
+        self.inventory_shards = inventory_shards  # Store it in an instance variable
+        inventory_shards.invalidate_shard_counts()
+
+    def create_tables(self, shard_counts):
+        dynamodb = boto3.resource('dynamodb', region_name='us-east-1')
+        for table_name in ('test_products_table', 'test_shards_table'):
+            dynamodb.create_table(
+                TableName=table_name,
+                KeySchema=[{'AttributeName': 'id', 'KeyType': 'HASH'}],
+                AttributeDefinitions=[{'AttributeName': 'id', 'AttributeType': 'S'}],
+                ProvisionedThroughput={'ReadCapacityUnits': 1, 'WriteCapacityUnits': 1}
+            )
+
+        # Product 1 is not sharded. Product 2 has one shard per count.
+        dynamodb.Table('test_products_table').put_item(Item={'id': '1', 'inventory_count': 10})
+        dynamodb.Table('test_products_table').put_item(Item={'id': '2', 'inventory_count': 0, 'inventory_shards': len(shard_counts)})
+        for shard, count in enumerate(shard_counts):
+            dynamodb.Table('test_shards_table').put_item(Item={'id': f'2#{shard}', 'inventory_count': count})
+
+        return dynamodb
+
+    def get_shard_counts(self, dynamodb, shards):
+        return [int(dynamodb.Table('test_shards_table').get_item(Key={'id': f'2#{shard}'})['Item']['inventory_count']) for shard in range(shards)]
+
+    def decrement(self, dynamodb, quantities):
+        shard_counts = self.inventory_shards.get_shard_counts(dynamodb, 'test_products_table', list(quantities.keys()), 'test_shards_table')
+        plan = self.inventory_shards.plan_shards(shard_counts)
+        build_items = lambda: [self.inventory_shards.build_shard_decrement('test_products_table', 'test_shards_table', product_id, quantity, plan)
+                               for product_id, quantity in quantities.items()]
+        return self.inventory_shards.transact_with_shards(dynamodb, build_items, list(quantities.keys()), plan)
+
+    @mock_aws
+    def test_get_shard_counts(self):
+        print(f'***************************************************')
+        print(f'Unit Test: {self.__class__.__name__} : {self._testMethodName} :')
+        print(f'***************************************************')
+
+        dynamodb = self.create_tables([1, 1, 1])
+
+        # Without a shards table, sharding is disabled: nothing is read
+        self.assertEqual(self.inventory_shards.get_shard_counts(dynamodb, 'test_products_table', ['1', '2'], None), {})
+
+        self.assertEqual(self.inventory_shards.get_shard_counts(dynamodb, 'test_products_table', ['1', '2', '3'], 'test_shards_table'), {'2': 3})
+
+        # Shard counts are kept by the container
+        with patch.object(dynamodb, 'batch_get_item') as mock_batch_get_item:
+            self.assertEqual(self.inventory_shards.get_shard_counts(dynamodb, 'test_products_table', ['2'], 'test_shards_table'), {'2': 3})
+            mock_batch_get_item.assert_not_called()
+
+    @mock_aws
+    def test_transact_with_shards_fallback(self):
+        print(f'***************************************************')
+        print(f'Unit Test: {self.__class__.__name__} : {self._testMethodName} :')
+        print(f'***************************************************')
+
+        dynamodb = self.create_tables([0, 5, 1])
+
+        # Whichever shard is tried first, the shard with enough stock is found
+        for _ in range(2):
+            self.decrement(dynamodb, {'1': 1, '2': 2})
+        self.assertEqual(self.get_shard_counts(dynamodb, 3), [0, 1, 1])
+        self.assertEqual(dynamodb.Table('test_products_table').get_item(Key={'id': '1'})['Item']['inventory_count'], 8)
+
+        # The shards do not have enough stock together: the transaction is cancelled, and nothing is decremented
+        from botocore.exceptions import ClientError
+        with self.assertRaises(ClientError):
+            self.decrement(dynamodb, {'1': 1, '2': 3})
+        self.assertEqual(self.get_shard_counts(dynamodb, 3), [0, 1, 1])
+        self.assertEqual(dynamodb.Table('test_products_table').get_item(Key={'id': '1'})['Item']['inventory_count'], 8)
+
+        # No single shard has enough stock: the quantity is split across shards
+        self.decrement(dynamodb, {'1': 1, '2': 2})
+        self.assertEqual(self.get_shard_counts(dynamodb, 3), [0, 0, 0])
+        self.assertEqual(dynamodb.Table('test_products_table').get_item(Key={'id': '1'})['Item']['inventory_count'], 7)
+
+    @mock_aws
+    def test_transact_with_shards_split(self):
+        print(f'***************************************************')
+        print(f'Unit Test: {self.__class__.__name__} : {self._testMethodName} :')
+        print(f'***************************************************')
+
+        # 12 units are available, in 3 shards of 4 units: an order of 10 is placed
+        dynamodb = self.create_tables([4, 4, 4])
+        self.decrement(dynamodb, {'2': 10})
+        self.assertEqual(sorted(self.get_shard_counts(dynamodb, 3)), [0, 0, 2])
+
+    @mock_aws
+    def test_transact_with_shards_split_cancelled(self):
+        print(f'***************************************************')
+        print(f'Unit Test: {self.__class__.__name__} : {self._testMethodName} :')
+        print(f'***************************************************')
+
+        dynamodb = self.create_tables([4, 4, 4])
+        transact_write_items = dynamodb.meta.client.transact_write_items
+
+        def transact_concurrently(TransactItems):
+            # A concurrent order takes 3 units of shard 0 just before the split transaction
+            if len(TransactItems) > 2:
+                dynamodb.Table('test_shards_table').put_item(Item={'id': '2#0', 'inventory_count': 1})
+            return transact_write_items(TransactItems=TransactItems)
+
+        with patch.object(dynamodb.meta.client, 'transact_write_items', side_effect=transact_concurrently):
+            with self.assertRaises(self.inventory_shards.InventoryTransactionCanceled) as context:
+                self.decrement(dynamodb, {'1': 1, '2': 10})
+
+        # One entry per product, with the stock of all its shards, although the split transaction had 4 items
+        self.assertEqual(context.exception.failed_products, [{'product_id': '2', 'reason': 'Not enough stock available', 'inventory_count': 9}])
+        self.assertEqual(context.exception.response['Error']['Code'], 'TransactionCanceledException')
+        self.assertEqual(self.get_shard_counts(dynamodb, 3), [1, 4, 4])
+        self.assertEqual(dynamodb.Table('test_products_table').get_item(Key={'id': '1'})['Item']['inventory_count'], 10)
+
+    def test_try_next_shards(self):
+        print(f'***************************************************')
+        print(f'Unit Test: {self.__class__.__name__} : {self._testMethodName} :')
+        print(f'***************************************************')
+
+        plan = {'2': {'shards': [1, 0], 'position': 0}}
+        out_of_stock = [{'product_id': '2', 'reason': 'Not enough stock available', 'inventory_count': 0}]
+
+        self.assertTrue(self.inventory_shards.try_next_shards(plan, out_of_stock))
+        self.assertEqual(plan['2']['position'], 1)
+
+        # Every shard was tried, and the quantities are not split
+        self.assertFalse(self.inventory_shards.try_next_shards(plan, out_of_stock))
+
+        # Every shard was tried: the quantity is split with the stock of the shards, once
+        plan = {'2': {'shards': [1, 0], 'position': 0}}
+        self.assertTrue(self.inventory_shards.try_next_shards(plan, [{'product_id': '2', 'reason': 'Not enough stock available', 'inventory_count': 2}], {'2': 5}))
+        self.assertTrue(self.inventory_shards.try_next_shards(plan, [{'product_id': '2', 'reason': 'Not enough stock available', 'inventory_count': 3}], {'2': 5}))
+        self.assertEqual(plan['2']['split'], [(0, 3), (1, 2)])
+        self.assertFalse(self.inventory_shards.try_next_shards(plan, out_of_stock, {'2': 5}))
+
+        # The shards do not have enough stock together
+        plan = {'2': {'shards': [1, 0], 'position': 1, 'seen': {1: 2}}}
+        self.assertFalse(self.inventory_shards.try_next_shards(plan, [{'product_id': '2', 'reason': 'Not enough stock available', 'inventory_count': 2}], {'2': 5}))
+
+        # A product that is not sharded, or that does not exist, is not retried
+        plan = {'2': {'shards': [1, 0], 'position': 0}}
+        self.assertFalse(self.inventory_shards.try_next_shards(plan, out_of_stock + [{'product_id': '1', 'reason': 'Not enough stock available'}]))
+        self.assertFalse(self.inventory_shards.try_next_shards(plan, [{'product_id': '2', 'reason': 'Product not found'}]))
+        self.assertEqual(plan['2']['position'], 0)
+
+    @mock_aws
+    def test_aggregate_inventory(self):
+        print(f'***************************************************')
+        print(f'Unit Test: {self.__class__.__name__} : {self._testMethodName} :')
+        print(f'***************************************************')
+
+        dynamodb = self.create_tables([2, 3, 4])
+
+        products = dynamodb.Table('test_products_table').scan()['Items']
+        self.inventory_shards.aggregate_inventory(dynamodb, 'test_shards_table', products)
+
+        self.assertEqual({product['id']: int(product['inventory_count']) for product in products}, {'1': 10, '2': 9})
+
+        # inventory_shards is only returned when it was requested (see with_shard_field)
+        fields = ['id', 'inventory_count']
+        products = dynamodb.Table('test_products_table').scan(ProjectionExpression=', '.join(self.inventory_shards.with_shard_field(fields)))['Items']
+        self.inventory_shards.aggregate_inventory(dynamodb, 'test_shards_table', products)
+        self.inventory_shards.remove_shard_field(products, fields)
+        self.assertEqual(sorted(products, key=lambda product: product['id']), [{'id': '1', 'inventory_count': 10}, {'id': '2', 'inventory_count': 9}])
+
+    @mock_aws
+    def test_rebalance_shards(self):
+        print(f'***************************************************')
+        print(f'Unit Test: {self.__class__.__name__} : {self._testMethodName} :')
+        print(f'***************************************************')
+
+        dynamodb = self.create_tables([0, 10, 0])
+
+        self.assertTrue(self.inventory_shards.rebalance_shards(dynamodb, 'test_shards_table', '2', 3))
+        self.assertEqual(self.get_shard_counts(dynamodb, 3), [4, 3, 3])
+
+        # Already balanced
+        self.assertFalse(self.inventory_shards.rebalance_shards(dynamodb, 'test_shards_table', '2', 3))
+
+        # A shard that is missing is created
+        self.assertTrue(self.inventory_shards.rebalance_shards(dynamodb, 'test_shards_table', '2', 4))
+        self.assertEqual(self.get_shard_counts(dynamodb, 4), [3, 3, 2, 2])
+
+if __name__ == '__main__':
+
+    os.environ['AWS_ACCESS_KEY_ID'] = 'testing'
+    os.environ['AWS_SECRET_ACCESS_KEY'] = 'testing'
+    os.environ['AWS_SECURITY_TOKEN'] = 'testing'
+    os.environ['AWS_SESSION_TOKEN'] = 'testing'
+    os.environ['AWS_DEFAULT_REGION'] = 'us-east-1'
+
+    unittest.main()
+
+    # Remove the same path from sys.path when finished testing
+    if layer_path_to_add in sys.path:
+        sys.path.remove(layer_path_to_add)
@@ -1,15 +1,21 @@
 import unittest
+import json
 from unittest.mock import patch
 import uuid
 import os
 import sys
 from datetime import datetime
+from decimal import Decimal
 from moto import mock_aws
 
 # Append the path to sys.path, in order to import from DocumentLambdaFunction/
 path_to_add = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
 sys.path.append(path_to_add)
 
+# Append the path of the shared Lambda layer, in order to import from layers/common/
+layer_path_to_add = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'layers', 'common'))
+sys.path.append(layer_path_to_add)
+
 class TestGenerateShortId(unittest.TestCase):
 
     def setUp(self):
@@ -109,16 +115,23 @@ class TestCreateOrder(unittest.TestCase):
     def tearDown(self):
         os.environ.pop('ORDERS_TABLE', None)
 
+    @patch('handlers.new_order.new_order.get_catalog_prices')  # Mocking the catalog prices
+    @patch('handlers.new_order.new_order.generate_order_id')  # Mocking generate_order_id
     @patch('handlers.new_order.new_order.generate_short_id')  # Mocking generate_short_id
     @patch('handlers.new_order.new_order.datetime')  # Mocking datetime to return a fixed time
-    def test_create_order_success(self, mock_datetime, mock_generate_short_id):
+    def test_create_order_success(self, mock_datetime, mock_generate_short_id, mock_generate_order_id, mock_get_catalog_prices):
         print(f'***************************************************')
         print(f'Unit Test: {self.__class__.__name__} : {self._testMethodName} :')
         print(f'***************************************************')
                 
         # Set up mock return values
+        mock_generate_order_id.return_value = '01JQV4X2B8M3K9T5R7W1C0D2E4'
         mock_generate_short_id.return_value = '12345678'
         mock_datetime.now.return_value = datetime(2025, 4, 2, 12, 0, 0)
+        mock_get_catalog_prices.return_value = {
+            '1': {'price': Decimal('10.00'), 'product_name': 'Product 1'},
+            '2': {'price': Decimal('20.00'), 'product_name': 'Product 2'}
+        }
         
         # Sample input data (received order)
         received_order = {
@@ -142,13 +155,57 @@ class TestCreateOrder(unittest.TestCase):
 
         # Assertions
         self.assertIsNotNone(result)
-        self.assertEqual(result['id'], '12345678')
+        self.assertEqual(result['id'], '01JQV4X2B8M3K9T5R7W1C0D2E4')
+        self.assertEqual(result['display_code'], '12345678')
         self.assertEqual(result['customer_name'], 'John Doe')
         self.assertEqual(result['email'], 'johndoe@example.com')
+        self.assertEqual(result['email_key'], 'johndoe@example.com')
         self.assertEqual(result['phone'], '555-555-5555')
         self.assertEqual(len(result['ordered_items']), 2)
         self.assertEqual(result['total_amount'], '40.00')
         self.assertEqual(result['order_time'], '2025-04-02T12:00:00Z')
+        self.assertEqual(result['order_day'], '2025-04-02')
+        self.assertEqual(result['ordered_items'][0], {'product_id': '1', 'product_name': 'Product 1', 'quantity': '2', 'amount': '20.00'})
+        # The prices of both products are read together
+        mock_get_catalog_prices.assert_called_once()
+        self.assertEqual(mock_get_catalog_prices.call_args[0][2], ['1', '2'])
+
+    @patch('handlers.new_order.new_order.generate_short_id')
+    def test_create_order_price_changed(self, mock_generate_short_id):
+        print(f'***************************************************')
+        print(f'Unit Test: {self.__class__.__name__} : {self._testMethodName} :')
+        print(f'***************************************************')
+
+        mock_generate_short_id.return_value = '12345678'
+
+        # The client saw 10.00, the catalog price is now 10.50
+        received_order = {
+            'personalInfo': {
+                'customer_name': 'John Doe',
+                'email': 'johndoe@example.com',
+                'phone': '555-555-5555'
+            },
+            'customerproduct': {
+                'productsToSubmit': [
+                    {'id': 1, 'name': 'Product 1', 'quantity': 2, 'price': '10.00'}
+                ]
+            }
+        }
+        prices = {'1': {'price': Decimal('10.50'), 'product_name': 'Product 1'}}
+
+        valerror = {'error':''}
+        result = self.create_order(received_order, valerror, prices=prices)
+
+        self.assertIsNone(result)
+        self.assertIsInstance(valerror['error'], ValueError)
+        self.assertIn('Prices have changed', str(valerror['error']))
+
+        # An unknown product is rejected
+        valerror = {'error':''}
+        result = self.create_order(received_order, valerror, prices={})
+
+        self.assertIsNone(result)
+        self.assertIn('Product not found (product 1)', str(valerror['error']))
 
     @patch('handlers.new_order.new_order.generate_short_id')
     def test_create_order_with_error(self, mock_generate_short_id):
@@ -349,7 +406,7 @@ class TestPutItemInDynamoDB(unittest.TestCase):
 
         # The moto library mocks AWS services, so you can return this response
         # when calling the `dynamodb.Table` method        
-        ddb_table.put_item = lambda Item: dynamodb_mock_response
+        ddb_table.put_item = lambda **kwargs: dynamodb_mock_response
 
         order = {
             'order_id': '12345',
@@ -371,6 +428,633 @@ class TestPutItemInDynamoDB(unittest.TestCase):
         self.assertIn('error', valerror)  # Error should be in the valerror dict
         self.assertTrue(isinstance(valerror['error'], ValueError))  # Check if the error is ValueError
 
+    @mock_aws
+    def test_put_item_in_dynamodb_id_taken(self):
+        print(f'***************************************************')
+        print(f'Unit Test: {self.__class__.__name__} : {self._testMethodName} :')
+        print(f'***************************************************')
+
+        # https://docs.getmoto.org/en/latest/docs/getting_started.html
+        # According to moto documentation, I can use the clients and resources that I created
+        # in the AWS Lambda function, and then patch them (using patch_client() and patch_resource())
+        # to be used with moto.
+        from moto.core import patch_client, patch_resource
+        patch_resource(self.dynamodb)
+
+        from handlers.new_order.new_order import is_order_id_taken
+
+        table_name = os.environ['ORDERS_TABLE']
+        ddb_table = self.dynamodb.Table(table_name)
+        self.dynamodb.create_table(
+            TableName=table_name,
+            KeySchema=[{'AttributeName': 'id', 'KeyType': 'HASH'}],
+            AttributeDefinitions=[{'AttributeName': 'id', 'AttributeType': 'S'}],
+            ProvisionedThroughput={'ReadCapacityUnits': 1, 'WriteCapacityUnits': 1}
+        )
+
+        order = {'id': '01JQV4X2B8M3K9T5R7W1C0D2E4', 'submission_id': 'a1b2c3d4e5f6', 'customer_name': 'John Doe'}
+        self.assertTrue(self.put_item_in_dynamodb(ddb_table, dict(order), {}, {}))
+
+        # The same submission (for example after a timeout of the Express execution) is placed once
+        valerror = {}
+        self.assertTrue(self.put_item_in_dynamodb(ddb_table, dict(order), {}, valerror))
+        self.assertEqual(len(valerror), 0)
+
+        # Another order never overwrites an existing order with the same id
+        other_order = {'id': order['id'], 'submission_id': 'f6e5d4c3b2a1', 'customer_name': 'Jane Doe'}
+        valerror = {}
+        self.assertFalse(self.put_item_in_dynamodb(ddb_table, other_order, {}, valerror))
+        self.assertTrue(is_order_id_taken(valerror['error']))
+        self.assertEqual(ddb_table.get_item(Key={'id': order['id']})['Item']['customer_name'], 'John Doe')
+
+class TestPlaceOrderInDynamoDB(unittest.TestCase):
+
+    def setUp(self):
+
+        os.environ['ORDERS_TABLE'] = 'test_table'
+        
+        # Import after patching env variables
+        from handlers.new_order.new_order import place_order_in_dynamodb
+        from handlers.new_order.new_order import dynamodb
+        from table_registry import invalidate_table
+
+        self.place_order_in_dynamodb = place_order_in_dynamodb  # Store it in an instance variable
+        self.dynamodb = dynamodb
+        invalidate_table('test_table')
+        invalidate_table('test_products_table')
+
+    def tearDown(self):
+        os.environ.pop('ORDERS_TABLE', None)
+
+    def create_tables(self):
+        for table_name in ('test_table', 'test_products_table'):
+            self.dynamodb.create_table(
+                TableName=table_name,
+                KeySchema=[{'AttributeName': 'id', 'KeyType': 'HASH'}],
+                AttributeDefinitions=[{'AttributeName': 'id', 'AttributeType': 'S'}],
+                ProvisionedThroughput={'ReadCapacityUnits': 1, 'WriteCapacityUnits': 1}
+            )
+
+        products_table = self.dynamodb.Table('test_products_table')
+        products_table.put_item(Item={'id': '1', 'inventory_count': 10})
+        products_table.put_item(Item={'id': '2', 'inventory_count': 10})
+        products_table.put_item(Item={'id': '3', 'inventory_count': 1})
+
+    def get_inventory_counts(self):
+        products_table = self.dynamodb.Table('test_products_table')
+        return [products_table.get_item(Key={'id': product_id})['Item']['inventory_count'] for product_id in ('1', '2', '3')]
+
+    def create_shards_table(self, shard_counts):
+        # Product 2 keeps its stock in one shard per count (see layers/common/inventory_shards.py)
+        from inventory_shards import invalidate_shard_counts
+        invalidate_shard_counts()
+        from table_registry import invalidate_table
+        invalidate_table('test_shards_table')
+        self.dynamodb.create_table(
+            TableName='test_shards_table',
+            KeySchema=[{'AttributeName': 'id', 'KeyType': 'HASH'}],
+            AttributeDefinitions=[{'AttributeName': 'id', 'AttributeType': 'S'}],
+            ProvisionedThroughput={'ReadCapacityUnits': 1, 'WriteCapacityUnits': 1}
+        )
+        self.dynamodb.Table('test_products_table').update_item(
+            Key={'id': '2'}, UpdateExpression='SET inventory_count = :zero, inventory_shards = :shards',
+            ExpressionAttributeValues={':zero': 0, ':shards': len(shard_counts)}
+        )
+        for shard, count in enumerate(shard_counts):
+            self.dynamodb.Table('test_shards_table').put_item(Item={'id': f'2#{shard}', 'inventory_count': count})
+
+    def get_shard_counts(self, shards):
+        return [int(self.dynamodb.Table('test_shards_table').get_item(Key={'id': f'2#{shard}'})['Item']['inventory_count']) for shard in range(shards)]
+
+    def make_order(self, quantities):
+        received_order = {
+            'customerproduct': {
+                'productsToSubmit': [{'id': product_id, 'quantity': quantity} for product_id, quantity in quantities]
+            }
+        }
+        order = {
+            'id': '12345678',
+            'customer_name': 'John Doe',
+            'ordered_items': [],
+            'total_amount': '100.00'
+        }
+        return order, received_order
+
+    @patch('handlers.new_order.new_order.products_table_name', 'test_products_table')
+    @mock_aws
+    def test_place_order_in_dynamodb_success(self):
+        print(f'***************************************************')
+        print(f'Unit Test: {self.__class__.__name__} : {self._testMethodName} :')
+        print(f'***************************************************')
+
+        # https://docs.getmoto.org/en/latest/docs/getting_started.html
+        # According to moto documentation, I can use the clients and resources that I created
+        # in the AWS Lambda function, and then patch them (using patch_client() and patch_resource())
+        # to be used with moto.
+        from moto.core import patch_client, patch_resource
+        patch_resource(self.dynamodb)
+
+        self.create_tables()
+        order, received_order = self.make_order([(1, 2), (2, 3)])
+
+        valerror = {'error':''}
+        result = self.place_order_in_dynamodb(order, received_order, valerror)
+
+        self.assertTrue(result)
+        self.assertEqual(valerror, {'error':''})  # No error should be set
+        self.assertIn('Item', self.dynamodb.Table('test_table').get_item(Key={'id': '12345678'}))
+        self.assertEqual(self.get_inventory_counts(), [8, 7, 1])
+
+    @patch('handlers.new_order.new_order.products_table_name', 'test_products_table')
+    @mock_aws
+    def test_place_order_in_dynamodb_not_enough_stock(self):
+        print(f'***************************************************')
+        print(f'Unit Test: {self.__class__.__name__} : {self._testMethodName} :')
+        print(f'***************************************************')
+
+        # https://docs.getmoto.org/en/latest/docs/getting_started.html
+        # According to moto documentation, I can use the clients and resources that I created
+        # in the AWS Lambda function, and then patch them (using patch_client() and patch_resource())
+        # to be used with moto.
+        from moto.core import patch_client, patch_resource
+        patch_resource(self.dynamodb)
+
+        self.create_tables()
+        order, received_order = self.make_order([(1, 2), (3, 5)])
+
+        valerror = {'error':''}
+        result = self.place_order_in_dynamodb(order, received_order, valerror)
+
+        # No order is written without stock behind it, and no stock is reserved
+        self.assertFalse(result)
+        self.assertEqual(valerror['failed_products'], [{'product_id': '3', 'reason': 'Not enough stock available', 'inventory_count': 1}])
+        self.assertNotIn('Item', self.dynamodb.Table('test_table').get_item(Key={'id': '12345678'}))
+        self.assertEqual(self.get_inventory_counts(), [10, 10, 1])
+
+    @patch('handlers.new_order.new_order.products_table_name', 'test_products_table')
+    @mock_aws
+    def test_place_order_in_dynamodb_same_submission(self):
+        print(f'***************************************************')
+        print(f'Unit Test: {self.__class__.__name__} : {self._testMethodName} :')
+        print(f'***************************************************')
+
+        # https://docs.getmoto.org/en/latest/docs/getting_started.html
+        # According to moto documentation, I can use the clients and resources that I created
+        # in the AWS Lambda function, and then patch them (using patch_client() and patch_resource())
+        # to be used with moto.
+        from moto.core import patch_client, patch_resource
+        patch_resource(self.dynamodb)
+
+        self.create_tables()
+        order, received_order = self.make_order([(1, 2), (3, 1)])
+        order['submission_id'] = 'a1b2c3d4e5f6'
+
+        # The Express execution and the Standard execution (after a timeout) place the same submission
+        valerror = {'error':''}
+        self.assertTrue(self.place_order_in_dynamodb(order, received_order, valerror))
+        valerror = {'error':''}
+        self.assertTrue(self.place_order_in_dynamodb(order, received_order, valerror))
+
+        # The order is placed once
+        self.assertTrue(valerror['already_placed'])
+        self.assertEqual(self.get_inventory_counts(), [8, 10, 0])
+
+        # Another submission with the same order id is not placed
+        order, received_order = self.make_order([(1, 1)])
+        order['submission_id'] = 'f6e5d4c3b2a1'
+        valerror = {'error':''}
+        self.assertFalse(self.place_order_in_dynamodb(order, received_order, valerror))
+        self.assertTrue(valerror['order_id_taken'])
+        self.assertEqual(self.get_inventory_counts(), [8, 10, 0])
+
+    @patch('handlers.new_order.new_order.MAX_TRANSACTION_ITEMS', 2)
+    @patch('handlers.new_order.new_order.products_table_name', 'test_products_table')
+    @mock_aws
+    def test_place_order_in_dynamodb_several_transactions(self):
+        print(f'***************************************************')
+        print(f'Unit Test: {self.__class__.__name__} : {self._testMethodName} :')
+        print(f'***************************************************')
+
+        # https://docs.getmoto.org/en/latest/docs/getting_started.html
+        # According to moto documentation, I can use the clients and resources that I created
+        # in the AWS Lambda function, and then patch them (using patch_client() and patch_resource())
+        # to be used with moto.
+        from moto.core import patch_client, patch_resource
+        patch_resource(self.dynamodb)
+
+        self.create_tables()
+
+        # With 2 items per transaction: (product 1, product 2), then (product 3, order).
+        # The second transaction is cancelled, so the stock of products 1 and 2 is given back.
+        order, received_order = self.make_order([(1, 1), (2, 1), (3, 2)])
+
+        valerror = {'error':''}
+        result = self.place_order_in_dynamodb(order, received_order, valerror)
+
+        self.assertFalse(result)
+        self.assertEqual([failed_product['product_id'] for failed_product in valerror['failed_products']], ['3'])
+        self.assertNotIn('Item', self.dynamodb.Table('test_table').get_item(Key={'id': '12345678'}))
+        self.assertEqual(self.get_inventory_counts(), [10, 10, 1])
+
+        # With enough stock, all transactions are committed
+        order, received_order = self.make_order([(1, 1), (2, 1), (3, 1)])
+        valerror = {'error':''}
+        self.assertTrue(self.place_order_in_dynamodb(order, received_order, valerror))
+        self.assertIn('Item', self.dynamodb.Table('test_table').get_item(Key={'id': '12345678'}))
+        self.assertEqual(self.get_inventory_counts(), [9, 9, 0])
+
+    @patch('handlers.new_order.new_order.products_table_name', 'test_products_table')
+    @patch('handlers.new_order.new_order.shards_table_name', 'test_shards_table')
+    @mock_aws
+    def test_place_order_in_dynamodb_split_cancelled(self):
+        print(f'***************************************************')
+        print(f'Unit Test: {self.__class__.__name__} : {self._testMethodName} :')
+        print(f'***************************************************')
+
+        from moto.core import patch_client, patch_resource
+        patch_resource(self.dynamodb)
+
+        self.create_tables()
+        self.create_shards_table([4, 4, 4])
+        order, received_order = self.make_order([(1, 2), (2, 10)])
+
+        transact_write_items = self.dynamodb.meta.client.transact_write_items
+        def transact_concurrently(TransactItems):
+            # A concurrent order takes 3 units of shard 0 just before the split transaction
+            if len(TransactItems) > 3:
+                self.dynamodb.Table('test_shards_table').put_item(Item={'id': '2#0', 'inventory_count': 1})
+            return transact_write_items(TransactItems=TransactItems)
+
+        valerror = {'error':''}
+        with patch.object(self.dynamodb.meta.client, 'transact_write_items', side_effect=transact_concurrently):
+            result = self.place_order_in_dynamodb(order, received_order, valerror)
+
+        # The order is out of stock (with the stock of all shards), not "already exists"
+        self.assertFalse(result)
+        self.assertNotIn('order_id_taken', valerror)
+        self.assertEqual(valerror['failed_products'], [{'product_id': '2', 'reason': 'Not enough stock available', 'inventory_count': 9}])
+        self.assertEqual(self.get_shard_counts(3), [1, 4, 4])
+        self.assertEqual(self.get_inventory_counts()[0], 10)
+
+class TestBatchOrderHandler(unittest.TestCase):
+
+    def setUp(self):
+
+        os.environ['ORDERS_TABLE'] = 'test_table'
+        
+        # Import after patching env variables
+        from handlers.new_order.new_order import batch_order_handler, write_orders_in_batches
+        from handlers.new_order.new_order import dynamodb
+        from table_registry import invalidate_table
+        from catalog_prices import invalidate_prices
+
+        self.batch_order_handler = batch_order_handler  # Store it in an instance variable
+        self.write_orders_in_batches = write_orders_in_batches
+        self.dynamodb = dynamodb
+        invalidate_table('test_table')
+        invalidate_table('test_products_table')
+        invalidate_prices()
+
+    def tearDown(self):
+        os.environ.pop('ORDERS_TABLE', None)
+
+    def create_tables(self):
+        for table_name in ('test_table', 'test_products_table'):
+            self.dynamodb.create_table(
+                TableName=table_name,
+                KeySchema=[{'AttributeName': 'id', 'KeyType': 'HASH'}],
+                AttributeDefinitions=[{'AttributeName': 'id', 'AttributeType': 'S'}],
+                ProvisionedThroughput={'ReadCapacityUnits': 1, 'WriteCapacityUnits': 1}
+            )
+
+        products_table = self.dynamodb.Table('test_products_table')
+        products_table.put_item(Item={'id': '1', 'product_name': 'Product 1', 'price': '10.00', 'inventory_count': 10})
+        products_table.put_item(Item={'id': '2', 'product_name': 'Product 2', 'price': '10.00', 'inventory_count': 10})
+        products_table.put_item(Item={'id': '3', 'product_name': 'Product 3', 'price': '10.00', 'inventory_count': 1})
+
+    def get_inventory_counts(self):
+        products_table = self.dynamodb.Table('test_products_table')
+        return [products_table.get_item(Key={'id': product_id})['Item']['inventory_count'] for product_id in ('1', '2', '3')]
+
+    def create_shards_table(self, shard_counts):
+        # Product 2 keeps its stock in one shard per count (see layers/common/inventory_shards.py)
+        from inventory_shards import invalidate_shard_counts
+        invalidate_shard_counts()
+        from table_registry import invalidate_table
+        invalidate_table('test_shards_table')
+        self.dynamodb.create_table(
+            TableName='test_shards_table',
+            KeySchema=[{'AttributeName': 'id', 'KeyType': 'HASH'}],
+            AttributeDefinitions=[{'AttributeName': 'id', 'AttributeType': 'S'}],
+            ProvisionedThroughput={'ReadCapacityUnits': 1, 'WriteCapacityUnits': 1}
+        )
+        self.dynamodb.Table('test_products_table').update_item(
+            Key={'id': '2'}, UpdateExpression='SET inventory_count = :zero, inventory_shards = :shards',
+            ExpressionAttributeValues={':zero': 0, ':shards': len(shard_counts)}
+        )
+        for shard, count in enumerate(shard_counts):
+            self.dynamodb.Table('test_shards_table').put_item(Item={'id': f'2#{shard}', 'inventory_count': count})
+
+    def get_shard_counts(self, shards):
+        return [int(self.dynamodb.Table('test_shards_table').get_item(Key={'id': f'2#{shard}'})['Item']['inventory_count']) for shard in range(shards)]
+
+    def make_order(self, customer_name, quantities):
+        return {
+            'personalInfo': {
+                'customer_name': customer_name,
+                'email': 'johndoe@example.com',
+                'phone': '555-555-5555'
+            },
+            'customerproduct': {
+                'productsToSubmit': [
+                    {'id': product_id, 'name': f'Product {product_id}', 'quantity': quantity, 'price': '10.00'}
+                    for product_id, quantity in quantities
+                ]
+            }
+        }
+
+    @patch('handlers.new_order.new_order.products_table_name', 'test_products_table')
+    @mock_aws
+    def test_batch_order_handler(self):
+        print(f'***************************************************')
+        print(f'Unit Test: {self.__class__.__name__} : {self._testMethodName} :')
+        print(f'***************************************************')
+
+        # https://docs.getmoto.org/en/latest/docs/getting_started.html
+        # According to moto documentation, I can use the clients and resources that I created
+        # in the AWS Lambda function, and then patch them (using patch_client() and patch_resource())
+        # to be used with moto.
+        from moto.core import patch_client, patch_resource
+        patch_resource(self.dynamodb)
+
+        self.create_tables()
+
+        received_orders = [
+            self.make_order('John Doe', [(1, 2), (3, 1)]),
+            {'customerproduct': {}},                        # Invalid: no personalInfo
+            self.make_order('Jane Doe', [(2, 1), (3, 1)]),  # Product 3 has no stock left
+            self.make_order('Jim Doe', [(1, 3), (2, 4)]),
+            self.make_order('Joe Doe', [(4, 1)]),           # Product 4 does not exist
+            self.make_order('Jay Doe', [(1, 1)])            # The client saw another price
+        ]
+        received_orders[5]['customerproduct']['productsToSubmit'][0]['price'] = '9.00'
+        response = self.batch_order_handler({'body': json.dumps({'orders': received_orders})}, None)
+
+        self.assertEqual(response['statusCode'], 200)
+        body = json.loads(response['body'])
+        self.assertEqual(body['created'], 2)
+        self.assertEqual([result['status'] for result in body['results']], ['created', 'invalid', 'rejected', 'created', 'invalid', 'invalid'])
+        self.assertEqual(body['results'][2]['failed_products'], [{'product_id': '3', 'reason': 'Not enough stock available', 'inventory_count': 1}])
+        # Orders are repriced with the catalog before any stock is reserved
+        self.assertIn('Product not found (product 4)', body['results'][4]['error'])
+        self.assertIn('Prices have changed', body['results'][5]['error'])
+
+        # The stock of the created orders only is decremented, once per product
+        self.assertEqual(self.get_inventory_counts(), [5, 6, 0])
+
+        orders_table = self.dynamodb.Table('test_table')
+        for result in (body['results'][0], body['results'][3]):
+            item = orders_table.get_item(Key={'id': result['order_id']})['Item']
+            self.assertEqual(item['display_code'], result['display_code'])
+        self.assertEqual(orders_table.scan()['Count'], 2)
+
+    @patch('handlers.new_order.new_order.products_table_name', 'test_products_table')
+    @patch('handlers.new_order.new_order.shards_table_name', 'test_shards_table')
+    @mock_aws
+    def test_batch_order_handler_sharded_stock(self):
+        print(f'***************************************************')
+        print(f'Unit Test: {self.__class__.__name__} : {self._testMethodName} :')
+        print(f'***************************************************')
+
+        from moto.core import patch_client, patch_resource
+        patch_resource(self.dynamodb)
+
+        self.create_tables()
+        self.create_shards_table([3, 3])
+
+        # 6 units in 2 shards: the first order is created, the second one is rejected
+        received_orders = [self.make_order('John Doe', [(2, 4)]), self.make_order('Jane Doe', [(2, 4)])]
+        response = self.batch_order_handler({'body': json.dumps({'orders': received_orders})}, None)
+
+        body = json.loads(response['body'])
+        self.assertEqual([result['status'] for result in body['results']], ['created', 'rejected'])
+        # The stock of a sharded product is the stock of all its shards, not of the shard that was tried
+        self.assertEqual(body['results'][1]['failed_products'], [{'product_id': '2', 'reason': 'Not enough stock available', 'inventory_count': 6}])
+        self.assertEqual(sum(self.get_shard_counts(2)), 2)
+
+    @patch('handlers.new_order.new_order.MAX_BATCH_ORDERS', 2)
+    def test_batch_order_handler_invalid_body(self):
+        print(f'***************************************************')
+        print(f'Unit Test: {self.__class__.__name__} : {self._testMethodName} :')
+        print(f'***************************************************')
+
+        for body in ('not json', json.dumps({'orders': []}), json.dumps({'orders': [{}, {}, {}]})):
+            response = self.batch_order_handler({'body': body}, None)
+            self.assertEqual(response['statusCode'], 400)
+            self.assertIn('error', json.loads(response['body']))
+
+    @patch('handlers.new_order.new_order.time.sleep')
+    @patch('handlers.new_order.new_order.dynamodb')
+    def test_write_orders_in_batches_unprocessed_items(self, mock_dynamodb, mock_sleep):
+        print(f'***************************************************')
+        print(f'Unit Test: {self.__class__.__name__} : {self._testMethodName} :')
+        print(f'***************************************************')
+
+        orders = [{'id': f'order{i}'} for i in range(30)]
+
+        # 25 orders, then the 5 others. The first request is throttled for one order.
+        mock_dynamodb.batch_write_item.side_effect = [
+            {'UnprocessedItems': {'test_table': [{'PutRequest': {'Item': orders[3]}}]}},
+            {'UnprocessedItems': {}},
+            {}
+        ]
+
+        valerror = {'error':''}
+        self.assertEqual(self.write_orders_in_batches(orders, valerror), [])
+        self.assertEqual(mock_dynamodb.batch_write_item.call_count, 3)
+        self.assertEqual(len(mock_dynamodb.batch_write_item.call_args_list[0].kwargs['RequestItems']['test_table']), 25)
+        self.assertEqual(mock_dynamodb.batch_write_item.call_args_list[1].kwargs['RequestItems']['test_table'], [{'PutRequest': {'Item': orders[3]}}])
+        self.assertEqual(mock_sleep.call_count, 1)
+
+        # Items that are still unprocessed after MAX_BATCH_RETRIES are reported
+        mock_dynamodb.batch_write_item.side_effect = None
+        mock_dynamodb.batch_write_item.return_value = {'UnprocessedItems': {'test_table': [{'PutRequest': {'Item': orders[0]}}]}}
+        valerror = {'error':''}
+        self.assertEqual(self.write_orders_in_batches(orders[:1], valerror), ['order0'])
+        self.assertTrue(isinstance(valerror['error'], ValueError))
+
+class TestQueueOrderHandler(unittest.TestCase):
+
+    def setUp(self):
+
+        os.environ['ORDERS_TABLE'] = 'test_table'
+        
+        # Import after patching env variables
+        from handlers.new_order.new_order import queue_order_handler
+        from handlers.new_order.new_order import dynamodb
+        from table_registry import invalidate_table
+        from catalog_prices import invalidate_prices
+
+        self.queue_order_handler = queue_order_handler  # Store it in an instance variable
+        self.dynamodb = dynamodb
+        invalidate_table('test_table')
+        invalidate_table('test_products_table')
+        invalidate_table('test_rejected_orders_table')
+        invalidate_prices()
+
+    def tearDown(self):
+        os.environ.pop('ORDERS_TABLE', None)
+
+    def create_tables(self):
+        for table_name in ('test_table', 'test_products_table'):
+            self.dynamodb.create_table(
+                TableName=table_name,
+                KeySchema=[{'AttributeName': 'id', 'KeyType': 'HASH'}],
+                AttributeDefinitions=[{'AttributeName': 'id', 'AttributeType': 'S'}],
+                ProvisionedThroughput={'ReadCapacityUnits': 1, 'WriteCapacityUnits': 1}
+            )
+
+        self.dynamodb.create_table(
+            TableName='test_rejected_orders_table',
+            KeySchema=[{'AttributeName': 'order_id', 'KeyType': 'HASH'}],
+            AttributeDefinitions=[{'AttributeName': 'order_id', 'AttributeType': 'S'}],
+            ProvisionedThroughput={'ReadCapacityUnits': 1, 'WriteCapacityUnits': 1}
+        )
+
+        products_table = self.dynamodb.Table('test_products_table')
+        products_table.put_item(Item={'id': '1', 'product_name': 'Product 1', 'price': '10.00', 'inventory_count': 10})
+        products_table.put_item(Item={'id': '2', 'product_name': 'Product 2', 'price': '10.00', 'inventory_count': 1})
+
+    def get_inventory_counts(self):
+        products_table = self.dynamodb.Table('test_products_table')
+        return [products_table.get_item(Key={'id': product_id})['Item']['inventory_count'] for product_id in ('1', '2')]
+
+    def make_message(self, order_id, quantities):
+        # Same input as the state machine executions (see create_order.py)
+        received_order = {
+            'personalInfo': {'customer_name': 'John Doe', 'email': 'johndoe@example.com', 'phone': '555-555-5555'},
+            'customerproduct': {
+                'productsToSubmit': [
+                    {'id': product_id, 'name': f'Product {product_id}', 'quantity': quantity, 'price': '10.00'}
+                    for product_id, quantity in quantities
+                ]
+            }
+        }
+        return json.dumps({'body': json.dumps(received_order), 'submission_id': order_id.lower(), 'order_id': order_id})
+
+    def receive_event(self, sqs, queue_url):
+        # Event of the SQS event source mapping (BatchSize: 10)
+        messages = sqs.receive_message(QueueUrl=queue_url, MaxNumberOfMessages=10).get('Messages', [])
+        return {'Records': [{'messageId': message['MessageId'], 'body': message['Body']} for message in messages]}
+
+    @patch('handlers.new_order.new_order.products_table_name', 'test_products_table')
+    @patch('handlers.new_order.new_order.rejected_orders_table_name', 'test_rejected_orders_table')
+    @mock_aws
+    def test_queue_order_handler(self):
+        print(f'***************************************************')
+        print(f'Unit Test: {self.__class__.__name__} : {self._testMethodName} :')
+        print(f'***************************************************')
+
+        # https://docs.getmoto.org/en/latest/docs/getting_started.html
+        # According to moto documentation, I can use the clients and resources that I created
+        # in the AWS Lambda function, and then patch them (using patch_client() and patch_resource())
+        # to be used with moto.
+        from moto.core import patch_client, patch_resource
+        patch_resource(self.dynamodb)
+        self.create_tables()
+
+        import boto3
+        sqs = boto3.client('sqs', region_name='us-east-1')
+        queue_url = sqs.create_queue(QueueName='test_order_queue')['QueueUrl']
+
+        messages = [
+            self.make_message('01JQV4X2B8M3K9T5R7W1C0D2E1', [(1, 2), (2, 1)]),
+            'not json',                                                         # Invalid: dropped
+            self.make_message('01JQV4X2B8M3K9T5R7W1C0D2E2', [(1, 3), (2, 1)]),  # Product 2 has no stock left: dropped
+            self.make_message('01JQV4X2B8M3K9T5R7W1C0D2E3', [(1, 1)]),
+            self.make_message('01JQV4X2B8M3K9T5R7W1C0D2E1', [(1, 2), (2, 1)])   # Delivered twice
+        ]
+        for message in messages:
+            sqs.send_message(QueueUrl=queue_url, MessageBody=message)
+
+        event = self.receive_event(sqs, queue_url)
+        self.assertEqual(len(event['Records']), 5)
+        response = self.queue_order_handler(event, None)
+
+        # No message is delivered again. Product 1 is decremented once, by 3.
+        self.assertEqual(response, {'batchItemFailures': []})
+        self.assertEqual(self.get_inventory_counts(), [7, 0])
+
+        orders_table = self.dynamodb.Table('test_table')
+        self.assertEqual(sorted(item['id'] for item in orders_table.scan()['Items']), ['01JQV4X2B8M3K9T5R7W1C0D2E1', '01JQV4X2B8M3K9T5R7W1C0D2E3'])
+
+        # The ticket of the order that is not placed resolves to its rejection
+        rejected_orders_table = self.dynamodb.Table('test_rejected_orders_table')
+        rejections = rejected_orders_table.scan()['Items']
+        self.assertEqual([item['order_id'] for item in rejections], ['01JQV4X2B8M3K9T5R7W1C0D2E2'])
+        self.assertTrue(rejections[0]['reason'].startswith('Could not place order: '))
+
+        # A message that is delivered again after its order was placed does not place it twice
+        sqs.send_message(QueueUrl=queue_url, MessageBody=messages[3])
+        response = self.queue_order_handler(self.receive_event(sqs, queue_url), None)
+        self.assertEqual(response, {'batchItemFailures': []})
+        self.assertEqual(self.get_inventory_counts(), [7, 0])
+
+    @patch('handlers.new_order.new_order.products_table_name', 'test_products_table')
+    @mock_aws
+    def test_queue_order_handler_write_failures(self):
+        print(f'***************************************************')
+        print(f'Unit Test: {self.__class__.__name__} : {self._testMethodName} :')
+        print(f'***************************************************')
+
+        # https://docs.getmoto.org/en/latest/docs/getting_started.html
+        # According to moto documentation, I can use the clients and resources that I created
+        # in the AWS Lambda function, and then patch them (using patch_client() and patch_resource())
+        # to be used with moto.
+        from moto.core import patch_client, patch_resource
+        patch_resource(self.dynamodb)
+        self.create_tables()
+
+        event = {'Records': [
+            {'messageId': 'message-1', 'body': self.make_message('01JQV4X2B8M3K9T5R7W1C0D2E1', [(1, 2)])},
+            {'messageId': 'message-2', 'body': self.make_message('01JQV4X2B8M3K9T5R7W1C0D2E2', [(1, 3)])}
+        ]}
+
+        # The second order cannot be written: only its message is delivered again, and its stock is given back
+        with patch('handlers.new_order.new_order.write_orders_in_batches', return_value=['01JQV4X2B8M3K9T5R7W1C0D2E2']):
+            response = self.queue_order_handler(event, None)
+        self.assertEqual(response, {'batchItemFailures': [{'itemIdentifier': 'message-2'}]})
+        self.assertEqual(self.get_inventory_counts(), [8, 1])
+
+        # When the batch cannot be placed at all, every message is delivered again
+        with patch('handlers.new_order.new_order.get_placed_order_ids', return_value=None):
+            response = self.queue_order_handler(event, None)
+        self.assertEqual(response, {'batchItemFailures': [{'itemIdentifier': 'message-1'}, {'itemIdentifier': 'message-2'}]})
+
+    @patch('handlers.new_order.new_order.products_table_name', 'test_products_table')
+    @patch('handlers.new_order.new_order.rejected_orders_table_name', 'test_rejected_orders_table')
+    @mock_aws
+    def test_queue_order_handler_rejection_failures(self):
+        print(f'***************************************************')
+        print(f'Unit Test: {self.__class__.__name__} : {self._testMethodName} :')
+        print(f'***************************************************')
+
+        from moto.core import patch_client, patch_resource
+        patch_resource(self.dynamodb)
+        self.create_tables()
+
+        event = {'Records': [
+            {'messageId': 'message-1', 'body': self.make_message('01JQV4X2B8M3K9T5R7W1C0D2E1', [(1, 2)])},
+            {'messageId': 'message-2', 'body': self.make_message('01JQV4X2B8M3K9T5R7W1C0D2E2', [(2, 5)])}
+        ]}
+
+        # The rejection of the second order cannot be recorded: its message is delivered again,
+        # instead of leaving its ticket pending forever
+        with patch('handlers.new_order.new_order.record_rejections', side_effect=ValueError('Table not found')):
+            response = self.queue_order_handler(event, None)
+        self.assertEqual(response, {'batchItemFailures': [{'itemIdentifier': 'message-2'}]})
+        self.assertEqual(self.get_inventory_counts(), [8, 1])
+
 if __name__ == '__main__':
 
     os.environ['AWS_ACCESS_KEY_ID'] = 'testing'
@@ -0,0 +1,72 @@
+import unittest
+import boto3
+from moto import mock_aws
+import os
+import sys
+
+# Append the path of the shared Lambda layer, in order to import from layers/common/
+layer_path_to_add = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'layers', 'common'))
+sys.path.append(layer_path_to_add)
+
+class TestOrderDays(unittest.TestCase):
+
+    def setUp(self):
+
+        import order_days
+        from table_registry import invalidate_table
+
+        self.order_days = order_days  # Store it in an instance variable
+        order_days.invalidate_order_days()
+        invalidate_table('test_order_days_table')
+
+    @mock_aws
+    def test_record_and_query_order_days(self):
+        print(f'***************************************************')
+        print(f'Unit Test: {self.__class__.__name__} : {self._testMethodName} :')
+        print(f'***************************************************')
+
+        dynamodb = boto3.resource('dynamodb', region_name='us-east-1')
+        dynamodb.create_table(
+            TableName='test_order_days_table',
+            KeySchema=[
+                {'AttributeName': 'calendar', 'KeyType': 'HASH'},
+                {'AttributeName': 'order_day', 'KeyType': 'RANGE'}
+            ],
+            AttributeDefinitions=[
+                {'AttributeName': 'calendar', 'AttributeType': 'S'},
+                {'AttributeName': 'order_day', 'AttributeType': 'S'}
+            ],
+            ProvisionedThroughput={'ReadCapacityUnits': 1, 'WriteCapacityUnits': 1}
+        )
+
+        self.order_days.record_order_days(dynamodb, 'test_order_days_table', ['2025-03-12', '2024-01-02', None])
+
+        # A day is written once per container: a day deleted since is not written again
+        ddb_table = dynamodb.Table('test_order_days_table')
+        ddb_table.delete_item(Key={'calendar': 'orders', 'order_day': '2024-01-02'})
+        self.order_days.record_order_days(dynamodb, 'test_order_days_table', ['2024-01-02', '2025-03-13'])
+        self.assertNotIn('Item', ddb_table.get_item(Key={'calendar': 'orders', 'order_day': '2024-01-02'}))
+        self.order_days.invalidate_order_days()
+        self.order_days.record_order_days(dynamodb, 'test_order_days_table', ['2024-01-02'])
+
+        days = self.order_days.query_order_days(dynamodb, 'test_order_days_table')
+        self.assertEqual(list(days), ['2025-03-13', '2025-03-12', '2024-01-02'])
+        days = self.order_days.query_order_days(dynamodb, 'test_order_days_table', first_day='2025-01-01', descending=False)
+        self.assertEqual(list(days), ['2025-03-12', '2025-03-13'])
+
+        # Not configured: nothing is recorded
+        self.order_days.record_order_days(dynamodb, None, ['2025-03-14'])
+
+if __name__ == '__main__':
+
+    os.environ['AWS_ACCESS_KEY_ID'] = 'testing'
+    os.environ['AWS_SECRET_ACCESS_KEY'] = 'testing'
+    os.environ['AWS_SECURITY_TOKEN'] = 'testing'
+    os.environ['AWS_SESSION_TOKEN'] = 'testing'
+    os.environ['AWS_DEFAULT_REGION'] = 'us-east-1'
+
+    unittest.main()
+
+    # Remove the same path from sys.path when finished testing
+    if layer_path_to_add in sys.path:
+        sys.path.remove(layer_path_to_add)
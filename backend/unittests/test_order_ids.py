@@ -0,0 +1,67 @@
+import unittest
+import os
+import sys
+import time
+from unittest.mock import patch
+
+# Append the path of the shared Lambda layer, in order to import from layers/common/
+layer_path_to_add = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'layers', 'common'))
+sys.path.append(layer_path_to_add)
+
+class TestOrderIds(unittest.TestCase):
+
+    def setUp(self):
+
+        from order_ids import generate_order_id, get_order_id_time, ENCODING
+
+        self.generate_order_id = generate_order_id  # Store it in an instance variable
+        self.get_order_id_time = get_order_id_time
+        self.ENCODING = ENCODING
+
+    def test_generate_order_id(self):
+        print(f'***************************************************')
+        print(f'Unit Test: {self.__class__.__name__} : {self._testMethodName} :')
+        print(f'***************************************************')
+
+        before = int(time.time() * 1000)
+        order_id = self.generate_order_id()
+        after = int(time.time() * 1000)
+
+        self.assertEqual(len(order_id), 26)
+        self.assertTrue(all(character in self.ENCODING for character in order_id))
+        self.assertTrue(before <= self.get_order_id_time(order_id) <= after)
+
+    def test_generate_order_id_monotonic(self):
+        print(f'***************************************************')
+        print(f'Unit Test: {self.__class__.__name__} : {self._testMethodName} :')
+        print(f'***************************************************')
+
+        # Many IDs in the same millisecond are still unique and sorted
+        with patch('order_ids.time.time', return_value=1743595200.0):
+            order_ids = [self.generate_order_id() for _ in range(1000)]
+
+        self.assertEqual(len(set(order_ids)), 1000)
+        self.assertEqual(order_ids, sorted(order_ids))
+
+        # An ID generated later sorts after them
+        self.assertGreater(self.generate_order_id(), order_ids[-1])
+
+    def test_get_order_id_time_invalid(self):
+        print(f'***************************************************')
+        print(f'Unit Test: {self.__class__.__name__} : {self._testMethodName} :')
+        print(f'***************************************************')
+
+        self.assertEqual(self.get_order_id_time('01JQV4X2B8' + '0' * 16), self.get_order_id_time('01jqv4x2b8' + '0' * 16))
+
+        # Old numeric order ids, a character that is not in the alphabet, no id
+        for order_id in ('12345678', 'U1JQV4X2B8M3K9T5R7W1C0D2E4', None):
+            with self.assertRaises(ValueError):
+                self.get_order_id_time(order_id)
+
+if __name__ == '__main__':
+
+    unittest.main()
+
+    # Remove the same path from sys.path when finished testing
+    if layer_path_to_add in sys.path:
+        sys.path.remove(layer_path_to_add)
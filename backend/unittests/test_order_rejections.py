@@ -0,0 +1,70 @@
+import unittest
+import boto3
+from moto import mock_aws
+import os
+import sys
+import time
+
+# Append the path of the shared Lambda layer, in order to import from layers/common/
+layer_path_to_add = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'layers', 'common'))
+sys.path.append(layer_path_to_add)
+
+class TestOrderRejections(unittest.TestCase):
+
+    def setUp(self):
+
+        import order_rejections
+        from table_registry import invalidate_table
+
+        self.order_rejections = order_rejections  # Store it in an instance variable
+        invalidate_table('test_rejected_orders_table')
+
+    @mock_aws
+    def test_record_and_get_rejection(self):
+        print(f'***************************************************')
+        print(f'Unit Test: {self.__class__.__name__} : {self._testMethodName} :')
+        print(f'***************************************************')
+
+        dynamodb = boto3.resource('dynamodb', region_name='us-east-1')
+        dynamodb.create_table(
+            TableName='test_rejected_orders_table',
+            KeySchema=[{'AttributeName': 'order_id', 'KeyType': 'HASH'}],
+            AttributeDefinitions=[{'AttributeName': 'order_id', 'AttributeType': 'S'}],
+            ProvisionedThroughput={'ReadCapacityUnits': 1, 'WriteCapacityUnits': 1}
+        )
+
+        self.order_rejections.record_rejections(dynamodb, 'test_rejected_orders_table', {
+            '01JQV4X2B8M3K9T5R7W1C0D2E1': 'Could not place order: Product 2 (out of stock)',
+            '01JQV4X2B8M3K9T5R7W1C0D2E2': 'Invalid order: the price of Product 1 has changed'
+        })
+
+        get_rejection = self.order_rejections.get_rejection
+        self.assertEqual(get_rejection(dynamodb, 'test_rejected_orders_table', '01JQV4X2B8M3K9T5R7W1C0D2E1'),
+                         'Could not place order: Product 2 (out of stock)')
+        self.assertIsNone(get_rejection(dynamodb, 'test_rejected_orders_table', '01JQV4X2B8M3K9T5R7W1C0D2E3'))
+
+        # An expired rejection is not returned, even before DynamoDB TTL deletes it
+        ddb_table = dynamodb.Table('test_rejected_orders_table')
+        ddb_table.update_item(Key={'order_id': '01JQV4X2B8M3K9T5R7W1C0D2E2'},
+                              UpdateExpression='SET expires_at = :expires_at',
+                              ExpressionAttributeValues={':expires_at': int(time.time()) - 1})
+        self.assertIsNone(get_rejection(dynamodb, 'test_rejected_orders_table', '01JQV4X2B8M3K9T5R7W1C0D2E2'))
+
+        # Not configured, or nothing to record: nothing is written
+        self.order_rejections.record_rejections(dynamodb, None, {'01JQV4X2B8M3K9T5R7W1C0D2E4': 'Invalid order'})
+        self.order_rejections.record_rejections(dynamodb, 'test_rejected_orders_table', {})
+        self.assertEqual(ddb_table.scan()['Count'], 2)
+
+if __name__ == '__main__':
+
+    os.environ['AWS_ACCESS_KEY_ID'] = 'testing'
+    os.environ['AWS_SECRET_ACCESS_KEY'] = 'testing'
+    os.environ['AWS_SECURITY_TOKEN'] = 'testing'
+    os.environ['AWS_SESSION_TOKEN'] = 'testing'
+    os.environ['AWS_DEFAULT_REGION'] = 'us-east-1'
+
+    unittest.main()
+
+    # Remove the same path from sys.path when finished testing
+    if layer_path_to_add in sys.path:
+        sys.path.remove(layer_path_to_add)
@@ -0,0 +1,134 @@
+import unittest
+import boto3
+import os
+import sys
+from moto import mock_aws
+
+# Append the path of the shared Lambda layer, in order to import from layers/common/
+layer_path_to_add = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'layers', 'common'))
+sys.path.append(layer_path_to_add)
+
+class TestParallelScan(unittest.TestCase):
+
+    def setUp(self):
+
+        from parallel_scan import parallel_scan
+        from table_registry import invalidate_table
+
+        self.parallel_scan = parallel_scan  # Store it in an instance variable
+        self.table_name = 'test_table'
+        invalidate_table(self.table_name)
+
+    def tearDown(self):
+        from table_registry import invalidate_table
+        invalidate_table(self.table_name)
+
+    def create_table(self, dynamodb, count):
+        dynamodb.create_table(
+            TableName=self.table_name,
+            KeySchema=[
+                {
+                    'AttributeName': 'id',
+                    'KeyType': 'HASH'
+                }
+            ],
+            AttributeDefinitions=[
+                {
+                    'AttributeName': 'id',
+                    'AttributeType': 'S'
+                }
+            ],
+            ProvisionedThroughput={
+                'ReadCapacityUnits': 1,
+                'WriteCapacityUnits': 1
+            }
+        )
+
+        ddb_table = dynamodb.Table(self.table_name)
+        with ddb_table.batch_writer() as batch:
+            for i in range(count):
+                batch.put_item(Item={'id': str(i), 'name': f'Item {i}'})
+
+    @mock_aws
+    def test_parallel_scan_all_items(self):
+        print(f'***************************************************')
+        print(f'Unit Test: {self.__class__.__name__} : {self._testMethodName} :')
+        print(f'***************************************************')
+
+        dynamodb = boto3.resource('dynamodb', region_name='us-east-1')
+        self.create_table(dynamodb, 50)
+
+        # Small pages, so that every segment follows LastEvaluatedKey several times
+        items = list(self.parallel_scan(dynamodb, self.table_name, total_segments=4, max_workers=2, page_size=3))
+
+        ids = sorted(int(item['id']) for item in items)
+        self.assertEqual(ids, list(range(50)))  # Every item exactly once
+        self.assertEqual(items[0]['name'], f"Item {items[0]['id']}")
+
+    @mock_aws
+    def test_parallel_scan_stop_early(self):
+        print(f'***************************************************')
+        print(f'Unit Test: {self.__class__.__name__} : {self._testMethodName} :')
+        print(f'***************************************************')
+
+        dynamodb = boto3.resource('dynamodb', region_name='us-east-1')
+        self.create_table(dynamodb, 50)
+
+        # A caller that streams items can stop at any time; the scan threads stop too
+        items = self.parallel_scan(dynamodb, self.table_name, total_segments=4, page_size=1)
+        first = [next(items) for _ in range(5)]
+        items.close()
+
+        self.assertEqual(len(first), 5)
+
+    @mock_aws
+    def test_parallel_scan_table_not_found(self):
+        print(f'***************************************************')
+        print(f'Unit Test: {self.__class__.__name__} : {self._testMethodName} :')
+        print(f'***************************************************')
+
+        dynamodb = boto3.resource('dynamodb', region_name='us-east-1')
+
+        with self.assertRaises(ValueError) as context:
+            list(self.parallel_scan(dynamodb, self.table_name))
+
+        self.assertIn(f'Table: {self.table_name} not found', str(context.exception))
+
+    @mock_aws
+    def test_scan_pages_one_page_at_a_time(self):
+        print(f'***************************************************')
+        print(f'Unit Test: {self.__class__.__name__} : {self._testMethodName} :')
+        print(f'***************************************************')
+
+        from parallel_scan import scan_pages
+
+        dynamodb = boto3.resource('dynamodb', region_name='us-east-1')
+        self.create_table(dynamodb, 25)
+
+        pages = scan_pages(dynamodb, self.table_name, page_size=10)
+        first_page = next(pages)
+        self.assertEqual(len(first_page), 10)
+
+        # The other pages are scanned only when they are consumed
+        other_pages = list(pages)
+        self.assertEqual([len(page) for page in other_pages], [10, 5])
+        ids = {item['id'] for page in [first_page] + other_pages for item in page}
+        self.assertEqual(ids, {str(i) for i in range(25)})
+
+        with self.assertRaises(ValueError):
+            list(scan_pages(dynamodb, 'missing_table'))
+
+if __name__ == '__main__':
+
+    os.environ['AWS_ACCESS_KEY_ID'] = 'testing'
+    os.environ['AWS_SECRET_ACCESS_KEY'] = 'testing'
+    os.environ['AWS_SECURITY_TOKEN'] = 'testing'
+    os.environ['AWS_SESSION_TOKEN'] = 'testing'
+    os.environ['AWS_DEFAULT_REGION'] = 'us-east-1'
+    os.environ['AWS_REGION'] = 'us-east-1'
+
+    unittest.main()
+
+    # Remove the same path from sys.path when finished testing
+    if layer_path_to_add in sys.path:
+        sys.path.remove(layer_path_to_add)
@@ -0,0 +1,134 @@
+import unittest
+from unittest.mock import patch
+import os
+import sys
+from datetime import datetime, timedelta
+from moto import mock_aws
+
+# Append the path to sys.path, in order to import from DocumentLambdaFunction/
+path_to_add = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(path_to_add)
+
+# Append the path of the shared Lambda layer, in order to import from layers/common/
+layer_path_to_add = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'layers', 'common'))
+sys.path.append(layer_path_to_add)
+
+class TestPrepareOrdersReportData(unittest.TestCase):
+
+    def setUp(self):
+
+        os.environ['AWS_REGION'] = 'us-east-1'
+        os.environ['ORDERS_TABLE'] = 'test_table'
+        os.environ['ORDER_DAYS_TABLE'] = 'test_order_days_table'
+        os.environ['REPORTS_BUCKET'] = 'test-bucket'
+
+        # Import after patching env variables
+        from handlers.prepare_orders_report_data.prepare_orders_report_data import lambda_handler, s3, dynamodb
+        from table_registry import invalidate_table
+
+        self.lambda_handler = lambda_handler  # Store it in an instance variable
+        self.s3 = s3
+        self.dynamodb = dynamodb
+        invalidate_table('test_table')
+        invalidate_table('test_order_days_table')
+
+    def tearDown(self):
+        os.environ.pop('ORDERS_TABLE', None)
+        os.environ.pop('ORDER_DAYS_TABLE', None)
+        os.environ.pop('REPORTS_BUCKET', None)
+
+    def put_order(self, order_id, order_time):
+        order_time = order_time.isoformat(timespec='microseconds') + 'Z'
+        self.dynamodb.Table('test_table').put_item(Item={'id': order_id, 'order_time': order_time, 'order_day': order_time[:10]})
+        self.dynamodb.Table('test_order_days_table').put_item(Item={'calendar': 'orders', 'order_day': order_time[:10]})
+
+    @patch('handlers.prepare_orders_report_data.prepare_orders_report_data.ddb_orders_table_name', 'test_table')
+    @patch('handlers.prepare_orders_report_data.prepare_orders_report_data.ddb_order_days_table_name', 'test_order_days_table')
+    @patch('handlers.prepare_orders_report_data.prepare_orders_report_data.s3_bucket_name', 'test-bucket')
+    @mock_aws
+    def test_lambda_handler_incremental(self):
+        print(f'***************************************************')
+        print(f'Unit Test: {self.__class__.__name__} : {self._testMethodName} :')
+        print(f'***************************************************')
+
+        from moto.core import patch_client, patch_resource
+        patch_client(self.s3)
+        patch_resource(self.dynamodb)
+
+        self.s3.create_bucket(Bucket='test-bucket')
+        self.dynamodb.create_table(
+            TableName='test_table',
+            KeySchema=[{'AttributeName': 'id', 'KeyType': 'HASH'}],
+            AttributeDefinitions=[
+                {'AttributeName': 'id', 'AttributeType': 'S'},
+                {'AttributeName': 'order_day', 'AttributeType': 'S'},
+                {'AttributeName': 'order_time', 'AttributeType': 'S'}
+            ],
+            GlobalSecondaryIndexes=[{
+                'IndexName': 'OrderTimeIndex',
+                'KeySchema': [
+                    {'AttributeName': 'order_day', 'KeyType': 'HASH'},
+                    {'AttributeName': 'order_time', 'KeyType': 'RANGE'}
+                ],
+                'Projection': {'ProjectionType': 'ALL'},
+                'ProvisionedThroughput': {'ReadCapacityUnits': 1, 'WriteCapacityUnits': 1}
+            }],
+            ProvisionedThroughput={'ReadCapacityUnits': 1, 'WriteCapacityUnits': 1}
+        )
+        self.dynamodb.create_table(
+            TableName='test_order_days_table',
+            KeySchema=[
+                {'AttributeName': 'calendar', 'KeyType': 'HASH'},
+                {'AttributeName': 'order_day', 'KeyType': 'RANGE'}
+            ],
+            AttributeDefinitions=[
+                {'AttributeName': 'calendar', 'AttributeType': 'S'},
+                {'AttributeName': 'order_day', 'AttributeType': 'S'}
+            ],
+            ProvisionedThroughput={'ReadCapacityUnits': 1, 'WriteCapacityUnits': 1}
+        )
+
+        now = datetime.now()
+        self.put_order('order-1', now - timedelta(hours=2))
+        self.put_order('order-2', now - timedelta(hours=1))
+        # Not settled yet
+        self.put_order('order-3', now)
+
+        from report_data import read_dataset
+        from incremental_report import write_manifest, read_manifest
+
+        # First report: the whole table
+        result = self.lambda_handler({}, None)
+        self.assertEqual(sorted(order['id'] for order in read_dataset(self.s3, result['dataset'])), ['order-1', 'order-2'])
+        self.assertEqual([order['id'] for order in read_dataset(self.s3, result['recent'])], ['order-3'])
+        self.assertEqual(result['watermark']['id'], 'order-2')
+        self.assertIsNone(result['manifest_etag'])
+
+        # The HTML task saves the watermark (see prepare_orders_report_html)
+        write_manifest(self.s3, 'test-bucket', {'watermark': result['watermark'], 'fragments': []}, None)
+        self.put_order('order-4', now - timedelta(minutes=30))
+
+        # Next report: only the orders after the watermark
+        result = self.lambda_handler({}, None)
+        self.assertEqual([order['id'] for order in read_dataset(self.s3, result['dataset'])], ['order-4'])
+        self.assertEqual([order['id'] for order in read_dataset(self.s3, result['recent'])], ['order-3'])
+        self.assertEqual(result['watermark']['id'], 'order-4')
+        self.assertEqual(result['manifest_etag'], read_manifest(self.s3, 'test-bucket')[1])
+
+        # A failure returns False, so that the Choice state of the state machine fails the branch
+        self.dynamodb.Table('test_table').delete()
+        self.assertIs(self.lambda_handler({}, None), False)
+
+if __name__ == '__main__':
+    os.environ['AWS_ACCESS_KEY_ID'] = 'testing'
+    os.environ['AWS_SECRET_ACCESS_KEY'] = 'testing'
+    os.environ['AWS_SECURITY_TOKEN'] = 'testing'
+    os.environ['AWS_SESSION_TOKEN'] = 'testing'
+    os.environ['AWS_DEFAULT_REGION'] = 'us-east-1'
+    os.environ['AWS_REGION'] = 'us-east-1'
+
+    unittest.main()
+
+    # Remove the same path from sys.path when finished testing
+    if path_to_add in sys.path:
+        sys.path.remove(path_to_add)
@@ -0,0 +1,226 @@
+import unittest
+from unittest.mock import patch
+import os
+import sys
+from moto import mock_aws
+
+# Append the path to sys.path, in order to import from DocumentLambdaFunction/
+path_to_add = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(path_to_add)
+
+# Append the path of the shared Lambda layer, in order to import from layers/common/
+layer_path_to_add = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'layers', 'common'))
+sys.path.append(layer_path_to_add)
+
+class TestPrepareOrdersReportHtml(unittest.TestCase):
+
+    def setUp(self):
+
+        os.environ['REPORTS_BUCKET'] = 'test-bucket'
+
+        # Import after patching env variables
+        from handlers.prepare_orders_report_html.prepare_orders_report_html import lambda_handler
+        from handlers.prepare_orders_report_html.prepare_orders_report_html import s3
+        from handlers.prepare_orders_report_html.prepare_orders_report_html import fused_report_handler, dynamodb
+        from table_registry import invalidate_table
+
+        self.lambda_handler = lambda_handler  # Store it in an instance variable
+        self.s3 = s3
+        self.fused_report_handler = fused_report_handler
+        self.dynamodb = dynamodb
+        invalidate_table('test_table')
+
+    def tearDown(self):
+        os.environ.pop('REPORTS_BUCKET', None)
+
+    def create_result(self, orders, recent_orders=[], manifest_etag=None):
+        # Output of prepare_orders_report_data for these orders
+        from report_data import write_dataset, get_dataset_key
+        last_order = max(orders, key=lambda order: (order['order_time'], order['id'])) if orders else None
+        return {
+            'dataset': write_dataset(self.s3, 'test-bucket', get_dataset_key('orders'), orders),
+            'recent': write_dataset(self.s3, 'test-bucket', get_dataset_key('recent-orders'), recent_orders),
+            'watermark': {'order_time': last_order['order_time'], 'id': last_order['id']} if orders else None,
+            'period': {'from': min(order['order_time'] for order in orders), 'to': last_order['order_time']} if orders else None,
+            'manifest_etag': manifest_etag
+        }
+
+    def create_order(self, order_id, order_time):
+        return {
+            'id': order_id,
+            'order_time': order_time,
+            'total_amount': '10.00',
+            'ordered_items': [{'product_id': '1', 'product_name': 'A', 'quantity': '1', 'amount': '10.00'}]
+        }
+
+    @patch('handlers.prepare_orders_report_html.prepare_orders_report_html.s3_bucket_name', 'test-bucket')
+    @mock_aws
+    def test_lambda_handler(self):
+        print(f'***************************************************')
+        print(f'Unit Test: {self.__class__.__name__} : {self._testMethodName} :')
+        print(f'***************************************************')
+
+        # https://docs.getmoto.org/en/latest/docs/getting_started.html
+        # According to moto documentation, I can use the clients and resources that I created
+        # in the AWS Lambda function, and then patch them (using patch_client() and patch_resource())
+        # to be used with moto.
+        from moto.core import patch_client, patch_resource
+        patch_client(self.s3)
+
+        self.s3.create_bucket(Bucket='test-bucket')
+
+        orders = [
+            {
+                'id': '01JQV4X2B8M3K9T5R7W1C0D2E4',
+                'order_time': '2025-04-02T12:00:00Z',
+                'total_amount': '20.00',
+                'ordered_items': [
+                    {'product_id': '1', 'product_name': '<script>alert(1)</script>', 'quantity': '2', 'amount': '20.00'}
+                ]
+            }
+        ]
+
+        # The orders are read from the dataset written by prepare_orders_report_data
+        result = self.lambda_handler({'ordersReportResult': self.create_result(orders)}, None)
+
+        self.assertTrue(result)
+        # The orders are in a fragment, and the index links to it
+        from incremental_report import read_manifest
+        manifest, etag = read_manifest(self.s3, 'test-bucket')
+        self.assertEqual(len(manifest['fragments']), 1)
+        index = self.s3.get_object(Bucket='test-bucket', Key='orderreport.html')['Body'].read().decode()
+        self.assertIn(manifest['fragments'][0]['key'], index)
+        page = self.s3.get_object(Bucket='test-bucket', Key=manifest['fragments'][0]['key'])['Body'].read().decode()
+        self.assertTrue(page.startswith('<!DOCTYPE html>'))
+        self.assertTrue(page.endswith('</html>'))
+        self.assertIn('<td>01JQV4X2B8M3K9T5R7W1C0D2E4</td>', page)
+        # Values are HTML-escaped
+        self.assertIn('&lt;script&gt;alert(1)&lt;/script&gt;', page)
+        self.assertNotIn('<script>', page)
+
+    @patch('handlers.prepare_orders_report_html.prepare_orders_report_html.s3_bucket_name', 'test-bucket')
+    @mock_aws
+    def test_lambda_handler_invalid_order(self):
+        print(f'***************************************************')
+        print(f'Unit Test: {self.__class__.__name__} : {self._testMethodName} :')
+        print(f'***************************************************')
+
+        from moto.core import patch_client, patch_resource
+        patch_client(self.s3)
+
+        self.s3.create_bucket(Bucket='test-bucket')
+
+        # An order without ordered_items fails the report, and no partial report is written
+        result = self.lambda_handler({'ordersReportResult': self.create_result([{'id': '1', 'order_time': '', 'total_amount': '0'}])}, None)
+
+        self.assertFalse(result)
+        keys = [item['Key'] for item in self.s3.list_objects_v2(Bucket='test-bucket')['Contents']]
+        self.assertNotIn('orderreport.html', keys)
+        self.assertNotIn('orders-report/manifest.json', keys)
+
+    @patch('handlers.prepare_orders_report_html.prepare_orders_report_html.s3_bucket_name', 'test-bucket')
+    @mock_aws
+    def test_lambda_handler_incremental(self):
+        print(f'***************************************************')
+        print(f'Unit Test: {self.__class__.__name__} : {self._testMethodName} :')
+        print(f'***************************************************')
+
+        from moto.core import patch_client, patch_resource
+        patch_client(self.s3)
+
+        self.s3.create_bucket(Bucket='test-bucket')
+        from incremental_report import read_manifest
+
+        first_result = self.create_result([self.create_order('order-1', '2025-04-02T12:00:00.000000Z')])
+        self.assertTrue(self.lambda_handler({'ordersReportResult': first_result}, None))
+        first_manifest, etag = read_manifest(self.s3, 'test-bucket')
+
+        # The next report only renders the new orders. Recent orders are only in the index.
+        second_result = self.create_result([self.create_order('order-2', '2025-04-03T12:00:00.000000Z')],
+                                           [self.create_order('order-3', '2025-04-03T12:05:00.000000Z')], etag)
+        self.assertTrue(self.lambda_handler({'ordersReportResult': second_result}, None))
+
+        manifest, second_etag = read_manifest(self.s3, 'test-bucket')
+        self.assertEqual(manifest['watermark'], {'order_time': '2025-04-03T12:00:00.000000Z', 'id': 'order-2'})
+        self.assertEqual(manifest['fragments'][0], first_manifest['fragments'][0])
+        self.assertEqual([fragment['count'] for fragment in manifest['fragments']], [1, 1])
+        fragment = self.s3.get_object(Bucket='test-bucket', Key=manifest['fragments'][1]['key'])['Body'].read().decode()
+        self.assertIn('<td>order-2</td>', fragment)
+        self.assertNotIn('<td>order-1</td>', fragment)
+        index = self.s3.get_object(Bucket='test-bucket', Key='orderreport.html')['Body'].read().decode()
+        self.assertIn('<td>order-3</td>', index)
+        # Most recent fragment first
+        self.assertLess(index.index(manifest['fragments'][1]['key']), index.index(manifest['fragments'][0]['key']))
+
+        # No new orders: no fragment
+        self.assertTrue(self.lambda_handler({'ordersReportResult': self.create_result([], [], second_etag)}, None))
+        self.assertEqual(read_manifest(self.s3, 'test-bucket'), (manifest, second_etag))
+
+        # Another execution updated the report since the data was read
+        self.assertFalse(self.lambda_handler({'ordersReportResult': second_result}, None))
+        self.assertEqual(read_manifest(self.s3, 'test-bucket')[0], manifest)
+
+    @patch('handlers.prepare_orders_report_html.prepare_orders_report_html.ddb_orders_table_name', 'test_table')
+    @patch('handlers.prepare_orders_report_html.prepare_orders_report_html.s3_bucket_name', 'test-bucket')
+    @patch('parallel_scan.get_table')
+    @mock_aws
+    def test_fused_report_handler(self, mock_get_table):
+        print(f'***************************************************')
+        print(f'Unit Test: {self.__class__.__name__} : {self._testMethodName} :')
+        print(f'***************************************************')
+
+        from moto.core import patch_client, patch_resource
+        patch_client(self.s3)
+        patch_resource(self.dynamodb)
+
+        self.s3.create_bucket(Bucket='test-bucket')
+        self.dynamodb.create_table(
+            TableName='test_table',
+            KeySchema=[{'AttributeName': 'id', 'KeyType': 'HASH'}],
+            AttributeDefinitions=[{'AttributeName': 'id', 'AttributeType': 'S'}],
+            ProvisionedThroughput={'ReadCapacityUnits': 1, 'WriteCapacityUnits': 1}
+        )
+        ddb_table = self.dynamodb.Table('test_table')
+        mock_get_table.return_value = ddb_table
+
+        # Scan pages: 2 items
+        pages = []
+        original_scan = ddb_table.scan
+        def scan(**kwargs):
+            response = original_scan(Limit=2, **kwargs)
+            pages.append(len(response['Items']))
+            return response
+        ddb_table.scan = scan
+
+        for number in range(5):
+            ddb_table.put_item(Item={
+                'id': f'order-{number}',
+                'order_time': '2025-04-02T12:00:00Z',
+                'total_amount': '10.00',
+                'ordered_items': [{'product_id': '1', 'product_name': 'A & B', 'quantity': '1', 'amount': '10.00'}]
+            })
+
+        result = self.fused_report_handler({}, None)
+
+        self.assertTrue(result)
+        self.assertEqual(pages, [2, 2, 1])
+        page = self.s3.get_object(Bucket='test-bucket', Key='orderreport-full.html')['Body'].read().decode()
+        # The index page of the incremental report is not overwritten
+        self.assertNotIn('Contents', self.s3.list_objects_v2(Bucket='test-bucket', Prefix='orderreport.html'))
+        for number in range(5):
+            self.assertIn(f'<td>order-{number}</td>', page)
+        self.assertIn('A &amp; B', page)
+
+if __name__ == '__main__':
+    os.environ['AWS_ACCESS_KEY_ID'] = 'testing'
+    os.environ['AWS_SECRET_ACCESS_KEY'] = 'testing'
+    os.environ['AWS_SECURITY_TOKEN'] = 'testing'
+    os.environ['AWS_SESSION_TOKEN'] = 'testing'
+    os.environ['AWS_DEFAULT_REGION'] = 'us-east-1'
+    os.environ['AWS_REGION'] = 'us-east-1'
+
+    unittest.main()
+
+    # Remove the same path from sys.path when finished testing
+    if path_to_add in sys.path:
+        sys.path.remove(path_to_add)
@@ -0,0 +1,61 @@
+import unittest
+import os
+import sys
+
+# Append the path of the shared Lambda layer, in order to import from layers/common/
+layer_path_to_add = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'layers', 'common'))
+sys.path.append(layer_path_to_add)
+
+class TestProjection(unittest.TestCase):
+
+    def setUp(self):
+
+        from projection import get_requested_fields, build_projection, PRODUCT_FIELDS, ORDER_FIELDS
+
+        self.get_requested_fields = get_requested_fields  # Store it in an instance variable
+        self.build_projection = build_projection
+        self.PRODUCT_FIELDS = PRODUCT_FIELDS
+        self.ORDER_FIELDS = ORDER_FIELDS
+
+    def test_get_requested_fields(self):
+        print(f'***************************************************')
+        print(f'Unit Test: {self.__class__.__name__} : {self._testMethodName} :')
+        print(f'***************************************************')
+
+        # No 'fields' parameter means all attributes
+        self.assertIsNone(self.get_requested_fields(None, self.PRODUCT_FIELDS))
+        self.assertIsNone(self.get_requested_fields({'limit': '10'}, self.PRODUCT_FIELDS))
+
+        # The key 'id' is always returned, and duplicates are removed
+        result = self.get_requested_fields({'fields': 'price, product_name,price'}, self.PRODUCT_FIELDS)
+        self.assertEqual(result, ['id', 'price', 'product_name'])
+
+    def test_get_requested_fields_not_allowed(self):
+        print(f'***************************************************')
+        print(f'Unit Test: {self.__class__.__name__} : {self._testMethodName} :')
+        print(f'***************************************************')
+
+        # 'email' is an order attribute, but not a product attribute
+        self.assertEqual(self.get_requested_fields({'fields': 'email'}, self.ORDER_FIELDS), ['id', 'email'])
+        with self.assertRaises(ValueError):
+            self.get_requested_fields({'fields': 'email'}, self.PRODUCT_FIELDS)
+
+    def test_build_projection(self):
+        print(f'***************************************************')
+        print(f'Unit Test: {self.__class__.__name__} : {self._testMethodName} :')
+        print(f'***************************************************')
+
+        self.assertEqual(self.build_projection(None), {})
+
+        # Every attribute name is aliased, since names such as 'name' are reserved words
+        result = self.build_projection(['id', 'name'])
+        self.assertEqual(result['ProjectionExpression'], '#p0, #p1')
+        self.assertEqual(result['ExpressionAttributeNames'], {'#p0': 'id', '#p1': 'name'})
+
+if __name__ == '__main__':
+
+    unittest.main()
+
+    # Remove the same path from sys.path when finished testing
+    if layer_path_to_add in sys.path:
+        sys.path.remove(layer_path_to_add)
@@ -0,0 +1,97 @@
+import unittest
+from unittest.mock import patch
+import os
+import sys
+from moto import mock_aws
+
+# Append the path to sys.path, in order to import from DocumentLambdaFunction/
+path_to_add = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(path_to_add)
+
+# Append the path of the shared Lambda layer, in order to import from layers/common/
+layer_path_to_add = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'layers', 'common'))
+sys.path.append(layer_path_to_add)
+
+class TestRebalanceInventory(unittest.TestCase):
+
+    def setUp(self):
+
+        os.environ['PRODUCTS_TABLE'] = 'test_table'
+        os.environ['INVENTORY_SHARDS_TABLE'] = 'test_shards_table'
+        
+        # Import after patching env variables
+        from handlers.rebalance_inventory.rebalance_inventory import lambda_handler
+        from handlers.rebalance_inventory.rebalance_inventory import dynamodb
+        from table_registry import invalidate_table
+
+        self.lambda_handler = lambda_handler  # Store it in an instance variable
+        self.dynamodb = dynamodb
+        invalidate_table('test_table')
+
+    def tearDown(self):
+        os.environ.pop('PRODUCTS_TABLE', None)
+        os.environ.pop('INVENTORY_SHARDS_TABLE', None)
+
+    @mock_aws
+    def test_lambda_handler(self):
+        print(f'***************************************************')
+        print(f'Unit Test: {self.__class__.__name__} : {self._testMethodName} :')
+        print(f'***************************************************')
+
+        # https://docs.getmoto.org/en/latest/docs/getting_started.html
+        # According to moto documentation, I can use the clients and resources that I created
+        # in the AWS Lambda function, and then patch them (using patch_client() and patch_resource())
+        # to be used with moto.
+        from moto.core import patch_client, patch_resource
+        patch_resource(self.dynamodb)
+
+        for table_name in ('test_table', 'test_shards_table'):
+            self.dynamodb.create_table(
+                TableName=table_name,
+                KeySchema=[{'AttributeName': 'id', 'KeyType': 'HASH'}],
+                AttributeDefinitions=[{'AttributeName': 'id', 'AttributeType': 'S'}],
+                ProvisionedThroughput={'ReadCapacityUnits': 1, 'WriteCapacityUnits': 1}
+            )
+
+        # Product 1 is not sharded. Products 2 and 3 are sharded; only product 2 is unbalanced.
+        products_table = self.dynamodb.Table('test_table')
+        shards_table = self.dynamodb.Table('test_shards_table')
+        products_table.put_item(Item={'id': '1', 'inventory_count': 10})
+        products_table.put_item(Item={'id': '2', 'inventory_count': 0, 'inventory_shards': 2})
+        products_table.put_item(Item={'id': '3', 'inventory_count': 0, 'inventory_shards': 2})
+        for shard_id, count in (('2#0', 0), ('2#1', 8), ('3#0', 4), ('3#1', 4)):
+            shards_table.put_item(Item={'id': shard_id, 'inventory_count': count})
+
+        result = self.lambda_handler({}, None)
+
+        self.assertEqual(result, {'rebalanced': ['2'], 'failed': []})
+        self.assertEqual(shards_table.get_item(Key={'id': '2#0'})['Item']['inventory_count'], 4)
+        self.assertEqual(shards_table.get_item(Key={'id': '2#1'})['Item']['inventory_count'], 4)
+
+    @patch('handlers.rebalance_inventory.rebalance_inventory.get_sharded_products')
+    def test_lambda_handler_error(self, mock_get_sharded_products):
+        print(f'***************************************************')
+        print(f'Unit Test: {self.__class__.__name__} : {self._testMethodName} :')
+        print(f'***************************************************')
+
+        mock_get_sharded_products.return_value = None
+
+        result = self.lambda_handler({}, None)
+
+        self.assertEqual(result['rebalanced'], [])
+        self.assertIn('Could not get sharded products', result['error'])
+
+if __name__ == '__main__':
+
+    os.environ['AWS_ACCESS_KEY_ID'] = 'testing'
+    os.environ['AWS_SECRET_ACCESS_KEY'] = 'testing'
+    os.environ['AWS_SECURITY_TOKEN'] = 'testing'
+    os.environ['AWS_SESSION_TOKEN'] = 'testing'
+    os.environ['AWS_DEFAULT_REGION'] = 'us-east-1'
+    os.environ['AWS_REGION'] = 'us-east-1'
+
+    unittest.main()
+
+    #Remove the same path from sys.path when finished testing
+    if path_to_add in sys.path:
+        sys.path.remove(path_to_add)
@@ -0,0 +1,89 @@
+import unittest
+import boto3
+import gzip
+import json
+from decimal import Decimal
+from moto import mock_aws
+import os
+import sys
+
+# Append the path of the shared Lambda layer, in order to import from layers/common/
+layer_path_to_add = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'layers', 'common'))
+sys.path.append(layer_path_to_add)
+
+class TestReportData(unittest.TestCase):
+
+    def setUp(self):
+
+        import report_data
+
+        self.report_data = report_data  # Store it in an instance variable
+
+    def create_bucket(self):
+        s3 = boto3.client('s3', region_name='us-east-1')
+        s3.create_bucket(Bucket='test-bucket')
+        return s3
+
+    @mock_aws
+    def test_write_and_read_dataset(self):
+        print(f'***************************************************')
+        print(f'Unit Test: {self.__class__.__name__} : {self._testMethodName} :')
+        print(f'***************************************************')
+
+        s3 = self.create_bucket()
+        key = self.report_data.get_dataset_key('products')
+        self.assertTrue(key.startswith('report-data/') and key.endswith('/products.ndjson.gz'))
+
+        # A generator: the items are not held in memory
+        items = ({'id': str(number), 'price': Decimal('2.5'), 'inventory_count': Decimal(number)} for number in range(1000))
+        pointer = self.report_data.write_dataset(s3, 'test-bucket', key, items)
+
+        self.assertEqual(pointer['bucket'], 'test-bucket')
+        self.assertEqual(pointer['key'], key)
+        self.assertEqual(pointer['count'], 1000)
+        # The pointer is small enough for any AWS Step Functions payload
+        self.assertLess(len(json.dumps(pointer)), 512)
+
+        # The object is gzip-compressed NDJSON
+        body = s3.get_object(Bucket='test-bucket', Key=key)['Body'].read()
+        lines = gzip.decompress(body).decode().splitlines()
+        self.assertEqual(len(lines), 1000)
+        self.assertEqual(json.loads(lines[1]), {'id': '1', 'price': 2.5, 'inventory_count': 1})
+
+        read_items = list(self.report_data.read_dataset(s3, pointer))
+        self.assertEqual(len(read_items), 1000)
+        self.assertEqual(read_items[999], {'id': '999', 'price': Decimal('2.5'), 'inventory_count': 999})
+
+    @mock_aws
+    def test_read_dataset_checksum_mismatch(self):
+        print(f'***************************************************')
+        print(f'Unit Test: {self.__class__.__name__} : {self._testMethodName} :')
+        print(f'***************************************************')
+
+        s3 = self.create_bucket()
+        pointer = self.report_data.write_dataset(s3, 'test-bucket', 'report-data/test/orders.ndjson.gz', [{'id': '1'}])
+
+        # The object was overwritten after the pointer was returned
+        self.report_data.write_dataset(s3, 'test-bucket', 'report-data/test/orders.ndjson.gz', [{'id': '2'}])
+
+        with self.assertRaises(ValueError):
+            list(self.report_data.read_dataset(s3, pointer))
+
+        # An empty dataset
+        pointer = self.report_data.write_dataset(s3, 'test-bucket', 'report-data/test/empty.ndjson.gz', [])
+        self.assertEqual(pointer['count'], 0)
+        self.assertEqual(list(self.report_data.read_dataset(s3, pointer)), [])
+
+if __name__ == '__main__':
+
+    os.environ['AWS_ACCESS_KEY_ID'] = 'testing'
+    os.environ['AWS_SECRET_ACCESS_KEY'] = 'testing'
+    os.environ['AWS_SECURITY_TOKEN'] = 'testing'
+    os.environ['AWS_SESSION_TOKEN'] = 'testing'
+    os.environ['AWS_DEFAULT_REGION'] = 'us-east-1'
+
+    unittest.main()
+
+    # Remove the same path from sys.path when finished testing
+    if layer_path_to_add in sys.path:
+        sys.path.remove(layer_path_to_add)
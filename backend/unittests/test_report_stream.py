@@ -0,0 +1,104 @@
+import unittest
+from unittest.mock import patch
+import boto3
+import hashlib
+from moto import mock_aws
+import os
+import sys
+
+# Append the path of the shared Lambda layer, in order to import from layers/common/
+layer_path_to_add = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'layers', 'common'))
+sys.path.append(layer_path_to_add)
+
+class TestReportStream(unittest.TestCase):
+
+    def setUp(self):
+
+        import report_stream
+
+        self.report_stream = report_stream  # Store it in an instance variable
+
+    def create_bucket(self):
+        s3 = boto3.client('s3', region_name='us-east-1')
+        s3.create_bucket(Bucket='test-bucket')
+        return s3
+
+    @mock_aws
+    def test_upload_stream_small_object(self):
+        print(f'***************************************************')
+        print(f'Unit Test: {self.__class__.__name__} : {self._testMethodName} :')
+        print(f'***************************************************')
+
+        s3 = self.create_bucket()
+
+        # Smaller than one part: a single PutObject
+        with patch.object(s3, 'create_multipart_upload') as mock_create_multipart_upload:
+            result = self.report_stream.upload_stream(s3, 'test-bucket', 'report.html', iter(['<html>', b'</html>']))
+            mock_create_multipart_upload.assert_not_called()
+
+        response = s3.get_object(Bucket='test-bucket', Key='report.html')
+        self.assertEqual(response['Body'].read(), b'<html></html>')
+        self.assertEqual(response['ContentType'], 'text/html')
+        self.assertEqual(result, {'size': 13, 'sha256': hashlib.sha256(b'<html></html>').hexdigest()})
+
+    @patch('report_stream.REPORT_PART_SIZE_IN_BYTES', 5 * 1024 * 1024)
+    @mock_aws
+    def test_upload_stream_multipart(self):
+        print(f'***************************************************')
+        print(f'Unit Test: {self.__class__.__name__} : {self._testMethodName} :')
+        print(f'***************************************************')
+
+        s3 = self.create_bucket()
+
+        # 11 MiB in 1 MiB chunks: two full parts and a last, smaller part
+        chunk = b'x' * (1024 * 1024)
+        with patch.object(s3, 'upload_part', wraps=s3.upload_part) as mock_upload_part:
+            result = self.report_stream.upload_stream(s3, 'test-bucket', 'report.html', (chunk for _ in range(11)))
+            self.assertEqual(mock_upload_part.call_count, 3)
+
+        self.assertEqual(result['size'], 11 * 1024 * 1024)
+        self.assertEqual(s3.head_object(Bucket='test-bucket', Key='report.html')['ContentLength'], 11 * 1024 * 1024)
+
+    @patch('report_stream.REPORT_PART_SIZE_IN_BYTES', 5 * 1024 * 1024)
+    @mock_aws
+    def test_upload_stream_aborted(self):
+        print(f'***************************************************')
+        print(f'Unit Test: {self.__class__.__name__} : {self._testMethodName} :')
+        print(f'***************************************************')
+
+        s3 = self.create_bucket()
+
+        def chunks():
+            yield b'x' * (5 * 1024 * 1024)
+            raise KeyError('ordered_items')
+
+        with self.assertRaises(KeyError):
+            self.report_stream.upload_stream(s3, 'test-bucket', 'report.html', chunks())
+
+        # No object, and no parts are kept
+        self.assertNotIn('Contents', s3.list_objects_v2(Bucket='test-bucket'))
+        self.assertNotIn('Uploads', s3.list_multipart_uploads(Bucket='test-bucket'))
+
+    def test_render_header_escapes(self):
+        print(f'***************************************************')
+        print(f'Unit Test: {self.__class__.__name__} : {self._testMethodName} :')
+        print(f'***************************************************')
+
+        header = self.report_stream.render_header('A & B', 'List', ['<id>'])
+        self.assertIn('<title>A &amp; B</title>', header)
+        self.assertIn('<th>&lt;id&gt;</th>', header)
+        self.assertNotIn('\n', header)
+
+if __name__ == '__main__':
+
+    os.environ['AWS_ACCESS_KEY_ID'] = 'testing'
+    os.environ['AWS_SECRET_ACCESS_KEY'] = 'testing'
+    os.environ['AWS_SECURITY_TOKEN'] = 'testing'
+    os.environ['AWS_SESSION_TOKEN'] = 'testing'
+    os.environ['AWS_DEFAULT_REGION'] = 'us-east-1'
+
+    unittest.main()
+
+    # Remove the same path from sys.path when finished testing
+    if layer_path_to_add in sys.path:
+        sys.path.remove(layer_path_to_add)
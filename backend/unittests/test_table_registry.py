@@ -0,0 +1,100 @@
+import unittest
+from unittest.mock import patch, Mock, PropertyMock
+import os
+import sys
+from botocore.exceptions import ClientError
+
+# Append the path of the shared Lambda layer, in order to import from layers/common/
+layer_path_to_add = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'layers', 'common'))
+sys.path.append(layer_path_to_add)
+
+def resource_not_found_error(operation_name):
+    return ClientError({'Error': {'Code': 'ResourceNotFoundException', 'Message': 'Requested resource not found'}}, operation_name)
+
+class TestTableRegistry(unittest.TestCase):
+
+    def setUp(self):
+
+        import table_registry
+
+        self.table_registry = table_registry  # Store it in an instance variable
+        self.table_name = 'test_table'
+        self.table_registry.invalidate_table(self.table_name)
+
+    def tearDown(self):
+        self.table_registry.invalidate_table(self.table_name)
+
+    def test_get_table_validates_once(self):
+        print(f'***************************************************')
+        print(f'Unit Test: {self.__class__.__name__} : {self._testMethodName} :')
+        print(f'***************************************************')
+
+        dynamodb = Mock()
+        table_status = PropertyMock(return_value='ACTIVE')
+        type(dynamodb.Table.return_value).table_status = table_status
+
+        first = self.table_registry.get_table(dynamodb, self.table_name)
+        second = self.table_registry.get_table(dynamodb, self.table_name)
+
+        # DescribeTable (table_status) is called once. The second call uses the cached handle.
+        self.assertIs(first, second)
+        self.assertEqual(table_status.call_count, 1)
+
+        # With a TTL of 0 seconds, the table is validated again
+        self.table_registry.get_table(dynamodb, self.table_name, ttl_in_seconds=0)
+        self.assertEqual(table_status.call_count, 2)
+
+    def test_get_table_not_found(self):
+        print(f'***************************************************')
+        print(f'Unit Test: {self.__class__.__name__} : {self._testMethodName} :')
+        print(f'***************************************************')
+
+        dynamodb = Mock()
+        type(dynamodb.Table.return_value).table_status = PropertyMock(side_effect=resource_not_found_error('DescribeTable'))
+
+        with self.assertRaises(ValueError) as context:
+            self.table_registry.get_table(dynamodb, self.table_name)
+
+        self.assertIn(f'Table: {self.table_name} not found', str(context.exception))
+
+    def test_run_table_operation_revalidates_on_resource_not_found(self):
+        print(f'***************************************************')
+        print(f'Unit Test: {self.__class__.__name__} : {self._testMethodName} :')
+        print(f'***************************************************')
+
+        dynamodb = Mock()
+        table_status = PropertyMock(return_value='ACTIVE')
+        type(dynamodb.Table.return_value).table_status = table_status
+
+        # The first call fails as if the table was re-created since it was validated
+        operation = Mock(side_effect=[resource_not_found_error('GetItem'), {'Item': {'id': '1'}}])
+
+        result = self.table_registry.run_table_operation(dynamodb, self.table_name, operation)
+
+        self.assertEqual(result, {'Item': {'id': '1'}})
+        self.assertEqual(operation.call_count, 2)
+        self.assertEqual(table_status.call_count, 2)  # Validated, then validated again after the error
+
+    def test_run_table_operation_other_errors(self):
+        print(f'***************************************************')
+        print(f'Unit Test: {self.__class__.__name__} : {self._testMethodName} :')
+        print(f'***************************************************')
+
+        dynamodb = Mock()
+        type(dynamodb.Table.return_value).table_status = PropertyMock(return_value='ACTIVE')
+
+        throttled = ClientError({'Error': {'Code': 'ProvisionedThroughputExceededException', 'Message': 'Throttled'}}, 'GetItem')
+        operation = Mock(side_effect=throttled)
+
+        # Errors other than ResourceNotFoundException are not retried
+        with self.assertRaises(ClientError):
+            self.table_registry.run_table_operation(dynamodb, self.table_name, operation)
+        self.assertEqual(operation.call_count, 1)
+
+if __name__ == '__main__':
+
+    unittest.main()
+
+    # Remove the same path from sys.path when finished testing
+    if layer_path_to_add in sys.path:
+        sys.path.remove(layer_path_to_add)
@@ -9,6 +9,10 @@ import sys
 path_to_add = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
 sys.path.append(path_to_add)
 
+# Append the path of the shared Lambda layer, in order to import from layers/common/
+layer_path_to_add = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'layers', 'common'))
+sys.path.append(layer_path_to_add)
+
 class TestUpdateInventory(unittest.TestCase):
 
     def setUp(self):
@@ -68,7 +72,7 @@ class TestUpdateInventory(unittest.TestCase):
         ddb_table.put_item(
             Item={
                 'id': '1',
-                'inventory_count': '10'
+                'inventory_count': 10
             }
         )
                 
@@ -87,7 +91,7 @@ class TestUpdateInventory(unittest.TestCase):
 
         # Verify the inventory count was updated
         response = ddb_table.get_item(Key={'id': '1'})
-        self.assertEqual(response['Item']['inventory_count'], '8')    
+        self.assertEqual(response['Item']['inventory_count'], 8)    
 
     @mock_aws
     def test_update_inventory_not_found(self):
@@ -134,7 +138,7 @@ class TestUpdateInventory(unittest.TestCase):
         ddb_table.put_item(
             Item={
                 'id': '1',
-                'inventory_count': '10'
+                'inventory_count': 10
             }
         )
         
@@ -196,7 +200,7 @@ class TestUpdateInventory(unittest.TestCase):
         ddb_table.put_item(
             Item={
                 'id': '1',
-                'inventory_count': '10'
+                'inventory_count': 10
             }
         )
         
@@ -214,6 +218,90 @@ class TestUpdateInventory(unittest.TestCase):
         # Check if the function returns False indicating failure
         self.assertFalse(result)
         self.assertIn('error', valerror)  # Error should be set in valerror
+        self.assertEqual(valerror['failed_products'], [{'product_id': '1', 'reason': 'Not enough stock available', 'inventory_count': 10}])
+
+        # Nothing was updated
+        response = ddb_table.get_item(Key={'id': '1'})
+        self.assertEqual(response['Item']['inventory_count'], 10)
+
+    @mock_aws
+    def test_update_inventory_all_or_nothing(self):
+        print(f'***************************************************')
+        print(f'Unit Test: {self.__class__.__name__} : {self._testMethodName} :')
+        print(f'***************************************************')
+
+        # https://docs.getmoto.org/en/latest/docs/getting_started.html
+        # According to moto documentation, I can use the clients and resources that I created
+        # in AWS Lambda function, and then patch them (using patch_client() and patch_resource())
+        # to be used with moto.
+        from moto.core import patch_client, patch_resource    
+        patch_resource(self.dynamodb)
+
+        # Setup mock DynamoDB
+        table_name = os.environ['PRODUCTS_TABLE']
+
+        ddb_table = self.dynamodb.Table(table_name) 
+
+        # Create mock table
+        self.dynamodb.create_table(
+            TableName=table_name,
+            KeySchema=[
+                {
+                    'AttributeName': 'id',
+                    'KeyType': 'HASH'
+                }
+            ],
+            AttributeDefinitions=[
+                {
+                    'AttributeName': 'id',
+                    'AttributeType': 'S'
+                }
+            ],
+            ProvisionedThroughput={
+                'ReadCapacityUnits': 1,
+                'WriteCapacityUnits': 1
+            }
+        )
+
+        ddb_table.put_item(Item={'id': '1', 'inventory_count': 10})
+        ddb_table.put_item(Item={'id': '2', 'inventory_count': 3})
+
+        # Product 2 is listed twice: 2 + 2 = 4 is more than its stock. Product 3 does not exist.
+        received_order = {
+            'customerproduct': {
+                'productsToSubmit': [
+                    {'id': '1', 'quantity': '1'},
+                    {'id': '2', 'quantity': '2'},
+                    {'id': '3', 'quantity': '1'},
+                    {'id': '2', 'quantity': '2'}
+                ]
+            }
+        }
+        valerror = {}
+
+        result = self.update_inventory(received_order, valerror)
+
+        self.assertFalse(result)
+        self.assertEqual(valerror['failed_products'], [
+            {'product_id': '2', 'reason': 'Not enough stock available', 'inventory_count': 3},
+            {'product_id': '3', 'reason': 'Product not found'}
+        ])
+        self.assertIn('product 2', str(valerror['error']))
+
+        # The transaction was cancelled: product 1 was not updated either
+        self.assertEqual(ddb_table.get_item(Key={'id': '1'})['Item']['inventory_count'], 10)
+        self.assertEqual(ddb_table.get_item(Key={'id': '2'})['Item']['inventory_count'], 3)
+
+        # With enough stock, all products are updated together
+        received_order['customerproduct']['productsToSubmit'] = [
+            {'id': '1', 'quantity': '1'},
+            {'id': '2', 'quantity': '1'},
+            {'id': '2', 'quantity': '2'}
+        ]
+        valerror = {}
+        self.assertTrue(self.update_inventory(received_order, valerror))
+        self.assertEqual(ddb_table.get_item(Key={'id': '1'})['Item']['inventory_count'], 9)
+        self.assertEqual(ddb_table.get_item(Key={'id': '2'})['Item']['inventory_count'], 0)
 
     @patch('handlers.update_inventory.update_inventory.dynamodb.Table')
     @mock_aws
@@ -246,6 +334,53 @@ class TestUpdateInventory(unittest.TestCase):
         self.assertFalse(result)
         self.assertIn('error', valerror)  # Error should be set in valerror
 
+    @patch('handlers.update_inventory.update_inventory.shards_table_name', 'test_shards_table')
+    @mock_aws
+    def test_update_inventory_sharded_product(self):
+        print(f'***************************************************')
+        print(f'Unit Test: {self.__class__.__name__} : {self._testMethodName} :')
+        print(f'***************************************************')
+
+        # https://docs.getmoto.org/en/latest/docs/getting_started.html
+        # According to moto documentation, I can use the clients and resources that I created
+        # in AWS Lambda function, and then patch them (using patch_client() and patch_resource())
+        # to be used with moto.
+        from moto.core import patch_client, patch_resource    
+        patch_resource(self.dynamodb)
+
+        from inventory_shards import invalidate_shard_counts
+        invalidate_shard_counts()
+
+        for table_name in (os.environ['PRODUCTS_TABLE'], 'test_shards_table'):
+            self.dynamodb.create_table(
+                TableName=table_name,
+                KeySchema=[{'AttributeName': 'id', 'KeyType': 'HASH'}],
+                AttributeDefinitions=[{'AttributeName': 'id', 'AttributeType': 'S'}],
+                ProvisionedThroughput={'ReadCapacityUnits': 1, 'WriteCapacityUnits': 1}
+            )
+
+        # Product 1 is a hot product: its stock is in 4 shards
+        ddb_table = self.dynamodb.Table(os.environ['PRODUCTS_TABLE'])
+        ddb_table.put_item(Item={'id': '1', 'inventory_count': 0, 'inventory_shards': 4})
+        shards_table = self.dynamodb.Table('test_shards_table')
+        for shard, count in enumerate([3, 0, 0, 2]):
+            shards_table.put_item(Item={'id': f'1#{shard}', 'inventory_count': count})
+
+        received_order = {'customerproduct': {'productsToSubmit': [{'id': '1', 'quantity': '2'}]}}
+
+        # Each order finds a shard with enough stock
+        for _ in range(2):
+            valerror = {}
+            self.assertTrue(self.update_inventory(received_order, valerror))
+
+        counts = sorted(shards_table.get_item(Key={'id': f'1#{shard}'})['Item']['inventory_count'] for shard in range(4))
+        self.assertEqual(counts, [0, 0, 0, 1])
+
+        # No shard has enough stock left
+        valerror = {}
+        self.assertFalse(self.update_inventory(received_order, valerror))
+        self.assertEqual(valerror['failed_products'][0]['reason'], 'Not enough stock available')
+
 if __name__ == '__main__':
 
     os.environ['AWS_ACCESS_KEY_ID'] = 'testing'
@@ -36,21 +36,34 @@ const CustomerInfoForm = () => {
     });
   };
 
-  const createOrder = async (dataToSubmit) => {
+  const createOrder = async (dataToSubmit, idempotencyKey) => {
     try {
+        // wait=true: the order is placed within this request when possible (200).
+        // Otherwise, the response is 202 and the status is polled.
         const response = await axios.post(`${API_GATEWAY_BASE_URL}/orders`, dataToSubmit, {
+            params: {
+                wait: true
+            },
             headers: {
-                'Content-Type': 'application/json'
+                'Content-Type': 'application/json',
+                // A retry of this submission with the same key does not create a second order
+                'Idempotency-Key': idempotencyKey
             }
         });
-                
-        if (response.status === 202) {                        
+
+        if (response.status === 200) {
+            const { status, output } = response.data;
+            if (status === 'SUCCEEDED' && output && output.inventory_updated) {
+                return status;
+            }
+            throw new Error(`Order processing failed: ${(output && output.error) || response.data.cause || status}`);
+        } else if (response.status === 202) {                        
             // Poll for status
             const { executionArn } = response.data;
             let orderStatus = 'RUNNING';
 
             while (orderStatus === 'RUNNING') {
-                const statusResponse = await axios.get(`${API_GATEWAY_BASE_URL}/orders/status/${executionArn}`, {
+                const statusResponse = await axios.get(`${API_GATEWAY_BASE_URL}/orders/status/${executionArn}?wait=20`, {
                   headers: {
                     'Content-Type': 'application/json'
                   }
@@ -65,6 +78,7 @@ const CustomerInfoForm = () => {
                     throw new Error(`Order processing failed: ${statusData.output}`);
                 }
 
+                // The server waits up to 20 seconds for the end of the execution (wait=20).
                 // Wait before the next poll
                 await new Promise(resolve => setTimeout(resolve, 2000));
             }
@@ -90,7 +104,7 @@ const CustomerInfoForm = () => {
         }
 
     try {
-        const result = await createOrder(dataToSubmit);
+        const result = await createOrder(dataToSubmit, crypto.randomUUID());
         setIsLoading(false);
         setIsSubmitted(true);
     } catch (error) {
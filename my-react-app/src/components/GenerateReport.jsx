@@ -35,7 +35,7 @@ const GenerateReport = () => {
                 let orderStatus = 'RUNNING';
             
                 while (orderStatus === 'RUNNING') {
-                    const statusResponse = await axios.get(`${API_GATEWAY_BASE_URL}/create-report/status/${executionArn}`, {
+                    const statusResponse = await axios.get(`${API_GATEWAY_BASE_URL}/create-report/status/${executionArn}?wait=20`, {
                     headers: {
                         'Content-Type': 'application/json'
                     }
@@ -51,6 +51,7 @@ const GenerateReport = () => {
                         throw new Error(`Report processing failed: ${statusData.output}`);
                     }
                 
+                    // The server waits up to 20 seconds for the end of the execution (wait=20).
                     // Wait before the next poll
                     await new Promise(resolve => setTimeout(resolve, 2000));
                 }
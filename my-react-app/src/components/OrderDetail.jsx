@@ -9,6 +9,7 @@ const OrderDetail = () => {
     const API_GATEWAY_BASE_URL = import.meta.env.VITE_API_GATEWAY_URL;
     const { id } = useParams(); // Extracting the "id" from the URL
     const [order, setOrder] = useState(null);
+    const [products, setProducts] = useState({});
     const [loading, setLoading] = useState(true);
     const [error, setError] = useState(null);
     const navigate = useNavigate();
@@ -25,6 +26,21 @@ const OrderDetail = () => {
                 },
             });
  	            setOrder(response.data);
+
+                // Get all ordered products in one request instead of one request per product
+                const ids = response.data.ordered_items.map(item => item.product_id).join(',');
+                const productsResponse = await axios.get(`${API_GATEWAY_BASE_URL}/products`, {
+                    params: { ids },
+                    headers: {
+                      Authorization: `Bearer ${accessToken}`,
+                      "Content-Type": "application/json",
+                    },
+                });
+                const productsById = (productsResponse.data.products || []).reduce((acc, product) => {
+                    acc[product.id] = product;
+                    return acc;
+                }, {});
+                setProducts(productsById);
                 setLoading(false);
             } catch (err) {
                 setError(err.message);
@@ -87,7 +103,7 @@ const OrderDetail = () => {
                     order.ordered_items.map(item => {
                         return (
                             <div key={item.product_id} >                                
-                                <OrderItem productid={item.product_id} productitem={item}/>                                
+                                <OrderItem product={products[item.product_id]} productitem={item}/>                                
                             </div>
                         )
                     })
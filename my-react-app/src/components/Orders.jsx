@@ -8,22 +8,36 @@ const API_GATEWAY_BASE_URL = import.meta.env.VITE_API_GATEWAY_URL;
 function Orders() {
   const [orders, setOrders] = useState([]);
   const [loading, setLoading] = useState(true);
+  // Cursor of the next page of orders (null: no more orders)
+  const [nextCursor, setNextCursor] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
   
   const accessToken = localStorage.getItem("accessToken");
 
-  useEffect(() => {
-    if (!loading) return;
-
-    axios.get(`${API_GATEWAY_BASE_URL}/orders`, {
+  // Reads one page of orders, most recent first. The next page starts at cursor.
+  const getOrdersPage = (cursor) => axios.get(`${API_GATEWAY_BASE_URL}/orders`, {
+            params: {
+              // Only the attributes that are shown in the table
+              fields: 'id,display_code,customer_name,ordered_items,order_time',
+              order: 'desc',
+              limit: 50,
+              ...(cursor ? { cursor } : {}),
+            },
             headers: {
               Authorization: `Bearer ${accessToken}`,
               "Content-Type": "application/json",
             },
-    })
+    });
+
+  useEffect(() => {
+    if (!loading) return;
+
+    getOrdersPage(null)
     .then((response) => {
         //API response has a "orders" property containing the array, you'll need to extract it correctly.
         const ordersData = response.data.orders || []; // Extract the orders array
         setOrders(ordersData);
+        setNextCursor(response.data.next_cursor || null);
         setLoading(false);
     })
     .catch((err) => {
@@ -32,6 +46,20 @@ function Orders() {
     });
 }, [loading]);
 
+const loadMoreOrders = () => {
+    setLoadingMore(true);
+    getOrdersPage(nextCursor)
+    .then((response) => {
+        setOrders((previousOrders) => [...previousOrders, ...(response.data.orders || [])]);
+        setNextCursor(response.data.next_cursor || null);
+        setLoadingMore(false);
+    })
+    .catch((err) => {
+        console.log(err);
+        setLoadingMore(false);
+    });
+};
+
 if (loading) {
   return <div className="loading-text">Loading...</div>;
 }
@@ -48,6 +76,7 @@ return (
     <table>
         <thead>
             <tr>
+                <th>Order Code</th>
                 <th>Customer Name</th>
                 <th>Number of Products</th>
                 <th>Order Submitted on</th>
@@ -57,15 +86,16 @@ return (
         <tbody>
         {loading ? (
           <tr>
-            <td colSpan="4" className="loading-text">Loading orders...</td>
+            <td colSpan="5" className="loading-text">Loading orders...</td>
           </tr>
         ) : orders.length === 0 ? (
           <tr>
-            <td colSpan="4">No orders to show</td>
+            <td colSpan="5">No orders to show</td>
           </tr>
         ) : (
           orders.map((order) => (
             <tr key={order.id}>
+              <td>{order.display_code || order.id}</td>
               <td>{order.customer_name}</td>
               <td>{order.ordered_items.length}</td>
               <td>{formatDate(order.order_time)}</td>
@@ -75,6 +105,11 @@ return (
         )}
         </tbody>
     </table>
+    {nextCursor && (
+      <button onClick={loadMoreOrders} disabled={loadingMore}>
+        {loadingMore ? 'Loading...' : 'Load more orders'}
+      </button>
+    )}
   </div>
 );
 